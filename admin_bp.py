@@ -8,7 +8,7 @@ from flask import (
     url_for, flash, abort, current_app, jsonify
 )
 from flask_login import login_required, current_user, logout_user
-from sqlalchemy import text, func, or_, and_
+from sqlalchemy import func, or_, and_
 from sqlalchemy import inspect as sqla_inspect
 
 from models import (
@@ -18,14 +18,29 @@ from models import (
     DepositRequest,
     PaymentSettings,
     PlayerBalance,
+    PlayerStats,
+    WalletLedger,
     GameAccount,
     GameAccountRequest,
     WithdrawRequest,
     ReferralCode,
     Notification,
+    NotificationArchive,
+    RequestArchive,
     notify,
     BonusSettings,
 )
+from keyset import seek, cached_count
+from db_routing import read_only
+from load_shed import low_priority
+from exports import export_response
+from player_search import user_filter
+import kv
+import settings_cache
+import unread_counts
+from wallet import credit as wallet_credit, key_for as wallet_key
+
+PLAYERS_PAGE_SIZE = 100
 
 admin_bp = Blueprint("adminbp", __name__, url_prefix="/admin")
 
@@ -78,75 +93,6 @@ def _save_image(file_storage, prefix: str) -> str | None:
     file_storage.save(dest)
     return url_for("static", filename=f"uploads/{new_name}")
 
-# ---------- KV Store ----------
-
-def _ensure_kv():
-    """Create key-value table if it doesn't exist."""
-    try:
-        bind = db.session.get_bind()
-        dialect = bind.dialect.name if bind else "sqlite"
-        if dialect in ("postgresql", "postgres"):
-            db.session.execute(text("""
-                CREATE TABLE IF NOT EXISTS kv_store (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """))
-        elif dialect in ("mysql", "mariadb"):
-            db.session.execute(text("""
-                CREATE TABLE IF NOT EXISTS kv_store (
-                    `key` VARCHAR(191) PRIMARY KEY,
-                    `value` TEXT
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """))
-        else:
-            db.session.execute(text("""
-                CREATE TABLE IF NOT EXISTS kv_store (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-def _kv_set(k: str, v: str | None):
-    _ensure_kv()
-    v = v if v is not None else ""
-    try:
-        bind = db.session.get_bind()
-        dialect = bind.dialect.name if bind else "sqlite"
-        if dialect in ("postgresql", "postgres"):
-            db.session.execute(
-                text("INSERT INTO kv_store(key,value) VALUES(:k,:v) "
-                     "ON CONFLICT (key) DO UPDATE SET value=EXCLUDED.value"),
-                {"k": k, "v": v}
-            )
-        elif dialect in ("mysql", "mariadb"):
-            db.session.execute(
-                text("INSERT INTO kv_store(`key`,`value`) VALUES(:k,:v) "
-                     "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"),
-                {"k": k, "v": v}
-            )
-        else:
-            db.session.execute(
-                text("INSERT INTO kv_store(key,value) VALUES(:k,:v) "
-                     "ON CONFLICT(key) DO UPDATE SET value=excluded.value"),
-                {"k": k, "v": v}
-            )
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-def _kv_get(k: str) -> str | None:
-    _ensure_kv()
-    try:
-        row = db.session.execute(text("SELECT value FROM kv_store WHERE key=:k"), {"k": k}).fetchone()
-        return row[0] if row else None
-    except Exception:
-        db.session.rollback()
-        return None
-
 # ---------- PaymentSettings ----------
 
 def _get_settings() -> PaymentSettings:
@@ -167,28 +113,24 @@ def _get_bonus_stats():
     """Get bonus statistics."""
     try:
         # Get bonus settings
-        bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-        if not bonus_settings:
-            bonus_settings = BonusSettings()
-            db.session.add(bonus_settings)
-            db.session.commit()
+        bonus_settings = settings_cache.bonus()  # cached snapshot
         
-        # Get bonus summary
-        signup_bonus_used = User.query.filter_by(
-            role="PLAYER",
-            signup_bonus_claimed=True
-        ).count()
+        # Get bonus summary (daily_stats rollup: user rows carry the signup bonus)
+        import daily_stats  # lazy: pulls in celery
+        players = daily_stats.totals("user", statuses=("PLAYER",))
+        signup_bonus_used = players["bonus_count"]
         
-        total_players = User.query.filter_by(role="PLAYER").count()
+        total_players = players["count"]
         eligible_signup = total_players - signup_bonus_used
         
-        # Count players who have made at least one deposit
-        players_with_deposits = db.session.query(User.id).join(
-            DepositRequest, User.id == DepositRequest.user_id
+        # Count players who have made at least one deposit (player_stats, not history;
+        # a distinct count doesn't add up across daily rollup rows)
+        players_with_deposits = db.session.query(func.count(PlayerStats.user_id)).join(
+            User, User.id == PlayerStats.user_id
         ).filter(
             User.role == "PLAYER",
-            DepositRequest.status.in_(["LOADED", "PAID"])
-        ).distinct().count()
+            PlayerStats.deposit_count > 0
+        ).scalar() or 0
         
         # Calculate available for regular bonus (players with deposits who have used signup bonus)
         eligible_regular = players_with_deposits - signup_bonus_used
@@ -216,71 +158,34 @@ def _get_bonus_stats():
 # -------------------- Admin Home --------------------
 
 @admin_bp.get("/")
+@read_only
 def admin_home():
     """Admin dashboard - REMOVED @login_required decorator to avoid conflicts"""
     print(f"[DEBUG] admin_home - User: {current_user.email if current_user.is_authenticated else 'Anonymous'}")
     
     s = _get_settings()
-
-    players_count = User.query.filter_by(role="PLAYER").count()
-    employees_count = User.query.filter_by(role="EMPLOYEE").count()
-    games_count = Game.query.count()
-    pending_deposits_count = DepositRequest.query.filter_by(status="PENDING").count()
+    import daily_stats  # lazy: pulls in celery
 
     employees = User.query.filter_by(role="EMPLOYEE").all()
     games = Game.query.all()
+
+    players_count = daily_stats.count("user", statuses=("PLAYER",))
+    employees_count = len(employees)
+    games_count = len(games)
+    pending_deposits_count = DepositRequest.query.filter_by(status="PENDING").count()  # live, like employee_home
     pending_deposits = DepositRequest.query.filter_by(status="PENDING").order_by(DepositRequest.created_at.desc()).limit(50).all()
 
     # Bonus statistics
     bonus_stats = _get_bonus_stats()
             
     # Get current bonus settings for display
-    bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-    if not bonus_settings:
-        bonus_settings = BonusSettings()
-        db.session.add(bonus_settings)
-        db.session.commit()
-    
-    # Calculate deposits by employee
-    dep_by_emp = {}
-    for emp in employees:
-        try:
-            # Count deposits loaded by this employee
-            if hasattr(DepositRequest, 'loaded_by'):
-                emp_deposits = DepositRequest.query.filter_by(
-                    loaded_by=emp.id, 
-                    status="LOADED"
-                ).count()
-            else:
-                emp_deposits = 0
-            
-            # Sum amounts for this employee
-            if hasattr(DepositRequest, 'loaded_by') and hasattr(DepositRequest, 'amount'):
-                total_amount = db.session.query(
-                    func.coalesce(func.sum(DepositRequest.amount), 0)
-                ).filter(
-                    DepositRequest.loaded_by == emp.id,
-                    DepositRequest.status == "LOADED"
-                ).scalar() or 0
-            else:
-                total_amount = 0
-            
-            dep_by_emp[emp.id] = {
-                'count': emp_deposits,
-                'sum': total_amount
-            }
-        except Exception:
-            dep_by_emp[emp.id] = {'count': 0, 'sum': 0}
+    bonus_settings = settings_cache.bonus()  # cached snapshot
     
-    # Calculate IDs created by employee (GameAccount requests)
-    ids_by_emp = {}
-    for emp in employees:
-        try:
-            # Count game account requests created by this employee
-            ids_count = GameAccountRequest.query.filter_by(handled_by=emp.id).count()
-            ids_by_emp[emp.id] = ids_count
-        except Exception:
-            ids_by_emp[emp.id] = 0
+    # Deposits loaded / IDs handled per employee: one grouped rollup query each
+    loaded = daily_stats.by_actor("deposit", statuses=("LOADED",))
+    handled = daily_stats.by_actor("id_request")
+    dep_by_emp = {emp.id: loaded.get(emp.id, {'count': 0, 'sum': 0}) for emp in employees}
+    ids_by_emp = {emp.id: handled.get(emp.id, {'count': 0})['count'] for emp in employees}
     
     # Get latest game account requests
     latest_ids = GameAccountRequest.query.order_by(
@@ -327,7 +232,7 @@ def settings_get():
     s = _get_settings()
     
     # Get trending games list
-    trending_csv = getattr(s, "trending_game_ids", None) or _kv_get("trending_game_ids") or ""
+    trending_csv = getattr(s, "trending_game_ids", None) or kv.get("trending_game_ids") or ""
     trending_selected_ids = []
     if trending_csv:
         for token in str(trending_csv).split(","):
@@ -336,11 +241,7 @@ def settings_get():
                 trending_selected_ids.append(int(token))
     
     # Get current bonus settings
-    bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-    if not bonus_settings:
-        bonus_settings = BonusSettings()
-        db.session.add(bonus_settings)
-        db.session.commit()
+    bonus_settings = settings_cache.bonus()  # cached snapshot
 
     return render_template(
         "admin_settings.html",
@@ -358,7 +259,7 @@ def update_crypto_qr():
     s.crypto_wallet_text = (request.form.get("crypto_wallet_text") or "").strip()
     crypto_pay_url = (request.form.get("crypto_pay_url") or "").strip()
     _maybe_set(s, "crypto_pay_url", crypto_pay_url)
-    _kv_set("crypto_pay_url", crypto_pay_url)
+    kv.put("crypto_pay_url", crypto_pay_url)
 
     qr_file = request.files.get("crypto_qr")
     url = _save_image(qr_file, "crypto_qr")
@@ -381,7 +282,7 @@ def update_chime_qr():
     s.chime_handle = (request.form.get("chime_handle") or "").strip()
     chime_pay_url = (request.form.get("chime_pay_url") or "").strip()
     _maybe_set(s, "chime_pay_url", chime_pay_url)
-    _kv_set("chime_pay_url", chime_pay_url)
+    kv.put("chime_pay_url", chime_pay_url)
 
     qr_file = request.files.get("chime_qr")
     url = _save_image(qr_file, "chime_qr")
@@ -440,9 +341,8 @@ def update_promotions():
         _maybe_set(s, "ticker_bonus_percent", ticker_bonus_percent)
 
         # Save to kv_store for backup
-        _kv_set("promo_line1", promo_line1)
-        _kv_set("promo_line2", promo_line2)
-        _kv_set("ticker_bonus_percent", str(ticker_bonus_percent))
+        kv.put_many({"promo_line1": promo_line1, "promo_line2": promo_line2,
+                     "ticker_bonus_percent": str(ticker_bonus_percent)})
 
         db.session.commit()
         flash("Promotions updated successfully!", "success")
@@ -474,8 +374,7 @@ def update_trending_games():
         _maybe_set(s, "trending_note", trending_note)
 
         # Save to kv_store for backup
-        _kv_set("trending_game_ids", csv_value)
-        _kv_set("trending_note", trending_note)
+        kv.put_many({"trending_game_ids": csv_value, "trending_note": trending_note})
 
         db.session.commit()
         flash("Trending games updated successfully!", "success")
@@ -691,7 +590,7 @@ def create_game():
     db.session.add(g)
     db.session.commit()
 
-    _kv_set(f"game:{g.id}:backend_url", backend_url or "")
+    kv.put(f"game:{g.id}:backend_url", backend_url or "")
 
     flash("Game created.", "success")
     return redirect(url_for("adminbp.games_list"))
@@ -724,7 +623,7 @@ def edit_game_post(game_id: int):
 
     db.session.commit()
 
-    _kv_set(f"game:{g.id}:backend_url", backend_url or "")
+    kv.put(f"game:{g.id}:backend_url", backend_url or "")
 
     flash("Game updated.", "success")
     return redirect(url_for("adminbp.games_list"))
@@ -780,10 +679,30 @@ def delete_game(game_id):
 # -------------------- Deposits Audit --------------------
 
 @admin_bp.get("/deposits")
+@read_only
 def deposits_audit():
     pending = DepositRequest.query.filter_by(status="PENDING").order_by(DepositRequest.created_at.desc()).all()
     recent = DepositRequest.query.filter(DepositRequest.status.in_(["LOADED", "PAID"])).order_by(DepositRequest.updated_at.desc()).limit(20).all()
-    return render_template("admin_deposits.html", page_title="Deposits", pending=pending, recent=recent)
+
+    # ?q= finds a deposit by id or player name/email, live rows first, then cold storage
+    q = (request.args.get("q") or "").strip()
+    found, archived = [], []
+    if q:
+        cond = [user_filter(DepositRequest.user_id, q)]
+        if q.lstrip("#").isdigit():
+            cond.append(DepositRequest.id == int(q.lstrip("#")))
+        found = (
+            DepositRequest.query
+            .filter(or_(*cond))
+            .order_by(DepositRequest.created_at.desc(), DepositRequest.id.desc())
+            .limit(50)
+            .all()
+        )
+        import cold_storage  # lazy: pulls in celery
+        archived = cold_storage.search("deposit", q=q, limit=50)
+
+    return render_template("admin_deposits.html", page_title="Deposits", pending=pending, recent=recent,
+                           q=q, found=found, archived=archived)
 
 @admin_bp.post("/deposits/<int:dep_id>/<string:action>")
 def deposit_mark(dep_id: int, action: str):
@@ -804,9 +723,7 @@ def deposit_mark(dep_id: int, action: str):
             dep.loaded_by = current_user.id
 
         if dep.amount and dep.user_id:
-            wallet = PlayerBalance.query.filter_by(user_id=dep.user_id).first()
-            if wallet:
-                wallet.balance = (wallet.balance or 0) + int(dep.amount or 0)
+            wallet_credit(dep.user_id, dep.amount, key=wallet_key("deposit", dep), actor_id=current_user.id)
 
         db.session.commit()
 
@@ -825,9 +742,18 @@ def deposit_mark(dep_id: int, action: str):
 # -------------------- Players Management -------------------
 
 @admin_bp.get("/players")
+@read_only
 def admin_players():
-    players = User.query.filter_by(role="PLAYER").limit(200).all()
-    return render_template("admin_players.html", page_title="Players", players=players)
+    q = User.query.filter_by(role="PLAYER")
+    page = seek(q, User, cursor=request.args.get("cursor"), limit=PLAYERS_PAGE_SIZE)
+    return render_template(
+        "admin_players.html",
+        page_title="Players",
+        players=page.rows,
+        total=cached_count("admin:players", q),
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+    )
 
 @admin_bp.post("/players/<int:player_id>/delete")
 def delete_player(player_id: int):
@@ -837,22 +763,144 @@ def delete_player(player_id: int):
         return redirect(url_for("adminbp.admin_players"))
 
     try:
+        import daily_stats  # lazy: pulls in celery
+        daily_stats.forget_user(player_id)  # before the bulk deletes the flush hook can't see
         DepositRequest.query.filter_by(user_id=player_id).delete(synchronize_session=False)
         WithdrawRequest.query.filter_by(user_id=player_id).delete(synchronize_session=False)
         GameAccountRequest.query.filter_by(user_id=player_id).delete(synchronize_session=False)
         GameAccount.query.filter_by(user_id=player_id).delete(synchronize_session=False)
         PlayerBalance.query.filter_by(user_id=player_id).delete(synchronize_session=False)
+        WalletLedger.query.filter_by(user_id=player_id).delete(synchronize_session=False)
+        PlayerStats.query.filter_by(user_id=player_id).delete(synchronize_session=False)
         ReferralCode.query.filter_by(user_id=player_id).delete(synchronize_session=False)
         Notification.query.filter_by(user_id=player_id).delete(synchronize_session=False)
+        NotificationArchive.query.filter_by(user_id=player_id).delete(synchronize_session=False)
+        RequestArchive.query.filter_by(user_id=player_id).delete(synchronize_session=False)
 
         db.session.delete(u)
         db.session.commit()
+        unread_counts.forget(player_id)
         flash("Player and all related data deleted.", "success")
     except Exception:
         db.session.rollback()
         flash("Failed to delete player. See server logs.", "error")
     return redirect(url_for("adminbp.admin_players"))
 
+# -------------------- Exports --------------------
+
+@admin_bp.get("/export/<string:dataset>.<string:fmt>")
+@low_priority
+def export_dataset(dataset: str, fmt: str):
+    """Streamed CSV/Parquet of deposits, withdrawals or players (?from=&to=&status=&archived=1)."""
+    return export_response(dataset, fmt, request.args)
+
+# -------------------- Queue Observability --------------------
+
+def _queue_snapshot():
+    try:
+        hours = int(request.args.get("hours", 24))
+    except (TypeError, ValueError):
+        hours = 24
+    import queue_metrics  # lazy: pulls in celery.signals
+    return queue_metrics.snapshot(hours)
+
+@admin_bp.get("/queues")
+@read_only
+def queues_page():
+    """Per-vendor wait/run/attempt percentiles, outcomes and live backlog."""
+    import ready_pool
+    try:
+        pool = ready_pool.plan()
+    except Exception:
+        db.session.rollback()
+        pool = []
+    return render_template("admin_queues.html", page_title="Queues", snap=_queue_snapshot(),
+                           pool=pool, pool_window=ready_pool.POOL_QUIET_HOURS)
+
+@admin_bp.get("/queues.json")
+@read_only
+def queues_json():
+    return jsonify(_queue_snapshot())
+
+# -------------------- Dead Letters --------------------
+
+def _dlq_filters():
+    return {
+        "kind": request.values.get("kind") or None,
+        "error_class": request.values.get("error_class") or None,
+        "vendor": request.values.get("vendor") or None,
+    }
+
+@admin_bp.get("/dead-letters")
+def dead_letters_page():
+    """Failed ID/credit jobs with filters + bulk replay."""
+    import dead_letters
+    filters = _dlq_filters()
+    status = request.args.get("status") or "DEAD"
+    jobs = (
+        dead_letters.query(status=status, **filters)
+        .order_by(dead_letters.DeadLetterJob.created_at.desc())
+        .limit(300)
+        .all()
+    )
+    return render_template(
+        "admin_dead_letters.html",
+        page_title="Dead letters",
+        jobs=jobs,
+        counts=dead_letters.counts(status),
+        filters=filters,
+        status=status,
+        kinds=dead_letters.KINDS,
+        error_classes=dead_letters.ERROR_CLASSES,
+        default_rate=dead_letters.REPLAY_RATE,
+    )
+
+@admin_bp.post("/dead-letters/replay")
+def dead_letters_replay():
+    import dead_letters
+    filters = _dlq_filters()
+    ids = [int(i) for i in request.form.getlist("ids") if str(i).isdigit()]
+    try:
+        limit = int(request.form.get("limit") or 200)
+        rate = int(request.form.get("rate") or dead_letters.REPLAY_RATE)
+    except ValueError:
+        flash("Limit and rate must be numbers.", "error")
+        return redirect(url_for("adminbp.dead_letters_page", **filters))
+
+    summary = dead_letters.replay(
+        ids=ids or None, limit=limit, rate=rate,
+        force=bool(request.form.get("force")), staff=bool(ids), **filters,
+    )
+    msg = (f"🔁 Replay: {summary['queued']} queued at {summary['rate_per_min']}/min, "
+           f"{summary['resolved']} already resolved, {summary['deferred']} deferred.")
+    if summary["unhealthy"]:
+        msg += " Skipped unhealthy vendors: " + ", ".join(
+            f"{v} ({why})" for v, why in summary["unhealthy"].items())
+    flash(msg, "success" if summary["queued"] else "info")
+    return redirect(url_for("adminbp.dead_letters_page", **{k: v for k, v in filters.items() if v}))
+
+@admin_bp.post("/dead-letters/<int:job_id>/resolve")
+def dead_letter_resolve(job_id: int):
+    """Staff fixed it by hand – take it out of the queue."""
+    import dead_letters
+    job = db.session.get(dead_letters.DeadLetterJob, job_id)
+    if not job:
+        abort(404)
+    job.status = "RESOLVED"
+    db.session.commit()
+    flash(f"Dead letter #{job_id} marked resolved.", "success")
+    return redirect(request.referrer or url_for("adminbp.dead_letters_page"))
+
+@admin_bp.post("/dead-letters/<int:job_id>/release")
+def dead_letter_release(job_id: int):
+    """Staff checked the vendor panel: the credit is not there, allow replay."""
+    import dead_letters
+    if dead_letters.release(job_id):
+        flash(f"Dead letter #{job_id} released for replay.", "success")
+    else:
+        flash(f"Dead letter #{job_id} is not waiting for verification.", "info")
+    return redirect(request.referrer or url_for("adminbp.dead_letters_page"))
+
 # -------------------- Emergency Bypass Route --------------------
 # Use this ONLY for testing if you still have issues
 
@@ -1,10 +1,16 @@
 import os
-from flask import Flask, render_template, redirect, url_for, jsonify, request
+from flask import Flask, g, render_template, redirect, url_for, jsonify, request
+from werkzeug.local import LocalProxy
 from flask_socketio import join_room, leave_room, rooms  # Add these
 from flask_migrate import Migrate
+from schema_check import MIGRATIONS_DIR, check_schema
+import load_shed
+from load_shed import low_priority
+import kv  # cached kv_store reads (promo / trending fallbacks)
+import settings_cache  # versioned PaymentSettings / BonusSettings snapshots
+import unread_counts  # Redis badge counters
 from dotenv import load_dotenv
 from flask_login import LoginManager, current_user, login_user, login_required
-from sqlalchemy import text, inspect as sqla_inspect
 from sqlalchemy.exc import TimeoutError as SATimeoutError, SQLAlchemyError
 from flask_socketio import SocketIO, emit
 from flask_mail import Mail
@@ -24,7 +30,7 @@ start_keepalive_background()
 from telegram_bp import telegram_bp
 from queued_requests import queue_bp
 
-# models (import every model that needs a table so create_all() sees them)
+# models (import every model that needs a table so `flask db migrate` sees them)
 from models import (
     db,
     User,
@@ -33,7 +39,6 @@ from models import (
     Game,
     GameAccount,
     DepositRequest,
-    PaymentSettings,
     EmailToken,
     PasswordResetToken,
     WithdrawRequest,
@@ -43,7 +48,7 @@ from models import (
     DMMessage,
     ReferralCode,
     BonusSettings,
-    BonusRecord
+    BonusRecord,
 )
 
 # ✅ back-compat alias (so old imports from player_bp expecting `Deposit` still work)
@@ -90,14 +95,9 @@ def create_app():
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///casino.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-    # 🔧 Bigger SQLAlchemy pool for Neon (helps avoid TimeoutError under load)
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_size": 20,        # persistent connections
-        "max_overflow": 40,     # extra temporary connections
-        "pool_timeout": 30,     # seconds to wait for a connection
-        "pool_recycle": 1800,   # recycle connections every 30 minutes
-        "pool_pre_ping": True,  # check connection before using it
-    }
+    # 🔧 Pool/pragmas per dialect: the big Neon pool on Postgres, WAL + busy_timeout on SQLite
+    from db_engine import engine_options
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
 
     # SafePay config
     app.config["SAFE_PAY_LOGIN_URL"]   = os.getenv("SAFE_PAY_LOGIN_URL", "https://www.safepayin.com/#/base/exp")
@@ -123,57 +123,29 @@ def create_app():
         MAIL_DEFAULT_SENDER=os.getenv("MAIL_DEFAULT_SENDER") or os.getenv("SMTP_FROM", "no-reply@neonspire.local"),
     )
 
+    # optional DATABASE_REPLICA_URL bind for read-only views / bot listings
+    from db_routing import init_db_routing
+    init_db_routing(app)
+
     db.init_app(app)
-    migrate = Migrate(app, db)
-    socketio.init_app(app)
-    mail.init_app(app)
-    
-    # ------------------ tiny kv fallback (shared) ------------------
-    def _ensure_kv():
-        try:
-            bind = db.session.get_bind()
-            dialect = bind.dialect.name if bind else "sqlite"
-            if dialect in ("postgresql", "postgres"):
-                db.session.execute(text("""
-                    CREATE TABLE IF NOT EXISTS kv_store (
-                        key TEXT PRIMARY KEY,
-                        value TEXT
-                    )
-                """))
-            elif dialect in ("mysql", "mariadb"):
-                db.session.execute(text("""
-                    CREATE TABLE IF NOT EXISTS kv_store (
-                        `key` VARCHAR(191) PRIMARY KEY,
-                        `value` TEXT
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-                """))
-            else:  # sqlite / other
-                db.session.execute(text("""
-                    CREATE TABLE IF NOT EXISTS kv_store (
-                        key TEXT PRIMARY KEY,
-                        value TEXT
-                    )
-                """))
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
+    migrate = Migrate(app, db, directory=MIGRATIONS_DIR)
 
-    def _kv_get(k: str):
-        _ensure_kv()
-        try:
-            row = db.session.execute(text("SELECT value FROM kv_store WHERE key=:k"), {"k": k}).fetchone()
-            return row[0] if row else None
-        except Exception:
-            db.session.rollback()
-            return None
+    # query-shape capture for index_advisor.py (load runs only)
+    if _as_bool(os.getenv("INDEX_ADVISOR")):
+        from index_advisor import install as install_index_advisor
+        install_index_advisor()
 
-    def _kv_first(*keys, default=None):
-        for k in keys:
-            v = _kv_get(k)
-            if v not in (None, ""):
-                return v
-        return default
+    # 503 + Retry-After for @low_priority views while the DB pool is saturated
+    # (registered first so shed requests skip the other before_request hooks)
+    load_shed.init_load_shed(app)
 
+    # per-request query count/time, N+1 + slow-query log, Server-Timing
+    from sql_trace import init_sql_trace
+    init_sql_trace(app)
+
+    socketio.init_app(app)
+    mail.init_app(app)
+    
     def _first_attr(obj, *names, default=None):
         for n in names:
             if hasattr(obj, n):
@@ -188,6 +160,7 @@ def create_app():
 
     @app.get("/player/request/latest/<int:game_id>.json")
     @login_required
+    @low_priority
     def player_request_latest_for_game_json(game_id):
         """
         Return the most recent GameAccountRequest for this user + game.
@@ -221,22 +194,22 @@ def create_app():
         return db.session.get(User, int(user_id))
 
     # ------------------ globals for templates ------------------
+    def _request_wallet():
+        # first template that touches `wallet` loads it, once per request;
+        # wallets are created at registration, never here
+        if "_wallet" not in g:
+            g._wallet = (PlayerBalance.query.filter_by(user_id=current_user.id).first()
+                         if current_user.is_authenticated else None)
+        return g._wallet
+
     @app.context_processor
     def inject_globals():
-        if current_user.is_authenticated:
-            cnt = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
-        else:
-            cnt = 0
+        # Redis counter (unread_counts), not a COUNT per render
+        cnt = unread_counts.get(current_user.id) if current_user.is_authenticated else 0
 
-        settings = db.session.get(PaymentSettings, 1)
+        settings = settings_cache.payment()  # versioned snapshot: no query on a warm cache
 
-        wallet = None
-        if current_user.is_authenticated:
-            wallet = PlayerBalance.query.filter_by(user_id=current_user.id).first()
-            if not wallet:
-                wallet = PlayerBalance(user_id=current_user.id, balance=0)
-                db.session.add(wallet)
-                db.session.commit()
+        wallet = LocalProxy(_request_wallet)
 
         # 👇 detect if this request is coming from the Telegram mini app
         is_telegram = (
@@ -246,7 +219,7 @@ def create_app():
         )
 
         system_status = {
-            "busy": os.getenv("SYSTEM_BUSY", "0") == "1"
+            "busy": load_shed.saturated()
         }
 
         return dict(
@@ -288,29 +261,27 @@ def create_app():
 
     # ------------------ Home / Lobby ------------------
     @app.route("/")
+    @low_priority(anonymous_only=True)
     def index():
         games = Game.query.filter_by(is_active=True).order_by(
             Game.created_at.desc() if hasattr(Game, "created_at") else Game.id.desc()
         ).all()
 
-        settings = db.session.get(PaymentSettings, 1)
-        bonus_settings = db.session.get(BonusSettings, 1)
-        if not bonus_settings:
-            # Create default if missing
-            bonus_settings = BonusSettings(id=1)
-            db.session.add(bonus_settings)
-            db.session.commit()
+        settings = settings_cache.payment()
+        bonus_settings = settings_cache.bonus()  # creates the default row if missing
 
-        promo_line1 = _first_attr(settings, *PROMO1_ALIASES) or _kv_first(*PROMO1_ALIASES, default="")
-        promo_line2 = _first_attr(settings, *PROMO2_ALIASES) or _kv_first(*PROMO2_ALIASES, default="")
+        # every kv fallback below in one round-trip (then from the per-process cache)
+        kv.get_many([*PROMO1_ALIASES, *PROMO2_ALIASES, "bonus_percent", *TREND_ALIASES])
+        promo_line1 = _first_attr(settings, *PROMO1_ALIASES) or kv.first(*PROMO1_ALIASES, default="")
+        promo_line2 = _first_attr(settings, *PROMO2_ALIASES) or kv.first(*PROMO2_ALIASES, default="")
         bonus_percent = getattr(settings, "bonus_percent", None)
         if bonus_percent in (None, ""):
-            bp = _kv_first("bonus_percent")
+            bp = kv.first("bonus_percent")
             bonus_percent = int(bp) if (bp and str(bp).isdigit()) else 0
 
         raw_csv = _first_attr(settings, *TREND_ALIASES)
         if raw_csv in (None, ""):
-            raw_csv = _kv_first(*TREND_ALIASES, default="") or ""
+            raw_csv = kv.first(*TREND_ALIASES, default="") or ""
         trending_ids = []
         for token in str(raw_csv).split(","):
             t = token.strip()
@@ -518,21 +489,9 @@ def create_app():
         except Exception:
             pass
 
-        # auto-enable busy mode for 30 seconds
-        os.environ["SYSTEM_BUSY"] = "1"
-
-        return (
-            render_template(
-                "error.html",
-                status_code=503,
-                message_title="Casino is busy",
-                message_body=(
-                    "Our servers are handling a lot of players right now. "
-                    "Your request took too long to complete. Please refresh the page or try again shortly."
-                ),
-            ),
-            503,
-        )
+        # the pool already told load_shed (SampledQueuePool); this worker now
+        # sheds low-priority routes until the score cools down
+        return load_shed.busy_response()
 
     # 🔹 any other SQLAlchemy / database error
     @app.errorhandler(SQLAlchemyError)
@@ -601,158 +560,12 @@ def create_app():
         ]
         return jsonify({k: ("<set>" if os.getenv(k) else None) for k in keys})
 
-    # ------------------ bootstrap & schema patches ------------------
+    # ------------------ bootstrap ------------------
+    # Schema lives in migrations/ (python schema_check.py upgrade); at boot we only
+    # compare alembic_version with the head revision. See schema_check.py.
     with app.app_context():
-        db.create_all()
-        _ensure_kv()
-
-        insp = sqla_inspect(db.engine)
-        dialect = db.engine.dialect.name
-
-        def _has_col(table: str, col: str) -> bool:
-            try:
-                return col in {c["name"] for c in insp.get_columns(table)}
-            except Exception:
-                return False
-
-        def _add_col(stmt_sqlite: str, stmt_pg: str = None, stmt_mysql: str = None):
-            try:
-                if dialect in ("postgresql", "postgres"):
-                    db.session.execute(text(stmt_pg or stmt_sqlite))
-                elif dialect in ("mysql", "mariadb"):
-                    db.session.execute(text(stmt_mysql or stmt_sqlite))
-                else:
-                    db.session.execute(text(stmt_sqlite))
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
-
-        # --- games.backend_url ---
-        if not _has_col("games", "backend_url"):
-            _add_col(
-                "ALTER TABLE games ADD COLUMN backend_url VARCHAR(500)",
-                "ALTER TABLE games ADD COLUMN IF NOT EXISTS backend_url VARCHAR(500)",
-                "ALTER TABLE games ADD COLUMN backend_url VARCHAR(500) NULL",
-            )
-
-        # --- users patches ---
-        if not _has_col("users", "mobile"):
-            _add_col("ALTER TABLE users ADD COLUMN mobile VARCHAR(24)")
-        if not _has_col("users", "email_verified"):
-            _add_col("ALTER TABLE users ADD COLUMN email_verified BOOLEAN DEFAULT 0")
-        if not _has_col("users", "email_verified_at"):
-            _add_col("ALTER TABLE users ADD COLUMN email_verified_at DATETIME")
-        if not _has_col("users", "promo_seen"):
-            _add_col("ALTER TABLE users ADD COLUMN promo_seen BOOLEAN DEFAULT 0")
-        if not _has_col("users", "is_active"):
-            _add_col(
-                "ALTER TABLE users ADD COLUMN is_active BOOLEAN DEFAULT 1",
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE",
-                "ALTER TABLE users ADD COLUMN is_active TINYINT(1) DEFAULT 1",
-            )
-        if not _has_col("users", "bonus_eligible"):
-            _add_col(
-                "ALTER TABLE users ADD COLUMN bonus_eligible BOOLEAN DEFAULT 0",
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS bonus_eligible BOOLEAN DEFAULT FALSE",
-                "ALTER TABLE users ADD COLUMN bonus_eligible TINYINT(1) DEFAULT 0",
-            )
-
-        # 🔹 NEW – telegram columns for mini-app
-        if not _has_col("users", "telegram_id"):
-            _add_col("ALTER TABLE users ADD COLUMN telegram_id BIGINT")
-
-        if not _has_col("users", "telegram_username"):
-            _add_col("ALTER TABLE users ADD COLUMN telegram_username VARCHAR(64)")
-
-        if not _has_col("users", "telegram_firstname"):
-            _add_col("ALTER TABLE users ADD COLUMN telegram_firstname VARCHAR(120)")
-
-        if not _has_col("users", "telegram_lastname"):
-            _add_col("ALTER TABLE users ADD COLUMN telegram_lastname VARCHAR(120)")
-
-        # 🔹 bonus-related columns that are missing
-        if not _has_col("users", "deposit_count"):
-            _add_col("ALTER TABLE users ADD COLUMN deposit_count INTEGER DEFAULT 0")
-        if not _has_col("users", "signup_bonus_claimed"):
-            _add_col("ALTER TABLE users ADD COLUMN signup_bonus_claimed BOOLEAN DEFAULT 0")
-        if not _has_col("users", "signup_bonus_amount"):
-            _add_col("ALTER TABLE users ADD COLUMN signup_bonus_amount REAL DEFAULT 0.0")
-        if not _has_col("users", "signup_bonus_claimed_at"):
-            _add_col("ALTER TABLE users ADD COLUMN signup_bonus_claimed_at DATETIME")
-        if not _has_col("users", "regular_bonus_last_claimed"):
-            _add_col("ALTER TABLE users ADD COLUMN regular_bonus_last_claimed DATETIME")
-        if not _has_col("users", "available_bonus"):
-            _add_col("ALTER TABLE users ADD COLUMN available_bonus REAL DEFAULT 0.0")
-
-        # --- game_accounts patches ---
-        if not _has_col("game_accounts", "issued_by_id"):
-            _add_col("ALTER TABLE game_accounts ADD COLUMN issued_by_id INTEGER")
-        if not _has_col("game_accounts", "issued_at"):
-            _add_col("ALTER TABLE game_accounts ADD COLUMN issued_at DATETIME")
-        if not _has_col("game_accounts", "request_id"):
-            _add_col("ALTER TABLE game_accounts ADD COLUMN request_id INTEGER")
-
-        # --- game_account_requests patches ---
-        if not _has_col("game_account_requests", "approved_by_id"):
-            _add_col("ALTER TABLE game_account_requests ADD COLUMN approved_by_id INTEGER")
-        if not _has_col("game_account_requests", "handled_by"):
-            _add_col("ALTER TABLE game_account_requests ADD COLUMN handled_by INTEGER")
-        if not _has_col("game_account_requests", "approved_at"):
-            _add_col("ALTER TABLE game_account_requests ADD COLUMN approved_at DATETIME")
-        if not _has_col("game_account_requests", "status"):
-            _add_col("ALTER TABLE game_account_requests ADD COLUMN status VARCHAR(20) DEFAULT 'PENDING'")
-        if not _has_col("game_account_requests", "retry_count"):
-            _add_col("ALTER TABLE game_account_requests ADD COLUMN retry_count INTEGER DEFAULT 0")
-
-        # --- deposit_requests patches ---
-        if not _has_col("deposit_requests", "loaded_by"):
-            _add_col("ALTER TABLE deposit_requests ADD COLUMN loaded_by INTEGER")
-        if not _has_col("deposit_requests", "provider"):
-            _add_col("ALTER TABLE deposit_requests ADD COLUMN provider VARCHAR(32)")
-        if not _has_col("deposit_requests", "provider_order_id"):
-            _add_col("ALTER TABLE deposit_requests ADD COLUMN provider_order_id VARCHAR(128)")
-        if not _has_col("deposit_requests", "pay_url"):
-            _add_col("ALTER TABLE deposit_requests ADD COLUMN pay_url TEXT")
-        if not _has_col("deposit_requests", "backend_url"):
-            _add_col("ALTER TABLE deposit_requests ADD COLUMN backend_url TEXT")
-        if not _has_col("deposit_requests", "meta"):
-            _add_col("ALTER TABLE deposit_requests ADD COLUMN meta TEXT")
-
-        # --- payment_settings patches ---
-        ps_cols = {c["name"] for c in insp.get_columns("payment_settings")}
-        needed_ps = {
-            "whatsapp_url": "ALTER TABLE payment_settings ADD COLUMN whatsapp_url VARCHAR(500)",
-            "telegram_url": "ALTER TABLE payment_settings ADD COLUMN telegram_url VARCHAR(500)",
-            "facebook_url": "ALTER TABLE payment_settings ADD COLUMN facebook_url VARCHAR(500)",
-            "instagram_url": "ALTER TABLE payment_settings ADD COLUMN instagram_url VARCHAR(500)",
-            "promo_bonus_line": "ALTER TABLE payment_settings ADD COLUMN promo_bonus_line VARCHAR(300)",
-            "promo_referral_line": "ALTER TABLE payment_settings ADD COLUMN promo_referral_line VARCHAR(300)",
-            "promo_service_line": "ALTER TABLE payment_settings ADD COLUMN promo_service_line VARCHAR(300)",
-            "promo_trust_line": "ALTER TABLE payment_settings ADD COLUMN promo_trust_line VARCHAR(300)",
-            "cashapp_handle": "ALTER TABLE payment_settings ADD COLUMN cashapp_handle VARCHAR(255)",
-            "cashapp_qr_url": "ALTER TABLE payment_settings ADD COLUMN cashapp_qr_url VARCHAR(500)",
-            "cashapp_pay_url": "ALTER TABLE payment_settings ADD COLUMN cashapp_pay_url VARCHAR(500)",
-
-            # 🔹 NEW – withdraw payout fields
-            "withdraw_crypto_address": "ALTER TABLE payment_settings ADD COLUMN withdraw_crypto_address VARCHAR(255)",
-            "withdraw_crypto_qr_url":  "ALTER TABLE payment_settings ADD COLUMN withdraw_crypto_qr_url VARCHAR(500)",
-            "withdraw_chime_handle":   "ALTER TABLE payment_settings ADD COLUMN withdraw_chime_handle VARCHAR(255)",
-            "withdraw_chime_qr_url":   "ALTER TABLE payment_settings ADD COLUMN withdraw_chime_qr_url VARCHAR(500)",
-        }
-        for col, stmt in needed_ps.items():
-            if col not in ps_cols:
-                _add_col(stmt)
-
-        # Ensure a row exists in payment_settings with id=1
-        ps = db.session.get(PaymentSettings, 1)
-        if not ps:
-            ps = PaymentSettings(id=1)
-            db.session.add(ps)
-            db.session.commit()
-
-        # Ensure bonus settings exist
-        init_bonus_settings()
-        seed_admin()
+        if check_schema(db) in ("ok", "upgraded"):
+            seed_admin()
 
     return app
 
@@ -11,7 +11,7 @@ from flask import (
 )
 from flask_login import login_user, logout_user, current_user, login_required
 
-from models import db, User, EmailToken, PasswordResetToken
+from models import db, User, EmailToken, PasswordResetToken, PlayerBalance
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -213,6 +213,8 @@ def register_post():
     )
     u.set_password(password)
     db.session.add(u)
+    db.session.flush()
+    db.session.add(PlayerBalance(user_id=u.id, balance=0))  # wallet opens with the account
     db.session.commit()
 
     # Auto login after registration
@@ -12,10 +12,17 @@ import requests
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright, Page, BrowserContext, Frame, Locator
 
+# Progress events for the lobby card (no-op outside the ID worker)
+try:
+    from request_progress import report as _progress
+except Exception:  # pragma: no cover
+    def _progress(*a, **k):
+        return None
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-load_dotenv(PROJECT_ROOT / ".env", override=True)
+load_dotenv(PROJECT_ROOT / ".env")  # no override: tests/benches set DATABASE_URL first
 
 
 class FKError(RuntimeError):
@@ -205,6 +212,7 @@ class FireKirinUIBot:
             return p.locator("img, canvas").first.screenshot()
 
     def _solve_captcha(self, img_bytes: bytes) -> str:
+        _progress("solving_captcha")
         if self.cfg.captcha_provider != "2captcha":
             raise FKError("Only 2Captcha is supported.")
         if not self.cfg.captcha_key:
@@ -280,6 +288,7 @@ class FireKirinUIBot:
     # ──────────────────────────────────────────────────────────────────────
     # login + ensure logged in (with 2captcha + manual fallback)
     def ensure_logged_in(self):
+        _progress("logging_in")
         p = self.page
         assert p is not None
 
@@ -473,6 +482,7 @@ class FireKirinUIBot:
         return account
 
     def create_player(self, account: str, password: str, nickname: Optional[str] = None) -> dict:
+        _progress("creating_account")
         self.goto_user_management()
         mf = self._main_frame() or self.page
         assert mf is not None
@@ -12,6 +12,13 @@ from pathlib import Path
 from dotenv import load_dotenv
 from playwright.async_api import async_playwright, TimeoutError as PWTimeout
 
+# Progress events for the lobby card (no-op outside the ID worker)
+try:
+    from request_progress import report as _progress
+except Exception:  # pragma: no cover
+    def _progress(*a, **k):
+        return None
+
 # ------------------------------------------------------------------------------
 # ENV
 # ------------------------------------------------------------------------------
@@ -43,6 +50,7 @@ DEFAULT_CREDIT = int(os.getenv("GAMEROOM_DEFAULT_FIRST_CREDIT", "0"))
 # 2CAPTCHA
 # ------------------------------------------------------------------------------
 def solve_2captcha(api_key: str, img_bytes: bytes) -> str | None:
+    _progress("solving_captcha")
     if not api_key:
         return None
     import urllib.request, urllib.parse
@@ -210,6 +218,7 @@ async def close_all_layers(page, timeout_ms: int = 1500):
 # LOGIN
 # ------------------------------------------------------------------------------
 async def do_login(page):
+    _progress("logging_in")
     print("[gameroom] 2captcha key:", "SET" if GR_2CAPTCHA_KEY else "EMPTY")
     await page.goto(GR_LOGIN_URL, wait_until="domcontentloaded")
 
@@ -330,6 +339,7 @@ async def get_popup_iframe(page, kind: str, timeout_sec: float = 3.0):
 # CREATE USER (same)
 # ------------------------------------------------------------------------------
 async def ui_create_user(page, account, password, credit, nickname=None):
+    _progress("creating_account")
     await open_user_management(page)
     list_frame = await get_user_list_frame(page)
 
@@ -24,6 +24,13 @@ except Exception:
 import httpx
 from playwright.async_api import async_playwright, Page, Locator
 
+# Progress events for the lobby card (no-op outside the ID worker)
+try:
+    from request_progress import report as _progress
+except Exception:  # pragma: no cover
+    def _progress(*a, **k):
+        return None
+
 # --- ENV ---
 BASE = os.getenv("JUWA_BASE_URL", "https://ht.juwa777.com").rstrip("/")
 ADMIN_USER = os.getenv("JUWA_USERNAME", "")
@@ -76,6 +83,7 @@ async def _close(bundle):
 
 # --- Captcha via 2captcha ---
 async def _solve_captcha(page: Page) -> str:
+    _progress("solving_captcha")
     if not CAPTCHA_API_KEY:
         raise RuntimeError("CAPTCHA_API_KEY missing")
 
@@ -146,6 +154,7 @@ async def _dismiss_vegas_popup(page: Page) -> None:
 
 # --- Login ---
 async def juwa_login(page: Page) -> dict:
+    _progress("logging_in")
     await page.goto(LOGIN_URL, wait_until="domcontentloaded")
 
     user = page.get_by_placeholder("Account", exact=False)
@@ -246,6 +255,7 @@ def _amount_input_by_label(body: Locator, label_text: str) -> Locator:
 
 # --- Create user (auto-shuffle if taken) ---
 async def create_user(page: Page, account: Optional[str], password: Optional[str]) -> dict:
+    _progress("creating_account")
     await goto_user_management(page)
 
     base_name = account or f"{USERNAME_PREFIX}{_rand(USERNAME_LEN)}{USERNAME_SUFFIX}"
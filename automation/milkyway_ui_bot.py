@@ -13,9 +13,16 @@ import requests
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright, Page, BrowserContext, Frame, Locator
 
+# Progress events for the lobby card (no-op outside the ID worker)
+try:
+    from request_progress import report as _progress
+except Exception:  # pragma: no cover
+    def _progress(*a, **k):
+        return None
+
 # ──────────────────────────────────────────────────────────────────────────────
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-load_dotenv(PROJECT_ROOT / ".env", override=True)
+load_dotenv(PROJECT_ROOT / ".env")  # no override: tests/benches set DATABASE_URL first
 
 # ──────────────────────────────────────────────────────────────────────────────
 @dataclass
@@ -175,6 +182,7 @@ class MilkywayUIBot:
             return p.locator("img").first.screenshot()
 
     def _solve_captcha(self, img_bytes: bytes) -> str:
+        _progress("solving_captcha")
         if self.cfg.captcha_provider != "2captcha":
             raise MWError("Only 2Captcha is supported.")
         if not self.cfg.captcha_key:
@@ -240,6 +248,7 @@ class MilkywayUIBot:
         raise MWError(f"Failed to navigate to {label or url}: {last_err}")
 
     def ensure_logged_in(self):
+        _progress("logging_in")
         p = self.page
         assert p is not None
 
@@ -395,6 +404,7 @@ class MilkywayUIBot:
         """
         Manual create with provided account/password/nickname.
         """
+        _progress("creating_account")
         self.goto_user_management()
         mf = self._main_frame() or self.page
         assert mf is not None
@@ -732,6 +742,20 @@ def mw_create_player_auto():
         info = bot.create_player_auto()
         return info
 
+def mw_create_player_auto_batch(count: int):
+    """Create `count` players in one logged-in session (ReadyAccount pool filler)."""
+    out = []
+    with mw_from_env().session() as bot:
+        bot.ensure_logged_in()
+        for _ in range(max(0, int(count))):
+            try:
+                out.append(bot.create_player_auto())
+            except Exception as e:
+                # session is probably broken; keep what we have
+                out.append({"ok": False, "error": str(e)})
+                break
+    return out
+
 def mw_recharge(account_or_id: Union[str, int], amount: Union[int, float], note: str = ""):
     with mw_from_env().session() as bot:
         bot.ensure_logged_in()
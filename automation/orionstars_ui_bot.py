@@ -12,10 +12,17 @@ import requests
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright, Page, BrowserContext, Frame, Locator
 
+# Progress events for the lobby card (no-op outside the ID worker)
+try:
+    from request_progress import report as _progress
+except Exception:  # pragma: no cover
+    def _progress(*a, **k):
+        return None
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-load_dotenv(PROJECT_ROOT / ".env", override=True)
+load_dotenv(PROJECT_ROOT / ".env")  # no override: tests/benches set DATABASE_URL first
 
 
 class OSError(RuntimeError):
@@ -211,6 +218,7 @@ class OrionStarsUIBot:
             return p.locator("img, canvas").first.screenshot()
 
     def _solve_captcha(self, img_bytes: bytes) -> str:
+        _progress("solving_captcha")
         if self.cfg.captcha_provider != "2captcha":
             raise OSError("Only 2Captcha is supported.")
         if not self.cfg.captcha_key:
@@ -285,6 +293,7 @@ class OrionStarsUIBot:
     # ──────────────────────────────────────────────────────────────────────
     # login + ensure logged in - IDENTICAL TO FIREKIRIN
     def ensure_logged_in(self):
+        _progress("logging_in")
         p = self.page
         assert p is not None
 
@@ -486,6 +495,7 @@ class OrionStarsUIBot:
         return account
 
     def create_player(self, account: str, password: str, nickname: Optional[str] = None) -> dict:
+        _progress("creating_account")
         self.goto_user_management()
         mf = self._main_frame() or self.page
         assert mf is not None
@@ -913,6 +923,25 @@ def auto_create_sync() -> dict:
         return {"ok": False, "error": f"Orion Stars auto_create failed: {str(e)}"}
 
 
+def auto_create_batch_sync(count: int) -> list:
+    """
+    Create `count` Orion Stars accounts in ONE logged-in browser session
+    (ReadyAccount pool filler). Stops at the first failure.
+    Returns a list of {"ok": True, "account", "password"} / error dicts.
+    """
+    out = []
+    try:
+        bot = OrionStarsUIBot(OSConfig())
+        with bot.session() as b:
+            b.ensure_logged_in()
+            for _ in range(max(0, int(count))):
+                result = b.create_player_auto()
+                out.append({"ok": True, "account": result["account"], "password": result["password"]})
+    except Exception as e:
+        out.append({"ok": False, "error": f"Orion Stars auto_create batch failed: {str(e)}"})
+    return out
+
+
 def recharge_sync(account: str, amount: float, note: str = "") -> dict:
     """
     Recharge an Orion Stars account (for player_bp.py).
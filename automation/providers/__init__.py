@@ -6,6 +6,7 @@ Exports:
 - provider_credit(vendor, account, amount, note="")
 - provider_redeem(vendor, account, amount, note="")
 - provider_auto_create(vendor)  # optional
+- provider_auto_create_batch(vendor, count)  # optional, one session when supported
 - result_ok(res) / result_error_text(res)
 - all_providers, by_key, detect_by_name
 """
@@ -91,6 +92,7 @@ try:
         recharge_sync as os_credit_sync,
         redeem_sync as os_redeem_sync,
         auto_create_sync as os_auto_create_sync,
+        auto_create_batch_sync as os_auto_create_batch_sync,
     )
     _ORIONSTARS_AVAILABLE = True
 except Exception:
@@ -154,6 +156,7 @@ class Provider:
     credit: Callable[[str, int, str], Any]     # (account, amount, note) -> result
     redeem: Callable[[str, int, str], Any]     # (account, amount, note) -> result
     auto_create: Optional[Callable[[], Any]] = None  # optional
+    auto_create_batch: Optional[Callable[[int], List[Any]]] = None  # optional, one login for N accounts
 
 
 by_key: dict[str, Provider] = {
@@ -180,6 +183,7 @@ by_key: dict[str, Provider] = {
         credit=milkyway.credit,          # <-- Milkyway UI wired here
         redeem=milkyway.redeem,          # <-- Milkyway UI wired here
         auto_create=milkyway.auto_create, # <-- Milkyway UI auto-create wired here
+        auto_create_batch=milkyway.auto_create_batch,
     ),
     "vblink": Provider(
         key="vblink",
@@ -219,6 +223,7 @@ by_key["orionstars"] = Provider(
     credit=lambda account, amount, note="": os_credit_sync(account, amount, note),
     redeem=lambda account, amount, note="": os_redeem_sync(account, amount, note),
     auto_create=os_auto_create_sync if _ORIONSTARS_AVAILABLE else None,
+    auto_create_batch=os_auto_create_batch_sync if _ORIONSTARS_AVAILABLE else None,
 )
 
 # Register Orion Stars aliases
@@ -227,6 +232,7 @@ by_key["orion"] = Provider(
     credit=lambda account, amount, note="": os_credit_sync(account, amount, note),
     redeem=lambda account, amount, note="": os_redeem_sync(account, amount, note),
     auto_create=os_auto_create_sync if _ORIONSTARS_AVAILABLE else None,
+    auto_create_batch=os_auto_create_batch_sync if _ORIONSTARS_AVAILABLE else None,
 )
 
 by_key["os"] = Provider(
@@ -234,6 +240,7 @@ by_key["os"] = Provider(
     credit=lambda account, amount, note="": os_credit_sync(account, amount, note),
     redeem=lambda account, amount, note="": os_redeem_sync(account, amount, note),
     auto_create=os_auto_create_sync if _ORIONSTARS_AVAILABLE else None,
+    auto_create_batch=os_auto_create_batch_sync if _ORIONSTARS_AVAILABLE else None,
 )
 
 
@@ -389,4 +396,25 @@ def provider_auto_create(vendor: str) -> Any:
     p = by_key.get(v) or by_key.get(_normalized_vendor_string(v) or "")
     if not p or not p.auto_create:
         return {"ok": False, "error": f"Auto-create not supported for vendor '{vendor}'"}
-    return p.auto_create()
\ No newline at end of file
+    return p.auto_create()
+
+
+def provider_auto_create_batch(vendor: str, count: int) -> List[Any]:
+    """
+    Create up to `count` accounts. Uses the vendor's single-session batch
+    helper when it has one, otherwise calls auto_create() repeatedly.
+    Stops at the first failure (the failure is the last item).
+    """
+    v = (vendor or "").lower()
+    p = by_key.get(v) or by_key.get(_normalized_vendor_string(v) or "")
+    if not p or not p.auto_create:
+        return [{"ok": False, "error": f"Auto-create not supported for vendor '{vendor}'"}]
+    if p.auto_create_batch:
+        return list(p.auto_create_batch(int(count)) or [])
+    out: List[Any] = []
+    for _ in range(max(0, int(count))):
+        res = p.auto_create()
+        out.append(res)
+        if not result_ok(v, res):
+            break
+    return out
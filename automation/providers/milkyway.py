@@ -18,6 +18,7 @@ try:
         mw_recharge as _recharge,          # (account_or_id, amount, note="")
         mw_redeem as _redeem,              # (account_or_id, amount, note="")
         mw_create_player_auto as _auto_create,  # () -> dict
+        mw_create_player_auto_batch as _auto_create_batch,  # (count) -> list[dict]
     )
 except Exception as e:  # pragma: no cover
     _IMPORT_ERROR = str(e)
@@ -31,6 +32,9 @@ except Exception as e:  # pragma: no cover
     def _auto_create(*a, **k):
         return {"ok": False, "error": f"milkyway_ui_bot.mw_create_player_auto not available: {_IMPORT_ERROR}"}
 
+    def _auto_create_batch(*a, **k):
+        return [{"ok": False, "error": f"milkyway_ui_bot.mw_create_player_auto_batch not available: {_IMPORT_ERROR}"}]
+
 
 def _to_amount_int(amount: Union[int, float, str]) -> int:
     """
@@ -106,7 +110,21 @@ def auto_create() -> Dict[str, Any]:
         "note": "Auto-provisioned via Milkyway"
       }
     """
-    res = _auto_create()
+    return _normalize_created(_auto_create())
+
+
+def auto_create_batch(count: int) -> list:
+    """
+    Create `count` players in one Milkyway session (ReadyAccount pool filler).
+    Each item has the same shape as auto_create().
+    """
+    res = _auto_create_batch(count)
+    if not isinstance(res, list):
+        return [_normalize_created(res)]
+    return [_normalize_created(r) for r in res]
+
+
+def _normalize_created(res: Any) -> Dict[str, Any]:
     if not isinstance(res, dict):
         # if UI bot returned something odd, still wrap it
         return {"ok": True, "result": res, "note": "Auto-provisioned via Milkyway"}
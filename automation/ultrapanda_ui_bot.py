@@ -49,12 +49,12 @@ def _load_env():
     here = Path(__file__).resolve()
     for p in (here.parents[1] / ".env", here.parent / ".env"):
         if p.exists():
-            load_dotenv(p, override=True)
+            load_dotenv(p)
             print(f"[ultrapanda_ui_bot] .env loaded from {p}")
             return
     found = find_dotenv(usecwd=True)
     if found:
-        load_dotenv(found, override=True)
+        load_dotenv(found)
         print(f"[ultrapanda_ui_bot] .env loaded from {found}")
     else:
         print("[ultrapanda_ui_bot] .env not found; relying on OS env")
@@ -0,0 +1,61 @@
+# bench_cold_start.py
+"""
+Cold-start cost of `import app` (which calls create_app()) – what every
+gunicorn worker, Celery worker and CLI script pays before doing real work.
+
+Counts every statement sent to the database (before_cursor_execute) so the
+round-trips of the boot path show up next to the wall time.
+
+  python bench_cold_start.py                  # uses DATABASE_URL
+  python bench_cold_start.py --runs 10
+  DATABASE_URL=postgresql://... python bench_cold_start.py
+
+What to expect: the boot path should issue two statements (the
+alembic_version check and the seed_admin lookup) where create_all plus
+the inspector/ALTER patches used to issue dozens. Wall times depend on
+the machine – run it rather than trusting a figure here. On a remote
+Postgres every statement is a network round-trip, so the statement count
+is what matters there.
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_stmts = {"n": 0}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count(*_a, **_k):
+    _stmts["n"] += 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Measure app import / create_app() cold start")
+    ap.add_argument("--runs", type=int, default=5, help="extra create_app() calls to time")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    import app as app_module
+    first_ms = (time.perf_counter() - t0) * 1000
+    first_stmts = _stmts["n"]
+
+    times, stmts = [], []
+    for _ in range(max(1, args.runs)):
+        _stmts["n"] = 0
+        t = time.perf_counter()
+        app_module.create_app()
+        times.append((time.perf_counter() - t) * 1000)
+        stmts.append(_stmts["n"])
+
+    print(f"import app        : {first_ms:8.1f} ms  {first_stmts:4d} statements")
+    print(f"create_app median : {statistics.median(times):8.1f} ms  {int(statistics.median(stmts)):4d} statements"
+          f"  (runs={len(times)})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
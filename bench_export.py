@@ -0,0 +1,156 @@
+# bench_export.py
+"""
+Deposit export on a large synthetic table: the naive way (ORM .all(),
+then csv.writer over the list) against exports.py (stream_results +
+yield_per, one encoded chunk per batch).
+
+Seeds a SQLite file in a fresh temp dir, then runs every mode in its
+own process so peak RSS is measured per mode rather than accumulated.
+
+  python bench_export.py                       # 1M deposits
+  python bench_export.py --rows 200000 --mode stream-csv --mode stream-parquet
+"""
+
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+MODES = ("naive", "stream-csv", "stream-parquet")
+N_PLAYERS = 20_000
+SEED_CHUNK = 50_000
+
+
+def _rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def _seed(db, rows: int):
+    from sqlalchemy import insert
+    from models import DepositRequest, Game, User
+
+    db.session.execute(insert(User.__table__), [
+        {"email": f"bench{i}@example.com", "name": f"Player {i}", "role": "PLAYER", "password_hash": "x",
+         "created_at": datetime(2025, 1, 1)}
+        for i in range(N_PLAYERS)
+    ])
+    db.session.execute(insert(Game.__table__), [{"name": f"Game {i}", "download_url": ""} for i in range(10)])
+    db.session.commit()
+    user_ids = [uid for (uid,) in db.session.query(User.id)]
+    game_ids = [gid for (gid,) in db.session.query(Game.id)]
+
+    rnd = random.Random(42)
+    start = datetime(2025, 1, 1)
+    statuses = ("LOADED", "LOADED", "LOADED", "REJECTED", "PENDING")
+    done = 0
+    while done < rows:
+        n = min(SEED_CHUNK, rows - done)
+        batch = []
+        for i in range(done, done + n):
+            created = start + timedelta(seconds=i * 30)
+            status = rnd.choice(statuses)
+            amount = float(rnd.randint(10, 500))
+            bonus = round(amount * 0.1, 2) if rnd.random() < 0.2 else 0.0
+            batch.append({
+                "user_id": rnd.choice(user_ids), "game_id": rnd.choice(game_ids),
+                "amount": amount, "method": rnd.choice(("CRYPTO", "CHIME", "CASHAPP")), "status": status,
+                "bonus_amount": bonus, "total_credited": amount + bonus,
+                "provider_order_id": f"ord-{i}", "created_at": created,
+                "loaded_at": created + timedelta(minutes=5) if status == "LOADED" else None,
+            })
+        db.session.execute(insert(DepositRequest.__table__), batch)
+        db.session.commit()
+        done += n
+
+
+def _naive(out_path: str) -> int:
+    from models import DepositRequest
+
+    rows = DepositRequest.query.order_by(DepositRequest.created_at, DepositRequest.id).all()
+    with open(out_path, "w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["id", "user_id", "amount", "method", "status", "bonus_amount", "created_at"])
+        for d in rows:
+            w.writerow([d.id, d.user_id, d.amount, d.method, d.status, d.bonus_amount, d.created_at])
+    return len(rows)
+
+
+def _child(mode: str, url: str, out_path: str, batch: int, out):
+    os.environ["SQL_TRACE"] = "0"
+    os.environ["DATABASE_URL"] = url
+    from app import app
+    if app.config["SQLALCHEMY_DATABASE_URI"] != url:
+        out.put({"mode": mode, "error": f"app is on {app.config['SQLALCHEMY_DATABASE_URI']}, not {url}"})
+        return
+    import exports
+
+    with app.app_context():
+        base = _rss_mb()
+        t0 = time.perf_counter()
+        try:
+            if mode == "naive":
+                n = _naive(out_path)
+            else:
+                fmt = mode.split("-", 1)[1]
+                with open(out_path, "wb") as fh:
+                    exports.write_export(fh, "deposits", fmt, batch=batch)
+                n = None
+        except RuntimeError as e:  # parquet without pyarrow
+            out.put({"mode": mode, "error": str(e)})
+            return
+        secs = time.perf_counter() - t0
+        out.put({"mode": mode, "secs": secs, "rows": n, "rss": _rss_mb(), "delta": _rss_mb() - base,
+                 "bytes": os.path.getsize(out_path)})
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark naive vs streamed deposit export")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--mode", choices=MODES, action="append", default=None)
+    args = ap.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_export_")
+    url = f"sqlite:///{os.path.join(tmpdir, 'export.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SCHEMA_CHECK", "upgrade")
+    os.environ["SQL_TRACE"] = "0"
+
+    from app import app
+    if app.config["SQLALCHEMY_DATABASE_URI"] != url:
+        raise SystemExit(f"app is on {app.config['SQLALCHEMY_DATABASE_URI']}, not {url} – refusing to seed")
+    from models import db
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        _seed(db, args.rows)
+        db.session.remove()
+        db.engine.dispose()
+    print(f"seeded {args.rows} deposits in {time.perf_counter() - t0:.1f}s ({tmpdir})")
+
+    ctx = mp.get_context("spawn")  # fresh interpreters: each child gets the DB url, not our RSS
+    print(f"{'mode':<15} {'seconds':>8} {'rows/s':>10} {'peak MB':>8} {'+MB':>7} {'file MB':>8}")
+    for mode in args.mode or MODES:
+        out = ctx.Queue()
+        path = os.path.join(tmpdir, f"out-{mode}.{'parquet' if mode.endswith('parquet') else 'csv'}")
+        p = ctx.Process(target=_child, args=(mode, url, path, args.batch, out))
+        p.start()
+        r = out.get()
+        p.join()
+        if "error" in r:
+            print(f"{mode:<15} skipped: {r['error']}")
+            continue
+        print(f"{mode:<15} {r['secs']:8.1f} {args.rows / r['secs']:10.0f} {r['rss']:8.0f} "
+              f"{r['delta']:7.0f} {r['bytes'] / 1e6:8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,138 @@
+# bench_globals.py
+"""
+Statements per rendered page, before and after the cheap inject_globals:
+
+  legacy   unread Notification COUNT + PaymentSettings get + PlayerBalance
+           lookup (INSERT + COMMIT when missing) on every render
+  current  unread_counts (Redis), settings_cache snapshot, lazy wallet
+
+Seeds one player, a few games and some notifications into a SQLite
+file in a fresh temp dir, logs the player in on a test client and
+requests each page --runs times per mode.
+"legacy" swaps the old context processor back in for the run.
+
+  python bench_globals.py
+  python bench_globals.py --runs 20 --page / --page /notifications/
+
+Without a reachable Redis the current mode still counts unread rows (one
+statement) – the report says which.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PAGES = ("/", "/player/dashboard", "/notifications/", "/no-such-page")
+
+_stmts = {"n": 0}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count(*_a, **_k):
+    _stmts["n"] += 1
+
+
+def _seed(db) -> int:
+    from models import Game, Notification, PlayerBalance, User
+
+    u = User(email="bench-player@example.com", name="Bench Player", role="PLAYER")
+    u.set_password("x")
+    db.session.add(u)
+    db.session.flush()
+    db.session.add(PlayerBalance(user_id=u.id, balance=100))
+    db.session.add_all([Game(name=f"Game {i}", download_url="", is_active=True) for i in range(8)])
+    db.session.add_all([Notification(user_id=u.id, message=f"note {i}", is_read=i % 3 == 0,
+                                     created_at=datetime.utcnow()) for i in range(30)])
+    db.session.commit()
+    return u.id
+
+
+def _legacy_globals():
+    """inject_globals as it was before unread_counts / settings_cache / the lazy wallet."""
+    from flask import request
+    from flask_login import current_user
+    import load_shed
+    from models import db, Notification, PaymentSettings, PlayerBalance
+
+    if current_user.is_authenticated:
+        cnt = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
+    else:
+        cnt = 0
+    settings = db.session.get(PaymentSettings, 1)
+    wallet = None
+    if current_user.is_authenticated:
+        wallet = PlayerBalance.query.filter_by(user_id=current_user.id).first()
+        if not wallet:
+            wallet = PlayerBalance(user_id=current_user.id, balance=0)
+            db.session.add(wallet)
+            db.session.commit()
+    is_telegram = (request.cookies.get("is_telegram") == "1" or request.args.get("tg") == "1"
+                   or request.path.startswith("/tg/"))
+    return dict(unread_count=cnt, settings=settings, wallet=wallet, is_telegram=is_telegram,
+                system_status={"busy": load_shed.saturated()})
+
+
+def _measure(client, page: str, runs: int) -> list[int]:
+    client.get(page)  # warm caches / first-request setup
+    counts = []
+    for _ in range(runs):
+        _stmts["n"] = 0
+        client.get(page)
+        counts.append(_stmts["n"])
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Statements per page: legacy vs current inject_globals")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--page", action="append", default=None)
+    args = ap.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_globals_")
+    url = f"sqlite:///{os.path.join(tmpdir, 'globals.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SCHEMA_CHECK", "upgrade")
+    os.environ["SQL_TRACE"] = "0"
+
+    from app import app
+    if app.config["SQLALCHEMY_DATABASE_URI"] != url:
+        raise SystemExit(f"app is on {app.config['SQLALCHEMY_DATABASE_URI']}, not {url} – refusing to seed")
+    from models import db
+    import unread_counts
+
+    with app.app_context():
+        uid = _seed(db)
+    try:
+        unread_counts._redis().ping()
+        backend = "redis"
+    except Exception:
+        backend = "no redis: unread falls back to COUNT"
+
+    procs = app.template_context_processors[None]
+    current = next(p for p in procs if p.__name__ == "inject_globals")
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = str(uid)
+        s["_fresh"] = True
+
+    results = {}
+    for mode, proc in (("legacy", _legacy_globals), ("current", current)):
+        procs[procs.index(next(p for p in procs if p.__name__ in ("inject_globals", "_legacy_globals")))] = proc
+        for page in args.page or PAGES:
+            results[(mode, page)] = statistics.mean(_measure(client, page, args.runs))
+
+    print(f"statements per request, mean of {args.runs} ({backend})")
+    print(f"{'page':<22} {'legacy':>8} {'current':>8} {'saved':>7}")
+    for page in args.page or PAGES:
+        old, new = results[("legacy", page)], results[("current", page)]
+        print(f"{page:<22} {old:8.1f} {new:8.1f} {old - new:7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
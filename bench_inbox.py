@@ -0,0 +1,151 @@
+# bench_inbox.py
+"""
+Staff chat inbox at scale: the old per-thread loop (get(User) + "last
+message" query for each of the 300 rows) against the denormalized
+dm_threads columns + one joined query that chat_bp.inbox runs now.
+
+Seeds N players into a SQLite file in a fresh temp dir, one OPEN thread
+each and a few messages per thread, then times both read paths and
+counts statements.
+
+  python bench_inbox.py                      # 10k threads
+  python bench_inbox.py --threads 50000 --runs 5
+
+Statements are fixed by the code: the loop issues 1 + 2 per row (601 for
+a 300-row page), the denormalized read 1. Timings depend on the machine
+and database – run it rather than trusting a figure here.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import desc, event
+from sqlalchemy.engine import Engine
+
+_stmts = {"n": 0}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count(*_a, **_k):
+    _stmts["n"] += 1
+
+
+def _seed(db, n_threads: int, per_thread: int):
+    from models import User, DMThread, DMMessage
+
+    now = datetime.utcnow()
+    staff = User(email="bench-staff@example.com", name="Bench Staff", role="EMPLOYEE", password_hash="x")
+    db.session.add(staff)
+    db.session.flush()
+
+    db.session.bulk_insert_mappings(User, [
+        {"email": f"bench{i}@example.com", "name": f"Player {i}", "role": "PLAYER", "password_hash": "x"}
+        for i in range(n_threads)
+    ])
+    player_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == "PLAYER").order_by(User.id)]
+    db.session.bulk_insert_mappings(DMThread, [
+        {"player_id": pid, "employee_id": staff.id, "status": "OPEN",
+         "created_at": now, "last_msg_at": now - timedelta(seconds=i)}
+        for i, pid in enumerate(player_ids)
+    ])
+    thread_ids = [tid for (tid,) in db.session.query(DMThread.id).order_by(DMThread.id)]
+    db.session.commit()
+
+    # ORM inserts in batches so _maintain_dm_threads fills the new columns
+    # exactly as in production.
+    batch = []
+    for tid, pid in zip(thread_ids, player_ids):
+        for k in range(per_thread):
+            player_turn = k % 2 == 0
+            batch.append(DMMessage(
+                thread_id=tid,
+                sender_id=pid if player_turn else staff.id,
+                sender_role="PLAYER" if player_turn else "EMPLOYEE",
+                body=f"message {k} in thread {tid} " + "lorem ipsum " * 12,
+                source="website",
+                created_at=now,
+            ))
+        if len(batch) >= 5000:
+            db.session.add_all(batch)
+            db.session.commit()
+            batch = []
+    db.session.add_all(batch)
+    db.session.commit()
+
+
+def _old_inbox(db, limit: int):
+    from models import User, DMThread, DMMessage
+
+    out = []
+    threads = (DMThread.query.filter_by(status="OPEN")
+               .order_by(desc(DMThread.last_msg_at), desc(DMThread.id))
+               .limit(limit).all())
+    for t in threads:
+        player = db.session.get(User, t.player_id)
+        last = DMMessage.query.filter_by(thread_id=t.id).order_by(DMMessage.id.desc()).first()
+        out.append((player.name if player else None, last.body[:80] if last else None))
+    return out
+
+
+def _new_inbox(db, limit: int):
+    from models import User, DMThread
+
+    rows = (db.session.query(DMThread, User)
+            .outerjoin(User, User.id == DMThread.player_id)
+            .filter(DMThread.status == "OPEN")
+            .order_by(desc(DMThread.last_msg_at), desc(DMThread.id))
+            .limit(limit).all())
+    return [(p.name if p else None, (t.last_msg_snippet or "")[:80], t.unread_for_staff) for t, p in rows]
+
+
+def _time(db, fn, limit: int, runs: int):
+    times, stmts = [], []
+    for _ in range(runs):
+        db.session.expunge_all()  # cold identity map, like a fresh request
+        _stmts["n"] = 0
+        t0 = time.perf_counter()
+        rows = fn(db, limit)
+        times.append((time.perf_counter() - t0) * 1000)
+        stmts.append(_stmts["n"])
+    return statistics.median(times), int(statistics.median(stmts)), len(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the staff chat inbox query")
+    ap.add_argument("--threads", type=int, default=10_000)
+    ap.add_argument("--messages", type=int, default=3, help="messages per thread")
+    ap.add_argument("--limit", type=int, default=300, help="inbox page size")
+    ap.add_argument("--runs", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_inbox_")
+    url = f"sqlite:///{os.path.join(tmpdir, 'inbox.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SCHEMA_CHECK", "upgrade")
+    os.environ["SQL_TRACE"] = "0"
+
+    from app import app
+    if app.config["SQLALCHEMY_DATABASE_URI"] != url:
+        raise SystemExit(f"app is on {app.config['SQLALCHEMY_DATABASE_URI']}, not {url} – refusing to seed")
+    from models import db
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        _seed(db, args.threads, args.messages)
+        print(f"seeded {args.threads} threads x {args.messages} messages in {time.perf_counter() - t0:.1f}s "
+              f"({tmpdir})")
+
+        old_ms, old_n, old_rows = _time(db, _old_inbox, args.limit, args.runs)
+        new_ms, new_n, new_rows = _time(db, _new_inbox, args.limit, args.runs)
+
+    print(f"per-thread loop : {old_ms:8.1f} ms  {old_n:4d} statements  ({old_rows} rows)")
+    print(f"denormalized    : {new_ms:8.1f} ms  {new_n:4d} statements  ({new_rows} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+# bench_notify.py
+"""
+Notification fan-out: the old per-recipient notify() loop (dedup SELECT +
+INSERT + COMMIT for every recipient) against models.notify_many (one dedup
+SELECT and one batched INSERT per 1000 recipients, one COMMIT).
+
+Two shapes:
+  staff    – deposit_submit / withdraw_post telling every EMPLOYEE/ADMIN
+  players  – chat broadcast to every open thread
+
+Both run against users seeded into a SQLite file in a fresh temp dir.
+
+  python bench_notify.py                       # 50 staff, 10k recipients
+  python bench_notify.py --staff 200 --players 50000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_stmts = {"n": 0, "commits": 0}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count(*_a, **_k):
+    _stmts["n"] += 1
+
+
+@event.listens_for(Engine, "commit")
+def _count_commit(*_a, **_k):
+    _stmts["commits"] += 1
+
+
+def _seed(db, n_staff: int, n_players: int):
+    from models import User
+
+    db.session.bulk_insert_mappings(User, [
+        {"email": f"staff{i}@example.com", "name": f"Staff {i}", "role": "EMPLOYEE", "password_hash": "x"}
+        for i in range(n_staff)
+    ] + [
+        {"email": f"bench{i}@example.com", "name": f"Player {i}", "role": "PLAYER", "password_hash": "x"}
+        for i in range(n_players)
+    ])
+    db.session.commit()
+
+
+def _old_notify(db, user_id: int, message: str):
+    """models.notify as it was before notify_many."""
+    from models import Notification
+
+    recent = (
+        Notification.query
+        .filter(Notification.user_id == user_id)
+        .filter(Notification.message == message)
+        .filter(Notification.is_read == False)  # noqa: E712
+        .order_by(Notification.created_at.desc())
+        .first()
+    )
+    if recent and (datetime.utcnow() - (recent.created_at or datetime.utcnow())) < timedelta(minutes=5):
+        return
+    db.session.add(Notification(user_id=user_id, message=message, is_read=False, created_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def _run(label, fn):
+    _stmts["n"] = _stmts["commits"] = 0
+    t0 = time.perf_counter()
+    fn()
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"{label:<28} {ms:9.1f} ms  {_stmts['n']:6d} statements  {_stmts['commits']:6d} commits")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark notification fan-out")
+    ap.add_argument("--staff", type=int, default=50)
+    ap.add_argument("--players", type=int, default=10_000)
+    args = ap.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_notify_")
+    url = f"sqlite:///{os.path.join(tmpdir, 'notify.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SCHEMA_CHECK", "upgrade")
+    os.environ["SQL_TRACE"] = "0"
+
+    from app import app
+    if app.config["SQLALCHEMY_DATABASE_URI"] != url:
+        raise SystemExit(f"app is on {app.config['SQLALCHEMY_DATABASE_URI']}, not {url} – refusing to seed")
+    from models import db, User, notify_many
+
+    with app.app_context():
+        _seed(db, args.staff, args.players)
+        staff = [uid for (uid,) in db.session.query(User.id).filter(User.role == "EMPLOYEE")]
+        players = [uid for (uid,) in db.session.query(User.id).filter(User.role == "PLAYER")]
+        print(f"seeded {len(staff)} staff + {len(players)} players ({tmpdir})")
+
+        _run(f"staff x{len(staff)}   loop", lambda: [_old_notify(db, u, "deposit #1 (old)") for u in staff])
+        _run(f"staff x{len(staff)}   batched", lambda: notify_many(staff, "deposit #1 (new)"))
+        _run(f"staff x{len(staff)}   batched, dup", lambda: notify_many(staff, "deposit #1 (new)"))
+        _run(f"players x{len(players)} loop", lambda: [_old_notify(db, u, "broadcast (old)") for u in players])
+        _run(f"players x{len(players)} batched", lambda: notify_many(players, "broadcast (new)"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+# bench_search.py
+"""
+Player search on a large synthetic users table: the old unindexed
+`name/email ILIKE '%term%'` scan against player_search.search_user_ids
+(FTS5 trigram on SQLite, pg_trgm on Postgres).
+
+Seeds users into a SQLite file in a fresh temp dir, builds the search
+index with player_search.rebuild(), then times a mix of terms: name
+fragments, email fragments, a mobile suffix, an exact id and a miss.
+
+  python bench_search.py                       # 500k users
+  python bench_search.py --users 100000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+SEED_CHUNK = 50_000
+FIRST = ("john", "maria", "ahmed", "li", "olga", "carlos", "fatima", "kenji", "amara", "noah")
+LAST = ("smith", "garcia", "khan", "wang", "ivanova", "silva", "okafor", "tanaka", "mensah", "brown")
+
+
+def _seed(db, n_users: int):
+    from sqlalchemy import insert
+    from models import User
+
+    rnd = random.Random(42)
+    done = 0
+    while done < n_users:
+        n = min(SEED_CHUNK, n_users - done)
+        batch = []
+        for i in range(done, done + n):
+            first, last = rnd.choice(FIRST), rnd.choice(LAST)
+            batch.append({
+                "email": f"{first}.{last}{i}@example.com", "name": f"{first.title()} {last.title()}",
+                "mobile": f"+1555{i:07d}", "role": "PLAYER", "password_hash": "x",
+                "created_at": datetime(2025, 1, 1),
+            })
+        db.session.execute(insert(User.__table__), batch)
+        db.session.commit()
+        done += n
+
+
+def _old(term: str, limit: int) -> list[int]:
+    from models import User
+    return [u.id for u in User.query.filter(
+        (User.email.ilike(f"%{term}%")) | (User.name.ilike(f"%{term}%"))
+    ).limit(limit).all()]
+
+
+def _time(fn, term: str, limit: int, repeat: int) -> tuple[float, int]:
+    best, n = float("inf"), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = len(fn(term, limit))
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark LIKE scan vs indexed player search")
+    ap.add_argument("--users", type=int, default=500_000)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_search_")
+    url = f"sqlite:///{os.path.join(tmpdir, 'search.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SCHEMA_CHECK", "upgrade")
+    os.environ["SQL_TRACE"] = "0"
+
+    from app import app
+    if app.config["SQLALCHEMY_DATABASE_URI"] != url:
+        raise SystemExit(f"app is on {app.config['SQLALCHEMY_DATABASE_URI']}, not {url} – refusing to seed")
+    from models import db
+    import player_search
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        _seed(db, args.users)
+        print(f"seeded {args.users} users in {time.perf_counter() - t0:.1f}s ({tmpdir})")
+        t0 = time.perf_counter()
+        player_search.rebuild()
+        kind = player_search.backend(db.session.connection())
+        print(f"indexed ({kind}) in {time.perf_counter() - t0:.1f}s")
+
+        mid = args.users // 2
+        terms = ["okafor", "maria.sil", f"{mid}@exa", f"555{mid:07d}"[-6:], str(mid), "zzqx"]
+        new = lambda term, limit: player_search.search_user_ids(term, limit=limit, role=None)  # noqa: E731
+        print(f"{'term':<14} {'old ms':>9} {'hits':>5} {'new ms':>9} {'hits':>5} {'speedup':>8}")
+        for term in terms:
+            old_ms, old_n = _time(_old, term, args.limit, args.repeat)
+            new_ms, new_n = _time(new, term, args.limit, args.repeat)
+            print(f"{term:<14} {old_ms:9.2f} {old_n:5d} {new_ms:9.2f} {new_n:5d} {old_ms / max(new_ms, 1e-6):7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+# bench_sqlite.py
+"""
+SQLite write throughput the way gunicorn gthread runs the app
+(run_neonspire_highload.sh: -w 4 -k gthread --threads 40): several worker
+processes, each with many request threads, all sharing one database file.
+
+Two profiles, each on its own throw-away file:
+
+  legacy   what create_app used to pass for every dialect – pool_size=20,
+           max_overflow=40, pre-ping – with SQLite's defaults: rollback
+           journal, synchronous=FULL, pysqlite's 5 s busy wait
+  profile  db_engine.engine_options(): WAL, synchronous=NORMAL,
+           busy_timeout, mmap/cache pragmas, QueuePool sized for threads
+
+Each thread loops for --seconds: a --read-ratio share of "page views"
+(wallet + last ledger rows) and the rest wallet credits (ledger INSERT +
+balance UPDATE in one transaction). Reported per profile: committed
+writes/s, reads/s, write latency p50/p95/max and "database is locked"
+failures.
+
+  python bench_sqlite.py
+  python bench_sqlite.py --workers 4 --threads 40 --seconds 15 --read-ratio 0.8
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+N_WALLETS = 1000
+
+
+def _setup(path: str):
+    # plain sqlite3 so the file starts in SQLite's default (rollback journal) mode
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE wallets (user_id INTEGER PRIMARY KEY, balance INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE ledger (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX ix_ledger_user ON ledger (user_id, id);
+    """)
+    conn.executemany("INSERT INTO wallets (user_id, balance) VALUES (?, 0)", [(i,) for i in range(1, N_WALLETS + 1)])
+    conn.commit()
+    conn.close()
+
+
+def _worker(profile: str, path: str, threads: int, seconds: float, read_ratio: float, out):
+    if profile == "legacy":
+        os.environ["SQLITE_PRAGMAS"] = "0"
+
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+    import db_engine
+
+    url = f"sqlite:///{path}"
+    if profile == "legacy":
+        opts = dict(db_engine.POSTGRES_OPTIONS)
+    else:
+        opts = db_engine.engine_options(url)
+    engine = create_engine(url, **opts)
+
+    read_sql = text("SELECT balance FROM wallets WHERE user_id = :u")
+    recent_sql = text("SELECT id, delta FROM ledger WHERE user_id = :u ORDER BY id DESC LIMIT 10")
+    ledger_sql = text("INSERT INTO ledger (user_id, delta, created_at) VALUES (:u, :d, :t)")
+    wallet_sql = text("UPDATE wallets SET balance = balance + :d WHERE user_id = :u")
+
+    stats = {"writes": 0, "reads": 0, "locked": 0, "other": 0, "lat": []}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def loop():
+        rnd = random.Random()
+        local = {"writes": 0, "reads": 0, "locked": 0, "other": 0, "lat": []}
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            uid = rnd.randint(1, N_WALLETS)
+            try:
+                if rnd.random() < read_ratio:
+                    with engine.connect() as conn:
+                        conn.execute(read_sql, {"u": uid}).scalar()
+                        conn.execute(recent_sql, {"u": uid}).all()
+                    local["reads"] += 1
+                else:
+                    t0 = time.perf_counter()
+                    with engine.begin() as conn:
+                        conn.execute(ledger_sql, {"u": uid, "d": 5, "t": time.time()})
+                        conn.execute(wallet_sql, {"u": uid, "d": 5})
+                    local["lat"].append(time.perf_counter() - t0)
+                    local["writes"] += 1
+            except OperationalError as e:
+                local["locked" if "locked" in str(e) else "other"] += 1
+        with lock:
+            for k in ("writes", "reads", "locked", "other"):
+                stats[k] += local[k]
+            stats["lat"].extend(local["lat"])
+
+    pool = [threading.Thread(target=loop) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    engine.dispose()
+    out.put(stats)
+
+
+def _pct(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))]
+
+
+def run_profile(profile: str, workers: int, threads: int, seconds: float, read_ratio: float) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix=f"bench_sqlite_{profile}_"), "bench.db")
+    _setup(path)
+
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(profile, path, threads, seconds, read_ratio, out))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    parts = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    lat = sorted(x for part in parts for x in part["lat"])
+    total = {k: sum(part[k] for part in parts) for k in ("writes", "reads", "locked", "other")}
+
+    # every committed credit must be in both tables
+    conn = sqlite3.connect(path)
+    ledger_rows = conn.execute("SELECT COUNT(*) FROM ledger").fetchone()[0]
+    balance = conn.execute("SELECT COALESCE(SUM(balance), 0) FROM wallets").fetchone()[0]
+    journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+
+    return {
+        **total,
+        "writes_per_s": total["writes"] / seconds,
+        "reads_per_s": total["reads"] / seconds,
+        "p50_ms": _pct(lat, 0.50) * 1000,
+        "p95_ms": _pct(lat, 0.95) * 1000,
+        "max_ms": (lat[-1] if lat else 0.0) * 1000,
+        "mean_ms": (statistics.fmean(lat) if lat else 0.0) * 1000,
+        "consistent": ledger_rows == total["writes"] and balance == 5 * total["writes"],
+        "journal_mode": journal,
+        "path": path,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SQLite write throughput: legacy options vs db_engine profile")
+    ap.add_argument("--workers", type=int, default=4, help="processes (gunicorn -w)")
+    ap.add_argument("--threads", type=int, default=40, help="threads per process (gunicorn --threads)")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--read-ratio", type=float, default=0.8)
+    ap.add_argument("--profile", choices=("legacy", "profile"), action="append", default=None)
+    args = ap.parse_args(argv)
+
+    print(f"{args.workers} workers x {args.threads} threads, {args.seconds:.0f}s, "
+          f"{int(args.read_ratio * 100)}% reads")
+    print(f"{'profile':<9} {'journal':<8} {'writes/s':>9} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'max ms':>8} {'locked':>7} {'other':>6}  ok")
+    for profile in args.profile or ("legacy", "profile"):
+        r = run_profile(profile, args.workers, args.threads, args.seconds, args.read_ratio)
+        print(f"{profile:<9} {r['journal_mode']:<8} {r['writes_per_s']:9.1f} {r['reads_per_s']:9.1f} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['max_ms']:8.1f} {r['locked']:7d} {r['other']:6d}  "
+              f"{'✅' if r['consistent'] else '❌'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
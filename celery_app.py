@@ -14,12 +14,18 @@ def make_celery():
         "crypto_casino",
         broker=broker_url,
         backend=result_backend,
-        include=["id_requests"],  # make sure tasks in id_requests.py are loaded
+        include=["id_requests", "dead_letters", "queue_lanes", "ready_pool", "notify_fanout", "notification_retention", "cold_storage", "daily_stats", "referral_clicks"],  # make sure task modules are loaded
     )
 
     # ---- Queue setup: dedicated queue for ID requests ----
+    # Scheduled housekeeping (pool stocking, archiving, rollups, click
+    # flushes) has its own "maintenance" queue and worker, so a long
+    # archive or pool fill never holds an ID-request worker slot:
+    #   celery -A celery_app worker -Q id_requests
+    #   celery -A celery_app worker -Q maintenance --concurrency 2
     celery.conf.task_queues = (
         Queue("id_requests", Exchange("id_requests"), routing_key="id_requests"),
+        Queue("maintenance", Exchange("maintenance"), routing_key="maintenance"),
     )
     celery.conf.task_default_queue = "id_requests"
     celery.conf.task_default_exchange = "id_requests"
@@ -36,13 +42,60 @@ def make_celery():
         # Redis visibility timeout (seconds) – tasks are not lost if worker dies
         broker_transport_options={
             "visibility_timeout": 3600,   # 1 hour
+            # Priority lanes (queue_lanes.py): one Redis list per step,
+            # lower number drained first → id_requests, id_requests:1, ...
+            "priority_steps": list(range(10)),
+            "sep": ":",
+            "queue_order_strategy": "priority",
         },
+        # Untagged messages would otherwise land in the top (0) lane
+        task_default_priority=6,
 
         # Safety limits for very long provider runs
         task_soft_time_limit=300,        # 5 minutes soft limit
         task_time_limit=360,             # 6 minutes hard kill
     )
 
+    # ---- Periodic jobs (run `celery -A celery_app beat` next to the worker) ----
+    celery.conf.beat_schedule = {
+        # anti-starvation for the priority lanes
+        "age-waiting-requests": {
+            "task": "age_waiting_requests",
+            "schedule": float(os.environ.get("LANE_AGING_TICK_SECONDS", "30")),
+            "options": {"queue": "id_requests", "priority": 0, "expires": 25},
+        },
+        # keep the ReadyAccount pool stocked (only works inside POOL_QUIET_HOURS)
+        "fill-ready-pool": {
+            "task": "fill_ready_pool",
+            "schedule": float(os.environ.get("POOL_TICK_SECONDS", "900")),
+            "options": {"queue": "maintenance", "priority": 9, "expires": 600},
+        },
+        # move read notifications past NOTIFY_RETENTION_DAYS out of the hot table
+        "archive-notifications": {
+            "task": "archive_notifications",
+            "schedule": float(os.environ.get("NOTIFY_RETENTION_TICK_SECONDS", "86400")),
+            "options": {"queue": "maintenance", "priority": 9, "expires": 3600},
+        },
+        # move settled deposits / withdrawals / ID requests past COLD_ARCHIVE_DAYS to cold storage
+        "archive-settled-requests": {
+            "task": "archive_settled_requests",
+            "schedule": float(os.environ.get("COLD_ARCHIVE_TICK_SECONDS", "86400")),
+            "options": {"queue": "maintenance", "priority": 9, "expires": 3600},
+        },
+        # re-derive the last DAILY_STATS_REFRESH_DAYS (and days with open requests) of the dashboard rollup
+        "refresh-daily-stats": {
+            "task": "refresh_daily_stats",
+            "schedule": float(os.environ.get("DAILY_STATS_TICK_SECONDS", "3600")),
+            "options": {"queue": "maintenance", "priority": 9, "expires": 1800},
+        },
+        # fold buffered referral link clicks into referral_codes.clicks
+        "flush-referral-clicks": {
+            "task": "flush_referral_clicks",
+            "schedule": float(os.environ.get("REFERRAL_CLICK_FLUSH_SECONDS", "60")),
+            "options": {"queue": "maintenance", "priority": 9, "expires": 50},
+        },
+    }
+
     return celery
 
 
@@ -2,9 +2,11 @@
 from datetime import datetime
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, abort, current_app
 from flask_login import current_user, login_required
-from sqlalchemy import or_, desc
+from load_shed import low_priority
+from player_search import user_filter
+from sqlalchemy import desc
 
-from models import db, User, DMThread, DMMessage, notify  # <-- add notify
+from models import db, User, DMThread, DMMessage, notify, mark_dm_thread_read  # <-- add notify
 
 chat_bp = Blueprint("chat_bp", __name__, url_prefix="/chat")
 
@@ -106,6 +108,7 @@ def my_chat():
 
 @chat_bp.get("/my-thread-id")
 @login_required
+@low_priority
 def my_thread_id():
     """Return the player’s thread id (used by floating _dm_widget.html)."""
     if current_user.role != "PLAYER":
@@ -124,37 +127,24 @@ def inbox():
         abort(403)
 
     term = (request.args.get("q") or "").strip()
-    q = DMThread.query.filter_by(status="OPEN")
+    # One query: the thread row carries the last message snippet and unread
+    # counter, the player comes along through the join.
+    q = (db.session.query(DMThread, User)
+         .outerjoin(User, User.id == DMThread.player_id)
+         .filter(DMThread.status == "OPEN"))
 
     if term:
-        # search player by name/email/id
-        matches = (User.query
-                   .filter(or_(
-                       User.name.ilike(f"%{term}%"),
-                       User.email.ilike(f"%{term}%"),
-                       User.id.cast(db.String).ilike(f"%{term}%"),
-                   ))
-                   .with_entities(User.id)
-                   .all())
-        ids = [uid for (uid,) in matches]
-        if ids:
-            q = q.filter(DMThread.player_id.in_(ids))
-        else:
-            # nothing matches
-            q = q.filter(DMThread.id == 0)
-
-    threads = (q.order_by(desc(DMThread.last_msg_at), desc(DMThread.id))
-                 .limit(300)
-                 .all())
+        # indexed search over name/email/mobile/telegram/ref code/game logins
+        q = q.filter(user_filter(DMThread.player_id, term))
+
+    rows = (q.order_by(desc(DMThread.last_msg_at), desc(DMThread.id))
+              .limit(300)
+              .all())
 
     # Build a simple view-model for the template (no heavy logic there)
     threads_view = []
-    for t in threads:
-        player = db.session.get(User, t.player_id)
-        last = (DMMessage.query
-                .filter_by(thread_id=t.id)
-                .order_by(DMMessage.id.desc())
-                .first())
+    for t, player in rows:
+        snippet = t.last_msg_snippet
         threads_view.append({
             "thread_id": t.id,
             "status": t.status,
@@ -163,7 +153,9 @@ def inbox():
             "player_email": (player.email if player else ""),
             "assigned_staff_id": t.employee_id,
             "last_msg_at": (t.last_msg_at or t.created_at),
-            "last_msg_snippet": (last.body[:80] + ("…" if last and len(last.body) > 80 else "")) if last else "(no messages yet)",
+            "last_msg_snippet": (snippet[:80] + ("…" if len(snippet) > 80 else "")) if snippet else "(no messages yet)",
+            "last_sender_role": t.last_sender_role,
+            "unread": t.unread_for_staff or 0,
         })
 
     return render_template("employee_chat.html", threads_view=threads_view, q=term)
@@ -271,6 +263,7 @@ def start_with_player():
 
 @chat_bp.get("/thread/<int:thread_id>/messages")
 @login_required
+@low_priority
 def fetch_messages(thread_id: int):
     """Incremental polling. after_id=0 returns latest 100, otherwise messages > after_id."""
     t = db.session.get(DMThread, thread_id)
@@ -287,6 +280,10 @@ def fetch_messages(thread_id: int):
         q = q.order_by(DMMessage.id.desc()).limit(100)
         items = list(reversed([m.to_dict() for m in q.all()]))
 
+    # The reader has now seen the thread – only writes when the counter is set.
+    if mark_dm_thread_read(t, staff=_is_staff()):
+        db.session.commit()
+
     resp = jsonify({"ok": True, "items": items})
     resp.headers["Cache-Control"] = "no-store"
     return resp, 200
@@ -356,33 +353,30 @@ def broadcast_to_all():
     if not message:
         return jsonify({"ok": False, "error": "Empty message"}), 400
     
-    # Get all open threads
-    open_threads = DMThread.query.filter_by(status="OPEN").all()
+    # Get all open threads (only the two ids we need – no ORM objects per thread)
+    open_threads = db.session.query(DMThread.id, DMThread.player_id).filter_by(status="OPEN").all()
     sender_name = _display_name(current_user)
-    
-    success_count = 0
-    for thread in open_threads:
-        try:
-            # Create broadcast message
-            m = DMMessage(
-                thread_id=thread.id,
-                sender_id=current_user.id,
-                sender_role=current_user.role,
-                body=f"📢 Broadcast: {message}",
-                source='website',
-                created_at=datetime.utcnow(),
-            )
-            db.session.add(m)
-            thread.last_msg_at = datetime.utcnow()
-            
-            # Notify player
-            notify(thread.player_id, f"📢 Broadcast from {sender_name}: {message}")
-            
-            success_count += 1
-        except:
-            continue
-    
+    now = datetime.utcnow()
+
+    # One flush inserts every message; _maintain_dm_threads updates the
+    # thread rows (last_msg_at / snippet / unread) in the same flush.
+    db.session.add_all([
+        DMMessage(
+            thread_id=tid,
+            sender_id=current_user.id,
+            sender_role=current_user.role,
+            body=f"📢 Broadcast: {message}",
+            source='website',
+            created_at=now,
+        )
+        for tid, _ in open_threads
+    ])
     db.session.commit()
+    success_count = len(open_threads)
+
+    # Player notifications: batched, and queued to Celery for large audiences
+    from notify_fanout import fan_out  # lazy: pulls in celery
+    fan_out([pid for _, pid in open_threads], f"📢 Broadcast from {sender_name}: {message}")
     
     return jsonify({
         "ok": True, 
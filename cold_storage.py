@@ -0,0 +1,410 @@
+# cold_storage.py
+"""
+Cold storage for settled deposit, withdraw and ID requests.
+
+deposit_requests / withdraw_requests / game_account_requests kept every row
+forever – deposits with the full `meta` JSON of raw provider payloads – so
+every status-filtered list and COUNT walked years of finished work. Rows in a
+final state whose last update is older than COLD_ARCHIVE_DAYS are moved out
+in batches of COLD_ARCHIVE_BATCH, one short transaction each:
+
+  deposit     LOADED, REJECTED, PAID
+  withdraw    PAID, REJECTED
+  id_request  APPROVED, REJECTED
+
+Each moved row leaves a thin models.RequestArchive entry (kind, id, user,
+status, amounts, timestamps), so lookups by id and per-player totals keep
+working. The full row goes to, per COLD_ARCHIVE_MODE:
+
+  table     RequestArchive.payload (JSON)
+  jsonl     COLD_ARCHIVE_DIR/<kind>-YYYYMMDD.jsonl.gz
+  parquet   COLD_ARCHIVE_DIR/<kind>-YYYYMMDD-HHMMSS-<first id>.parquet (needs pyarrow)
+
+Rows an unresolved dead letter points at are left alone – the replay needs
+them. Archived ids are never handed out again (Postgres sequences; SQLite
+AUTOINCREMENT since migration 0015), so a new row can't collide with its
+request_archive entry. Archiving an ID request clears
+game_accounts.request_id; the account ids are kept in the payload as
+`_game_account_ids`.
+
+Reads fall through to the archive:
+  fetch("deposit", 42)                    hot row, else a detached DepositRequest
+                                          rebuilt from the archive (is_archived=True)
+  search("deposit", q="bob", status=...)  archived index rows, newest first
+
+Scheduled by Celery beat ("archive-settled-requests").
+
+CLI:
+  python cold_storage.py run [--days 90] [--kind deposit] [--mode jsonl] [--dry-run]
+  python cold_storage.py show deposit 42
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import JSON, DateTime, and_, exists, func, or_, select
+
+from celery_app import celery, get_flask_app
+
+log = logging.getLogger("cold_storage")
+
+ARCHIVE_DAYS = int(os.getenv("COLD_ARCHIVE_DAYS", "90"))
+BATCH = int(os.getenv("COLD_ARCHIVE_BATCH", "2000"))
+ARCHIVE_MODE = os.getenv("COLD_ARCHIVE_MODE", "table").strip().lower()
+ARCHIVE_DIR = os.getenv("COLD_ARCHIVE_DIR", os.path.join(".data", "request_archive"))
+
+MODES = ("table", "jsonl", "parquet")
+
+KINDS = {
+    "deposit": {
+        "model": "DepositRequest",
+        "statuses": ("LOADED", "REJECTED", "PAID"),
+        "settled": ("loaded_at", "updated_at"),
+        "actor": "loaded_by",
+        "bonus": "bonus_amount",
+        "dead_letter": "credit",
+    },
+    "withdraw": {
+        "model": "WithdrawRequest",
+        "statuses": ("PAID", "REJECTED"),
+        "settled": ("acted_at", "updated_at"),
+        "actor": "acted_by",
+        "bonus": None,
+        "dead_letter": None,
+    },
+    "id_request": {
+        "model": "GameAccountRequest",
+        "statuses": ("APPROVED", "REJECTED"),
+        "settled": ("updated_at",),
+        "actor": "approved_by_id",
+        "bonus": None,
+        "dead_letter": "id_request",
+    },
+}
+
+
+def _model(kind: str):
+    import models
+    return getattr(models, KINDS[kind]["model"])
+
+
+def _jsonable(v):
+    return v.isoformat() if isinstance(v, (datetime, date)) else v
+
+
+def _to_json(rec: dict) -> dict:
+    return {k: _jsonable(v) for k, v in rec.items()}
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+def _write_jsonl(kind: str, records: list[dict], now: datetime) -> str:
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"{kind}-{now:%Y%m%d}.jsonl.gz")
+    with gzip.open(path, "at", encoding="utf-8") as fh:
+        for rec in records:
+            fh.write(json.dumps(_to_json(rec), default=str) + "\n")
+    return path
+
+
+def _json_columns(kind: str) -> set[str]:
+    cols = {c.name for c in _model(kind).__table__.columns if isinstance(c.type, JSON)}
+    return cols | {"_game_account_ids"}
+
+
+def _write_parquet(kind: str, records: list[dict], now: datetime) -> str:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("COLD_ARCHIVE_MODE=parquet needs pyarrow (pip install pyarrow)")
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"{kind}-{now:%Y%m%d-%H%M%S}-{records[0]['id']}.parquet")
+    json_cols = _json_columns(kind)
+    rows = [
+        {k: (json.dumps(v, default=str) if k in json_cols and v is not None else v) for k, v in rec.items()}
+        for rec in records
+    ]
+    pq.write_table(pa.Table.from_pylist(rows), path, compression="zstd")
+    return path
+
+
+def _index_row(kind: str, rec: dict, now: datetime, location: str | None) -> dict:
+    spec = KINDS[kind]
+    return {
+        "kind": kind,
+        "ref_id": rec["id"],
+        "user_id": rec.get("user_id"),
+        "game_id": rec.get("game_id"),
+        "status": rec.get("status"),
+        "amount": rec.get("amount"),
+        "bonus_amount": rec.get(spec["bonus"]) if spec["bonus"] else None,
+        "actor_id": rec.get(spec["actor"]),
+        "created_at": rec.get("created_at"),
+        "settled_at": next((rec[c] for c in spec["settled"] if rec.get(c)), None),
+        "archived_at": now,
+        "location": location,
+        "payload": _to_json(rec) if location is None else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Archive
+# ---------------------------------------------------------------------------
+
+def _settled_filter(kind: str, table, cutoff: datetime) -> list:
+    from models import DeadLetterJob
+    spec = KINDS[kind]
+    cond = [
+        table.c.status.in_(spec["statuses"]),
+        func.coalesce(table.c.updated_at, table.c.created_at) < cutoff,
+    ]
+    if spec["dead_letter"]:
+        dl = DeadLetterJob.__table__
+        cond.append(~exists().where(and_(
+            dl.c.kind == spec["dead_letter"], dl.c.ref_id == table.c.id, dl.c.status == "DEAD",
+        )))
+    return cond
+
+
+def _detach_game_accounts(records: list[dict]):
+    from models import db, GameAccount
+    ga = GameAccount.__table__
+    ids = [r["id"] for r in records]
+    links: dict[int, list[int]] = {}
+    for req_id, acc_id in db.session.execute(select(ga.c.request_id, ga.c.id).where(ga.c.request_id.in_(ids))):
+        links.setdefault(req_id, []).append(acc_id)
+    for rec in records:
+        rec["_game_account_ids"] = links.get(rec["id"])
+    if links:
+        db.session.execute(ga.update().where(ga.c.request_id.in_(list(links))).values(request_id=None))
+
+
+def archive_settled(kind: str, days: int | None = None, batch: int | None = None, mode: str | None = None,
+                    max_batches: int | None = None, dry_run: bool = False) -> dict:
+    from models import db, RequestArchive
+
+    if kind not in KINDS:
+        raise ValueError(f"unknown kind {kind!r} ({' | '.join(KINDS)})")
+    days = ARCHIVE_DAYS if days is None else days
+    batch = batch or BATCH
+    mode = (mode or ARCHIVE_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"unknown archive mode {mode!r} ({' | '.join(MODES)})")
+
+    table = _model(kind).__table__
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    cond = _settled_filter(kind, table, cutoff)
+    report = {"kind": kind, "mode": mode, "cutoff": cutoff.isoformat(timespec="seconds"),
+              "rows": 0, "batches": 0, "files": [], "seconds": 0.0}
+    t0 = time.perf_counter()
+
+    if dry_run:
+        report["rows"] = db.session.execute(select(func.count()).select_from(table).where(*cond)).scalar() or 0
+        report["seconds"] = round(time.perf_counter() - t0, 2)
+        return report
+
+    last_id = 0
+    while max_batches is None or report["batches"] < max_batches:
+        rows = db.session.execute(
+            select(table).where(*cond, table.c.id > last_id).order_by(table.c.id).limit(batch)
+        ).mappings().all()
+        if not rows:
+            break
+        records = [dict(r) for r in rows]
+        ids = [r["id"] for r in records]
+        last_id = ids[-1]
+        now = datetime.utcnow()
+        try:
+            if kind == "id_request":
+                _detach_game_accounts(records)
+            location = None
+            if mode == "jsonl":
+                location = _write_jsonl(kind, records, now)
+            elif mode == "parquet":
+                location = _write_parquet(kind, records, now)
+            if location and location not in report["files"]:
+                report["files"].append(location)
+            db.session.execute(RequestArchive.__table__.insert(),
+                               [_index_row(kind, rec, now, location) for rec in records])
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report["rows"] += len(records)
+        report["batches"] += 1
+        if len(records) < batch:
+            break
+
+    report["seconds"] = round(time.perf_counter() - t0, 2)
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def _read_payload(kind: str, entry) -> dict | None:
+    if entry.payload is not None:
+        return dict(entry.payload)
+    path = entry.location
+    if not path or not os.path.exists(path):
+        log.warning("archived %s #%s: %s is missing", kind, entry.ref_id, path)
+        return None
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        found = pq.read_table(path, filters=[("id", "=", entry.ref_id)]).to_pylist()
+        if not found:
+            return None
+        rec = found[0]
+        for col in _json_columns(kind):
+            if isinstance(rec.get(col), str):
+                rec[col] = json.loads(rec[col])
+        return rec
+
+    # rows are written with "id" first, so the substring test skips most lines unparsed
+    needle = f'"id": {entry.ref_id},'
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if needle in line:
+                rec = json.loads(line)
+                if rec.get("id") == entry.ref_id:
+                    return rec
+    return None
+
+
+def _hydrate(kind: str, data: dict):
+    """A detached model instance (never added to the session) from an archived row."""
+    model = _model(kind)
+    kw = {}
+    for col in model.__table__.columns:
+        if col.key not in data:
+            continue
+        v = data[col.key]
+        if isinstance(v, str) and isinstance(col.type, DateTime):
+            try:
+                v = datetime.fromisoformat(v)
+            except ValueError:
+                pass
+        kw[col.key] = v
+    obj = model(**kw)
+    obj.is_archived = True
+    return obj
+
+
+def fetch(kind: str, ref_id: int):
+    """The live row for (kind, id), else its archived copy, else None."""
+    from models import db, RequestArchive
+    obj = db.session.get(_model(kind), ref_id)
+    if obj is not None:
+        return obj
+    entry = db.session.get(RequestArchive, (kind, ref_id))
+    if entry is None:
+        return None
+    data = _read_payload(kind, entry)
+    if data is None:
+        # the file is gone – the index still knows the essentials
+        data = {"id": entry.ref_id, "user_id": entry.user_id, "game_id": entry.game_id,
+                "status": entry.status, "amount": entry.amount, "created_at": entry.created_at}
+    return _hydrate(kind, data)
+
+
+def search(kind: str, q: str | None = None, status: str | None = None,
+           user_ids=None, limit: int = 50) -> list:
+    """
+    Archived RequestArchive rows matching an id ('42' / '#42') or a player
+    (player_search.user_filter: every matching player, not a capped list).
+    """
+    from models import RequestArchive
+    if status and status not in KINDS[kind]["statuses"]:
+        return []
+
+    query = RequestArchive.query.filter(RequestArchive.kind == kind)
+    if status:
+        query = query.filter(RequestArchive.status == status)
+    if user_ids is not None:
+        query = query.filter(RequestArchive.user_id.in_(list(user_ids)))
+    q = (q or "").strip()
+    if q:
+        from player_search import user_filter
+        cond = [user_filter(RequestArchive.user_id, q)]
+        if q.lstrip("#").isdigit():
+            cond.append(RequestArchive.ref_id == int(q.lstrip("#")))
+        query = query.filter(or_(*cond))
+    return (query.order_by(RequestArchive.created_at.desc(), RequestArchive.ref_id.desc())
+            .limit(limit).all())
+
+
+# ---------------------------------------------------------------------------
+# Scheduled job
+# ---------------------------------------------------------------------------
+
+def run_cold_storage(days: int | None = None, mode: str | None = None, kinds=None) -> list[dict]:
+    reports = []
+    for kind in kinds or KINDS:
+        r = archive_settled(kind, days=days, mode=mode)
+        log.info("cold storage: %s – %d rows moved (%s) in %d batches, %.2fs",
+                 kind, r["rows"], r["mode"], r["batches"], r["seconds"])
+        reports.append(r)
+    return reports
+
+
+@celery.task(name="archive_settled_requests", queue="maintenance")
+def archive_settled_requests() -> list:
+    app = get_flask_app()
+    with app.app_context():
+        return run_cold_storage()
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="cold storage for settled deposits / withdrawals / ID requests")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("run")
+    rp.add_argument("--days", type=int, default=None)
+    rp.add_argument("--kind", choices=tuple(KINDS), action="append", default=None)
+    rp.add_argument("--mode", choices=MODES, default=None)
+    rp.add_argument("--dry-run", action="store_true")
+    sp = sub.add_parser("show")
+    sp.add_argument("kind", choices=tuple(KINDS))
+    sp.add_argument("ref_id", type=int)
+    args = ap.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "show":
+            obj = fetch(args.kind, args.ref_id)
+            if obj is None:
+                print(f"no {args.kind} #{args.ref_id}")
+                return 1
+            print(f"{args.kind} #{args.ref_id} ({'archived' if getattr(obj, 'is_archived', False) else 'live'})")
+            for col in obj.__table__.columns.keys():
+                print(f"  {col:<18} {getattr(obj, col)}")
+            return 0
+
+        if args.dry_run:
+            for kind in args.kind or KINDS:
+                r = archive_settled(kind, days=args.days, mode=args.mode, dry_run=True)
+                print(f"would move {r['rows']} {kind} rows settled before {r['cutoff']}")
+            return 0
+        for r in run_cold_storage(days=args.days, mode=args.mode, kinds=args.kind):
+            print(f"✅ {r['kind']}: moved {r['rows']} rows ({r['mode']}) in {r['batches']} batches, {r['seconds']}s")
+            for f in r["files"]:
+                print(f"   {f}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
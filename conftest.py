@@ -0,0 +1,58 @@
+# conftest.py
+"""
+Shared pytest fixtures.
+
+The app is imported once per test session against a SQLite file under
+pytest's tmp dir; SCHEMA_CHECK=upgrade runs the migrations into it at boot,
+and the session aborts if the engine ended up anywhere else. Flask and
+friends are imported lazily, so `pytest` skips cleanly where they are not
+installed.
+
+  app           the Flask app (session scope)
+  db            models.db inside an app context; rolled back and removed after
+  client        app.test_client()
+  query_budget  sql_trace.query_budget – `with query_budget(8): client.get(...)`
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    pytest.importorskip("flask")
+    path = tmp_path_factory.mktemp("neonspire") / "test.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["SCHEMA_CHECK"] = "upgrade"
+    os.environ["SQL_TRACE"] = "0"
+
+    from app import app as flask_app
+    from models import db as _db
+    with flask_app.app_context():
+        url = _db.engine.url
+    if url.get_backend_name() != "sqlite" or os.path.abspath(url.database or "") != str(path):
+        pytest.exit(f"test app is bound to {url!r}, not {path}; refusing to run", returncode=1)
+    flask_app.config.update(TESTING=True)
+    return flask_app
+
+
+@pytest.fixture
+def db(app):
+    from models import db as _db
+    with app.app_context():
+        yield _db
+        _db.session.rollback()
+        _db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_budget():
+    pytest.importorskip("flask")
+    from sql_trace import query_budget as _query_budget
+    return _query_budget
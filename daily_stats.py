@@ -0,0 +1,335 @@
+# daily_stats.py
+"""
+Read side, refresh and backfill for the daily_stats rollup (models.DailyStat).
+
+One row per (day, kind, game, method, status, actor) with cnt / amount /
+bonus_cnt / bonus_amount, where `day` is the day the request (or user) was
+created:
+
+  deposit      actor = loaded_by,   bonus = bonus_amount
+  withdraw     actor = acted_by
+  id_request   actor = handled_by (approved_by_id when unset)
+  user         status = role,       bonus = signup bonus claimed
+
+Kept current three ways:
+  • models._maintain_daily_stats upserts deltas in the same transaction as
+    any ORM insert / status change / delete of those rows
+  • bulk UPDATEs call models.shift_daily_stat themselves; bulk deletes of a
+    player's rows go through forget_user() first
+  • Celery beat ("refresh-daily-stats") re-derives the last
+    DAILY_STATS_REFRESH_DAYS days (UTC) from the source tables, plus every
+    older day that still holds open requests (OPEN_STATUSES, at most
+    DAILY_STATS_REFRESH_MAX_DAYS back), which also repairs anything written
+    behind the ORM's back
+
+Rows moved to request_archive by cold_storage.py stay counted: archiving
+is not a delete here, and the backfill reads request_archive too (method
+comes from the archived payload, which file-mode archives don't keep; an
+archived ID request's actor is its approved_by_id).
+
+Dashboards (admin home, bonus stats, employee home) read these sums instead
+of counting history; pending work-queue badges are still live COUNTs.
+
+CLI:
+  python daily_stats.py backfill          # rebuild every row
+  python daily_stats.py refresh --days 7
+  python daily_stats.py show --days 14
+"""
+
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, or_, text
+
+from celery_app import celery, get_flask_app
+
+log = logging.getLogger("daily_stats")
+
+REFRESH_DAYS = int(os.getenv("DAILY_STATS_REFRESH_DAYS", "2"))
+REFRESH_MAX_DAYS = int(os.getenv("DAILY_STATS_REFRESH_MAX_DAYS", "90"))
+
+# Statuses a request can still move out of, per kind. Days holding them are
+# re-derived on every refresh, however old.
+OPEN_STATUSES = {
+    "deposit": ("PENDING", "RECEIVED"),
+    "withdraw": ("PENDING", "APPROVED"),
+    "id_request": ("PENDING", "IN_PROGRESS", "PROCESSING"),
+}
+
+_ARCHIVE_METHOD = {
+    "sqlite": "json_extract(payload, '$.method')",
+    "postgresql": "(payload->>'method')",
+}
+
+# Same facts as models._DAILY_FACTS – keep them in step (and migration 0011).
+FACTS_SQL = """
+SELECT day, kind, game_id, method, status, actor_id,
+       COUNT(*) AS cnt, SUM(amount) AS amount, SUM(bonus_flag) AS bonus_cnt, SUM(bonus) AS bonus_amount
+FROM (
+    SELECT COALESCE(DATE(created_at), '1970-01-01') AS day, 'deposit' AS kind,
+           COALESCE(game_id, 0) AS game_id, COALESCE(method, '') AS method, COALESCE(status, '') AS status,
+           COALESCE(loaded_by, 0) AS actor_id, COALESCE(amount, 0) AS amount,
+           CASE WHEN COALESCE(bonus_amount, 0) > 0 THEN 1 ELSE 0 END AS bonus_flag,
+           COALESCE(bonus_amount, 0) AS bonus
+    FROM deposit_requests {where_req}
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), 'withdraw',
+           COALESCE(game_id, 0), COALESCE(method, ''), COALESCE(status, ''),
+           COALESCE(acted_by, 0), COALESCE(amount, 0), 0, 0
+    FROM withdraw_requests {where_req}
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), 'id_request',
+           COALESCE(game_id, 0), '', COALESCE(status, ''),
+           COALESCE(handled_by, approved_by_id, 0), 0, 0, 0
+    FROM game_account_requests {where_req}
+    {users}
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), kind,
+           COALESCE(game_id, 0), COALESCE({archive_method}, ''), COALESCE(status, ''),
+           COALESCE(actor_id, 0), COALESCE(amount, 0),
+           CASE WHEN COALESCE(bonus_amount, 0) > 0 THEN 1 ELSE 0 END,
+           COALESCE(bonus_amount, 0)
+    FROM request_archive {where_req}
+) f
+GROUP BY day, kind, game_id, method, status, actor_id
+"""
+
+USERS_SQL = """
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), 'user',
+           0, '', COALESCE(role, ''), 0, 0,
+           CASE WHEN signup_bonus_claimed THEN 1 ELSE 0 END,
+           CASE WHEN signup_bonus_claimed THEN COALESCE(signup_bonus_amount, 0) ELSE 0 END
+    FROM users {where_user}
+"""
+
+_COLS = "day, kind, game_id, method, status, actor_id, cnt, amount, bonus_cnt, bonus_amount"
+_UPSERT = """
+ON CONFLICT (day, kind, game_id, method, status, actor_id) DO UPDATE SET
+    cnt = excluded.cnt, amount = excluded.amount, bonus_cnt = excluded.bonus_cnt,
+    bonus_amount = excluded.bonus_amount, updated_at = excluded.updated_at
+"""
+
+
+def facts_sql(dialect: str, since: bool = False, user: bool = False, users: bool = True) -> str:
+    """FACTS_SQL for `dialect`, optionally limited to created_at >= :since or to user_id = :uid."""
+    if since:
+        where_req = where_user = "WHERE created_at >= :since"
+    elif user:
+        where_req, where_user = "WHERE user_id = :uid", "WHERE id = :uid"
+    else:
+        where_req = where_user = ""
+    return FACTS_SQL.format(
+        where_req=where_req,
+        users=USERS_SQL.format(where_user=where_user) if users else "",
+        archive_method=_ARCHIVE_METHOD.get(dialect, "NULL"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Write side
+# ---------------------------------------------------------------------------
+
+def _dialect() -> str:
+    from models import db
+    return db.session.get_bind().dialect.name
+
+
+def _prune():
+    # buckets every request has moved out of (PENDING on a quiet day, ...)
+    from models import db
+    db.session.execute(text("DELETE FROM daily_stats WHERE cnt = 0 AND bonus_cnt = 0"))
+
+
+def backfill() -> int:
+    """Rebuild daily_stats from every source table (live + archived) in one transaction."""
+    from models import db, DailyStat
+    try:
+        db.session.execute(text("DELETE FROM daily_stats"))
+        db.session.execute(
+            text(f"INSERT INTO daily_stats ({_COLS}, updated_at) SELECT f.*, :now FROM ({facts_sql(_dialect())}) f"),
+            {"now": datetime.utcnow()},
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return DailyStat.query.count()
+
+
+def _today() -> date:
+    return datetime.utcnow().date()  # created_at is stored in UTC
+
+
+def _oldest_open_day() -> date | None:
+    from models import db, DailyStat, EPOCH_DAY
+    open_rows = or_(*[(DailyStat.kind == kind) & DailyStat.status.in_(statuses)
+                      for kind, statuses in OPEN_STATUSES.items()])
+    day = (db.session.query(func.min(DailyStat.day))
+           .filter(open_rows, DailyStat.cnt != 0, DailyStat.day > EPOCH_DAY)
+           .scalar())
+    if isinstance(day, str):  # SQLite
+        day = date.fromisoformat(day)
+    return day
+
+
+def refresh(days: int | None = None) -> dict:
+    """
+    Re-derive the last `days` days (today included, UTC) from the source
+    tables, reaching back to the oldest day that still has open requests.
+    """
+    from models import db
+    days = max(1, days or REFRESH_DAYS)
+    today = _today()
+    start = today - timedelta(days=days - 1)
+    oldest_open = _oldest_open_day()
+    if oldest_open and oldest_open < start:
+        start = max(oldest_open, today - timedelta(days=max(REFRESH_MAX_DAYS, days) - 1))
+    since = datetime.combine(start, datetime.min.time())
+    try:
+        dialect = _dialect()
+        # a flush hook may re-create a bucket between our DELETE and INSERT
+        on_conflict = _UPSERT if dialect in ("postgresql", "sqlite") else ""
+        db.session.execute(text("DELETE FROM daily_stats WHERE day >= :day"), {"day": since.date()})
+        res = db.session.execute(
+            text(f"INSERT INTO daily_stats ({_COLS}, updated_at) "
+                 f"SELECT f.*, :now FROM ({facts_sql(dialect, since=True)}) f WHERE true {on_conflict}"),
+            {"since": since, "now": datetime.utcnow()},
+        )
+        _prune()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"since": since.date().isoformat(), "rows": res.rowcount}
+
+
+def forget_user(user_id: int):
+    """
+    Subtract a player's requests before they are bulk-deleted (admin
+    delete_player). The user row itself is an ORM delete and is handled by
+    the flush hook. Runs in the caller's transaction.
+    """
+    from models import db, bump_daily_stats
+    rows = db.session.execute(text(facts_sql(_dialect(), user=True, users=False)), {"uid": user_id}).all()
+    deltas = {}
+    for day, kind, game_id, method, status, actor_id, cnt, amount, bonus_cnt, bonus_amount in rows:
+        if isinstance(day, str):  # SQLite's DATE() is text
+            day = date.fromisoformat(day)
+        deltas[(day, kind, game_id, method, status, actor_id)] = [
+            -int(cnt or 0), -float(amount or 0), -int(bonus_cnt or 0), -float(bonus_amount or 0),
+        ]
+    bump_daily_stats(db.session.connection(), deltas)
+
+
+# ---------------------------------------------------------------------------
+# Read side
+# ---------------------------------------------------------------------------
+
+def _filtered(query, kind: str, statuses=None, since: date | None = None):
+    from models import DailyStat
+    query = query.filter(DailyStat.kind == kind)
+    if statuses:
+        query = query.filter(DailyStat.status.in_(list(statuses)))
+    if since:
+        query = query.filter(DailyStat.day >= since)
+    return query
+
+
+def count(kind: str, statuses=None, since: date | None = None) -> int:
+    from models import db, DailyStat
+    q = _filtered(db.session.query(func.coalesce(func.sum(DailyStat.cnt), 0)), kind, statuses, since)
+    return int(q.scalar() or 0)
+
+
+def totals(kind: str, statuses=None, since: date | None = None) -> dict:
+    from models import db, DailyStat
+    q = _filtered(db.session.query(
+        func.coalesce(func.sum(DailyStat.cnt), 0),
+        func.coalesce(func.sum(DailyStat.amount), 0),
+        func.coalesce(func.sum(DailyStat.bonus_cnt), 0),
+        func.coalesce(func.sum(DailyStat.bonus_amount), 0),
+    ), kind, statuses, since)
+    cnt, amount, bonus_cnt, bonus_amount = q.one()
+    return {"count": int(cnt), "sum": float(amount), "bonus_count": int(bonus_cnt), "bonus_sum": float(bonus_amount)}
+
+
+def by_actor(kind: str, statuses=None) -> dict:
+    """{actor_id: {"count", "sum"}} – one grouped query for a whole staff list."""
+    from models import db, DailyStat
+    q = _filtered(db.session.query(
+        DailyStat.actor_id,
+        func.coalesce(func.sum(DailyStat.cnt), 0),
+        func.coalesce(func.sum(DailyStat.amount), 0),
+    ), kind, statuses).filter(DailyStat.actor_id != 0).group_by(DailyStat.actor_id)
+    return {actor: {"count": int(cnt), "sum": float(amount)} for actor, cnt, amount in q.all()}
+
+
+def series(kind: str, days: int = 14, statuses=None) -> list[dict]:
+    """Per-day totals for the last `days` days, oldest first (days without rows included)."""
+    from models import db, DailyStat
+    start = _today() - timedelta(days=days - 1)
+    q = _filtered(db.session.query(
+        DailyStat.day,
+        func.coalesce(func.sum(DailyStat.cnt), 0),
+        func.coalesce(func.sum(DailyStat.amount), 0),
+    ), kind, statuses, start).group_by(DailyStat.day)
+    found = {d if isinstance(d, date) else date.fromisoformat(str(d)): (int(c), float(a)) for d, c, a in q.all()}
+    out = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        cnt, amount = found.get(day, (0, 0.0))
+        out.append({"day": day, "count": cnt, "sum": amount})
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Scheduled job
+# ---------------------------------------------------------------------------
+
+@celery.task(name="refresh_daily_stats", queue="maintenance")
+def refresh_daily_stats() -> dict:
+    app = get_flask_app()
+    with app.app_context():
+        r = refresh()
+        log.info("daily_stats: refreshed since %s (%s rows)", r["since"], r["rows"])
+        return r
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="daily_stats rollup: backfill / refresh / show")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("backfill")
+    rp = sub.add_parser("refresh")
+    rp.add_argument("--days", type=int, default=None)
+    sp = sub.add_parser("show")
+    sp.add_argument("--days", type=int, default=14)
+    args = ap.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "backfill":
+            print(f"✅ daily_stats rebuilt: {backfill()} rows")
+            return 0
+        if args.cmd == "refresh":
+            r = refresh(args.days)
+            print(f"✅ daily_stats refreshed since {r['since']}: {r['rows']} rows")
+            return 0
+        deposits = series("deposit", args.days, statuses=("LOADED",))
+        withdraws = series("withdraw", args.days, statuses=("PAID",))
+        signups = series("user", args.days, statuses=("PLAYER",))
+        print(f"{'day':<11} {'deposits':>9} {'amount':>11} {'paid out':>9} {'amount':>11} {'signups':>8}")
+        for d, w, u in zip(deposits, withdraws, signups):
+            print(f"{d['day']:%Y-%m-%d} {d['count']:9d} {d['sum']:11.2f} {w['count']:9d} {w['sum']:11.2f} "
+                  f"{u['count']:8d}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
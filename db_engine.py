@@ -0,0 +1,126 @@
+# db_engine.py
+"""
+Engine options per database dialect (SQLALCHEMY_ENGINE_OPTIONS).
+
+Postgres (Neon) keeps the pool create_app always used: 20 persistent
+connections + 40 overflow, pre-ping, 30 min recycle. Both dialects use
+load_shed.SampledQueuePool, which feeds checkout waits and utilization to
+the load shedder.
+
+SQLite – the default DATABASE_URL, small deployments and every local load
+test – gets its own profile instead of those Postgres numbers:
+
+  • WAL journal: readers never block the writer and the writer never
+    blocks readers (rollback-journal mode locks the whole file per write)
+  • synchronous=NORMAL: fsync at checkpoints, not every commit – still
+    crash-safe in WAL mode, may lose the last commits on power loss
+  • busy_timeout: a second writer waits SQLITE_BUSY_TIMEOUT_MS for the
+    lock instead of failing at once with "database is locked"
+  • mmap_size / cache_size: SQLITE_MMAP_MB / SQLITE_CACHE_MB of page cache
+  • temp_store=MEMORY
+  • QueuePool (load_shed.SampledQueuePool, like Postgres) with
+    check_same_thread=False: each gthread request thread
+    checks out its own connection; SQLITE_POOL_SIZE sits close to the
+    thread count because opening a connection re-runs the pragmas
+  • :memory: databases use StaticPool (one shared connection, or each
+    thread would see its own empty database)
+
+The pragmas are applied on every new DBAPI connection by a "connect"
+listener, so the replica bind and scripts creating their own engines get
+them too (SQLITE_PRAGMAS=0 turns that off).
+
+Benchmark: python bench_sqlite.py --workers 4 --threads 40
+"""
+
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+
+from load_shed import SampledQueuePool
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "24"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+
+POSTGRES_OPTIONS = {
+    "pool_size": 20,        # persistent connections
+    "max_overflow": 40,     # extra temporary connections
+    "pool_timeout": 30,     # seconds to wait for a connection
+    "pool_recycle": 1800,   # recycle connections every 30 minutes
+    "pool_pre_ping": True,  # check connection before using it
+}
+
+
+def sqlite_pragmas() -> list[str]:
+    return [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}",  # negative = KiB
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def is_memory(url) -> bool:
+    url = make_url(url)
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def engine_options(url) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for `url`."""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return {"poolclass": SampledQueuePool, **POSTGRES_OPTIONS}
+
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000.0,  # pysqlite's own busy wait
+    }
+    if is_memory(url):
+        return {"poolclass": StaticPool, "connect_args": connect_args}
+    return {
+        "poolclass": SampledQueuePool,
+        "pool_size": SQLITE_POOL_SIZE,
+        "max_overflow": SQLITE_MAX_OVERFLOW,
+        "pool_timeout": 30,
+        "connect_args": connect_args,
+    }
+
+
+def bind_options(url) -> dict:
+    """A Flask-SQLAlchemy SQLALCHEMY_BINDS entry: the url plus its dialect's options."""
+    if not isinstance(url, str):
+        url = url.render_as_string(hide_password=False)  # str(URL) masks the password
+    return {"url": url, **engine_options(url)}
+
+
+@event.listens_for(Engine, "connect")
+def _apply_sqlite_pragmas(dbapi_conn, _record):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    if os.getenv("SQLITE_PRAGMAS", "1").strip() == "0":  # escape hatch / benchmark baseline
+        return
+    cur = dbapi_conn.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cur.execute(pragma)
+    finally:
+        cur.close()
+
+
+def sqlite_status(engine) -> dict:
+    """Current pragma values on one pooled connection (for `flask shell` / debugging)."""
+    if engine.dialect.name != "sqlite":
+        return {}
+    with engine.connect() as conn:
+        return {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size")
+        }
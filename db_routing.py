@@ -0,0 +1,301 @@
+# db_routing.py
+"""
+Primary / read-replica routing for db.session.
+
+With DATABASE_REPLICA_URL set, the replica is registered as the "replica"
+bind and RoutingSession.get_bind sends plain SELECTs there while a
+read-only scope is active:
+
+    @employee_bp.get("/")
+    @login_required
+    @read_only                       # innermost – the view body + template
+    def employee_home(): ...
+
+    with flask_app.app_context(), use_replica():   # Telegram bot listings
+        rows = DepositRequest.query...
+
+Everything else stays on the primary:
+  • flushes, INSERT/UPDATE/DELETE and raw text() that isn't a SELECT
+  • reads after this session wrote in the current transaction
+  • requests within REPLICA_PIN_SECONDS of this browser's last write
+    (read-your-writes: a staff member who just approved a deposit sees it)
+  • the whole replica while its lag > REPLICA_MAX_LAG_SECONDS or it is
+    unreachable (checked at most every REPLICA_LAG_CHECK_SECONDS)
+
+Without DATABASE_REPLICA_URL every scope is a no-op.
+
+Local check with two SQLite files (no Postgres needed):
+  python db_routing.py selftest
+  DATABASE_REPLICA_URL=sqlite:///casino_replica.db python db_routing.py status
+"""
+
+import argparse
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session as _FSASession
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+log = logging.getLogger("db_routing")
+
+REPLICA_BIND = "replica"
+MAX_LAG = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5"))
+PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "15"))
+
+_PIN_KEY = "_db_pin_until"
+_route = contextvars.ContextVar("db_route", default="primary")
+
+# engine url -> (checked_at, usable, lag_seconds)
+_health: dict[str, tuple[float, bool, float | None]] = {}
+_health_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Session
+# ---------------------------------------------------------------------------
+
+def _is_read(clause) -> bool:
+    if clause is None:
+        return True
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().upper().startswith("SELECT")
+    return bool(getattr(clause, "is_select", False))
+
+
+class RoutingSession(_FSASession):
+    """Flask-SQLAlchemy session that may answer reads from the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or not _is_read(clause):
+            self.info["_wrote"] = True
+            if has_request_context():
+                g._db_wrote = True
+        elif bind is None and _route.get() == "replica" and not self.info.get("_wrote"):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None and replica_usable(engine):
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self.info.pop("_wrote", None)
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self.info.pop("_wrote", None)
+
+
+# ---------------------------------------------------------------------------
+# Replica health
+# ---------------------------------------------------------------------------
+
+def _lag_seconds(engine) -> float | None:
+    """Replication lag in seconds; 0.0 where the dialect can't tell (SQLite/MySQL)."""
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    with engine.connect() as conn:
+        lag = conn.execute(text(
+            "SELECT CASE WHEN pg_is_in_recovery() "
+            "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+            "ELSE 0 END"
+        )).scalar()
+    return float(lag or 0)
+
+
+def replica_usable(engine) -> bool:
+    key = str(engine.url)
+    now = time.monotonic()
+    hit = _health.get(key)
+    if hit and now - hit[0] < LAG_CHECK_SECONDS:
+        return hit[1]
+
+    try:
+        lag = _lag_seconds(engine)
+        usable = lag is not None and lag <= MAX_LAG
+        if not usable:
+            shown = "unknown" if lag is None else f"{lag:.1f}s"
+            log.warning("replica lag %s (max %.1fs) – reads fall back to primary", shown, MAX_LAG)
+    except Exception as e:
+        lag, usable = None, False
+        log.warning("replica unreachable (%s) – reads fall back to primary", e)
+
+    with _health_lock:
+        _health[key] = (now, usable, lag)
+    return usable
+
+
+# ---------------------------------------------------------------------------
+# Scopes
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def use_replica():
+    """Route plain SELECTs in this block to the replica (if configured and fresh)."""
+    token = _route.set("replica")
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+@contextmanager
+def use_primary():
+    token = _route.set("primary")
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def _pinned_to_primary() -> bool:
+    if not has_request_context():
+        return False
+    try:
+        return float(flask_session.get(_PIN_KEY) or 0) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def read_only(view):
+    """Mark a view as read-only: its queries may be served by the replica."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if _pinned_to_primary():
+            return view(*args, **kwargs)
+        with use_replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# App wiring
+# ---------------------------------------------------------------------------
+
+def init_db_routing(app):
+    """Register the replica bind (call before db.init_app)."""
+    url = (os.getenv("DATABASE_REPLICA_URL") or "").strip()
+    if not url:
+        return
+    from db_engine import bind_options
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    binds[REPLICA_BIND] = bind_options(url)
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+    @app.after_request
+    def _pin_after_write(response):
+        if g.get("_db_wrote"):
+            flask_session[_PIN_KEY] = time.time() + PIN_SECONDS
+        return response
+
+
+def status(db) -> dict:
+    engine = db.engines.get(REPLICA_BIND)
+    if engine is None:
+        return {"replica": None}
+    _health.pop(str(engine.url), None)
+    usable = replica_usable(engine)
+    _, _, lag = _health.get(str(engine.url), (0, usable, None))
+    return {
+        "replica": engine.url.render_as_string(hide_password=True),
+        "usable": usable,
+        "lag_seconds": lag,
+        "max_lag_seconds": MAX_LAG,
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _selftest() -> int:
+    """Two throwaway SQLite files standing in for primary and replica."""
+    import tempfile
+    from flask import Flask
+    from flask_sqlalchemy import SQLAlchemy
+
+    tmp = tempfile.mkdtemp(prefix="db_routing_")
+    primary_url = f"sqlite:///{os.path.join(tmp, 'primary.db')}"
+    replica_url = f"sqlite:///{os.path.join(tmp, 'replica.db')}"
+    os.environ["DATABASE_REPLICA_URL"] = replica_url
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "selftest"
+    app.config["SQLALCHEMY_DATABASE_URI"] = primary_url
+    init_db_routing(app)
+    sdb = SQLAlchemy(session_options={"class_": RoutingSession})
+    sdb.init_app(app)
+
+    failures = []
+
+    def check(label, got, want):
+        ok = got == want
+        print(f"{'✅' if ok else '❌'} {label}: {got!r}")
+        if not ok:
+            failures.append(label)
+
+    def where():
+        return sdb.session.execute(text("SELECT v FROM whoami")).scalar()
+
+    with app.app_context():
+        for key, label in ((None, "primary"), (REPLICA_BIND, "replica")):
+            with sdb.engines[key].begin() as conn:
+                conn.execute(text("CREATE TABLE whoami (v TEXT)"))
+                conn.execute(text("INSERT INTO whoami (v) VALUES (:v)"), {"v": label})
+
+        check("default scope reads", where(), "primary")
+        with use_replica():
+            check("use_replica reads", where(), "replica")
+            sdb.session.execute(text("UPDATE whoami SET v = v"))
+            check("read after a write in the same transaction", where(), "primary")
+            sdb.session.rollback()
+            check("read after rollback", where(), "replica")
+
+        global MAX_LAG
+        saved, MAX_LAG = MAX_LAG, -1.0
+        _health.clear()
+        with use_replica():
+            check("replica over max lag", where(), "primary")
+        MAX_LAG = saved
+        _health.clear()
+
+    with app.test_request_context("/"):
+        flask_session[_PIN_KEY] = time.time() + 60
+        check("read_only view, pinned after a write", read_only(where)(), "primary")
+        flask_session.pop(_PIN_KEY)
+        check("read_only view", read_only(where)(), "replica")
+
+    print("OK" if not failures else f"FAILED: {', '.join(failures)}")
+    return 1 if failures else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="primary/replica routing")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="replica url, lag and whether reads use it")
+    sub.add_parser("selftest", help="routing check against two temporary SQLite files")
+    args = ap.parse_args()
+
+    if args.cmd == "selftest":
+        raise SystemExit(_selftest())
+
+    from app import app
+    from models import db
+    with app.app_context():
+        for k, v in status(db).items():
+            print(f"{k:16} {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+# dead_letters.py
+"""
+Dead-letter store + bulk replay for jobs that exhausted their retries.
+
+Kinds:
+  - id_request : a GameAccountRequest the ID worker gave up on
+                 payload = {"req_id", "user_id", "game_id", "game"}
+  - credit     : a deposit whose vendor credit failed after approval
+                 payload = {"deposit_id", "vendor", "account", "amount", "note"}
+
+A credit whose provider call raised (UI timeout, lost page, ...) may still
+have landed on the vendor, so it is parked as VERIFY rather than DEAD: bulk
+replay never picks it up, and staff either mark the deposit LOADED (which
+resolves it) or release() it to DEAD once the panel shows it did not go
+through.
+
+Every dead letter carries vendor + error_class (captcha / login / timeout /
+config / other) so staff can filter, and replay only what a healthy vendor
+can absorb. Replays are spread out with Celery countdowns (REPLAY_RATE per
+minute) so a few hundred jobs don't stampede a vendor panel.
+
+CLI (ops):
+  python dead_letters.py list   [--kind id_request] [--error-class captcha] [--vendor juwa]
+  python dead_letters.py replay [--kind ...] [--error-class ...] [--vendor ...]
+                                [--limit 200] [--rate 20] [--force] [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from celery_app import celery, get_flask_app
+from models import (
+    db,
+    DEAD_LETTER_OPEN,
+    DeadLetterJob,
+    DepositRequest,
+    GameAccountRequest,
+    notify,
+)
+from wallet import credit as wallet_credit, key_for as wallet_key
+
+log = logging.getLogger("dead_letters")
+
+KINDS = ("id_request", "credit")
+ERROR_CLASSES = ("captcha", "login", "timeout", "config", "other")
+OPEN_STATUSES = DEAD_LETTER_OPEN
+
+# Replay pacing: jobs per minute per replay batch
+REPLAY_RATE = int(os.getenv("DLQ_REPLAY_RATE", "20"))
+# Keep every countdown well under the broker visibility_timeout (1h),
+# otherwise Redis would redeliver the ETA task a second time.
+MAX_SPREAD_SECONDS = int(os.getenv("DLQ_MAX_SPREAD_SECONDS", str(45 * 60)))
+
+# Vendor health: too many fresh dead letters or a bad success ratio → wait
+HEALTH_WINDOW_MINUTES = int(os.getenv("DLQ_HEALTH_WINDOW_MINUTES", "10"))
+HEALTH_MAX_RECENT = int(os.getenv("DLQ_HEALTH_MAX_RECENT", "3"))
+HEALTH_MIN_SUCCESS_RATIO = float(os.getenv("DLQ_HEALTH_MIN_SUCCESS_RATIO", "0.5"))
+
+# Order matters: first match wins ("captcha timeout" is a captcha problem)
+_ERROR_PATTERNS = (
+    ("config", re.compile(r"not configured|no automation provider|no gameprovider|"
+                          r"not recognized|missing game|no saved login", re.I)),
+    ("captcha", re.compile(r"captcha|verification code|verify code|security check", re.I)),
+    ("timeout", re.compile(r"timeout|timed out|locator\.|net::|connection|unreachable|"
+                           r"maintenance|not responding|502|503|504", re.I)),
+    ("login", re.compile(r"login|log in|password|unauthori[sz]ed|forbidden|401|403|"
+                         r"session|credential|auth", re.I)),
+)
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def classify_error(error: str | None) -> str:
+    text = error or ""
+    for name, rx in _ERROR_PATTERNS:
+        if rx.search(text):
+            return name
+    return "other"
+
+
+def record(kind: str, ref_id: int, vendor: str | None, error: str | None,
+           payload: dict | None = None, verify: bool = False) -> DeadLetterJob | None:
+    """
+    Store (or refresh) the dead letter for one job. Commits; never raises.
+
+    A failed replay updates the existing open row instead of adding a new one.
+    `verify=True` (outcome unknown) parks it as VERIFY; a job stays VERIFY
+    once it has been, since the earlier attempt may still have gone through.
+    """
+    try:
+        job = (
+            DeadLetterJob.query
+            .filter_by(kind=kind, ref_id=ref_id)
+            .filter(DeadLetterJob.status.in_(OPEN_STATUSES))
+            .order_by(DeadLetterJob.id.desc())
+            .first()
+        )
+        if job is None:
+            job = DeadLetterJob(kind=kind, ref_id=ref_id)
+            db.session.add(job)
+        elif job.status == "REPLAYING":
+            job.last_replay_error = (error or "")[:2000]
+
+        job.vendor = vendor or job.vendor or "unknown"
+        job.error = (error or "")[:2000]
+        job.error_class = classify_error(error)
+        job.payload = payload or job.payload or {}
+        job.status = "VERIFY" if verify or job.status == "VERIFY" else "DEAD"
+        db.session.commit()
+        log.warning("dead letter %s #%s (%s/%s): %s", kind, ref_id, job.vendor, job.error_class, error)
+        return job
+    except Exception:
+        db.session.rollback()
+        log.exception("could not record dead letter %s #%s", kind, ref_id)
+        return None
+
+
+def resolve(kind: str, ref_id: int, status: str = "REPLAYED"):
+    """Close any open dead letter for this job (it went through after all)."""
+    try:
+        (
+            DeadLetterJob.query
+            .filter_by(kind=kind, ref_id=ref_id)
+            .filter(DeadLetterJob.status.in_(OPEN_STATUSES))
+            .update({"status": status}, synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        log.exception("could not resolve dead letter %s #%s", kind, ref_id)
+
+
+def release(job_id: int) -> bool:
+    """Staff checked the vendor panel: a VERIFY credit did not go through, so it may be replayed."""
+    n = (
+        DeadLetterJob.query
+        .filter_by(id=job_id, status="VERIFY")
+        .update({"status": "DEAD"}, synchronize_session=False)
+    )
+    db.session.commit()
+    return bool(n)
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def query(kind=None, error_class=None, vendor=None, status="DEAD"):
+    q = DeadLetterJob.query
+    if kind:
+        q = q.filter(DeadLetterJob.kind == kind)
+    if error_class:
+        q = q.filter(DeadLetterJob.error_class == error_class)
+    if vendor:
+        q = q.filter(DeadLetterJob.vendor == vendor)
+    if status:
+        q = q.filter(DeadLetterJob.status == status)
+    return q
+
+
+def counts(status="DEAD") -> dict:
+    """{(kind, vendor, error_class): n} for the admin summary."""
+    rows = (
+        db.session.query(DeadLetterJob.kind, DeadLetterJob.vendor,
+                         DeadLetterJob.error_class, db.func.count(DeadLetterJob.id))
+        .filter(DeadLetterJob.status == status)
+        .group_by(DeadLetterJob.kind, DeadLetterJob.vendor, DeadLetterJob.error_class)
+        .all()
+    )
+    return {(k, v, e): int(n) for k, v, e, n in rows}
+
+
+def vendor_healthy(vendor: str) -> tuple[bool, str]:
+    """
+    Cheap health check before replaying into a vendor.
+
+    Unhealthy when it produced HEALTH_MAX_RECENT+ new dead letters in the last
+    HEALTH_WINDOW_MINUTES, or when last hour's ID success ratio (queue_metrics)
+    is below HEALTH_MIN_SUCCESS_RATIO.
+    """
+    since = datetime.utcnow() - timedelta(minutes=HEALTH_WINDOW_MINUTES)
+    recent = (
+        DeadLetterJob.query
+        .filter(DeadLetterJob.vendor == vendor, DeadLetterJob.created_at >= since)
+        .count()
+    )
+    if recent >= HEALTH_MAX_RECENT:
+        return False, f"{recent} new failures in {HEALTH_WINDOW_MINUTES}m"
+
+    try:
+        import queue_metrics
+        outcomes = queue_metrics._outcomes(vendor, 1)
+    except Exception:
+        outcomes = {}
+    ok = int(outcomes.get("approved", 0))
+    bad = int(outcomes.get("failed", 0)) + int(outcomes.get("error", 0))
+    if ok + bad >= 5 and ok / (ok + bad) < HEALTH_MIN_SUCCESS_RATIO:
+        return False, f"success ratio {ok}/{ok + bad} in the last hour"
+    return True, "ok"
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def _replay_id_request(job: DeadLetterJob, countdown: int, staff: bool = False) -> bool:
+    from id_requests import enqueue_game_account_request
+
+    req = db.session.get(GameAccountRequest, job.ref_id)
+    if not req:
+        job.status = "RESOLVED"
+        job.last_replay_error = "request no longer exists"
+        return False
+    if (req.status or "").upper() not in ("FAILED", "PENDING"):
+        # staff already handled it by hand
+        job.status = "RESOLVED"
+        return False
+
+    req.status = "PENDING"
+    req.retry_count = (req.retry_count or 0) + 1
+    if hasattr(req, "updated_at"):
+        req.updated_at = datetime.utcnow()
+    job.status = "REPLAYING"
+    db.session.commit()
+    enqueue_game_account_request(req.id, countdown=countdown, staff=staff)
+    return True
+
+
+def _replay_credit(job: DeadLetterJob, countdown: int, staff: bool = False) -> bool:
+    import queue_lanes
+    import queue_metrics
+
+    dep = db.session.get(DepositRequest, job.ref_id)
+    if not dep or dep.status not in ("PENDING", "RECEIVED"):
+        job.status = "RESOLVED"
+        return False
+    lane = queue_lanes.lane_for_deposit(dep.id, staff=staff)
+    job.status = "REPLAYING"
+    db.session.commit()
+
+    task_id = str(uuid4())
+    queue_metrics.mark_enqueued(task_id, f"credit:{job.vendor}", dep.id, countdown, lane=lane)
+    replay_credit.apply_async(
+        args=[job.id], queue="id_requests", task_id=task_id,
+        countdown=countdown, priority=queue_lanes.priority(lane),
+    )
+    return True
+
+
+def replay(kind=None, error_class=None, vendor=None, *, ids=None, limit: int = 200,
+           rate: int | None = None, force: bool = False, dry_run: bool = False,
+           staff: bool = False) -> dict:
+    """
+    Re-enqueue DEAD jobs matching the filters (or the explicit `ids`).
+    `staff=True` (a person replaying specific jobs) uses the staff priority
+    lane; bulk replays keep each player's normal lane.
+
+    Vendors failing vendor_healthy() are skipped unless force=True. Jobs are
+    staggered `60/rate` seconds apart; whatever would land beyond
+    MAX_SPREAD_SECONDS stays DEAD for the next run.
+    """
+    rate = max(1, int(rate or REPLAY_RATE))
+    step = 60.0 / rate
+
+    q = query(kind, error_class, vendor)
+    if ids:
+        q = q.filter(DeadLetterJob.id.in_(list(ids)))
+    jobs = q.order_by(DeadLetterJob.created_at.asc()).limit(max(1, int(limit))).all()
+
+    summary = {"matched": len(jobs), "queued": 0, "resolved": 0, "deferred": 0,
+               "unhealthy": {}, "rate_per_min": rate}
+    health: dict[str, tuple[bool, str]] = {}
+    slot = 0
+
+    for job in jobs:
+        v = job.vendor or "unknown"
+        if not force:
+            if v not in health:
+                health[v] = vendor_healthy(v)
+            ok, reason = health[v]
+            if not ok:
+                summary["unhealthy"][v] = reason
+                continue
+
+        countdown = int(slot * step)
+        if countdown > MAX_SPREAD_SECONDS:
+            summary["deferred"] += 1
+            continue
+        if dry_run:
+            summary["queued"] += 1
+            slot += 1
+            continue
+
+        try:
+            job.replay_count = (job.replay_count or 0) + 1
+            job.replayed_at = datetime.utcnow()
+            if job.kind == "id_request":
+                queued = _replay_id_request(job, countdown, staff)
+            elif job.kind == "credit":
+                queued = _replay_credit(job, countdown, staff)
+            else:
+                queued = False
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log.exception("replay of dead letter %s failed", job.id)
+            summary.setdefault("errors", []).append(f"#{job.id}: {e}")
+            continue
+
+        if queued:
+            summary["queued"] += 1
+            slot += 1
+        else:
+            summary["resolved"] += 1
+
+    return summary
+
+
+@celery.task(name="replay_credit", queue="id_requests")
+def replay_credit(job_id: int):
+    """
+    Re-send a failed vendor credit and finish the deposit like the staff flow.
+
+    Uses the amount stored at failure time (bonus already applied then), so
+    the bonus is never computed twice.
+    """
+    from automation.providers import provider_credit, result_ok, result_error_text
+
+    app = get_flask_app()
+    with app.app_context():
+        job = db.session.get(DeadLetterJob, job_id)
+        if not job or job.status != "REPLAYING":
+            return {"outcome": "skipped"}
+        label = f"credit:{job.vendor}"
+
+        dep = db.session.get(DepositRequest, job.ref_id)
+        if not dep or dep.status not in ("PENDING", "RECEIVED"):
+            job.status = "RESOLVED"
+            db.session.commit()
+            return {"outcome": "skipped", "vendor": label}
+
+        p = job.payload or {}
+        vendor, account = p.get("vendor"), p.get("account")
+        amount = p.get("amount") or dep.total_credited or dep.amount
+        try:
+            res = provider_credit(vendor, account, amount, p.get("note") or f"Deposit#{dep.id} replay")
+        except Exception as e:
+            record("credit", dep.id, vendor, f"{type(e).__name__}: {e}", p, verify=True)
+            return {"outcome": "failed", "attempts": 1, "vendor": label}
+        if not result_ok(vendor, res):
+            record("credit", dep.id, vendor, result_error_text(res) or "credit failed", p)
+            return {"outcome": "failed", "attempts": 1, "vendor": label}
+
+        dep.status = "LOADED"
+        dep.loaded_at = datetime.utcnow()
+        wallet_credit(dep.user_id, amount, key=wallet_key("deposit", dep), reason="replay")
+        job.status = "REPLAYED"
+        db.session.commit()
+        try:
+            notify(dep.user_id, f"✅ Your deposit #{dep.id} of {amount} has been credited to {(vendor or '').upper()}.")
+        except Exception:
+            pass
+        return {"outcome": "approved", "attempts": 1, "vendor": label}
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="Dead-letter queue: list / replay failed jobs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("list", "replay"):
+        sp = sub.add_parser(name)
+        sp.add_argument("--kind", choices=KINDS)
+        sp.add_argument("--error-class", choices=ERROR_CLASSES)
+        sp.add_argument("--vendor")
+        sp.add_argument("--limit", type=int, default=200)
+    rp = sub.choices["replay"]
+    rp.add_argument("--rate", type=int, default=REPLAY_RATE, help="jobs per minute")
+    rp.add_argument("--force", action="store_true", help="ignore vendor health")
+    rp.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "list":
+            jobs = (
+                query(args.kind, args.error_class, args.vendor)
+                .order_by(DeadLetterJob.created_at.desc())
+                .limit(args.limit)
+                .all()
+            )
+            for j in jobs:
+                print(f"#{j.id:<6} {j.kind:<10} ref={j.ref_id:<7} {j.vendor:<12} "
+                      f"{j.error_class:<8} x{j.replay_count} {j.created_at:%Y-%m-%d %H:%M}  "
+                      f"{(j.error or '')[:80]}")
+            print(f"{len(jobs)} dead letter(s)")
+            return 0
+
+        t0 = time.time()
+        summary = replay(args.kind, args.error_class, args.vendor, limit=args.limit,
+                         rate=args.rate, force=args.force, dry_run=args.dry_run)
+        print(summary)
+        print(f"done in {time.time() - t0:.1f}s")
+        return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(_cli())
@@ -15,7 +15,7 @@ from flask import (
     jsonify,
 )
 from flask_login import login_required, current_user
-from sqlalchemy import text, or_, func
+from sqlalchemy import or_, func
 
 from models import (
     db,
@@ -28,13 +28,23 @@ from models import (
     WithdrawRequest,
     ReferralCode,
     notify,
-    PaymentSettings,   # bonus %, limits, etc.
     Deposit,           # alias to DepositRequest
     BonusRecord,        # Import BonusRecord model
     BonusSettings,      # NEW: Import BonusSettings model
     apply_bonus_to_deposit,  # NEW: Import bonus helper function
     get_player_next_bonus    # NEW: Import bonus helper function
 )
+from player_stats import stats_map, loaded_count  # one-row-per-player history totals
+from keyset import seek  # (created_at, id) seek pagination
+from db_routing import read_only  # replica-eligible views
+from load_shed import low_priority  # sheddable while the DB pool is saturated
+from exports import export_response  # streamed CSV/Parquet
+from player_search import user_filter  # indexed player search
+import kv  # cached kv_store (per-game backend URLs)
+import settings_cache  # versioned PaymentSettings / BonusSettings snapshots
+from wallet import credit as wallet_credit, debit as wallet_debit, key_for as wallet_key  # ledgered, atomic balance changes
+
+DEPOSITS_PAGE_SIZE = 100
 
 # ====== Silent mode switch (prevents any external backend UI redirects) ======
 SILENT_BACKEND_UI = True
@@ -86,50 +96,11 @@ def _first_attr(obj, *names, default=""):
                 return v
     return default
 
-# ---------- tiny kv fallback (shared with admin) ----------
-def _ensure_kv():
-    try:
-        bind = db.session.get_bind()
-        dialect = bind.dialect.name if bind else "sqlite"
-        if dialect in ("postgresql", "postgres"):
-            db.session.execute(text("""
-                CREATE TABLE IF NOT EXISTS kv_store (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """))
-        elif dialect in ("mysql", "mariadb"):
-            db.session.execute(text("""
-                CREATE TABLE IF NOT EXISTS kv_store (
-                    `key` VARCHAR(191) PRIMARY KEY,
-                    `value` TEXT
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """))
-        else:
-            db.session.execute(text("""
-                CREATE TABLE IF NOT EXISTS kv_store (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-def _kv_get(k: str) -> str | None:
-    _ensure_kv()
-    try:
-        row = db.session.execute(text("SELECT value FROM kv_store WHERE key=:k"), {"k": k}).fetchone()
-        return row[0] if row else None
-    except Exception:
-        db.session.rollback()
-        return None
-
 def _backend_url_for(game: Game) -> str | None:
     val = getattr(game, "backend_url", None)
     if val:
         return val
-    return _kv_get(f"game:{game.id}:backend_url") or None
+    return kv.get(f"game:{game.id}:backend_url") or None
 
 def _refcodes_for_user_ids(user_ids):
     if not user_ids:
@@ -207,7 +178,10 @@ def _find_account_username(user_id: int, vendor_preference: str | None = None) -
 # -------------------- HOME ----------------------
 @employee_bp.get("/")
 @login_required
+@read_only
 def employee_home():
+    # Work queues are counted live (status indexes, few open rows): a badge
+    # read from the daily_stats rollup would keep any drift until it's refreshed.
     pending_deposits  = DepositRequest.query.filter_by(status="PENDING").count()
     pending_requests  = GameAccountRequest.query.filter(
         GameAccountRequest.status.in_(["PENDING", "IN_PROGRESS"])
@@ -287,19 +261,16 @@ def employee_home():
 # -------------------- DEPOSITS LIST --------------------
 @employee_bp.get("/deposits")
 @login_required
+@read_only
 def deposits_list():
     ALLOWED = {"PENDING", "RECEIVED", "LOADED", "REJECTED"}
     status = (request.args.get("status") or "").upper().strip()
     q = (request.args.get("q") or "").strip()
 
-    settings = db.session.get(PaymentSettings, 1)
+    settings = settings_cache.payment()
 
     # Get bonus settings
-    bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-    if not bonus_settings:
-        bonus_settings = BonusSettings()
-        db.session.add(bonus_settings)
-        db.session.commit()
+    bonus_settings = settings_cache.bonus()  # cached snapshot
     
     # Get bonus filter from URL
     bonus_filter = request.args.get("bonus_filter", "").lower()
@@ -311,20 +282,23 @@ def deposits_list():
             base = base.filter(DepositRequest.status == status)
 
         if q:
-            base = (
-                base.outerjoin(User, User.id == DepositRequest.user_id)
-                    .filter(
-                        or_(
-                            func.lower(func.coalesce(User.name, "")).like(f"%{q.lower()}%"),
-                            func.lower(func.coalesce(User.email, "")).like(f"%{q.lower()}%"),
-                            func.cast(DepositRequest.id, db.String).ilike(f"%{q}%"),
-                        )
-                    )
-            )
-
-        items = base.order_by(DepositRequest.created_at.desc()).all()
-
-        user_ids = [d.user_id for d in items if d.user_id]
+            # players via the search index (name/email/mobile/telegram/ref code/logins), or a deposit #
+            cond = [user_filter(DepositRequest.user_id, q)]
+            if q.lstrip("#").isdigit():
+                cond.append(DepositRequest.id == int(q.lstrip("#")))
+            base = base.filter(or_(*cond))
+
+        page = seek(base, DepositRequest, cursor=request.args.get("cursor"), limit=DEPOSITS_PAGE_SIZE)
+        items = page.rows
+
+        # Settled deposits past COLD_ARCHIVE_DAYS have moved to cold storage;
+        # once the live rows run out, show the archived matches too.
+        archived = []
+        if not page.has_next:
+            import cold_storage  # lazy: pulls in celery
+            archived = cold_storage.search("deposit", q=q, status=status or None, limit=DEPOSITS_PAGE_SIZE)
+
+        user_ids = [d.user_id for d in items + archived if d.user_id]
         users_map = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()} if user_ids else {}
         refcodes = _refcodes_for_user_ids(user_ids)
 
@@ -333,19 +307,14 @@ def deposits_list():
 
         backend_urls = {gid: _backend_url_for(g) for gid, g in games_map.items()}
         
-        # Calculate pending first bonuses
+        # Calculate pending first bonuses (one player_stats read for the page)
         pending_first_bonus_count = 0
         if status in ["", "PENDING"]:
+            stats = stats_map(user_ids)
             for dep in items:
-                if dep.status == "PENDING":
-                    player = User.query.get(dep.user_id)
-                    if player:
-                        prev_deposits = DepositRequest.query.filter_by(
-                            user_id=player.id, 
-                            status="LOADED"
-                        ).count()
-                        if prev_deposits == 0 and dep.amount >= (bonus_settings.signup_min_deposit or 30):
-                            pending_first_bonus_count += 1
+                if dep.status == "PENDING" and dep.user_id in users_map:
+                    if loaded_count(dep.user_id, stats) == 0 and dep.amount >= (bonus_settings.signup_min_deposit or 30):
+                        pending_first_bonus_count += 1
 
         return render_template(
             "employee_deposits.html",
@@ -362,6 +331,9 @@ def deposits_list():
             bonus_settings=bonus_settings,
             pending_first_bonus_count=pending_first_bonus_count,
             bonus_filter=bonus_filter,
+            next_cursor=page.next_cursor,
+            prev_cursor=page.prev_cursor,
+            archived=archived,
         )
 
     pending = (
@@ -380,16 +352,12 @@ def deposits_list():
     users_map = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()} if user_ids else {}
     refcodes = _refcodes_for_user_ids(user_ids)
 
-    # Calculate pending first bonuses
+    # Calculate pending first bonuses (one player_stats read for the page)
+    stats = stats_map(user_ids)
     pending_first_bonus_count = 0
     for dep in pending:
-        player = User.query.get(dep.user_id)
-        if player:
-            prev_deposits = DepositRequest.query.filter_by(
-                user_id=player.id, 
-                status="LOADED"
-            ).count()
-            if prev_deposits == 0 and dep.amount >= (bonus_settings.signup_min_deposit or 30):
+        if dep.user_id in users_map:
+            if loaded_count(dep.user_id, stats) == 0 and dep.amount >= (bonus_settings.signup_min_deposit or 30):
                 pending_first_bonus_count += 1
 
     def build_rows(deps):
@@ -416,11 +384,7 @@ def deposits_list():
             acc = accounts.get((d.user_id, d.game_id)) if d.user_id and d.game_id else None
             
             # Check if this is user's first deposit
-            prev_deposits = DepositRequest.query.filter_by(
-                user_id=d.user_id, 
-                status='LOADED'
-            ).count()
-            is_first_deposit = (prev_deposits == 0)
+            is_first_deposit = loaded_count(d.user_id, stats) == 0
 
             out.append({
                 "dep": d,
@@ -466,11 +430,21 @@ def deposits_list():
         bonus_filter=bonus_filter,
     )
 
+@employee_bp.get("/export/<string:dataset>.<string:fmt>")
+@login_required
+@low_priority
+def export_dataset(dataset: str, fmt: str):
+    """Streamed CSV/Parquet of deposits or withdrawals (?from=&to=&status=&archived=1)."""
+    if dataset == "players":
+        abort(404)  # player list export is admin-only
+    return export_response(dataset, fmt, request.args)
+
 # New: Deposit detail page
 @employee_bp.get("/deposits/<int:dep_id>", endpoint="deposit_detail")
 @login_required
 def deposit_detail(dep_id: int):
-    dep = db.session.get(DepositRequest, dep_id)
+    import cold_storage  # lazy: pulls in celery
+    dep = cold_storage.fetch("deposit", dep_id)
     if not dep:
         flash("Deposit not found.", "error")
         return redirect(url_for("employeebp.deposits_list"))
@@ -488,6 +462,7 @@ def deposit_detail(dep_id: int):
         user=user,
         game=game,
         refcode=refcode,
+        archived=getattr(dep, "is_archived", False),
     )
 
     if _template_exists("employee_deposit_detail.html"):
@@ -526,10 +501,14 @@ def deposit_detail(dep_id: int):
           </div>
         {% endif %}
         <hr>
+        {% if archived %}
+        <div class="muted">Archived – settled deposits are read-only.</div>
+        {% else %}
         <div style="display:flex;gap:8px">
           <form method="post" action="{{ url_for('employeebp.deposits_loaded', dep_id=dep.id) }}"><button class="btn btn-primary" type="submit">Approve &nbsp;✓</button></form>
           <form method="post" action="{{ url_for('employeebp.deposits_reject', dep_id=dep.id) }}"><button class="btn" type="submit">Reject ✕</button></form>
         </div>
+        {% endif %}
       </div>
     </div>{% endblock %}""", **ctx)
 
@@ -550,9 +529,7 @@ def deposits_loaded(dep_id: int):
         dep.loaded_by = current_user.id
 
     if dep.amount and dep.user_id:
-        wallet = PlayerBalance.query.filter_by(user_id=dep.user_id).first()
-        if wallet:
-            wallet.balance = (wallet.balance or 0) + dep.amount
+        wallet_credit(dep.user_id, dep.amount, key=wallet_key("deposit", dep), actor_id=current_user.id)
 
     db.session.commit()
 
@@ -581,6 +558,14 @@ def deposits_reject(dep_id: int):
 
 # -------------------- AUTOMATION: Approve & Credit (Vendor-aware) --------------------
 
+def _dead_letter_credit(dep_id: int, vendor: str, error: str, payload: dict, verify: bool = False):
+    """Park a failed vendor credit in the dead-letter queue for bulk replay."""
+    try:
+        import dead_letters  # lazy: pulls in celery
+        dead_letters.record("credit", dep_id, vendor, error, payload, verify=verify)
+    except Exception:
+        pass
+
 @employee_bp.post("/deposits/<int:deposit_id>/approve", endpoint="approve_and_credit_deposit")
 @login_required
 def approve_and_credit_deposit(deposit_id: int):
@@ -611,12 +596,7 @@ def approve_and_credit_deposit(deposit_id: int):
 
     # ===== NEW BONUS LOGIC =====
     player = db.session.get(User, dep.user_id)
-    bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-    if not bonus_settings:
-        # Create default bonus settings if none exist
-        bonus_settings = BonusSettings()
-        db.session.add(bonus_settings)
-        db.session.commit()
+    bonus_settings = settings_cache.bonus()  # cached snapshot
     
     # Determine bonus type
     bonus_type = get_player_next_bonus(player)
@@ -648,14 +628,22 @@ def approve_and_credit_deposit(deposit_id: int):
 
     note = f"Deposit#{dep.id} by {current_user.name or current_user.email or current_user.id}"
 
+    credit_payload = {
+        "deposit_id": dep.id, "vendor": vendor, "account": acc_username,
+        "amount": total_credited, "note": note,
+    }
     try:
         # Send total_credited (deposit + bonus) to vendor
         res = provider_credit(vendor, acc_username, total_credited, note)
     except Exception as e:
-        return jsonify({"ok": False, "error": f"{vendor.upper()} credit error: {e}"}), 500
+        # the call may have landed before it raised: staff verify, no blind replay
+        _dead_letter_credit(dep.id, vendor, f"{type(e).__name__}: {e}", credit_payload, verify=True)
+        return jsonify({"ok": False, "error": f"{vendor.upper()} credit error: {e}. "
+                                              f"Check the {vendor.upper()} panel before retrying."}), 500
 
     # Add this check - vendor credit result verification
     if not _prov_ok(vendor, res):
+        _dead_letter_credit(dep.id, vendor, _prov_err(res), credit_payload)
         return jsonify({"ok": False, "error": f"{vendor.upper()} credit failed: {_prov_err(res)}"}), 500
 
     dep.status = "LOADED"
@@ -663,10 +651,8 @@ def approve_and_credit_deposit(deposit_id: int):
     if hasattr(dep, "loaded_by"):
         dep.loaded_by = current_user.id
 
-    # Credit deposit amount + bonus to wallet
-    wallet = PlayerBalance.query.filter_by(user_id=dep.user_id).first()
-    if wallet:
-        wallet.balance = (wallet.balance or 0) + total_credited  # Use total_credited (amount + bonus)
+    # Credit deposit amount + bonus to wallet (atomic, once per deposit)
+    wallet_credit(dep.user_id, total_credited, key=wallet_key("deposit", dep), actor_id=current_user.id)
 
     db.session.commit()
 
@@ -689,6 +675,7 @@ def approve_and_credit_deposit(deposit_id: int):
 # -------------------- REQUESTS --------------------
 @employee_bp.get("/requests")
 @login_required
+@read_only
 def requests_list():
     open_reqs = (
         GameAccountRequest.query.filter(
@@ -961,6 +948,7 @@ def open_game_backend(game_id: int):
 # -------------------- WITHDRAW REQUESTS --------------------
 @employee_bp.get("/withdrawals")
 @login_required
+@read_only
 def withdrawals_list():
     pending = (
         WithdrawRequest.query.filter_by(status="PENDING")
@@ -1249,9 +1237,7 @@ def withdrawals_paid(wd_id: int):
     if hasattr(wd, "paid_at"):
         wd.paid_at = datetime.utcnow()
 
-    wallet = PlayerBalance.query.filter_by(user_id=wd.user_id).first()
-    if wallet:
-        wallet.balance = max(0, (wallet.balance or 0) - (wd.amount or 0) - tip)
+    wallet_debit(wd.user_id, (wd.amount or 0) + tip, key=wallet_key("withdraw", wd), actor_id=current_user.id)
 
     db.session.commit()
 
@@ -1291,12 +1277,7 @@ def withdrawals_reject(wd_id: int):
 def employee_bonus():
     """Employee bonus settings page"""
     # Get current bonus settings
-    bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-    if not bonus_settings:
-        # Create default settings if none exist
-        bonus_settings = BonusSettings()
-        db.session.add(bonus_settings)
-        db.session.commit()
+    bonus_settings = settings_cache.bonus()  # cached snapshot
     
     return render_template(
         "employee_bonus_settings.html",
@@ -0,0 +1,363 @@
+# exports.py
+"""
+Streaming CSV / Parquet exports of deposits, withdrawals and players.
+
+Rows come from a Core SELECT run with stream_results + yield_per
+(EXPORT_BATCH rows at a time – a server-side cursor on Postgres, SQLite's
+lazy cursor otherwise) and leave as soon as each batch is encoded, so
+memory stays flat whether the export holds 10 rows or 10 million.
+
+Filters (same for the endpoints and the CLI):
+  from / to     YYYY-MM-DD on created_at, `to` inclusive
+  status        one or more statuses, comma separated (not for players)
+  archived      also stream the cold_storage.py index rows (columns the
+                archive doesn't keep are left empty)
+
+Parquet needs pyarrow; it is written one row group per batch.
+
+Endpoints (staff only, shed while the DB pool is saturated):
+  /admin/export/deposits.csv?from=2026-01-01&to=2026-01-31&status=LOADED
+  /employee/export/withdrawals.parquet?status=PAID,REJECTED&archived=1
+
+CLI:
+  python exports.py deposits --from 2026-01-01 --to 2026-01-31 --status LOADED -o jan.csv
+  python exports.py players --format parquet -o players.parquet
+
+Benchmark on synthetic rows: python bench_export.py --rows 1000000
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, null, select
+
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "5000"))
+
+DATASETS = ("deposits", "withdrawals", "players")
+FORMATS = ("csv", "parquet")
+MIMETYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+@dataclass
+class Dataset:
+    name: str
+    columns: list          # [(name, expression, kind)]  kind: int | float | str | datetime
+    from_: object
+    date_col: object
+    order_col: object
+    status_col: object = None
+    where: object = None
+    archive_kind: str | None = None
+    archive_map: dict | None = None
+    archive_from: object = None
+
+
+def dataset(name: str) -> Dataset:
+    from models import DepositRequest, Game, PlayerBalance, PlayerStats, RequestArchive, User, WithdrawRequest
+
+    u, g, ra = User.__table__, Game.__table__, RequestArchive.__table__
+    ra_from = ra.outerjoin(u, u.c.id == ra.c.user_id).outerjoin(g, g.c.id == ra.c.game_id)
+
+    if name == "deposits":
+        d = DepositRequest.__table__
+        return Dataset(
+            name=name,
+            columns=[
+                ("id", d.c.id, "int"), ("user_id", d.c.user_id, "int"),
+                ("player", u.c.name, "str"), ("email", u.c.email, "str"), ("game", g.c.name, "str"),
+                ("amount", d.c.amount, "float"), ("method", d.c.method, "str"), ("status", d.c.status, "str"),
+                ("bonus_amount", d.c.bonus_amount, "float"), ("total_credited", d.c.total_credited, "float"),
+                ("provider", d.c.provider, "str"), ("provider_order_id", d.c.provider_order_id, "str"),
+                ("created_at", d.c.created_at, "datetime"), ("loaded_at", d.c.loaded_at, "datetime"),
+                ("loaded_by", d.c.loaded_by, "int"),
+            ],
+            from_=d.outerjoin(u, u.c.id == d.c.user_id).outerjoin(g, g.c.id == d.c.game_id),
+            date_col=d.c.created_at, order_col=d.c.id, status_col=d.c.status,
+            archive_kind="deposit",
+            archive_map={
+                "id": ra.c.ref_id, "user_id": ra.c.user_id, "player": u.c.name, "email": u.c.email,
+                "game": g.c.name, "amount": ra.c.amount, "status": ra.c.status,
+                "bonus_amount": ra.c.bonus_amount, "created_at": ra.c.created_at,
+                "loaded_at": ra.c.settled_at, "loaded_by": ra.c.actor_id,
+            },
+            archive_from=ra_from,
+        )
+
+    if name == "withdrawals":
+        w = WithdrawRequest.__table__
+        return Dataset(
+            name=name,
+            columns=[
+                ("id", w.c.id, "int"), ("user_id", w.c.user_id, "int"),
+                ("player", u.c.name, "str"), ("email", u.c.email, "str"), ("game", g.c.name, "str"),
+                ("amount", w.c.amount, "float"), ("total_amount", w.c.total_amount, "float"),
+                ("method", w.c.method, "str"), ("status", w.c.status, "str"), ("address", w.c.address, "str"),
+                ("created_at", w.c.created_at, "datetime"), ("acted_at", w.c.acted_at, "datetime"),
+                ("acted_by", w.c.acted_by, "int"),
+            ],
+            from_=w.outerjoin(u, u.c.id == w.c.user_id).outerjoin(g, g.c.id == w.c.game_id),
+            date_col=w.c.created_at, order_col=w.c.id, status_col=w.c.status,
+            archive_kind="withdraw",
+            archive_map={
+                "id": ra.c.ref_id, "user_id": ra.c.user_id, "player": u.c.name, "email": u.c.email,
+                "game": g.c.name, "amount": ra.c.amount, "status": ra.c.status,
+                "created_at": ra.c.created_at, "acted_at": ra.c.settled_at, "acted_by": ra.c.actor_id,
+            },
+            archive_from=ra_from,
+        )
+
+    if name == "players":
+        s, b = PlayerStats.__table__, PlayerBalance.__table__
+        return Dataset(
+            name=name,
+            columns=[
+                ("id", u.c.id, "int"), ("name", u.c.name, "str"), ("email", u.c.email, "str"),
+                ("mobile", u.c.mobile, "str"), ("telegram_username", u.c.telegram_username, "str"),
+                ("created_at", u.c.created_at, "datetime"), ("balance", b.c.balance, "int"),
+                ("deposit_count", s.c.deposit_count, "int"), ("deposit_sum", s.c.deposit_sum, "float"),
+                ("last_deposit_at", s.c.last_deposit_at, "datetime"),
+                ("withdraw_count", s.c.withdraw_count, "int"), ("withdraw_sum", s.c.withdraw_sum, "float"),
+            ],
+            from_=u.outerjoin(s, s.c.user_id == u.c.id).outerjoin(b, b.c.user_id == u.c.id),
+            date_col=u.c.created_at, order_col=u.c.id, where=u.c.role == "PLAYER",
+        )
+
+    raise ValueError(f"unknown dataset {name!r} ({' | '.join(DATASETS)})")
+
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+
+def _filters(ds: Dataset, date_col, status_col, date_from, date_to, statuses) -> list:
+    cond = []
+    if ds.where is not None:
+        cond.append(ds.where)
+    if date_from:
+        cond.append(date_col >= date_from)
+    if date_to:
+        cond.append(date_col < date_to)
+    if statuses and status_col is not None:
+        cond.append(status_col.in_(statuses))
+    return cond
+
+
+def build_selects(ds: Dataset, date_from=None, date_to=None, statuses=None, archived=False) -> list:
+    """The live SELECT, plus the archive SELECT when asked for and the dataset has one."""
+    live = (
+        select(*[expr.label(name) for name, expr, _ in ds.columns])
+        .select_from(ds.from_)
+        .where(and_(True, *_filters(ds, ds.date_col, ds.status_col, date_from, date_to, statuses)))
+        .order_by(ds.date_col, ds.order_col)
+    )
+    stmts = [live]
+    if archived and ds.archive_kind:
+        from models import RequestArchive
+        ra = RequestArchive.__table__
+        stmts.append(
+            select(*[ds.archive_map.get(name, null()).label(name) for name, _, _ in ds.columns])
+            .select_from(ds.archive_from)
+            .where(ra.c.kind == ds.archive_kind)
+            .where(and_(True, *_filters(ds, ra.c.created_at, ra.c.status, date_from, date_to, statuses)))
+            .order_by(ra.c.created_at, ra.c.ref_id)
+        )
+    return stmts
+
+
+def iter_batches(stmts, batch: int = EXPORT_BATCH):
+    """Lists of rows, `batch` at a time, across every statement in turn."""
+    from models import db
+    conn = db.session.connection().execution_options(stream_results=True, yield_per=batch)
+    for stmt in stmts:
+        result = conn.execute(stmt)
+        try:
+            for part in result.partitions():
+                yield part
+        finally:
+            result.close()
+
+
+# ---------------------------------------------------------------------------
+# Encoders
+# ---------------------------------------------------------------------------
+
+def _cell(v):
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ", timespec="seconds")
+    return v
+
+
+def csv_chunks(ds: Dataset, batches):
+    """CSV text, header first, one chunk per batch."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _, _ in ds.columns])
+    yield buf.getvalue()
+    for part in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([[_cell(v) for v in row] for row in part])
+        yield buf.getvalue()
+
+
+class _Drain:
+    """Write-only file object whose bytes are taken out after every row group."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out, self._chunks = b"".join(self._chunks), []
+        return out
+
+
+def parquet_chunks(ds: Dataset, batches):
+    """Parquet bytes, one row group per batch (needs pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "datetime": pa.timestamp("us")}
+    schema = pa.schema([(name, types[kind]) for name, _, kind in ds.columns])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for part in batches:
+            arrays = [
+                pa.array([row[i] for row in part], type=schema.field(i).type)
+                for i in range(len(ds.columns))
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export(name: str, fmt: str = "csv", date_from=None, date_to=None, statuses=None,
+           archived: bool = False, batch: int = EXPORT_BATCH):
+    """Encoded chunks (str for csv, bytes for parquet) of the whole export."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r} ({' | '.join(FORMATS)})")
+    ds = dataset(name)
+    batches = iter_batches(build_selects(ds, date_from, date_to, statuses, archived), batch)
+    return csv_chunks(ds, batches) if fmt == "csv" else parquet_chunks(ds, batches)
+
+
+# ---------------------------------------------------------------------------
+# Filters from request args / CLI
+# ---------------------------------------------------------------------------
+
+def parse_filters(date_from: str | None, date_to: str | None, status: str | None) -> dict:
+    """{"date_from", "date_to" (exclusive), "statuses"}; ValueError on bad dates."""
+    start = datetime.strptime(date_from, "%Y-%m-%d") if date_from else None
+    end = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1) if date_to else None
+    statuses = [s.strip().upper() for s in (status or "").split(",") if s.strip()] or None
+    return {"date_from": start, "date_to": end, "statuses": statuses}
+
+
+def export_response(name: str, fmt: str, args):
+    """Flask streaming response for /<bp>/export/<name>.<fmt>."""
+    from flask import Response, abort, stream_with_context
+    from db_routing import use_replica
+
+    if name not in DATASETS or fmt not in FORMATS:
+        abort(404)
+    try:
+        filters = parse_filters(args.get("from"), args.get("to"), args.get("status"))
+    except ValueError:
+        abort(400, description="from/to must be YYYY-MM-DD")
+    archived = args.get("archived") in ("1", "true", "yes")
+
+    def generate():
+        # inside the generator: the view has returned by the time rows are read
+        with use_replica():
+            for chunk in export(name, fmt, archived=archived, **filters):
+                yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+    filename = f"{name}-{date.today():%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=MIMETYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",  # let nginx pass chunks straight through
+        },
+    )
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def write_export(out, name: str, fmt: str, **kw) -> int:
+    """Write an export to a binary file object; returns bytes written."""
+    n = 0
+    for chunk in export(name, fmt, **kw):
+        data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        out.write(data)
+        n += len(data)
+    return n
+
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="streaming CSV / Parquet export")
+    ap.add_argument("dataset", choices=DATASETS)
+    ap.add_argument("--from", dest="date_from", default=None, help="YYYY-MM-DD")
+    ap.add_argument("--to", dest="date_to", default=None, help="YYYY-MM-DD (inclusive)")
+    ap.add_argument("--status", default=None, help="comma separated, e.g. LOADED,PAID")
+    ap.add_argument("--archived", action="store_true", help="include cold-storage rows")
+    ap.add_argument("--format", choices=FORMATS, default=None, help="default: from -o's extension, else csv")
+    ap.add_argument("--batch", type=int, default=EXPORT_BATCH)
+    ap.add_argument("-o", "--output", default="-", help="file, or - for stdout")
+    args = ap.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    filters = parse_filters(args.date_from, args.date_to, args.status)
+
+    from app import app
+    with app.app_context():
+        if args.output == "-":
+            n = write_export(sys.stdout.buffer, args.dataset, fmt, archived=args.archived,
+                             batch=args.batch, **filters)
+        else:
+            with open(args.output, "wb") as fh:
+                n = write_export(fh, args.dataset, fmt, archived=args.archived, batch=args.batch, **filters)
+            print(f"✅ {args.dataset} → {args.output} ({n / 1e6:.1f} MB)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
@@ -25,12 +25,19 @@ from models import (
     Notification,
     notify,
 )
+import dead_letters
+import queue_lanes
+import queue_metrics
+import request_progress
 
 # 👇 Link to your providers + helper from player_bp.py
 from player_bp import PROVIDERS, _save_or_update_game_account
 
 log = logging.getLogger("id_request_worker")
 
+# How many of the oldest PENDING rows compete on priority lane per pick
+PICK_WINDOW = 50
+
 # -----------------------------------------------------------------------------
 # GameVault integration (queue mode)
 # -----------------------------------------------------------------------------
@@ -195,6 +202,7 @@ def _process_single_request(req: GameAccountRequest):
     Process ONE GameAccountRequest row in the queue.
 
     This runs inside app.app_context() and inside a DB transaction.
+    Returns the number of provider attempts made (0 if none were made).
     """
     game = db.session.get(Game, req.game_id)
     user = db.session.get(User, req.user_id)
@@ -206,7 +214,8 @@ def _process_single_request(req: GameAccountRequest):
             req.last_error = "Game or user not found"
         if hasattr(req, "updated_at"):
             req.updated_at = datetime.utcnow()
-        return
+        request_progress.report("failed")
+        return 0
 
     provider = _provider_for_game(game)
     if not provider:
@@ -217,7 +226,8 @@ def _process_single_request(req: GameAccountRequest):
             req.last_error = msg
         if hasattr(req, "updated_at"):
             req.updated_at = datetime.utcnow()
-        return
+        request_progress.report("failed")
+        return 0
 
     pname = _friendly_player_label(user)
     log.info(
@@ -234,6 +244,10 @@ def _process_single_request(req: GameAccountRequest):
     max_attempts = 3
 
     for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            request_progress.report("retrying", attempt=attempt, max_attempts=max_attempts)
+        else:
+            request_progress.report("logging_in")
         try:
             # Prefer create(user, req) (needed for GameVault)
             try:
@@ -316,8 +330,9 @@ def _process_single_request(req: GameAccountRequest):
         except Exception:
             log.exception("Failed to notify user %s about failure", req.user_id)
 
+        request_progress.report("failed")
         log.error("Request %s for %s FAILED: %s", req.id, game.name, err_text)
-        return
+        return attempt
 
     # ---- success: save login (reuse helper from player_bp) ------------
     username = str(acct).strip()
@@ -354,6 +369,7 @@ def _process_single_request(req: GameAccountRequest):
         req.user_id,
         username,
     )
+    return attempt
 
 
 def _worker_loop():
@@ -366,12 +382,18 @@ def _worker_loop():
 
         while True:
             try:
-                # Find the oldest PENDING request
-                req = (
+                # Oldest PENDING requests, best (aged) priority lane first
+                candidates = (
                     GameAccountRequest.query
                     .filter(GameAccountRequest.status == "PENDING")
                     .order_by(GameAccountRequest.created_at.asc())
-                    .first()
+                    .limit(PICK_WINDOW)
+                    .all()
+                )
+                req = min(
+                    candidates,
+                    key=lambda r: (queue_lanes.effective_priority(r), r.created_at or datetime.min),
+                    default=None,
                 )
 
                 if not req:
@@ -393,9 +415,37 @@ def _worker_loop():
                     req.updated_at = datetime.utcnow()
                 db.session.commit()
 
+                # Queue wait = time since the player asked
+                wait = None
+                if getattr(req, "created_at", None):
+                    wait = (datetime.utcnow() - req.created_at).total_seconds()
+                vendor = queue_metrics.vendor_label(db.session.get(Game, req.game_id))
+                started = time.perf_counter()
+
                 # Process it
-                _process_single_request(req)
-                db.session.commit()
+                with request_progress.bind(req.id):
+                    request_progress.report("started")
+                    attempts = _process_single_request(req)
+                    db.session.commit()
+                    # only after commit, so My Logins already shows the account
+                    if req.status == "APPROVED":
+                        request_progress.report("done")
+                        if req.retry_count:
+                            dead_letters.resolve("id_request", req.id)
+                    elif req.status == "FAILED":
+                        dead_letters.record("id_request", req.id, vendor, req.last_error, {
+                            "req_id": req.id, "user_id": req.user_id,
+                            "game_id": req.game_id, "attempts": attempts,
+                        })
+
+                queue_metrics.record_job(
+                    vendor,
+                    wait=wait,
+                    run=time.perf_counter() - started,
+                    attempts=attempts,
+                    outcome=(req.status or "unknown").lower(),
+                    lane=queue_lanes.current(req.id).get("lane"),
+                )
 
                 # Cooldown between accounts (helps avoid bans/rate limits)
                 time.sleep(15)
@@ -8,6 +8,7 @@ players can request IDs at once without blocking the web app.
 
 import logging
 import time
+from uuid import uuid4
 
 from celery import Celery
 
@@ -22,7 +23,12 @@ from models import (
     GameAccountRequest,
     User,
     notify,
+    shift_daily_stat,
 )
+import dead_letters
+import queue_lanes
+import queue_metrics
+import request_progress
 
 # Reuse provider interface + helpers from player_bp (no UI stuff)
 from player_bp import (
@@ -125,14 +131,16 @@ def process_id_request(req_id: int):
     - Uses provider.create() or GameVault helper.
     - On success: saves GameAccount + marks APPROVED.
     - On failure: retries up to MAX_ATTEMPTS, then marks FAILED and stores last_error.
+
+    Returns {"outcome", "attempts", "vendor"} for queue_metrics (task_postrun).
     """
-    with app.app_context():
+    with app.app_context(), request_progress.bind(req_id):
         log.info("process_id_request starting: req_id=%s", req_id)
 
         req = db.session.get(GameAccountRequest, req_id)
         if not req:
             log.error("process_id_request: Request %s not found", req_id)
-            return
+            return {"outcome": "skipped", "attempts": 0, "vendor": None}
 
         # Only work on fresh requests
         if (req.status or "").upper() != "PENDING":
@@ -141,7 +149,10 @@ def process_id_request(req_id: int):
                 req.id,
                 req.status,
             )
-            return
+            # e.g. fulfilled instantly from the ReadyAccount pool
+            if (req.status or "").upper() == "APPROVED":
+                request_progress.report("done")
+            return {"outcome": "skipped", "attempts": 0, "vendor": None}
 
         game = db.session.get(Game, req.game_id) if req.game_id else None
         user = db.session.get(User, req.user_id) if req.user_id else None
@@ -150,17 +161,32 @@ def process_id_request(req_id: int):
             err = "Missing game or user"
             log.error("process_id_request: %s for req_id=%s", err, req_id)
             _set_request_status(req, "FAILED", err)
-            return
-
-        # Mark as PROCESSING so we know worker picked it up
-        req.status = "PROCESSING"
-        if hasattr(req, "updated_at"):
-            req.updated_at = db.func.now()
+            request_progress.report("failed")
+            dead_letters.record("id_request", req.id, queue_metrics.vendor_label(game), err,
+                                {"req_id": req.id, "user_id": req.user_id, "game_id": req.game_id})
+            return {"outcome": "failed", "attempts": 0, "vendor": queue_metrics.vendor_label(game)}
+
+        # Claim atomically: aging re-publishes the same request into a
+        # higher lane, so two copies may be in flight – only one may run.
+        claimed = (
+            GameAccountRequest.query
+            .filter_by(id=req.id, status="PENDING")
+            .update({"status": "PROCESSING", "updated_at": db.func.now()},
+                    synchronize_session=False)
+        )
+        if claimed:
+            # the bulk UPDATE bypasses the daily_stats flush hook
+            shift_daily_stat(db.session.connection(), req, {"status": "PENDING"}, {"status": "PROCESSING"})
         db.session.commit()
+        if not claimed:
+            log.info("process_id_request: Request %s claimed by another worker", req.id)
+            return {"outcome": "skipped", "attempts": 0, "vendor": None}
+        request_progress.report("started")
 
         provider = _provider_for_game(game)
         gname = (game.name or "").strip()
         gname_lower = gname.lower()
+        vendor = queue_metrics.vendor_label(game)
 
         # ===== NEW: retry loop around existing logic =====
         last_error_msg = ""
@@ -174,6 +200,8 @@ def process_id_request(req_id: int):
                 attempt,
                 MAX_ATTEMPTS,
             )
+            if attempt > 1:
+                request_progress.report("retrying", attempt=attempt, max_attempts=MAX_ATTEMPTS)
 
             try:
                 # ---- Special case: GameVault via direct helper ----------------
@@ -182,6 +210,7 @@ def process_id_request(req_id: int):
                         error_text = "GameVault automation not configured"
                         raise RuntimeError(error_text)
 
+                    request_progress.report("creating_account")
                     raw_res = gv_create_account(user.name or "", user.email or "") or {}
                     if raw_res.get("ok"):
                         acct = (
@@ -208,11 +237,14 @@ def process_id_request(req_id: int):
                             user.id,
                             f"🔐 Your {gname} login is ready. Check My Logins.",
                         )
+                        request_progress.report("done")
+                        if req.retry_count:
+                            dead_letters.resolve("id_request", req.id)
                         log.info(
                             "process_id_request: SUCCESS for req_id=%s (GameVault)",
                             req.id,
                         )
-                        return
+                        return {"outcome": "approved", "attempts": attempt, "vendor": vendor}
 
                     error_text = (
                         raw_res.get("error") or "GameVault auto-provision failed"
@@ -224,6 +256,8 @@ def process_id_request(req_id: int):
                     error_text = f"No automation provider configured for game {gname}"
                     raise RuntimeError(error_text)
 
+                # Bots report logging_in / solving_captcha themselves when they can
+                request_progress.report("logging_in")
                 raw_res = provider.create() or {}
                 log.info(
                     "process_id_request: provider=%s raw_res=%s",
@@ -258,8 +292,11 @@ def process_id_request(req_id: int):
                         user.id,
                         f"🔐 Your {gname} login is ready. Check My Logins.",
                     )
+                    request_progress.report("done")
+                    if req.retry_count:  # replayed from the dead-letter queue
+                        dead_letters.resolve("id_request", req.id)
                     log.info("process_id_request: SUCCESS for req_id=%s", req.id)
-                    return
+                    return {"outcome": "approved", "attempts": attempt, "vendor": vendor}
 
                 error_text = (
                     raw_res.get("error")
@@ -295,6 +332,11 @@ def process_id_request(req_id: int):
                 # ===== LAST ATTEMPT → keep your old failure behavior =====
                               
                 _set_request_status(req, "FAILED", msg)
+                request_progress.report("failed")
+                dead_letters.record("id_request", req.id, vendor, msg, {
+                    "req_id": req.id, "user_id": user.id, "game_id": game.id,
+                    "game": gname, "attempts": attempt,
+                })
 
                 # Let the player know something went wrong (soft + technical)
                 try:
@@ -309,12 +351,85 @@ def process_id_request(req_id: int):
                 except Exception:
                     pass
 
-                return  # stop after final failure
+                # stop after final failure
+                return {"outcome": "failed", "attempts": attempt, "vendor": vendor}
+
+
+def _vendor_for_request(req_id: int) -> str:
+    try:
+        req = db.session.get(GameAccountRequest, req_id)
+        game = db.session.get(Game, req.game_id) if req and req.game_id else None
+        return queue_metrics.vendor_label(game)
+    except Exception:
+        db.session.rollback()
+        return "unknown"
+
+
+def _queue_position(req_id: int) -> int | None:
+    """1-based position among requests still waiting/being worked on."""
+    try:
+        return (
+            GameAccountRequest.query
+            .filter(GameAccountRequest.status.in_(("PENDING", "PROCESSING", "IN_PROGRESS")))
+            .filter(GameAccountRequest.id <= req_id)
+            .count()
+        )
+    except Exception:
+        db.session.rollback()
+        return None
 
 
-def enqueue_game_account_request(req_id: int):
+def enqueue_game_account_request(req_id: int, countdown: int = 0, *, lane: str | None = None,
+                                 staff: bool = False):
     """
     Helper used from player_bp to push a job into the Celery queue.
+    `countdown` delays the job (dead-letter replays are staggered this way).
+    The priority lane is picked from the player (see queue_lanes) unless given.
+    Requests already fulfilled (e.g. from the ReadyAccount pool on insert)
+    are not enqueued – their progress goes straight to "done".
+    """
+    status = db.session.query(GameAccountRequest.status).filter(GameAccountRequest.id == req_id).scalar()
+    if (status or "PENDING").upper() != "PENDING":
+        if status.upper() in ("APPROVED", "PROVIDED"):
+            request_progress.publish(req_id, "done")
+        return
+
+    if lane is None:
+        try:
+            lane = queue_lanes.lane_for_request(req_id, staff=staff)
+        except Exception:
+            db.session.rollback()
+            lane = queue_lanes.DEFAULT_LANE
+    pri = queue_lanes.priority(lane)
+
+    # Publish before enqueueing so a fast worker's "started" is never overwritten
+    position = _queue_position(req_id)
+    message = None
+    if position and position > 1:
+        message = f"You're #{position} in the queue…"
+    request_progress.publish(req_id, "queued", message, position=position, lane=lane)
+
+    # Pre-assign the task id so task_prerun can measure queue wait
+    task_id = str(uuid4())
+    queue_metrics.mark_enqueued(task_id, _vendor_for_request(req_id), req_id, countdown, lane=lane)
+    queue_lanes.remember(req_id, lane, pri, eta=time.time() + (countdown or 0))
+
+    celery_kwargs = {"queue": "id_requests", "task_id": task_id, "priority": pri}
+    if countdown:
+        celery_kwargs["countdown"] = countdown
+    process_id_request.apply_async(args=[req_id], **celery_kwargs)
+
+
+def republish_aged_request(req_id: int, lane: str, pri: int, since: float):
+    """
+    Anti-starvation: push another copy of a waiting request at priority `pri`.
+    Queue wait still counts from `since`; the atomic claim in
+    process_id_request makes the older copy a no-op.
     """
-    celery_kwargs = {"queue": "id_requests"}
-    process_id_request.apply_async(args=[req_id], **celery_kwargs)
\ No newline at end of file
+    task_id = str(uuid4())
+    queue_metrics.mark_enqueued(task_id, _vendor_for_request(req_id), req_id,
+                                since - time.time(), lane=lane)
+    queue_lanes.bump(req_id, pri)
+    process_id_request.apply_async(
+        args=[req_id], queue="id_requests", task_id=task_id, priority=pri,
+    )
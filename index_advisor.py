@@ -0,0 +1,346 @@
+# index_advisor.py
+"""
+Small index advisor: capture query shapes + timings during a load run and
+suggest the composite indexes that are missing.
+
+Capture (any process that builds the app – gunicorn, celery, scripts):
+  INDEX_ADVISOR=1 gunicorn ... "app:create_app()"
+  locust -f locustfile.py ...                     # drive the load
+Every statement is normalised to a shape (literals/binds -> ?), and
+calls / total ms / max ms per shape are kept in memory and flushed to
+INDEX_ADVISOR_DIR/shapes-<pid>.json every INDEX_ADVISOR_FLUSH_SECONDS and
+at exit.
+
+Report (merges all workers' files, reads the live indexes):
+  python index_advisor.py report [--min-ms 50] [--top 25]
+  python index_advisor.py redundant      # single-col indexes shadowed by a composite
+  python index_advisor.py reset
+
+Heuristic (ORM-generated SQL, single main table): equality predicates
+first, then the ORDER BY column(s), else one range predicate
+(equality -> sort -> range). A shape is covered when an existing index
+starts with those columns. It's a hint list, not an optimiser – check the
+plan (EXPLAIN) before shipping a migration.
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+log = logging.getLogger("index_advisor")
+
+ADVISOR_DIR = os.getenv(
+    "INDEX_ADVISOR_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "index_advisor"),
+)
+FLUSH_SECONDS = int(os.getenv("INDEX_ADVISOR_FLUSH_SECONDS", "30"))
+
+_shapes: dict[str, dict] = {}
+_lock = threading.Lock()
+_installed = False
+_last_flush = 0.0
+
+
+# ---------------------------------------------------------------------------
+# Normalisation
+# ---------------------------------------------------------------------------
+
+_RE_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_BIND = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\[POSTCOMPILE_\w+\]|\?")
+_RE_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_RE_SPACE = re.compile(r"\s+")
+
+
+def normalize(sql: str) -> str:
+    s = _RE_COMMENT.sub(" ", sql)
+    s = _RE_STRING.sub("?", s)
+    s = _RE_BIND.sub("?", s)
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_IN_LIST.sub("IN (?)", s)
+    return _RE_SPACE.sub(" ", s).strip()
+
+
+# ---------------------------------------------------------------------------
+# Capture
+# ---------------------------------------------------------------------------
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_advisor_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("_advisor_t0")
+    if not stack:
+        return
+    ms = (time.perf_counter() - stack.pop()) * 1000.0
+    head = statement.lstrip()[:6].upper()
+    if head not in ("SELECT", "UPDATE", "DELETE"):
+        return
+    shape = normalize(statement)
+    with _lock:
+        row = _shapes.get(shape)
+        if row is None:
+            row = _shapes[shape] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+        row["calls"] += 1
+        row["total_ms"] += ms
+        row["max_ms"] = max(row["max_ms"], ms)
+    if time.time() - _last_flush >= FLUSH_SECONDS:
+        flush()
+
+
+def install():
+    """Start capturing on every Engine in this process (idempotent)."""
+    global _installed, _last_flush
+    if _installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _before)
+    event.listen(Engine, "after_cursor_execute", _after)
+    atexit.register(flush)
+    _installed = True
+    _last_flush = time.time()
+    log.info("index advisor capturing query shapes -> %s", ADVISOR_DIR)
+
+
+def flush():
+    global _last_flush
+    _last_flush = time.time()
+    with _lock:
+        snap = {k: dict(v) for k, v in _shapes.items()}
+    if not snap:
+        return
+    try:
+        os.makedirs(ADVISOR_DIR, exist_ok=True)
+        path = os.path.join(ADVISOR_DIR, f"shapes-{os.getpid()}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(snap, fh)
+        os.replace(tmp, path)
+    except Exception as e:
+        log.warning("index advisor flush failed: %s", e)
+
+
+def load_shapes(directory: str | None = None) -> dict[str, dict]:
+    """Merge every worker's shapes-*.json."""
+    merged: dict[str, dict] = {}
+    for path in glob.glob(os.path.join(directory or ADVISOR_DIR, "shapes-*.json")):
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except Exception:
+            continue
+        for shape, row in data.items():
+            m = merged.setdefault(shape, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            m["calls"] += row.get("calls", 0)
+            m["total_ms"] += row.get("total_ms", 0.0)
+            m["max_ms"] = max(m["max_ms"], row.get("max_ms", 0.0))
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Shape -> candidate index
+# ---------------------------------------------------------------------------
+
+_RE_MAIN_TABLE = re.compile(r"^(?:SELECT\b.*?\bFROM|UPDATE|DELETE\s+FROM)\s+\"?(\w+)\"?", re.I | re.S)
+_RE_WHERE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|$)", re.I | re.S)
+_RE_ORDER = re.compile(r"\bORDER BY\b(.*?)(?:\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|$)", re.I | re.S)
+_RE_PRED = re.compile(r"(?:\"?(\w+)\"?\.)?\"?(\w+)\"?\s*(=|<=|>=|<>|!=|<|>|\bIN\b|\bIS\b)", re.I)
+_RE_ORDER_COL = re.compile(r"(?:\"?(\w+)\"?\.)?\"?(\w+)\"?(?:\s+(?:ASC|DESC))?", re.I)
+
+
+def candidate(shape: str) -> tuple[str, list[str]] | None:
+    """(table, [columns]) the shape would like an index on, or None."""
+    m = _RE_MAIN_TABLE.search(shape)
+    if not m:
+        return None
+    table = m.group(1)
+
+    eq, rng = [], []
+    w = _RE_WHERE.search(shape)
+    if w:
+        for tbl, col, op in _RE_PRED.findall(w.group(1)):
+            if (tbl and tbl != table) or col.upper() in ("AND", "OR", "NOT", "NULL"):
+                continue
+            op = op.upper()
+            if op in ("=", "IN", "IS"):
+                if col not in eq:
+                    eq.append(col)
+            elif op in ("<", ">", "<=", ">="):
+                if col not in rng:
+                    rng.append(col)
+            # != / <> can't use an index range
+
+    order = []
+    o = _RE_ORDER.search(shape)
+    if o:
+        for tbl, col in _RE_ORDER_COL.findall(o.group(1)):
+            if col.upper() in ("ASC", "DESC", "NULLS", "FIRST", "LAST"):
+                continue
+            if tbl and tbl != table:
+                break  # sort on a joined table – index can't help
+            order.append(col)
+
+    if "id" in eq:
+        return None  # primary-key lookup
+    cols = list(eq)
+    if order and (not rng or rng[0] == order[0]):
+        cols += [c for c in order if c not in cols]
+    elif rng:
+        cols.append(rng[0])
+    if not cols or cols == ["id"]:
+        return None
+    return table, cols
+
+
+def _covered(cols: list[str], eq_len: int, indexes: list[list[str]]) -> bool:
+    """An index covers when it starts with the equality columns (any order), then the rest in order."""
+    for ix in indexes:
+        if len(ix) < len(cols):
+            continue
+        if set(ix[:eq_len]) == set(cols[:eq_len]) and ix[eq_len:len(cols)] == cols[eq_len:]:
+            return True
+    return False
+
+
+def table_indexes(inspector, table: str) -> list[list[str]]:
+    out = []
+    try:
+        pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+        if pk:
+            out.append(list(pk))
+        for ix in inspector.get_indexes(table):
+            out.append([c for c in ix.get("column_names") or [] if c])
+        for uq in inspector.get_unique_constraints(table):
+            out.append(list(uq.get("column_names") or []))
+    except Exception:
+        pass
+    return out
+
+
+def suggest(shapes: dict[str, dict], inspector, min_ms: float = 0.0) -> list[dict]:
+    """Missing indexes, most expensive first."""
+    cache: dict[str, list[list[str]]] = {}
+    found: dict[tuple, dict] = {}
+    for shape, row in shapes.items():
+        if row["total_ms"] < min_ms:
+            continue
+        cand = candidate(shape)
+        if not cand:
+            continue
+        table, cols = cand
+        if table not in cache:
+            cache[table] = table_indexes(inspector, table)
+        eq_len = len(_eq_cols(shape, table))
+        if _covered(cols, min(eq_len, len(cols)), cache[table]):
+            continue
+        key = (table, tuple(cols))
+        s = found.setdefault(key, {"table": table, "columns": cols, "calls": 0,
+                                   "total_ms": 0.0, "max_ms": 0.0, "example": shape})
+        s["calls"] += row["calls"]
+        s["total_ms"] += row["total_ms"]
+        s["max_ms"] = max(s["max_ms"], row["max_ms"])
+    out = sorted(found.values(), key=lambda s: s["total_ms"], reverse=True)
+    for s in out:
+        s["ddl"] = f"CREATE INDEX ix_{s['table']}_{'_'.join(s['columns'])} ON {s['table']} ({', '.join(s['columns'])})"
+    return out
+
+
+def _eq_cols(shape: str, table: str) -> list[str]:
+    w = _RE_WHERE.search(shape)
+    if not w:
+        return []
+    out = []
+    for tbl, col, op in _RE_PRED.findall(w.group(1)):
+        if (not tbl or tbl == table) and op.upper() in ("=", "IN", "IS") and col not in out:
+            out.append(col)
+    return out
+
+
+def _partial(ix: dict) -> bool:
+    return any(k.endswith("_where") for k in (ix.get("dialect_options") or {}))
+
+
+def redundant(inspector) -> list[dict]:
+    """Non-unique indexes whose columns are a leading prefix of a wider index."""
+    out = []
+    for table in inspector.get_table_names():
+        try:
+            idx = inspector.get_indexes(table)
+        except Exception:
+            continue
+        for a in idx:
+            if a.get("unique") or _partial(a):
+                continue
+            ac = a.get("column_names") or []
+            for b in idx:
+                bc = b.get("column_names") or []
+                if b is not a and not _partial(b) and len(bc) > len(ac) and bc[:len(ac)] == ac:
+                    out.append({"table": table, "index": a["name"], "shadowed_by": b["name"]})
+                    break
+    return out
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="Index advisor: report / redundant / reset")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("report")
+    rp.add_argument("--min-ms", type=float, default=0.0, help="ignore shapes cheaper than this in total")
+    rp.add_argument("--top", type=int, default=25)
+    rp.add_argument("--dir", default=None, help=f"shape files (default {ADVISOR_DIR})")
+    sub.add_parser("redundant")
+    sub.add_parser("reset")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "reset":
+        for path in glob.glob(os.path.join(ADVISOR_DIR, "shapes-*.json")):
+            os.remove(path)
+        print("🧹 shape files removed")
+        return 0
+
+    from sqlalchemy import inspect as sqla_inspect
+    from app import app
+    from models import db
+
+    with app.app_context():
+        insp = sqla_inspect(db.engine)
+        if args.cmd == "redundant":
+            for r in redundant(insp):
+                print(f"{r['table']:<24} {r['index']:<44} shadowed by {r['shadowed_by']}")
+            return 0
+
+        shapes = load_shapes(args.dir)
+        if not shapes:
+            print(f"no shapes captured in {args.dir or ADVISOR_DIR} – run with INDEX_ADVISOR=1 first")
+            return 1
+        total = sum(r["total_ms"] for r in shapes.values())
+        print(f"{len(shapes)} shapes, {sum(r['calls'] for r in shapes.values())} calls, {total:.0f} ms total\n")
+
+        print("Top shapes by total time:")
+        for shape, r in sorted(shapes.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)[:args.top]:
+            print(f"  {r['total_ms']:9.1f} ms  {r['calls']:6d}x  max {r['max_ms']:7.1f}  {shape[:140]}")
+
+        found = suggest(shapes, insp, min_ms=args.min_ms)
+        print("\nMissing indexes:" if found else "\nNo missing indexes for the captured shapes. ✅")
+        for s in found[:args.top]:
+            print(f"  {s['total_ms']:9.1f} ms  {s['calls']:6d}x  {s['ddl']};")
+            print(f"      e.g. {s['example'][:160]}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(_cli())
@@ -0,0 +1,163 @@
+# keyset.py
+"""
+Keyset (seek) pagination on (created_at, id) with opaque cursors.
+
+OFFSET n makes the database walk and throw away n rows, so page 500 costs
+500x page 1. Seeking from the last row seen – WHERE (created_at, id) < (:c, :i)
+ORDER BY created_at DESC, id DESC LIMIT n – costs the same on every page and
+does not skip/duplicate rows when new ones arrive between clicks.
+
+    page = seek(DepositRequest.query.filter_by(status="PENDING"),
+                DepositRequest, cursor=request.args.get("cursor"), limit=50)
+    page.rows, page.next_cursor, page.prev_cursor
+
+Cursors are short url-safe strings (they also fit in Telegram's 64-byte
+callback_data). A cursor that does not decode is treated as "first page".
+
+Exact totals are replaced by cached_count(): a COUNT(*) shared per process
+for COUNT_TTL seconds, or the planner's estimate on Postgres for
+unfiltered tables (estimated_count).
+"""
+
+import base64
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, tuple_
+
+DEFAULT_LIMIT = 50
+COUNT_TTL = int(os.getenv("KEYSET_COUNT_TTL", "60"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class Page:
+    rows: list = field(default_factory=list)
+    next_cursor: str | None = None   # older rows (the "Next" button)
+    prev_cursor: str | None = None   # newer rows; None on the first page
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+# -------------------- cursors --------------------
+
+def encode_cursor(created_at: datetime | None, row_id: int, back: bool = False) -> str:
+    micros = 0
+    if created_at:
+        # integer maths: a float round-trip can be a microsecond off
+        delta = created_at.replace(tzinfo=None) - _EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    raw = f"{'b' if back else 'f'}{micros:x}.{int(row_id):x}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str | None):
+    """(created_at, id, back) or None for a missing/garbled cursor."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        direction, rest = raw[0], raw[1:]
+        micros, row_id = rest.split(".", 1)
+        if direction not in ("f", "b"):
+            return None
+        ts = _EPOCH + timedelta(microseconds=int(micros, 16))
+        return ts, int(row_id, 16), direction == "b"
+    except Exception:
+        return None
+
+
+# -------------------- seek --------------------
+
+def seek(query, model, cursor: str | None = None, limit: int = DEFAULT_LIMIT,
+         desc: bool = True, created_col=None) -> Page:
+    """
+    One page of `query` ordered by (created_at, id), newest first when desc.
+
+    `query` must not carry its own ORDER BY / LIMIT. Fetches limit+1 rows to
+    know whether another page exists – no COUNT.
+    """
+    created = created_col if created_col is not None else model.created_at
+    pk = model.id
+    key = tuple_(created, pk)
+    limit = max(1, int(limit))
+
+    cur = decode_cursor(cursor)
+    back = bool(cur and cur[2])
+
+    # Walking back towards page 1 flips both the comparison and the order,
+    # then the rows are reversed into display order.
+    forward_desc = desc != back
+    q = query
+    if cur:
+        boundary = tuple_(cur[0], cur[1])
+        q = q.filter(key < boundary if forward_desc else key > boundary)
+    if forward_desc:
+        q = q.order_by(created.desc(), pk.desc())
+    else:
+        q = q.order_by(created.asc(), pk.asc())
+
+    rows = q.limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if back:
+        rows.reverse()
+
+    if not rows:
+        return Page(rows=[])
+
+    first, last = rows[0], rows[-1]
+    if back:
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, cur is not None
+
+    return Page(
+        rows=rows,
+        next_cursor=encode_cursor(getattr(last, created.key), last.id) if has_next else None,
+        prev_cursor=encode_cursor(getattr(first, created.key), first.id, back=True) if has_prev else None,
+    )
+
+
+# -------------------- counts --------------------
+
+_count_cache: dict[str, tuple[float, int]] = {}
+_count_lock = threading.Lock()
+
+
+def cached_count(key: str, query, ttl: int = COUNT_TTL) -> int:
+    """COUNT(*) of `query`, reused per process for `ttl` seconds under `key`."""
+    now = time.monotonic()
+    hit = _count_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    n = int(query.order_by(None).count())
+    with _count_lock:
+        _count_cache[key] = (now + ttl, n)
+    return n
+
+
+def estimated_count(session, table: str) -> int | None:
+    """Planner row estimate for a whole table (Postgres only), else None."""
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        n = session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+            {"t": table},
+        ).scalar()
+    except Exception:
+        session.rollback()
+        return None
+    # -1 / 0 until the table has been ANALYZEd
+    return int(n) if n and n > 0 else None
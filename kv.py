@@ -0,0 +1,202 @@
+# kv.py
+"""
+kv_store access for every blueprint (promo / trending text, per-game
+backend URLs, the support inbox, ...).
+
+  get(key)                  one value (None when missing)
+  get_many(keys)            {key: value} – cache misses in one SELECT … IN
+  first(*keys, default=)    first non-empty value among aliases
+  put(key, value)           upsert + commit + invalidate
+  put_many({key: value})    same, one commit and one broadcast
+
+Reads go through a per-process LRU (KV_CACHE_SIZE entries, each kept
+KV_CACHE_TTL_SECONDS; missing keys are cached too, so an unset promo
+alias costs nothing on the next lobby view). Writes publish the changed
+keys on the Redis channel "kv:invalidate"; every process runs one daemon
+thread subscribed to it that drops those keys. Without Redis the TTL
+alone bounds staleness.
+
+The table is created by migration 0001_baseline – nothing here issues DDL.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import column, select, table, text
+
+log = logging.getLogger("kv")
+
+CACHE_TTL_SECONDS = float(os.getenv("KV_CACHE_TTL_SECONDS", "30"))
+CACHE_SIZE = int(os.getenv("KV_CACHE_SIZE", "2048"))
+INVALIDATE = os.getenv("KV_INVALIDATE", "1") != "0"
+CHANNEL = "kv:invalidate"
+
+_cache: "OrderedDict[str, tuple[float, str | None]]" = OrderedDict()
+_lock = threading.Lock()
+_listener = {"pid": None}
+
+_kv = table("kv_store", column("key"), column("value"))  # quoted per dialect (`key` on MySQL)
+_UPSERT = {
+    "postgresql": "INSERT INTO kv_store(key,value) VALUES(:k,:v) "
+                  "ON CONFLICT (key) DO UPDATE SET value=EXCLUDED.value",
+    "mysql": "INSERT INTO kv_store(`key`,`value`) VALUES(:k,:v) "
+             "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)",
+    "sqlite": "INSERT INTO kv_store(key,value) VALUES(:k,:v) "
+              "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+}
+_UPSERT["mariadb"] = _UPSERT["mysql"]
+
+
+def _redis():
+    from request_progress import redis_client  # same Redis as the Celery broker
+    return redis_client
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def _cached(keys) -> tuple[dict, list]:
+    now = time.monotonic()
+    hits, misses = {}, []
+    with _lock:
+        for k in keys:
+            entry = _cache.get(k)
+            if entry and entry[0] > now:
+                _cache.move_to_end(k)
+                hits[k] = entry[1]
+            else:
+                misses.append(k)
+    return hits, misses
+
+
+def _store(values: dict):
+    expires = time.monotonic() + CACHE_TTL_SECONDS
+    with _lock:
+        for k, v in values.items():
+            _cache[k] = (expires, v)
+            _cache.move_to_end(k)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def evict(*keys):
+    """Drop keys from this process's cache (all of them when called without keys)."""
+    with _lock:
+        if not keys:
+            _cache.clear()
+        for k in keys:
+            _cache.pop(k, None)
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def get_many(keys) -> dict:
+    """{key: value or None} for every key; cache misses are fetched in one query."""
+    from models import db
+    keys = list(dict.fromkeys(keys))
+    _ensure_listener()
+    out, misses = _cached(keys)
+    if misses:
+        try:
+            found = dict(db.session.execute(select(_kv.c.key, _kv.c.value).where(_kv.c.key.in_(misses))).all())
+        except Exception:
+            db.session.rollback()
+            return {**out, **{k: None for k in misses}}  # not cached: retry next time
+        fetched = {k: found.get(k) for k in misses}
+        _store(fetched)
+        out.update(fetched)
+    return out
+
+
+def get(key: str, default=None):
+    v = get_many([key])[key]
+    return default if v is None else v
+
+
+def first(*keys, default=None):
+    """First value among `keys` that is neither missing nor empty."""
+    values = get_many(keys)
+    for k in keys:
+        if values.get(k) not in (None, ""):
+            return values[k]
+    return default
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+def put_many(values: dict) -> bool:
+    """Upsert and commit (the caller's session), then invalidate every process. False on DB error."""
+    from models import db
+    if not values:
+        return True
+    rows = [{"k": k, "v": "" if v is None else str(v)} for k, v in values.items()]
+    try:
+        dialect = db.session.get_bind().dialect.name
+        db.session.execute(text(_UPSERT.get(dialect, _UPSERT["sqlite"])), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        log.exception("kv: write of %s failed", list(values))
+        return False
+    _broadcast(list(values))
+    return True
+
+
+def put(key: str, value) -> bool:
+    return put_many({key: value})
+
+
+def _broadcast(keys: list):
+    evict(*keys)
+    if not INVALIDATE:
+        return
+    try:
+        _redis().publish(CHANNEL, json.dumps(keys))
+    except Exception as e:
+        log.debug("kv: invalidation not published (%s) – peers expire in %ss", e, CACHE_TTL_SECONDS)
+
+
+# ---------------------------------------------------------------------------
+# Cross-process invalidation
+# ---------------------------------------------------------------------------
+
+def _ensure_listener():
+    # per pid: a forked worker does not inherit the parent's thread
+    if not INVALIDATE or _listener["pid"] == os.getpid():
+        return
+    with _lock:
+        if _listener["pid"] == os.getpid():
+            return
+        _listener["pid"] = os.getpid()
+    threading.Thread(target=_listen, name="kv-invalidate", daemon=True).start()
+
+
+def _listen():
+    backoff = 1.0
+    while True:
+        try:
+            pubsub = _redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            evict()  # anything published while we were disconnected is lost
+            backoff = 1.0
+            for msg in pubsub.listen():
+                data = msg.get("data")
+                if msg.get("type") != "message" or not data:
+                    continue
+                try:
+                    evict(*json.loads(data))
+                except (TypeError, ValueError):
+                    evict()
+        except Exception as e:
+            log.debug("kv: invalidation listener down (%s), retrying in %.0fs", e, backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
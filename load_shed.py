@@ -0,0 +1,308 @@
+# load_shed.py
+"""
+Admission control driven by connection-pool saturation.
+
+Every pool checkout is sampled (db_engine wires SampledQueuePool into the
+engine):
+
+  utilization   checked-out connections / (pool_size + max_overflow)
+  wait          time spent waiting for the connection, against LOAD_SHED_WAIT_MS
+  timeouts      a pool TimeoutError counts as fully saturated
+
+Both feed an EWMA that also decays towards 0 with time constant
+LOAD_SHED_WINDOW_SECONDS, so a worker that goes quiet cools down by itself.
+The worker's score is max(utilization, wait).
+
+Workers share their score through the Redis hash `loadshed:scores`
+(host:pid -> "score:ts"), at most every LOAD_SHED_PUBLISH_SECONDS. A worker
+sheds when its own score, or the mean of its fresh peers, crosses
+LOAD_SHED_ENTER, and stops below LOAD_SHED_EXIT (hysteresis, so the banner
+doesn't flicker). Without Redis each worker decides on its own score.
+
+Only views marked @low_priority are shed – polling endpoints, chat history,
+the lobby for anonymous visitors. They get a 503 with Retry-After (plus
+jitter) before the view touches the database. Everything else, notably
+deposit and withdraw submission, always goes through.
+
+    @player_bp.get("/deposit/<int:dep_id>/status.json")
+    @login_required
+    @low_priority
+    def deposit_status_json(dep_id): ...
+
+    @app.route("/")
+    @low_priority(anonymous_only=True)
+    def index(): ...
+
+CLI:
+  python load_shed.py status        # every worker's published score
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import socket
+import threading
+import time
+
+from flask import jsonify, make_response, request, session as flask_session
+from sqlalchemy.exc import TimeoutError as SATimeoutError
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger("load_shed")
+
+ENABLED = os.getenv("LOAD_SHED", "1").strip() != "0"
+WINDOW = float(os.getenv("LOAD_SHED_WINDOW_SECONDS", "10"))
+WAIT_TARGET_MS = float(os.getenv("LOAD_SHED_WAIT_MS", "200"))
+ENTER = float(os.getenv("LOAD_SHED_ENTER", "0.9"))
+EXIT = float(os.getenv("LOAD_SHED_EXIT", "0.6"))
+RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "5"))
+PUBLISH_SECONDS = float(os.getenv("LOAD_SHED_PUBLISH_SECONDS", "1"))
+STALE_SECONDS = max(10.0, 5 * PUBLISH_SECONDS)
+
+REDIS_KEY = "loadshed:scores"
+ALPHA = 0.2          # weight of one sample in the EWMA
+WAIT_CAP = 4.0       # one very slow checkout can't pin the score for minutes
+TIMEOUT_SCORE = 2.0  # a pool timeout: saturated, cools below EXIT in ~WINDOW * ln(2/EXIT)
+
+
+
+def _member() -> str:
+    # per call, not at import: gunicorn --preload forks workers after import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------------------------------------------------------
+# Local score
+# ---------------------------------------------------------------------------
+
+class _Decaying:
+    """EWMA of samples that also decays towards 0 while no samples arrive."""
+
+    def __init__(self):
+        self.value = 0.0
+        self.t = time.monotonic()
+
+    def _decay(self, now: float):
+        self.value *= math.exp(-(now - self.t) / WINDOW)
+        self.t = now
+
+    def add(self, sample: float):
+        now = time.monotonic()
+        self._decay(now)
+        self.value += ALPHA * (sample - self.value)
+
+    def bump(self, floor: float):
+        now = time.monotonic()
+        self._decay(now)
+        self.value = max(self.value, floor)
+
+    def read(self) -> float:
+        self._decay(time.monotonic())
+        return self.value
+
+
+_lock = threading.Lock()
+_util = _Decaying()
+_wait = _Decaying()
+_state = {"shared": 0.0, "published_at": 0.0, "saturated": False, "shed": 0, "timeouts": 0}
+_publishing = threading.Lock()
+
+
+def record_checkout(wait_seconds: float, checked_out: int, capacity: int):
+    with _lock:
+        _util.add(min(1.0, checked_out / capacity) if capacity > 0 else 0.0)
+        _wait.add(min(WAIT_CAP, wait_seconds * 1000.0 / WAIT_TARGET_MS))
+
+
+def record_timeout():
+    with _lock:
+        _wait.bump(TIMEOUT_SCORE)
+        _state["timeouts"] += 1
+
+
+def local_score() -> float:
+    with _lock:
+        return max(_util.read(), _wait.read())
+
+
+class SampledQueuePool(QueuePool):
+    """QueuePool that reports checkout waits, utilization and timeouts to load_shed."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except SATimeoutError:
+            record_timeout()
+            raise
+        overflow = max(self._max_overflow, 0)
+        record_checkout(time.perf_counter() - t0, self.checkedout(), self.size() + overflow)
+        return conn
+
+
+# ---------------------------------------------------------------------------
+# Shared score (Redis)
+# ---------------------------------------------------------------------------
+
+def _redis():
+    from request_progress import redis_client  # same Redis as the Celery broker
+    return redis_client
+
+
+def _publish(local: float):
+    """Write our score, read the peers' – best effort, one round-trip."""
+    now = time.time()
+    me = _member()
+    try:
+        pipe = _redis().pipeline()
+        pipe.hset(REDIS_KEY, me, f"{local:.3f}:{now:.0f}")
+        pipe.hgetall(REDIS_KEY)
+        pipe.expire(REDIS_KEY, int(STALE_SECONDS * 6))
+        _, entries, _ = pipe.execute()
+    except Exception as e:
+        log.debug("load_shed: redis unavailable (%s) – local score only", e)
+        _state["shared"] = 0.0
+        return
+
+    peers, stale = [], []
+    for member, raw in (entries or {}).items():
+        member = member.decode() if isinstance(member, bytes) else member
+        raw = raw.decode() if isinstance(raw, bytes) else raw
+        try:
+            score, ts = raw.split(":", 1)
+            score, ts = float(score), float(ts)
+        except ValueError:
+            stale.append(member)
+            continue
+        if now - ts > STALE_SECONDS:
+            stale.append(member)
+        elif member != me:
+            peers.append(score)
+    if stale:
+        try:
+            _redis().hdel(REDIS_KEY, *stale)
+        except Exception:
+            pass
+    _state["shared"] = sum(peers) / len(peers) if peers else 0.0
+
+
+def score() -> float:
+    local = local_score()
+    now = time.monotonic()
+    if now - _state["published_at"] >= PUBLISH_SECONDS and _publishing.acquire(blocking=False):
+        try:
+            _state["published_at"] = now
+            _publish(local)
+        finally:
+            _publishing.release()
+    return max(local, _state["shared"])
+
+
+def saturated() -> bool:
+    if not ENABLED:
+        return False
+    s = score()
+    with _lock:
+        if _state["saturated"] and s < EXIT:
+            _state["saturated"] = False
+            log.info("load_shed: cleared (score %.2f, %d requests shed)", s, _state["shed"])
+        elif not _state["saturated"] and s >= ENTER:
+            _state["saturated"] = True
+            log.warning("load_shed: saturated (score %.2f) – shedding low-priority routes", s)
+        return _state["saturated"]
+
+
+# ---------------------------------------------------------------------------
+# Flask
+# ---------------------------------------------------------------------------
+
+def low_priority(view=None, *, anonymous_only: bool = False):
+    """Mark a view as sheddable while the database is saturated."""
+    def mark(fn):
+        fn._load_shed = "anonymous" if anonymous_only else "always"
+        return fn
+    return mark(view) if view is not None else mark
+
+
+def retry_after() -> int:
+    return RETRY_AFTER + random.randint(0, RETRY_AFTER)
+
+
+def busy_response(retry: int | None = None):
+    retry = retry or retry_after()
+    # page navigations ask for text/html explicitly; fetch()/XHR polling sends */*
+    wants_json = request.path.endswith(".json") or "text/html" not in request.headers.get("Accept", "")
+    if wants_json:
+        resp = jsonify({"ok": False, "error": "busy", "retry_after": retry})
+    else:
+        # no template: render_template would run inject_globals (DB queries).
+        # Only GETs reload themselves – re-sending a form is the player's call.
+        refresh = f"<meta http-equiv='refresh' content='{retry}'>" if request.method == "GET" else ""
+        hint = f"this page will retry in {retry} seconds" if refresh else "please try again in a few seconds"
+        resp = (
+            f"<!doctype html><meta charset='utf-8'>{refresh}"
+            "<title>Casino is busy</title>"
+            "<div style='font-family:sans-serif;max-width:520px;margin:15vh auto;text-align:center'>"
+            f"<h2>Casino is busy</h2><p>Lots of players right now – {hint}.</p></div>"
+        )
+    resp = make_response(resp, 503)
+    resp.headers["Retry-After"] = str(retry)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+def init_load_shed(app):
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _shed_low_priority():
+        view = app.view_functions.get(request.endpoint)
+        mode = getattr(view, "_load_shed", None)
+        if mode is None or not saturated():
+            return None
+        # Flask-Login's session key: no user_loader query while we're saturated
+        if mode == "anonymous" and flask_session.get("_user_id"):
+            return None
+        with _lock:
+            _state["shed"] += 1
+        return busy_response()
+
+
+def status() -> dict:
+    return {
+        "member": _member(),
+        "enabled": ENABLED,
+        "local": round(local_score(), 3),
+        "shared": round(_state["shared"], 3),
+        "saturated": _state["saturated"],
+        "shed": _state["shed"],
+        "timeouts": _state["timeouts"],
+    }
+
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="load shedding: published worker scores")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status")
+    ap.parse_args(argv)
+
+    now = time.time()
+    entries = _redis().hgetall(REDIS_KEY) or {}
+    if not entries:
+        print("no worker has published a score (idle, or LOAD_SHED=0)")
+        return 0
+    for member, raw in sorted(entries.items()):
+        member = member.decode() if isinstance(member, bytes) else member
+        raw = raw.decode() if isinstance(raw, bytes) else raw
+        score, _, ts = raw.partition(":")
+        age = now - float(ts or 0)
+        flag = "stale" if age > STALE_SECONDS else ("SATURATED" if float(score) >= ENTER else "ok")
+        print(f"{member:<32} {float(score):5.2f}  {age:5.0f}s ago  {flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
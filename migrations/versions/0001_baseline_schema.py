@@ -0,0 +1,586 @@
+"""baseline schema
+
+Everything create_app() used to build at boot with db.create_all() plus the
+kv_store side table. Tables that already exist are left alone, so existing
+databases can simply run `flask db upgrade` (their missing legacy columns
+are added by 0002).
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "dead_letter_jobs" not in existing:
+        op.create_table('dead_letter_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=False),
+        sa.Column('vendor', sa.String(length=40), nullable=True),
+        sa.Column('error_class', sa.String(length=20), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=True),
+        sa.Column('replay_count', sa.Integer(), nullable=False),
+        sa.Column('last_replay_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('replayed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('dead_letter_jobs', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_dead_letter_jobs_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dead_letter_jobs_error_class'), ['error_class'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dead_letter_jobs_kind'), ['kind'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dead_letter_jobs_ref_id'), ['ref_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dead_letter_jobs_status'), ['status'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dead_letter_jobs_vendor'), ['vendor'], unique=False)
+
+    if "games" not in existing:
+        op.create_table('games',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('description', sa.String(length=300), nullable=True),
+        sa.Column('icon_url', sa.String(length=500), nullable=True),
+        sa.Column('download_url', sa.String(length=500), nullable=False),
+        sa.Column('backend_url', sa.String(length=500), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('games', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_games_is_active'), ['is_active'], unique=False)
+
+    if "payment_settings" not in existing:
+        op.create_table('payment_settings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('crypto_wallet_text', sa.String(length=255), nullable=True),
+        sa.Column('crypto_qr_url', sa.String(length=500), nullable=True),
+        sa.Column('chime_handle', sa.String(length=255), nullable=True),
+        sa.Column('chime_qr_url', sa.String(length=500), nullable=True),
+        sa.Column('crypto_pay_url', sa.String(length=500), nullable=True),
+        sa.Column('chime_pay_url', sa.String(length=500), nullable=True),
+        sa.Column('cashapp_handle', sa.String(length=255), nullable=True),
+        sa.Column('cashapp_qr_url', sa.String(length=500), nullable=True),
+        sa.Column('cashapp_pay_url', sa.String(length=500), nullable=True),
+        sa.Column('withdraw_crypto_address', sa.String(length=255), nullable=True),
+        sa.Column('withdraw_crypto_qr_url', sa.String(length=500), nullable=True),
+        sa.Column('withdraw_chime_handle', sa.String(length=255), nullable=True),
+        sa.Column('withdraw_chime_qr_url', sa.String(length=500), nullable=True),
+        sa.Column('bonus_percent', sa.Integer(), nullable=True),
+        sa.Column('min_redeem', sa.Integer(), nullable=True),
+        sa.Column('max_redeem', sa.Integer(), nullable=True),
+        sa.Column('whatsapp_url', sa.String(length=500), nullable=True),
+        sa.Column('telegram_url', sa.String(length=500), nullable=True),
+        sa.Column('facebook_url', sa.String(length=500), nullable=True),
+        sa.Column('instagram_url', sa.String(length=500), nullable=True),
+        sa.Column('promo_bonus_line', sa.String(length=300), nullable=True),
+        sa.Column('promo_referral_line', sa.String(length=300), nullable=True),
+        sa.Column('promo_service_line', sa.String(length=300), nullable=True),
+        sa.Column('promo_trust_line', sa.String(length=300), nullable=True),
+        sa.Column('promo_text', sa.String(length=200), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if "users" not in existing:
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('mobile', sa.String(length=24), nullable=True),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('email_verified', sa.Boolean(), nullable=True),
+        sa.Column('email_verified_at', sa.DateTime(), nullable=True),
+        sa.Column('promo_seen', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('telegram_id', sa.BigInteger(), nullable=True),
+        sa.Column('telegram_username', sa.String(length=64), nullable=True),
+        sa.Column('telegram_firstname', sa.String(length=120), nullable=True),
+        sa.Column('telegram_lastname', sa.String(length=120), nullable=True),
+        sa.Column('deposit_count', sa.Integer(), nullable=True),
+        sa.Column('signup_bonus_claimed', sa.Boolean(), nullable=True),
+        sa.Column('signup_bonus_amount', sa.Float(), nullable=True),
+        sa.Column('signup_bonus_claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('regular_bonus_last_claimed', sa.DateTime(), nullable=True),
+        sa.Column('available_bonus', sa.Float(), nullable=True),
+        sa.Column('bonus_eligible', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_users_bonus_eligible'), ['bonus_eligible'], unique=False)
+            batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+            batch_op.create_index(batch_op.f('ix_users_email_verified'), ['email_verified'], unique=False)
+            batch_op.create_index(batch_op.f('ix_users_mobile'), ['mobile'], unique=False)
+            batch_op.create_index(batch_op.f('ix_users_promo_seen'), ['promo_seen'], unique=False)
+            batch_op.create_index(batch_op.f('ix_users_telegram_id'), ['telegram_id'], unique=True)
+            batch_op.create_index(batch_op.f('ix_users_telegram_username'), ['telegram_username'], unique=False)
+
+    if "bonus_records" not in existing:
+        op.create_table('bonus_records',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('bonus_type', sa.String(length=20), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('wagering_completed', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['player_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if "bonus_settings" not in existing:
+        op.create_table('bonus_settings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('signup_active', sa.Boolean(), nullable=True),
+        sa.Column('signup_percentage', sa.Integer(), nullable=True),
+        sa.Column('signup_max_amount', sa.Float(), nullable=True),
+        sa.Column('signup_min_deposit', sa.Float(), nullable=True),
+        sa.Column('signup_wagering', sa.Integer(), nullable=True),
+        sa.Column('regular_active', sa.Boolean(), nullable=True),
+        sa.Column('regular_percentage', sa.Integer(), nullable=True),
+        sa.Column('regular_max_amount', sa.Float(), nullable=True),
+        sa.Column('regular_min_deposit', sa.Float(), nullable=True),
+        sa.Column('regular_wagering', sa.Integer(), nullable=True),
+        sa.Column('updated_by', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['updated_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if "chat_messages" not in existing:
+        op.create_table('chat_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('room', sa.String(length=64), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('user_role', sa.String(length=20), nullable=True),
+        sa.Column('user_name', sa.String(length=120), nullable=True),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_chat_messages_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_chat_messages_room'), ['room'], unique=False)
+            batch_op.create_index(batch_op.f('ix_chat_messages_user_id'), ['user_id'], unique=False)
+
+    if "deposit_requests" not in existing:
+        op.create_table('deposit_requests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('game_id', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('method', sa.String(length=20), nullable=False),
+        sa.Column('proof_url', sa.String(length=500), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('note', sa.String(length=300), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.Column('loaded_at', sa.DateTime(), nullable=True),
+        sa.Column('loaded_by', sa.Integer(), nullable=True),
+        sa.Column('credited_amount', sa.Float(), nullable=True),
+        sa.Column('bonus_percentage', sa.Float(), nullable=True),
+        sa.Column('bonus_amount', sa.Float(), nullable=True),
+        sa.Column('total_credited', sa.Float(), nullable=True),
+        sa.Column('provider', sa.String(length=32), nullable=True),
+        sa.Column('provider_order_id', sa.String(length=128), nullable=True),
+        sa.Column('pay_url', sa.Text(), nullable=True),
+        sa.Column('backend_url', sa.Text(), nullable=True),
+        sa.Column('meta', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.ForeignKeyConstraint(['loaded_by'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('deposit_requests', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_deposit_requests_game_id'), ['game_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_deposit_requests_method'), ['method'], unique=False)
+            batch_op.create_index(batch_op.f('ix_deposit_requests_status'), ['status'], unique=False)
+            batch_op.create_index(batch_op.f('ix_deposit_requests_user_id'), ['user_id'], unique=False)
+
+    if "dm_threads" not in existing:
+        op.create_table('dm_threads',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('last_msg_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['employee_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['player_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('dm_threads', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_dm_threads_employee_id'), ['employee_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dm_threads_last_msg_at'), ['last_msg_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dm_threads_player_id'), ['player_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dm_threads_status'), ['status'], unique=False)
+
+    if "email_tokens" not in existing:
+        op.create_table('email_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=64), nullable=False),
+        sa.Column('purpose', sa.String(length=16), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('email_tokens', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_email_tokens_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_email_tokens_expires_at'), ['expires_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_email_tokens_purpose'), ['purpose'], unique=False)
+            batch_op.create_index(batch_op.f('ix_email_tokens_token'), ['token'], unique=True)
+            batch_op.create_index(batch_op.f('ix_email_tokens_user_id'), ['user_id'], unique=False)
+
+    if "external_accounts" not in existing:
+        op.create_table('external_accounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('vendor', sa.String(length=32), nullable=False),
+        sa.Column('vendor_user_id', sa.String(length=64), nullable=True),
+        sa.Column('vendor_username', sa.String(length=120), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('vendor', 'vendor_user_id', name='uq_vendor_and_vendor_user_id')
+        )
+        with op.batch_alter_table('external_accounts', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_external_accounts_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_external_accounts_user_id'), ['user_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_external_accounts_vendor'), ['vendor'], unique=False)
+            batch_op.create_index(batch_op.f('ix_external_accounts_vendor_user_id'), ['vendor_user_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_external_accounts_vendor_username'), ['vendor_username'], unique=False)
+
+    if "game_account_requests" not in existing:
+        op.create_table('game_account_requests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('game_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('retry_count', sa.Integer(), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=True),
+        sa.Column('note', sa.String(length=300), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('handled_by', sa.Integer(), nullable=True),
+        sa.Column('approved_by_id', sa.Integer(), nullable=True),
+        sa.Column('approved_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['approved_by_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['employee_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.ForeignKeyConstraint(['handled_by'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('game_account_requests', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_game_account_requests_approved_by_id'), ['approved_by_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_account_requests_employee_id'), ['employee_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_account_requests_game_id'), ['game_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_account_requests_handled_by'), ['handled_by'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_account_requests_status'), ['status'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_account_requests_user_id'), ['user_id'], unique=False)
+
+    if "notifications" not in existing:
+        op.create_table('notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('message', sa.String(length=300), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('notifications', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_notifications_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_notifications_is_read'), ['is_read'], unique=False)
+            batch_op.create_index(batch_op.f('ix_notifications_user_id'), ['user_id'], unique=False)
+
+    if "password_reset_tokens" not in existing:
+        op.create_table('password_reset_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('used_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_password_reset_tokens_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_password_reset_tokens_expires_at'), ['expires_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_password_reset_tokens_token'), ['token'], unique=True)
+            batch_op.create_index(batch_op.f('ix_password_reset_tokens_user_id'), ['user_id'], unique=False)
+
+    if "player_balances" not in existing:
+        op.create_table('player_balances',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('balance', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('player_balances', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_player_balances_user_id'), ['user_id'], unique=True)
+
+    if "ready_accounts" not in existing:
+        op.create_table('ready_accounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('game_id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=120), nullable=False),
+        sa.Column('password', sa.String(length=120), nullable=False),
+        sa.Column('note', sa.String(length=300), nullable=True),
+        sa.Column('is_claimed', sa.Boolean(), nullable=True),
+        sa.Column('claimed_by', sa.Integer(), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('added_by_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['added_by_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['claimed_by'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('game_id', 'username', name='uq_ready_accounts_game_username')
+        )
+        with op.batch_alter_table('ready_accounts', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_ready_accounts_added_by_id'), ['added_by_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_ready_accounts_claimed_by'), ['claimed_by'], unique=False)
+            batch_op.create_index(batch_op.f('ix_ready_accounts_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_ready_accounts_game_id'), ['game_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_ready_accounts_is_claimed'), ['is_claimed'], unique=False)
+
+    if "referral_codes" not in existing:
+        op.create_table('referral_codes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=16), nullable=False),
+        sa.Column('clicks', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('referral_codes', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_referral_codes_code'), ['code'], unique=True)
+            batch_op.create_index(batch_op.f('ix_referral_codes_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_referral_codes_user_id'), ['user_id'], unique=True)
+
+    if "withdraw_requests" not in existing:
+        op.create_table('withdraw_requests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('game_id', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Integer(), nullable=True),
+        sa.Column('keep_amount', sa.Integer(), nullable=True),
+        sa.Column('tip_amount', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('method', sa.String(length=20), nullable=True),
+        sa.Column('address', sa.String(length=255), nullable=True),
+        sa.Column('note', sa.String(length=300), nullable=True),
+        sa.Column('acted_by', sa.Integer(), nullable=True),
+        sa.Column('acted_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['acted_by'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('withdraw_requests', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_withdraw_requests_game_id'), ['game_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_withdraw_requests_status'), ['status'], unique=False)
+            batch_op.create_index(batch_op.f('ix_withdraw_requests_user_id'), ['user_id'], unique=False)
+
+    if "dm_messages" not in existing:
+        op.create_table('dm_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('thread_id', sa.Integer(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('sender_role', sa.String(length=20), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('source', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['thread_id'], ['dm_threads.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('dm_messages', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_dm_messages_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dm_messages_sender_id'), ['sender_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_dm_messages_thread_id'), ['thread_id'], unique=False)
+
+    if "game_accounts" not in existing:
+        op.create_table('game_accounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('request_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('game_id', sa.Integer(), nullable=False),
+        sa.Column('account_username', sa.String(length=120), nullable=False),
+        sa.Column('account_password', sa.String(length=120), nullable=False),
+        sa.Column('extra', sa.String(length=300), nullable=True),
+        sa.Column('issued_by_id', sa.Integer(), nullable=True),
+        sa.Column('issued_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.ForeignKeyConstraint(['issued_by_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['request_id'], ['game_account_requests.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('game_accounts', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_game_accounts_game_id'), ['game_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_accounts_issued_by_id'), ['issued_by_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_accounts_request_id'), ['request_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_game_accounts_user_id'), ['user_id'], unique=False)
+
+    # key/value settings table used by app.py / blueprints (_kv_get/_kv_set)
+    if "kv_store" not in existing:
+        op.create_table('kv_store',
+        sa.Column('key', sa.String(length=191), nullable=False),
+        sa.Column('value', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+        )
+
+
+def downgrade():
+    op.drop_table('kv_store')
+    with op.batch_alter_table('game_accounts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_game_accounts_user_id'))
+        batch_op.drop_index(batch_op.f('ix_game_accounts_request_id'))
+        batch_op.drop_index(batch_op.f('ix_game_accounts_issued_by_id'))
+        batch_op.drop_index(batch_op.f('ix_game_accounts_game_id'))
+
+    op.drop_table('game_accounts')
+    with op.batch_alter_table('dm_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dm_messages_thread_id'))
+        batch_op.drop_index(batch_op.f('ix_dm_messages_sender_id'))
+        batch_op.drop_index(batch_op.f('ix_dm_messages_created_at'))
+
+    op.drop_table('dm_messages')
+    with op.batch_alter_table('withdraw_requests', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_withdraw_requests_user_id'))
+        batch_op.drop_index(batch_op.f('ix_withdraw_requests_status'))
+        batch_op.drop_index(batch_op.f('ix_withdraw_requests_game_id'))
+
+    op.drop_table('withdraw_requests')
+    with op.batch_alter_table('referral_codes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_referral_codes_user_id'))
+        batch_op.drop_index(batch_op.f('ix_referral_codes_created_at'))
+        batch_op.drop_index(batch_op.f('ix_referral_codes_code'))
+
+    op.drop_table('referral_codes')
+    with op.batch_alter_table('ready_accounts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ready_accounts_is_claimed'))
+        batch_op.drop_index(batch_op.f('ix_ready_accounts_game_id'))
+        batch_op.drop_index(batch_op.f('ix_ready_accounts_created_at'))
+        batch_op.drop_index(batch_op.f('ix_ready_accounts_claimed_by'))
+        batch_op.drop_index(batch_op.f('ix_ready_accounts_added_by_id'))
+
+    op.drop_table('ready_accounts')
+    with op.batch_alter_table('player_balances', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_player_balances_user_id'))
+
+    op.drop_table('player_balances')
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_password_reset_tokens_user_id'))
+        batch_op.drop_index(batch_op.f('ix_password_reset_tokens_token'))
+        batch_op.drop_index(batch_op.f('ix_password_reset_tokens_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_password_reset_tokens_created_at'))
+
+    op.drop_table('password_reset_tokens')
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notifications_user_id'))
+        batch_op.drop_index(batch_op.f('ix_notifications_is_read'))
+        batch_op.drop_index(batch_op.f('ix_notifications_created_at'))
+
+    op.drop_table('notifications')
+    with op.batch_alter_table('game_account_requests', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_game_account_requests_user_id'))
+        batch_op.drop_index(batch_op.f('ix_game_account_requests_status'))
+        batch_op.drop_index(batch_op.f('ix_game_account_requests_handled_by'))
+        batch_op.drop_index(batch_op.f('ix_game_account_requests_game_id'))
+        batch_op.drop_index(batch_op.f('ix_game_account_requests_employee_id'))
+        batch_op.drop_index(batch_op.f('ix_game_account_requests_approved_by_id'))
+
+    op.drop_table('game_account_requests')
+    with op.batch_alter_table('external_accounts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_external_accounts_vendor_username'))
+        batch_op.drop_index(batch_op.f('ix_external_accounts_vendor_user_id'))
+        batch_op.drop_index(batch_op.f('ix_external_accounts_vendor'))
+        batch_op.drop_index(batch_op.f('ix_external_accounts_user_id'))
+        batch_op.drop_index(batch_op.f('ix_external_accounts_created_at'))
+
+    op.drop_table('external_accounts')
+    with op.batch_alter_table('email_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_email_tokens_user_id'))
+        batch_op.drop_index(batch_op.f('ix_email_tokens_token'))
+        batch_op.drop_index(batch_op.f('ix_email_tokens_purpose'))
+        batch_op.drop_index(batch_op.f('ix_email_tokens_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_email_tokens_created_at'))
+
+    op.drop_table('email_tokens')
+    with op.batch_alter_table('dm_threads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dm_threads_status'))
+        batch_op.drop_index(batch_op.f('ix_dm_threads_player_id'))
+        batch_op.drop_index(batch_op.f('ix_dm_threads_last_msg_at'))
+        batch_op.drop_index(batch_op.f('ix_dm_threads_employee_id'))
+
+    op.drop_table('dm_threads')
+    with op.batch_alter_table('deposit_requests', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_deposit_requests_user_id'))
+        batch_op.drop_index(batch_op.f('ix_deposit_requests_status'))
+        batch_op.drop_index(batch_op.f('ix_deposit_requests_method'))
+        batch_op.drop_index(batch_op.f('ix_deposit_requests_game_id'))
+
+    op.drop_table('deposit_requests')
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_messages_user_id'))
+        batch_op.drop_index(batch_op.f('ix_chat_messages_room'))
+        batch_op.drop_index(batch_op.f('ix_chat_messages_created_at'))
+
+    op.drop_table('chat_messages')
+    op.drop_table('bonus_settings')
+    op.drop_table('bonus_records')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_telegram_username'))
+        batch_op.drop_index(batch_op.f('ix_users_telegram_id'))
+        batch_op.drop_index(batch_op.f('ix_users_promo_seen'))
+        batch_op.drop_index(batch_op.f('ix_users_mobile'))
+        batch_op.drop_index(batch_op.f('ix_users_email_verified'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+        batch_op.drop_index(batch_op.f('ix_users_bonus_eligible'))
+
+    op.drop_table('users')
+    op.drop_table('payment_settings')
+    with op.batch_alter_table('games', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_games_is_active'))
+
+    op.drop_table('games')
+    with op.batch_alter_table('dead_letter_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dead_letter_jobs_vendor'))
+        batch_op.drop_index(batch_op.f('ix_dead_letter_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_dead_letter_jobs_ref_id'))
+        batch_op.drop_index(batch_op.f('ix_dead_letter_jobs_kind'))
+        batch_op.drop_index(batch_op.f('ix_dead_letter_jobs_error_class'))
+        batch_op.drop_index(batch_op.f('ix_dead_letter_jobs_created_at'))
+
+    op.drop_table('dead_letter_jobs')
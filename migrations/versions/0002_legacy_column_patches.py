@@ -0,0 +1,142 @@
+"""legacy column patches
+
+The ALTER TABLE checks create_app() used to run on every boot. Databases
+created before these columns existed get them once here; on a fresh
+database (built by 0001) every check is a no-op.
+
+Revision ID: 0002_legacy_columns
+Revises: 0001_baseline
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_legacy_columns'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, sqlite/generic DDL, postgres DDL, mysql DDL)
+PATCHES = [
+    # --- games ---
+    ("games", "backend_url",
+     "ALTER TABLE games ADD COLUMN backend_url VARCHAR(500)",
+     "ALTER TABLE games ADD COLUMN IF NOT EXISTS backend_url VARCHAR(500)",
+     "ALTER TABLE games ADD COLUMN backend_url VARCHAR(500) NULL"),
+
+    # --- users ---
+    ("users", "mobile", "ALTER TABLE users ADD COLUMN mobile VARCHAR(24)", None, None),
+    ("users", "email_verified", "ALTER TABLE users ADD COLUMN email_verified BOOLEAN DEFAULT 0",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS email_verified BOOLEAN DEFAULT FALSE", None),
+    ("users", "email_verified_at", "ALTER TABLE users ADD COLUMN email_verified_at DATETIME",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS email_verified_at TIMESTAMP", None),
+    ("users", "promo_seen", "ALTER TABLE users ADD COLUMN promo_seen BOOLEAN DEFAULT 0",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS promo_seen BOOLEAN DEFAULT FALSE", None),
+    ("users", "is_active",
+     "ALTER TABLE users ADD COLUMN is_active BOOLEAN DEFAULT 1",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE",
+     "ALTER TABLE users ADD COLUMN is_active TINYINT(1) DEFAULT 1"),
+    ("users", "bonus_eligible",
+     "ALTER TABLE users ADD COLUMN bonus_eligible BOOLEAN DEFAULT 0",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS bonus_eligible BOOLEAN DEFAULT FALSE",
+     "ALTER TABLE users ADD COLUMN bonus_eligible TINYINT(1) DEFAULT 0"),
+    # telegram mini-app
+    ("users", "telegram_id", "ALTER TABLE users ADD COLUMN telegram_id BIGINT", None, None),
+    ("users", "telegram_username", "ALTER TABLE users ADD COLUMN telegram_username VARCHAR(64)", None, None),
+    ("users", "telegram_firstname", "ALTER TABLE users ADD COLUMN telegram_firstname VARCHAR(120)", None, None),
+    ("users", "telegram_lastname", "ALTER TABLE users ADD COLUMN telegram_lastname VARCHAR(120)", None, None),
+    # bonus
+    ("users", "deposit_count", "ALTER TABLE users ADD COLUMN deposit_count INTEGER DEFAULT 0", None, None),
+    ("users", "signup_bonus_claimed", "ALTER TABLE users ADD COLUMN signup_bonus_claimed BOOLEAN DEFAULT 0",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS signup_bonus_claimed BOOLEAN DEFAULT FALSE", None),
+    ("users", "signup_bonus_amount", "ALTER TABLE users ADD COLUMN signup_bonus_amount REAL DEFAULT 0.0", None, None),
+    ("users", "signup_bonus_claimed_at", "ALTER TABLE users ADD COLUMN signup_bonus_claimed_at DATETIME",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS signup_bonus_claimed_at TIMESTAMP", None),
+    ("users", "regular_bonus_last_claimed", "ALTER TABLE users ADD COLUMN regular_bonus_last_claimed DATETIME",
+     "ALTER TABLE users ADD COLUMN IF NOT EXISTS regular_bonus_last_claimed TIMESTAMP", None),
+    ("users", "available_bonus", "ALTER TABLE users ADD COLUMN available_bonus REAL DEFAULT 0.0", None, None),
+
+    # --- game_accounts ---
+    ("game_accounts", "issued_by_id", "ALTER TABLE game_accounts ADD COLUMN issued_by_id INTEGER", None, None),
+    ("game_accounts", "issued_at", "ALTER TABLE game_accounts ADD COLUMN issued_at DATETIME",
+     "ALTER TABLE game_accounts ADD COLUMN IF NOT EXISTS issued_at TIMESTAMP", None),
+    ("game_accounts", "request_id", "ALTER TABLE game_accounts ADD COLUMN request_id INTEGER", None, None),
+
+    # --- game_account_requests ---
+    ("game_account_requests", "approved_by_id",
+     "ALTER TABLE game_account_requests ADD COLUMN approved_by_id INTEGER", None, None),
+    ("game_account_requests", "handled_by",
+     "ALTER TABLE game_account_requests ADD COLUMN handled_by INTEGER", None, None),
+    ("game_account_requests", "approved_at",
+     "ALTER TABLE game_account_requests ADD COLUMN approved_at DATETIME",
+     "ALTER TABLE game_account_requests ADD COLUMN IF NOT EXISTS approved_at TIMESTAMP", None),
+    ("game_account_requests", "status",
+     "ALTER TABLE game_account_requests ADD COLUMN status VARCHAR(20) DEFAULT 'PENDING'", None, None),
+    ("game_account_requests", "retry_count",
+     "ALTER TABLE game_account_requests ADD COLUMN retry_count INTEGER DEFAULT 0", None, None),
+    ("game_account_requests", "last_error",
+     "ALTER TABLE game_account_requests ADD COLUMN last_error TEXT", None, None),
+
+    # --- deposit_requests ---
+    ("deposit_requests", "loaded_by", "ALTER TABLE deposit_requests ADD COLUMN loaded_by INTEGER", None, None),
+    ("deposit_requests", "provider", "ALTER TABLE deposit_requests ADD COLUMN provider VARCHAR(32)", None, None),
+    ("deposit_requests", "provider_order_id",
+     "ALTER TABLE deposit_requests ADD COLUMN provider_order_id VARCHAR(128)", None, None),
+    ("deposit_requests", "pay_url", "ALTER TABLE deposit_requests ADD COLUMN pay_url TEXT", None, None),
+    ("deposit_requests", "backend_url", "ALTER TABLE deposit_requests ADD COLUMN backend_url TEXT", None, None),
+    ("deposit_requests", "meta", "ALTER TABLE deposit_requests ADD COLUMN meta TEXT", None, None),
+
+    # --- payment_settings ---
+    ("payment_settings", "whatsapp_url", "ALTER TABLE payment_settings ADD COLUMN whatsapp_url VARCHAR(500)", None, None),
+    ("payment_settings", "telegram_url", "ALTER TABLE payment_settings ADD COLUMN telegram_url VARCHAR(500)", None, None),
+    ("payment_settings", "facebook_url", "ALTER TABLE payment_settings ADD COLUMN facebook_url VARCHAR(500)", None, None),
+    ("payment_settings", "instagram_url", "ALTER TABLE payment_settings ADD COLUMN instagram_url VARCHAR(500)", None, None),
+    ("payment_settings", "promo_bonus_line", "ALTER TABLE payment_settings ADD COLUMN promo_bonus_line VARCHAR(300)", None, None),
+    ("payment_settings", "promo_referral_line", "ALTER TABLE payment_settings ADD COLUMN promo_referral_line VARCHAR(300)", None, None),
+    ("payment_settings", "promo_service_line", "ALTER TABLE payment_settings ADD COLUMN promo_service_line VARCHAR(300)", None, None),
+    ("payment_settings", "promo_trust_line", "ALTER TABLE payment_settings ADD COLUMN promo_trust_line VARCHAR(300)", None, None),
+    ("payment_settings", "cashapp_handle", "ALTER TABLE payment_settings ADD COLUMN cashapp_handle VARCHAR(255)", None, None),
+    ("payment_settings", "cashapp_qr_url", "ALTER TABLE payment_settings ADD COLUMN cashapp_qr_url VARCHAR(500)", None, None),
+    ("payment_settings", "cashapp_pay_url", "ALTER TABLE payment_settings ADD COLUMN cashapp_pay_url VARCHAR(500)", None, None),
+    # withdraw payout fields
+    ("payment_settings", "withdraw_crypto_address",
+     "ALTER TABLE payment_settings ADD COLUMN withdraw_crypto_address VARCHAR(255)", None, None),
+    ("payment_settings", "withdraw_crypto_qr_url",
+     "ALTER TABLE payment_settings ADD COLUMN withdraw_crypto_qr_url VARCHAR(500)", None, None),
+    ("payment_settings", "withdraw_chime_handle",
+     "ALTER TABLE payment_settings ADD COLUMN withdraw_chime_handle VARCHAR(255)", None, None),
+    ("payment_settings", "withdraw_chime_qr_url",
+     "ALTER TABLE payment_settings ADD COLUMN withdraw_chime_qr_url VARCHAR(500)", None, None),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    insp = sa.inspect(bind)
+    cols: dict[str, set] = {}
+
+    for table, col, stmt, stmt_pg, stmt_mysql in PATCHES:
+        if table not in cols:
+            try:
+                cols[table] = {c["name"] for c in insp.get_columns(table)}
+            except Exception:
+                cols[table] = None  # table missing – nothing to patch
+        if cols[table] is None or col in cols[table]:
+            continue
+        if dialect in ("postgresql", "postgres"):
+            op.execute(stmt_pg or stmt)
+        elif dialect in ("mysql", "mariadb"):
+            op.execute(stmt_mysql or stmt)
+        else:
+            op.execute(stmt)
+        cols[table].add(col)
+
+
+def downgrade():
+    # Columns predate versioned migrations; 0001's downgrade drops the tables.
+    pass
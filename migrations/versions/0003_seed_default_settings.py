@@ -0,0 +1,68 @@
+"""seed default settings rows
+
+payment_settings id=1 and the default bonus_settings row, previously
+inserted by create_app() / init_bonus_settings() on every boot.
+
+Revision ID: 0003_seed_settings
+Revises: 0002_legacy_columns
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_seed_settings'
+down_revision = '0002_legacy_columns'
+branch_labels = None
+depends_on = None
+
+
+payment_settings = sa.table('payment_settings', sa.column('id', sa.Integer))
+
+bonus_settings = sa.table(
+    'bonus_settings',
+    sa.column('id', sa.Integer),
+    sa.column('signup_active', sa.Boolean),
+    sa.column('signup_percentage', sa.Integer),
+    sa.column('signup_max_amount', sa.Float),
+    sa.column('signup_min_deposit', sa.Float),
+    sa.column('signup_wagering', sa.Integer),
+    sa.column('regular_active', sa.Boolean),
+    sa.column('regular_percentage', sa.Integer),
+    sa.column('regular_max_amount', sa.Float),
+    sa.column('regular_min_deposit', sa.Float),
+    sa.column('regular_wagering', sa.Integer),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    has_ps = bind.execute(
+        sa.select(payment_settings.c.id).where(payment_settings.c.id == 1)
+    ).first()
+    if not has_ps:
+        op.bulk_insert(payment_settings, [{"id": 1}])
+
+    has_bonus = bind.execute(sa.select(sa.func.count()).select_from(bonus_settings)).scalar()
+    if not has_bonus:
+        op.bulk_insert(bonus_settings, [{
+            "id": 1,
+            "signup_active": True,
+            "signup_percentage": 100,
+            "signup_max_amount": 100.0,
+            "signup_min_deposit": 20.0,
+            "signup_wagering": 30,
+            "regular_active": True,
+            "regular_percentage": 50,
+            "regular_max_amount": 50.0,
+            "regular_min_deposit": 10.0,
+            "regular_wagering": 25,
+        }])
+
+
+def downgrade():
+    # Settings rows are live configuration – never deleted by a downgrade.
+    pass
@@ -0,0 +1,83 @@
+"""player_stats table, backfilled from deposit/withdraw history
+
+Revision ID: 0005_player_stats
+Revises: 0004_composite_indexes
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_player_stats'
+down_revision = '0004_composite_indexes'
+branch_labels = None
+depends_on = None
+
+
+# Same aggregate as player_stats.BACKFILL_SQL (kept inline: migrations must
+# not depend on application modules that may change later).
+BACKFILL_SQL = """
+INSERT INTO player_stats (
+    user_id, deposit_count, deposit_sum, first_deposit_at, last_deposit_at,
+    bonus_count, bonus_sum, withdraw_count, withdraw_sum, last_withdraw_at, updated_at
+)
+SELECT u.id,
+       COALESCE(d.cnt, 0), COALESCE(d.total, 0), d.first_at, d.last_at,
+       COALESCE(d.bonus_cnt, 0), COALESCE(d.bonus_total, 0),
+       COALESCE(w.cnt, 0), COALESCE(w.total, 0), w.last_at,
+       :now
+FROM users u
+LEFT JOIN (
+    SELECT user_id,
+           COUNT(*) AS cnt,
+           SUM(amount) AS total,
+           MIN(COALESCE(loaded_at, created_at)) AS first_at,
+           MAX(COALESCE(loaded_at, created_at)) AS last_at,
+           SUM(CASE WHEN COALESCE(bonus_amount, 0) > 0 THEN 1 ELSE 0 END) AS bonus_cnt,
+           SUM(COALESCE(bonus_amount, 0)) AS bonus_total
+    FROM deposit_requests
+    WHERE status = 'LOADED'
+    GROUP BY user_id
+) d ON d.user_id = u.id
+LEFT JOIN (
+    SELECT user_id,
+           COUNT(*) AS cnt,
+           SUM(amount) AS total,
+           MAX(COALESCE(acted_at, updated_at, created_at)) AS last_at
+    FROM withdraw_requests
+    WHERE status = 'PAID'
+    GROUP BY user_id
+) w ON w.user_id = u.id
+WHERE d.user_id IS NOT NULL OR w.user_id IS NOT NULL
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    if "player_stats" in sa.inspect(bind).get_table_names():
+        return
+
+    op.create_table('player_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('deposit_count', sa.Integer(), nullable=False),
+    sa.Column('deposit_sum', sa.Float(), nullable=False),
+    sa.Column('first_deposit_at', sa.DateTime(), nullable=True),
+    sa.Column('last_deposit_at', sa.DateTime(), nullable=True),
+    sa.Column('bonus_count', sa.Integer(), nullable=False),
+    sa.Column('bonus_sum', sa.Float(), nullable=False),
+    sa.Column('withdraw_count', sa.Integer(), nullable=False),
+    sa.Column('withdraw_sum', sa.Float(), nullable=False),
+    sa.Column('last_withdraw_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    bind.execute(sa.text(BACKFILL_SQL), {"now": datetime.utcnow()})
+
+
+def downgrade():
+    op.drop_table('player_stats')
@@ -0,0 +1,75 @@
+"""dm_threads: last message snippet, sender role, unread counters per side
+
+Revision ID: 0006_dm_thread_denorm
+Revises: 0005_player_stats
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_dm_thread_denorm'
+down_revision = '0005_player_stats'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    sa.Column('last_msg_snippet', sa.String(length=120), nullable=True),
+    sa.Column('last_sender_role', sa.String(length=20), nullable=True),
+    sa.Column('unread_for_staff', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('unread_for_player', sa.Integer(), nullable=False, server_default='0'),
+]
+
+# There was no read tracking before this revision, so "unread" is
+# approximated as the messages sent after the other side's last reply.
+BACKFILL_SQL = """
+UPDATE dm_threads SET
+    last_msg_snippet = (
+        SELECT SUBSTR(m.body, 1, 120) FROM dm_messages m
+        WHERE m.thread_id = dm_threads.id ORDER BY m.id DESC LIMIT 1
+    ),
+    last_sender_role = (
+        SELECT UPPER(m.sender_role) FROM dm_messages m
+        WHERE m.thread_id = dm_threads.id ORDER BY m.id DESC LIMIT 1
+    ),
+    unread_for_staff = (
+        SELECT COUNT(*) FROM dm_messages m
+        WHERE m.thread_id = dm_threads.id
+          AND UPPER(COALESCE(m.sender_role, '')) NOT IN ('EMPLOYEE', 'ADMIN')
+          AND m.id > COALESCE((
+              SELECT MAX(s.id) FROM dm_messages s
+              WHERE s.thread_id = dm_threads.id
+                AND UPPER(COALESCE(s.sender_role, '')) IN ('EMPLOYEE', 'ADMIN')
+          ), 0)
+    ),
+    unread_for_player = (
+        SELECT COUNT(*) FROM dm_messages m
+        WHERE m.thread_id = dm_threads.id
+          AND UPPER(COALESCE(m.sender_role, '')) IN ('EMPLOYEE', 'ADMIN')
+          AND m.id > COALESCE((
+              SELECT MAX(p.id) FROM dm_messages p
+              WHERE p.thread_id = dm_threads.id
+                AND UPPER(COALESCE(p.sender_role, '')) NOT IN ('EMPLOYEE', 'ADMIN')
+          ), 0)
+    )
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = {c["name"] for c in sa.inspect(bind).get_columns("dm_threads")}
+    missing = [c for c in COLUMNS if c.name not in existing]
+    if not missing:
+        return
+    for col in missing:
+        op.add_column('dm_threads', col.copy())
+    bind.execute(sa.text(BACKFILL_SQL))
+
+
+def downgrade():
+    with op.batch_alter_table('dm_threads') as batch_op:
+        for col in reversed(COLUMNS):
+            batch_op.drop_column(col.name)
@@ -0,0 +1,84 @@
+"""keyset pagination: non-null created_at and (filter, created_at, id) indexes
+
+Lists now seek on (created_at, id) instead of OFFSET (see keyset.py). A NULL
+created_at can't be compared, so legacy rows without one get their
+updated_at (or the migration time) – they sort as the oldest rows they are.
+
+Revision ID: 0007_keyset_pagination
+Revises: 0006_dm_thread_denorm
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_keyset_pagination'
+down_revision = '0006_dm_thread_denorm'
+branch_labels = None
+depends_on = None
+
+
+# tables listed with keyset.seek, and whether they carry updated_at
+BACKFILL = [
+    ("users", False),
+    ("deposit_requests", True),
+    ("withdraw_requests", True),
+    ("game_account_requests", True),
+]
+
+INDEXES = [
+    ("ix_users_role_created_at_id", "users", ["role", "created_at", "id"]),
+    ("ix_withdraw_requests_status_created_at_id", "withdraw_requests", ["status", "created_at", "id"]),
+]
+
+
+def _existing(bind) -> set:
+    insp = sa.inspect(bind)
+    names = set()
+    for table in {t for _, t, _ in INDEXES}:
+        try:
+            names.update(ix["name"] for ix in insp.get_indexes(table))
+        except Exception:
+            pass
+    return names
+
+
+def upgrade():
+    bind = op.get_bind()
+    now = datetime.utcnow()
+    for table, has_updated in BACKFILL:
+        fill = "COALESCE(updated_at, :now)" if has_updated else ":now"
+        bind.execute(
+            sa.text(f"UPDATE {table} SET created_at = {fill} WHERE created_at IS NULL"),
+            {"now": now},
+        )
+
+    have = _existing(bind)
+    todo = [ix for ix in INDEXES if ix[0] not in have]
+    if not todo:
+        return
+
+    if bind.dialect.name in ("postgresql", "postgres"):
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, cols in todo:
+                op.create_index(name, table, cols, postgresql_concurrently=True)
+        op.execute("ANALYZE users, withdraw_requests")
+        return
+
+    for name, table, cols in todo:
+        op.create_index(name, table, cols)
+    if bind.dialect.name == "sqlite":
+        op.execute("ANALYZE")
+
+
+def downgrade():
+    bind = op.get_bind()
+    have = _existing(bind)
+    for name, table, _ in reversed(INDEXES):
+        if name in have:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,61 @@
+"""wallet_ledger: append-only balance changes with idempotency keys
+
+Every existing wallet gets one "opening" row carrying its current balance,
+so SUM(delta) per user equals player_balances.balance from the start.
+
+Revision ID: 0008_wallet_ledger
+Revises: 0007_keyset_pagination
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_wallet_ledger'
+down_revision = '0007_keyset_pagination'
+branch_labels = None
+depends_on = None
+
+
+OPENING_SQL = """
+INSERT INTO wallet_ledger (user_id, delta, reason, idempotency_key, created_at)
+SELECT user_id, COALESCE(balance, 0), 'opening', 'opening:' || CAST(user_id AS VARCHAR(20)), :now
+FROM player_balances
+WHERE COALESCE(balance, 0) <> 0
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    if "wallet_ledger" in sa.inspect(bind).get_table_names():
+        return
+    op.create_table(
+        'wallet_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.String(length=40), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=120), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['actor_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    op.create_index('ix_wallet_ledger_user_id', 'wallet_ledger', ['user_id'])
+    if bind.dialect.name in ("mysql", "mariadb"):
+        opening = OPENING_SQL.replace("'opening:' || CAST(user_id AS VARCHAR(20))",
+                                      "CONCAT('opening:', user_id)")
+    else:
+        opening = OPENING_SQL
+    bind.execute(sa.text(opening), {"now": datetime.utcnow()})
+
+
+def downgrade():
+    op.drop_index('ix_wallet_ledger_user_id', table_name='wallet_ledger')
+    op.drop_table('wallet_ledger')
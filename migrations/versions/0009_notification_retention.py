@@ -0,0 +1,157 @@
+"""notifications_archive table; monthly range partitions for notifications on Postgres
+
+On Postgres the live table is rebuilt as PARTITION BY RANGE (created_at),
+one partition per month from the oldest row to two months ahead plus a
+DEFAULT partition. The primary key becomes (id, created_at) – Postgres
+requires the partition key in it; ids still come from the same sequence,
+so they stay unique. The copy holds a lock on notifications for its
+duration: run it in a quiet window, ideally after a first
+`python notification_retention.py run` has shrunk the table.
+
+Other databases only get the archive table.
+
+Revision ID: 0009_notification_retention
+Revises: 0008_wallet_ledger
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_notification_retention'
+down_revision = '0008_wallet_ledger'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 2
+
+# same names as models.Notification / migration 0004
+INDEXES_SQL = [
+    "CREATE INDEX ix_notifications_user_id ON notifications (user_id)",
+    "CREATE INDEX ix_notifications_is_read ON notifications (is_read)",
+    "CREATE INDEX ix_notifications_created_at ON notifications (created_at)",
+    "CREATE INDEX ix_notifications_user_read_created ON notifications (user_id, is_read, created_at)",
+    "CREATE INDEX ix_notifications_user_unread ON notifications (user_id, created_at) WHERE is_read = false",
+]
+
+
+def _next_month(d):
+    return datetime(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _create_archive(bind):
+    if "notifications_archive" in sa.inspect(bind).get_table_names():
+        return
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('message', sa.String(length=300), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_notifications_archive_user_created', 'notifications_archive',
+                    ['user_id', 'created_at'])
+
+
+def _partition_postgres(bind):
+    already = bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications')"
+    )).scalar()
+    if already:
+        return
+
+    seq = bind.execute(sa.text("SELECT pg_get_serial_sequence('notifications', 'id')")).scalar()
+    if not seq:
+        bind.execute(sa.text("CREATE SEQUENCE notifications_id_seq"))
+        bind.execute(sa.text(
+            "SELECT setval('notifications_id_seq', COALESCE((SELECT MAX(id) FROM notifications), 0) + 1, false)"
+        ))
+        seq = "notifications_id_seq"
+
+    bind.execute(sa.text(f"""
+        CREATE TABLE notifications_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'::regclass),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            message VARCHAR(300) NOT NULL,
+            is_read BOOLEAN DEFAULT false,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """))
+
+    oldest = bind.execute(sa.text("SELECT MIN(created_at) FROM notifications")).scalar()
+    now = datetime.utcnow()
+    month = datetime((oldest or now).year, (oldest or now).month, 1)
+    last = datetime(now.year, now.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        bind.execute(sa.text(
+            f"CREATE TABLE notifications_p{month:%Y%m} PARTITION OF notifications_partitioned "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+        ))
+        month = _next_month(month)
+    bind.execute(sa.text("CREATE TABLE notifications_default PARTITION OF notifications_partitioned DEFAULT"))
+
+    bind.execute(sa.text("""
+        INSERT INTO notifications_partitioned (id, user_id, message, is_read, created_at)
+        SELECT id, user_id, message, COALESCE(is_read, false), COALESCE(created_at, now() AT TIME ZONE 'utc')
+        FROM notifications
+    """))
+    bind.execute(sa.text(f"ALTER SEQUENCE {seq} OWNED BY NONE"))
+    bind.execute(sa.text("DROP TABLE notifications"))
+    bind.execute(sa.text("ALTER TABLE notifications_partitioned RENAME TO notifications"))
+    bind.execute(sa.text(f"ALTER SEQUENCE {seq} OWNED BY notifications.id"))
+    for ddl in INDEXES_SQL:
+        bind.execute(sa.text(ddl))
+    bind.execute(sa.text("ANALYZE notifications"))
+
+
+def _unpartition_postgres(bind):
+    partitioned = bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications')"
+    )).scalar()
+    if not partitioned:
+        return
+    seq = bind.execute(sa.text("SELECT pg_get_serial_sequence('notifications', 'id')")).scalar()
+    bind.execute(sa.text(f"""
+        CREATE TABLE notifications_plain (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'::regclass) PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            message VARCHAR(300) NOT NULL,
+            is_read BOOLEAN,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """))
+    bind.execute(sa.text(
+        "INSERT INTO notifications_plain SELECT id, user_id, message, is_read, created_at FROM notifications"
+    ))
+    bind.execute(sa.text(f"ALTER SEQUENCE {seq} OWNED BY NONE"))
+    bind.execute(sa.text("DROP TABLE notifications CASCADE"))
+    bind.execute(sa.text("ALTER TABLE notifications_plain RENAME TO notifications"))
+    bind.execute(sa.text(f"ALTER SEQUENCE {seq} OWNED BY notifications.id"))
+    for ddl in INDEXES_SQL:
+        bind.execute(sa.text(ddl))
+
+
+def upgrade():
+    bind = op.get_bind()
+    _create_archive(bind)
+    if bind.dialect.name in ("postgresql", "postgres"):
+        _partition_postgres(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name in ("postgresql", "postgres"):
+        _unpartition_postgres(bind)
+    op.drop_index('ix_notifications_archive_user_created', table_name='notifications_archive')
+    op.drop_table('notifications_archive')
@@ -0,0 +1,47 @@
+"""request_archive: thin index (+ optional payload) for settled requests in cold storage
+
+Filled by cold_storage.py; nothing is moved by the migration itself.
+
+Revision ID: 0010_request_archive
+Revises: 0009_notification_retention
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_request_archive'
+down_revision = '0009_notification_retention'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "request_archive" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'request_archive',
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('ref_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('game_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('bonus_amount', sa.Float(), nullable=True),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('settled_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('kind', 'ref_id'),
+    )
+    op.create_index('ix_request_archive_kind_user_created', 'request_archive',
+                    ['kind', 'user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_request_archive_kind_user_created', table_name='request_archive')
+    op.drop_table('request_archive')
@@ -0,0 +1,125 @@
+"""daily_stats rollup, backfilled from live and archived requests; created_at indexes
+
+The refresh job re-derives recent days with WHERE created_at >= ?, so the
+source tables get a plain created_at index each.
+
+Revision ID: 0011_daily_stats
+Revises: 0010_request_archive
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_daily_stats'
+down_revision = '0010_request_archive'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_users_created_at", "users"),
+    ("ix_deposit_requests_created_at", "deposit_requests"),
+    ("ix_withdraw_requests_created_at", "withdraw_requests"),
+    ("ix_game_account_requests_created_at", "game_account_requests"),
+]
+
+_ARCHIVE_METHOD = {
+    "sqlite": "json_extract(payload, '$.method')",
+    "postgresql": "(payload->>'method')",
+}
+
+# Same aggregate as daily_stats.FACTS_SQL (kept inline: migrations must not
+# depend on application modules that may change later).
+BACKFILL_SQL = """
+INSERT INTO daily_stats (
+    day, kind, game_id, method, status, actor_id, cnt, amount, bonus_cnt, bonus_amount, updated_at
+)
+SELECT day, kind, game_id, method, status, actor_id,
+       COUNT(*), SUM(amount), SUM(bonus_flag), SUM(bonus), :now
+FROM (
+    SELECT COALESCE(DATE(created_at), '1970-01-01') AS day, 'deposit' AS kind,
+           COALESCE(game_id, 0) AS game_id, COALESCE(method, '') AS method, COALESCE(status, '') AS status,
+           COALESCE(loaded_by, 0) AS actor_id, COALESCE(amount, 0) AS amount,
+           CASE WHEN COALESCE(bonus_amount, 0) > 0 THEN 1 ELSE 0 END AS bonus_flag,
+           COALESCE(bonus_amount, 0) AS bonus
+    FROM deposit_requests
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), 'withdraw',
+           COALESCE(game_id, 0), COALESCE(method, ''), COALESCE(status, ''),
+           COALESCE(acted_by, 0), COALESCE(amount, 0), 0, 0
+    FROM withdraw_requests
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), 'id_request',
+           COALESCE(game_id, 0), '', COALESCE(status, ''),
+           COALESCE(handled_by, approved_by_id, 0), 0, 0, 0
+    FROM game_account_requests
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), 'user',
+           0, '', COALESCE(role, ''), 0, 0,
+           CASE WHEN signup_bonus_claimed THEN 1 ELSE 0 END,
+           CASE WHEN signup_bonus_claimed THEN COALESCE(signup_bonus_amount, 0) ELSE 0 END
+    FROM users
+    UNION ALL
+    SELECT COALESCE(DATE(created_at), '1970-01-01'), kind,
+           COALESCE(game_id, 0), COALESCE({archive_method}, ''), COALESCE(status, ''),
+           COALESCE(actor_id, 0), COALESCE(amount, 0),
+           CASE WHEN COALESCE(bonus_amount, 0) > 0 THEN 1 ELSE 0 END,
+           COALESCE(bonus_amount, 0)
+    FROM request_archive
+) f
+GROUP BY day, kind, game_id, method, status, actor_id
+"""
+
+
+def _existing_indexes(insp) -> set:
+    names = set()
+    for _, table in INDEXES:
+        try:
+            names.update(ix["name"] for ix in insp.get_indexes(table))
+        except Exception:
+            pass
+    return names
+
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    have = _existing_indexes(insp)
+    for name, table in INDEXES:
+        if name not in have:
+            op.create_index(name, table, ['created_at'], unique=False)
+
+    if "daily_stats" in insp.get_table_names():
+        return
+    op.create_table(
+        'daily_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('game_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('method', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('actor_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('cnt', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('bonus_cnt', sa.Integer(), nullable=False),
+        sa.Column('bonus_amount', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('day', 'kind', 'game_id', 'method', 'status', 'actor_id'),
+    )
+    op.create_index('ix_daily_stats_kind_status', 'daily_stats', ['kind', 'status'], unique=False)
+
+    method = _ARCHIVE_METHOD.get(bind.dialect.name, "NULL")
+    bind.execute(sa.text(BACKFILL_SQL.format(archive_method=method)), {"now": datetime.utcnow()})
+
+
+def downgrade():
+    op.drop_index('ix_daily_stats_kind_status', table_name='daily_stats')
+    op.drop_table('daily_stats')
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table)
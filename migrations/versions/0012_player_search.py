@@ -0,0 +1,96 @@
+"""player search index: pg_trgm GIN on Postgres, FTS5 trigram table on SQLite
+
+One lowercase document per user (name, email, mobile, telegram_username,
+referral code, game login usernames), maintained by models._maintain_player_search
+and queried by player_search.py. Other dialects get nothing and keep the
+LIKE fallback.
+
+Revision ID: 0012_player_search
+Revises: 0011_daily_stats
+Create Date: 2026-10-18
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_player_search'
+down_revision = '0011_daily_stats'
+branch_labels = None
+depends_on = None
+
+log = logging.getLogger("alembic.runtime.migration")
+
+# Same document as player_search._doc (kept inline: migrations must not
+# depend on application modules that may change later).
+PG_BACKFILL_SQL = """
+INSERT INTO player_search (user_id, doc)
+SELECT u.id,
+       lower(concat_ws(' ', NULLIF(trim(u.name), ''), NULLIF(trim(u.email), ''), NULLIF(trim(u.mobile), ''),
+                       NULLIF(trim(u.telegram_username), ''), NULLIF(trim(r.code), ''), g.logins))
+FROM users u
+LEFT JOIN referral_codes r ON r.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, string_agg(NULLIF(trim(account_username), ''), ' ' ORDER BY id) AS logins
+    FROM game_accounts
+    GROUP BY user_id
+) g ON g.user_id = u.id
+"""
+
+SQLITE_BACKFILL_SQL = """
+INSERT INTO player_search_fts (rowid, doc)
+SELECT u.id,
+       lower(trim(
+           COALESCE(trim(u.name) || ' ', '') || COALESCE(trim(u.email) || ' ', '') ||
+           COALESCE(trim(u.mobile) || ' ', '') || COALESCE(trim(u.telegram_username) || ' ', '') ||
+           COALESCE(trim(r.code) || ' ', '') || COALESCE(g.logins, '')
+       ))
+FROM users u
+LEFT JOIN referral_codes r ON r.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, group_concat(trim(account_username), ' ') AS logins
+    FROM (SELECT user_id, account_username FROM game_accounts ORDER BY id)
+    GROUP BY user_id
+) g ON g.user_id = u.id
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    dialect = bind.dialect.name
+
+    if dialect == "postgresql":
+        if "player_search" in tables:
+            return
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_table(
+            'player_search',
+            sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('doc', sa.Text(), nullable=False, server_default=''),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+        bind.execute(sa.text(PG_BACKFILL_SQL))
+        op.execute("CREATE INDEX ix_player_search_doc_trgm ON player_search USING gin (doc gin_trgm_ops)")
+        return
+
+    if dialect == "sqlite":
+        if "player_search_fts" in tables:
+            return
+        try:
+            op.execute("CREATE VIRTUAL TABLE player_search_fts USING fts5(doc, tokenize='trigram')")
+        except Exception as e:  # SQLite < 3.34 has no trigram tokenizer
+            log.warning("player_search: FTS5 trigram unavailable (%s) – search stays on LIKE", e)
+            return
+        bind.execute(sa.text(SQLITE_BACKFILL_SQL))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP TABLE IF EXISTS player_search")
+    elif dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS player_search_fts")
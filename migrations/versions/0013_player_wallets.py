@@ -0,0 +1,39 @@
+"""open a wallet for every player that doesn't have one
+
+Wallets used to be created lazily by inject_globals on the first page a
+user rendered. Registration now creates them with the account, so the
+players who never had that first render get theirs here. Nothing to undo.
+
+Revision ID: 0013_player_wallets
+Revises: 0012_player_search
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_player_wallets'
+down_revision = '0012_player_search'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_SQL = """
+INSERT INTO player_balances (user_id, balance, updated_at)
+SELECT u.id, 0, :now
+FROM users u
+WHERE u.role = 'PLAYER'
+  AND NOT EXISTS (SELECT 1 FROM player_balances b WHERE b.user_id = u.id)
+"""
+
+
+def upgrade():
+    op.get_bind().execute(sa.text(BACKFILL_SQL), {"now": datetime.utcnow()})
+
+
+def downgrade():
+    pass
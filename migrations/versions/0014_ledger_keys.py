@@ -0,0 +1,41 @@
+"""deposit / withdraw ledger_key: a wallet idempotency key that outlives the id
+
+SQLite tables here have no AUTOINCREMENT, so once cold_storage has moved
+the newest rows out their ids can be handed out again – and "deposit:<id>"
+would then match the old row's wallet_ledger entry. New rows get a random
+ledger_key; existing rows are backfilled with their id, which keeps the
+keys they were already credited / debited under.
+
+Revision ID: 0014_ledger_keys
+Revises: 0013_player_wallets
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014_ledger_keys'
+down_revision = '0013_player_wallets'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('deposit_requests', 'withdraw_requests')
+
+
+def upgrade():
+    bind = op.get_bind()
+    as_text = "CHAR" if bind.dialect.name in ("mysql", "mariadb") else "VARCHAR(36)"
+    for table in TABLES:
+        existing = {c["name"] for c in sa.inspect(bind).get_columns(table)}
+        if "ledger_key" not in existing:
+            op.add_column(table, sa.Column('ledger_key', sa.String(length=36), nullable=True))
+        bind.execute(sa.text(f"UPDATE {table} SET ledger_key = CAST(id AS {as_text}) WHERE ledger_key IS NULL"))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('ledger_key')
@@ -0,0 +1,75 @@
+"""AUTOINCREMENT on the archived request tables (SQLite)
+
+SQLite without AUTOINCREMENT hands out MAX(id) + 1, so once the newest
+rows are gone – archived by cold_storage, or deleted (delete_player, failed
+instant-mode ID requests) – their ids come back. A reused id collides with
+the request_archive (kind, ref_id) primary key and stops archive_settled
+for that kind. AUTOINCREMENT never reuses an id; sqlite_sequence is started
+past every id the table or the archive has seen.
+
+Postgres / MySQL sequences never reuse ids: nothing to do there.
+
+Revision ID: 0015_request_autoincrement
+Revises: 0014_ledger_keys
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0015_request_autoincrement'
+down_revision = '0014_ledger_keys'
+branch_labels = None
+depends_on = None
+
+
+# (table, request_archive.kind)
+TABLES = [
+    ('deposit_requests', 'deposit'),
+    ('withdraw_requests', 'withdraw'),
+    ('game_account_requests', 'id_request'),
+]
+
+# partial indexes (0004): recreated explicitly, batch reflection may drop the WHERE
+PARTIAL = {
+    'deposit_requests': [("ix_deposit_requests_open_created_at", ["created_at"],
+                          "status IN ('PENDING', 'RECEIVED')")],
+    'game_account_requests': [("ix_game_account_requests_pending_created_at", ["created_at"],
+                               "status = 'PENDING'")],
+}
+
+HIGH_WATER_SQL = """
+SELECT MAX(m) FROM (
+    SELECT MAX(id) AS m FROM {table}
+    UNION ALL
+    SELECT MAX(ref_id) FROM request_archive WHERE kind = :kind
+)
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    for table, kind in TABLES:
+        ddl = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"),
+                           {"t": table}).scalar() or ""
+        if "AUTOINCREMENT" not in ddl.upper():
+            with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+                pass
+            for name, cols, where in PARTIAL.get(table, ()):
+                op.execute(f"DROP INDEX IF EXISTS {name}")
+                op.create_index(name, table, cols, sqlite_where=sa.text(where))
+
+        high = bind.execute(sa.text(HIGH_WATER_SQL.format(table=table)), {"kind": kind}).scalar() or 0
+        bind.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = :t"), {"t": table})
+        bind.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES (:t, :seq)"),
+                     {"t": table, "seq": high})
+
+
+def downgrade():
+    # Dropping AUTOINCREMENT would only bring id reuse back; keep it.
+    pass
@@ -1,12 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import secrets
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import event
-from sqlalchemy.orm import object_session
+from sqlalchemy import bindparam, event, func as sa_func, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import set_committed_value
 
-db = SQLAlchemy()
+from db_routing import RoutingSession
+
+# RoutingSession: reads inside db_routing.read_only / use_replica may go to
+# DATABASE_REPLICA_URL; everything else uses the primary.
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # ========================= Users =========================
 class User(db.Model, UserMixin):
@@ -49,6 +55,13 @@ class User(db.Model, UserMixin):
 
     # ===== END NEW FIELDS =====
 
+    __table_args__ = (
+        # keyset player lists: WHERE role='PLAYER' ORDER BY created_at, id
+        db.Index("ix_users_role_created_at_id", "role", "created_at", "id"),
+        # daily_stats refresh window: WHERE created_at >= ?
+        db.Index("ix_users_created_at", "created_at"),
+    )
+
     def set_password(self, pw: str):
         self.password_hash = generate_password_hash(pw)
 
@@ -194,6 +207,10 @@ class BonusRecord(db.Model):
     
     # Relationships
     player = db.relationship("User", backref=db.backref("bonus_history", lazy=True))
+
+    __table_args__ = (
+        db.Index("ix_bonus_records_player_status", "player_id", "status"),
+    )
     
     def __repr__(self):
         return f"<BonusRecord {self.id} {self.bonus_type}: ${self.amount}>"
@@ -223,12 +240,64 @@ class PlayerBalance(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class WalletLedger(db.Model):
+    """
+    Append-only record of every PlayerBalance change. Written by wallet.apply
+    in the same transaction as the atomic balance update, so
+    SUM(delta) per user == player_balances.balance (`python wallet.py verify`).
+    """
+    __tablename__ = "wallet_ledger"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(40), nullable=False, default="adjust")  # deposit | withdraw | replay | opening | adjust
+    # "deposit:<ledger_key>" – a retried approval/replay of the same thing is a no-op
+    idempotency_key = db.Column(db.String(120), nullable=False, unique=True)
+    actor_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ========================= Player Stats =========================
+class PlayerStats(db.Model):
+    """
+    Running per-player totals so views read one row instead of counting
+    history. Maintained by _maintain_player_stats in the same transaction
+    as the DepositRequest -> LOADED / WithdrawRequest -> PAID change;
+    rebuild with `python player_stats.py backfill`.
+    """
+    __tablename__ = "player_stats"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+
+    deposit_count = db.Column(db.Integer, default=0, nullable=False)   # LOADED deposits
+    deposit_sum = db.Column(db.Float, default=0.0, nullable=False)
+    first_deposit_at = db.Column(db.DateTime, nullable=True)
+    last_deposit_at = db.Column(db.DateTime, nullable=True)
+
+    bonus_count = db.Column(db.Integer, default=0, nullable=False)     # LOADED deposits that carried a bonus
+    bonus_sum = db.Column(db.Float, default=0.0, nullable=False)
+
+    withdraw_count = db.Column(db.Integer, default=0, nullable=False)  # PAID withdrawals
+    withdraw_sum = db.Column(db.Float, default=0.0, nullable=False)
+    last_withdraw_at = db.Column(db.DateTime, nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 # ========================= Deposits =========================
 
+def _new_ledger_key() -> str:
+    return secrets.token_hex(16)
+
+
 class DepositRequest(db.Model):
     __tablename__ = "deposit_requests"
 
     id = db.Column(db.Integer, primary_key=True)
+    # wallet_ledger key ("deposit:<ledger_key>", see wallet.key_for): not tied
+    # to the id, which SQLite could hand out again before migration 0015
+    ledger_key = db.Column(db.String(36), nullable=True, default=_new_ledger_key)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     game_id = db.Column(db.Integer, db.ForeignKey("games.id"), nullable=True, index=True)
     # CHANGE FROM Integer TO Float
@@ -260,12 +329,28 @@ class DepositRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # pending/history lists: WHERE status=? ORDER BY created_at
+        db.Index("ix_deposit_requests_status_created_at", "status", "created_at"),
+        # per-player totals: WHERE user_id=? AND status='LOADED'
+        db.Index("ix_deposit_requests_user_status", "user_id", "status"),
+        # employee/bot queues only ever scan the open ones
+        db.Index("ix_deposit_requests_open_created_at", "created_at",
+                 postgresql_where=db.text("status IN ('PENDING', 'RECEIVED')"),
+                 sqlite_where=db.text("status IN ('PENDING', 'RECEIVED')")),
+        # daily_stats refresh window: WHERE created_at >= ?
+        db.Index("ix_deposit_requests_created_at", "created_at"),
+        # archived ids must never come back (request_archive PK, wallet keys); migration 0015
+        {"sqlite_autoincrement": True},
+    )
+
 
 # ========================= Withdrawals =========================
 class WithdrawRequest(db.Model):
     __tablename__ = "withdraw_requests"
 
     id = db.Column(db.Integer, primary_key=True)
+    ledger_key = db.Column(db.String(36), nullable=True, default=_new_ledger_key)  # as DepositRequest
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     game_id = db.Column(db.Integer, db.ForeignKey("games.id"), nullable=True, index=True)
     amount = db.Column(db.Integer, nullable=False)
@@ -287,6 +372,14 @@ class WithdrawRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # keyset lists: WHERE status=? ORDER BY created_at, id
+        db.Index("ix_withdraw_requests_status_created_at_id", "status", "created_at", "id"),
+        # daily_stats refresh window: WHERE created_at >= ?
+        db.Index("ix_withdraw_requests_created_at", "created_at"),
+        {"sqlite_autoincrement": True},  # as DepositRequest
+    )
+
 
 # ========================= Game Access Requests =========================
 class GameAccountRequest(db.Model):
@@ -312,6 +405,109 @@ class GameAccountRequest(db.Model):
       # ⭐ ADD THIS LINE ⭐
     last_error = db.Column(db.Text, nullable=True)
 
+    __table_args__ = (
+        # worker pick / lane aging: WHERE status='PENDING' ORDER BY created_at
+        db.Index("ix_game_account_requests_pending_created_at", "created_at",
+                 postgresql_where=db.text("status = 'PENDING'"),
+                 sqlite_where=db.text("status = 'PENDING'")),
+        # daily_stats refresh window: WHERE created_at >= ?
+        db.Index("ix_game_account_requests_created_at", "created_at"),
+        {"sqlite_autoincrement": True},  # as DepositRequest
+    )
+
+
+# ========================= Cold storage =========================
+class RequestArchive(db.Model):
+    """
+    Thin index of settled deposit / withdraw / ID requests moved out of the
+    hot tables by cold_storage.archive_settled. `payload` holds the full row
+    (COLD_ARCHIVE_MODE=table); with file modes it is NULL and `location`
+    names the .jsonl.gz / .parquet file holding it.
+    """
+    __tablename__ = "request_archive"
+
+    kind = db.Column(db.String(16), primary_key=True)   # deposit | withdraw | id_request
+    ref_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    game_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    bonus_amount = db.Column(db.Float, nullable=True)
+    actor_id = db.Column(db.Integer, nullable=True)     # loaded_by / acted_by / approved_by_id
+    created_at = db.Column(db.DateTime, nullable=True)
+    settled_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    location = db.Column(db.String(255), nullable=True)
+    payload = db.Column(db.JSON, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_request_archive_kind_user_created", "kind", "user_id", "created_at"),
+    )
+
+    @property
+    def id(self):
+        return self.ref_id
+
+
+# ========================= Daily Stats =========================
+class DailyStat(db.Model):
+    """
+    Daily rollup per (day, kind, game, method, status, actor) so dashboards
+    sum a few rows instead of counting history. `day` is the day the row
+    was created; a status change moves its count from one bucket to the
+    other. Maintained by _maintain_daily_stats in the same transaction as
+    the change, re-derived for recent days by daily_stats.refresh, rebuilt
+    with `python daily_stats.py backfill`.
+
+    kind: deposit | withdraw | id_request | user (status = role)
+    """
+    __tablename__ = "daily_stats"
+
+    day = db.Column(db.Date, primary_key=True)
+    kind = db.Column(db.String(16), primary_key=True)
+    game_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)   # 0 = none
+    method = db.Column(db.String(20), primary_key=True, default="")
+    status = db.Column(db.String(20), primary_key=True, default="")
+    actor_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)  # loaded_by / acted_by / handled_by
+
+    cnt = db.Column(db.Integer, default=0, nullable=False)
+    amount = db.Column(db.Float, default=0.0, nullable=False)
+    bonus_cnt = db.Column(db.Integer, default=0, nullable=False)     # deposits with a bonus / signup bonuses claimed
+    bonus_amount = db.Column(db.Float, default=0.0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # dashboard totals: WHERE kind=? AND status IN (...)
+        db.Index("ix_daily_stats_kind_status", "kind", "status"),
+    )
+
+
+# ========================= Dead Letters =========================
+class DeadLetterJob(db.Model):
+    """
+    A provisioning / credit job that exhausted its retries.
+    Kept with enough payload to replay it later (see dead_letters.py).
+    """
+    __tablename__ = "dead_letter_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, index=True)     # id_request | credit
+    ref_id = db.Column(db.Integer, nullable=False, index=True)      # GameAccountRequest.id / DepositRequest.id
+    vendor = db.Column(db.String(40), default="unknown", index=True)
+    error_class = db.Column(db.String(20), default="other", index=True)  # captcha | login | timeout | config | other
+    error = db.Column(db.Text, nullable=True)
+    payload = db.Column(db.JSON, nullable=True)
+
+    # DEAD | VERIFY | REPLAYING | REPLAYED | RESOLVED
+    # VERIFY: the vendor call raised, so it may have gone through – never replayed
+    # until staff have checked the panel (see dead_letters.release).
+    status = db.Column(db.String(16), default="DEAD", index=True)
+    replay_count = db.Column(db.Integer, default=0, nullable=False)
+    last_replay_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    replayed_at = db.Column(db.DateTime, nullable=True)
+
 
 # ========================= Issued Game Accounts =========================
 class GameAccount(db.Model):
@@ -334,6 +530,11 @@ class GameAccount(db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # "does this player already have a login for this game?"
+        db.Index("ix_game_accounts_user_game", "user_id", "game_id"),
+    )
+
 
 # ========================= Ready Accounts Pool =========================
 class ReadyAccount(db.Model):
@@ -430,29 +631,86 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    __table_args__ = (
+        db.Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # unread badge / dedupe in notify(): small, only unread rows
+        db.Index("ix_notifications_user_unread", "user_id", "created_at",
+                 postgresql_where=db.text("is_read = false"),
+                 sqlite_where=db.text("is_read = 0")),
+    )
+
+
+class NotificationArchive(db.Model):
+    """
+    Read notifications past the retention window, moved out of the hot
+    table by notification_retention.archive_read (NOTIFY_ARCHIVE_MODE=table).
+    Keeps the original id; no FK so deleting a user never has to touch it.
+    """
+    __tablename__ = "notifications_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    message = db.Column(db.String(300), nullable=False)
+    is_read = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_notifications_archive_user_created", "user_id", "created_at"),
+    )
+
+
+NOTIFY_DEDUP_WINDOW = timedelta(minutes=5)
+NOTIFY_CHUNK = 1000  # ids per IN (...) / rows per INSERT batch
+
+
+def notify_many(user_ids, message: str, commit: bool = True) -> int:
+    """
+    Send `message` to every user in `user_ids` with one dedup SELECT and
+    batched INSERTs per NOTIFY_CHUNK recipients (instead of a SELECT and a
+    COMMIT per recipient). Users who already have the identical unread
+    message from the last 5 minutes are skipped. Returns rows inserted.
+    """
+    ids = list(dict.fromkeys(int(u) for u in user_ids if u))
+    if not ids:
+        return 0
+
+    now = datetime.utcnow()
+    inserted = 0
+    for i in range(0, len(ids), NOTIFY_CHUNK):
+        chunk = ids[i:i + NOTIFY_CHUNK]
+        try:
+            recent = {
+                uid for (uid,) in db.session.query(Notification.user_id)
+                .filter(Notification.user_id.in_(chunk))
+                .filter(Notification.message == message)
+                .filter(Notification.is_read == False)  # noqa: E712
+                .filter(Notification.created_at >= now - NOTIFY_DEDUP_WINDOW)
+                .distinct()
+            }
+        except Exception:
+            db.session.rollback()
+            recent = set()
+        rows = [
+            {"user_id": uid, "message": message, "is_read": False, "created_at": now}
+            for uid in chunk if uid not in recent
+        ]
+        if rows:
+            db.session.execute(Notification.__table__.insert(), rows)
+            inserted += len(rows)
+            queue_unread_deltas(db.session, {r["user_id"]: 1 for r in rows})  # Core insert: no flush hook
+
+    if commit:
+        db.session.commit()
+    return inserted
+
 
 def notify(user_id: int, message: str):
     """
     Create a notification unless an identical unread one already exists
     very recently (5 minutes). This prevents accidental duplicates.
     """
-    try:
-        recent = (
-            Notification.query
-            .filter(Notification.user_id == user_id)
-            .filter(Notification.message == message)
-            .filter(Notification.is_read == False)  # noqa: E712
-            .order_by(Notification.created_at.desc())
-            .first()
-        )
-        if recent and (datetime.utcnow() - (recent.created_at or datetime.utcnow())) < timedelta(minutes=5):
-            return
-    except Exception:
-        db.session.rollback()
-
-    n = Notification(user_id=user_id, message=message, is_read=False, created_at=datetime.utcnow())
-    db.session.add(n)
-    db.session.commit()
+    notify_many([user_id], message)
 
 
 # ========================= Broadcast Chat (legacy/optional) =========================
@@ -480,6 +738,10 @@ class ChatMessage(db.Model):
 
 
 # ========================= Private DM Chat =========================
+DM_SNIPPET_LEN = 120
+DM_STAFF_ROLES = ("EMPLOYEE", "ADMIN")
+
+
 class DMThread(db.Model):
     __tablename__ = "dm_threads"
 
@@ -490,6 +752,12 @@ class DMThread(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_msg_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Denormalized from dm_messages by _maintain_dm_threads (same transaction
+    # as the insert) so inbox lists never touch the messages table.
+    last_msg_snippet = db.Column(db.String(DM_SNIPPET_LEN), nullable=True)
+    last_sender_role = db.Column(db.String(20), nullable=True)
+    unread_for_staff = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    unread_for_player = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self) -> str:
         return f"<DMThread {self.id} player={self.player_id} emp={self.employee_id} {self.status}>"
@@ -507,6 +775,11 @@ class DMMessage(db.Model):
     source = db.Column(db.String(20), default='website')  # 'website' or 'telegram'
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    __table_args__ = (
+        # thread history / polling: WHERE thread_id=? [AND id > ?] ORDER BY id
+        db.Index("ix_dm_messages_thread_id_id", "thread_id", "id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -539,92 +812,682 @@ def _generate_ref_code_base(name: str) -> str:
     return base
 
 
+# Referral codes are "AB" + a scrambled base-32 encoding of
+# (user_id, generation): unique by construction, so allocation never has to
+# probe the table. Generations let "new code" rotate through
+# REF_CODE_GENERATIONS codes per user. Legacy codes (AB1234) are 6 chars,
+# these are at least 8, so the two never collide.
+_REF_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford: no I/L/O/U
+_REF_MULT = 0x2F0A3B7   # odd → a bijection mod 32**width
+_REF_OFFSET = 0x15C3E29
+REF_CODE_WIDTH = 6       # 32**6 / 16 ≈ 67M users before codes grow a char
+REF_CODE_GENERATIONS = 16
+
+
+def _ref_modulus(n: int) -> tuple[int, int]:
+    width = REF_CODE_WIDTH
+    while n >= 32 ** width:
+        width += 1
+    return width, 32 ** width
+
+
+def referral_code_for(user_id: int, name: str, generation: int = 0) -> str:
+    n = int(user_id) * REF_CODE_GENERATIONS + generation % REF_CODE_GENERATIONS
+    width, m = _ref_modulus(n)
+    x = (n * _REF_MULT + _REF_OFFSET) % m
+    suffix = ""
+    for _ in range(width):
+        x, r = divmod(x, 32)
+        suffix = _REF_ALPHABET[r] + suffix
+    return _generate_ref_code_base(name) + suffix
+
+
+def _referral_generation(user_id: int, code: str):
+    """Generation encoded in `code` if it is this user's allocated code, else None."""
+    suffix = (code or "")[2:].upper()
+    if len(suffix) < REF_CODE_WIDTH or any(c not in _REF_ALPHABET for c in suffix):
+        return None
+    x = 0
+    for c in suffix:
+        x = x * 32 + _REF_ALPHABET.index(c)
+    m = 32 ** len(suffix)
+    n = (x - _REF_OFFSET) * pow(_REF_MULT, -1, m) % m
+    if n // REF_CODE_GENERATIONS != int(user_id):
+        return None
+    return n % REF_CODE_GENERATIONS
+
+
+def next_referral_code(user_id: int, name: str, current: str | None = None) -> str:
+    """The code after `current` for this user (generation 0 for none / legacy codes)."""
+    gen = _referral_generation(user_id, current) if current else None
+    return referral_code_for(user_id, name, 0 if gen is None else gen + 1)
+
+
 def get_or_create_referral_for_user(user_id: int) -> ReferralCode:
     rec = ReferralCode.query.filter_by(user_id=user_id).first()
     if rec:
         return rec
 
     user = db.session.get(User, user_id)
-    base = _generate_ref_code_base(user.name if user else "")
-
-    while True:
-        suffix = f"{secrets.randbelow(10000):04d}"
-        code = f"{base}{suffix}"
-        if not ReferralCode.query.filter_by(code=code).first():
-            break
-
-    rec = ReferralCode(user_id=user_id, code=code)
+    rec = ReferralCode(user_id=user_id, code=referral_code_for(user_id, user.name if user else ""))
     db.session.add(rec)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:  # a concurrent request created it first
+        db.session.rollback()
+        rec = ReferralCode.query.filter_by(user_id=user_id).one()
     return rec
 
 
 # =============== AUTO-FULFILL GAME REQUESTS ON INSERT ===============
+# after_insert runs mid-flush: ORM changes made here (sess.add, attribute
+# sets) are not part of the flush plan, so everything goes through the
+# connection. The claim is a conditional UPDATE – two requests racing for
+# the same ReadyAccount can't both win it – and the request only turns
+# APPROVED once the claim matched a row.
+_AUTOFULFILL_CANDIDATES = 5
+
+
+def _claim_ready_account(connection, game_id: int, user_id: int, now: datetime):
+    ra = ReadyAccount.__table__
+    unclaimed = (ra.c.is_claimed == False) | ra.c.is_claimed.is_(None)  # noqa: E712
+    candidates = connection.execute(
+        ra.select().where(ra.c.game_id == game_id, unclaimed)
+        .order_by(ra.c.created_at.asc(), ra.c.id.asc())
+        .limit(_AUTOFULFILL_CANDIDATES)
+    ).all()
+    for row in candidates:
+        res = connection.execute(
+            ra.update().where(ra.c.id == row.id, unclaimed)
+            .values(is_claimed=True, claimed_by=user_id, claimed_at=now)
+        )
+        if res.rowcount == 1:
+            return row
+    return None
+
+
 @event.listens_for(GameAccountRequest, "after_insert")
 def _autofulfill_game_request_on_insert(mapper, connection, req: GameAccountRequest):
+    if not req.game_id or not req.user_id or (req.status or "PENDING") != "PENDING":
+        return
+    now = datetime.utcnow()
     try:
-        sess = object_session(req)
-        if sess is None or not req or not req.game_id or not req.user_id:
-            return
+        with connection.begin_nested():  # a failure here never takes the request insert with it
+            ra = _claim_ready_account(connection, req.game_id, req.user_id, now)
+            if ra is None:
+                return
+            rq = GameAccountRequest.__table__
+            connection.execute(rq.update().where(rq.c.id == req.id)
+                               .values(status="APPROVED", approved_at=now, updated_at=now))
+
+            ga = GameAccount.__table__
+            login = {"account_username": ra.username or "", "account_password": ra.password or "",
+                     "extra": ra.note or "", "request_id": req.id, "issued_at": now}
+            acc_id = connection.execute(
+                ga.select().with_only_columns(ga.c.id)
+                .where(ga.c.user_id == req.user_id, ga.c.game_id == req.game_id)
+                .order_by(ga.c.id.asc()).limit(1)
+            ).scalar()
+            if acc_id:
+                connection.execute(ga.update().where(ga.c.id == acc_id).values(**login))
+            else:
+                connection.execute(ga.insert().values(user_id=req.user_id, game_id=req.game_id,
+                                                      created_at=now, **login))
+
+            g = Game.__table__
+            game_name = connection.execute(
+                g.select().with_only_columns(g.c.name).where(g.c.id == req.game_id)
+            ).scalar() or f"Game #{req.game_id}"
+            connection.execute(Notification.__table__.insert().values(
+                user_id=req.user_id,
+                message=f"✅ Your login for {game_name} is ready. Check My Logins.",
+                is_read=False,
+                created_at=now,
+            ))
+            import player_search  # no import cycle at load time; the login is part of the document
+            player_search.reindex(connection, [req.user_id])
+    except Exception:
+        # never block the original insert; the request stays PENDING for the worker
+        return
+
+    # keep the in-memory object in step with the row without dirtying it
+    set_committed_value(req, "status", "APPROVED")
+    set_committed_value(req, "approved_at", now)
+    set_committed_value(req, "updated_at", now)
+    sess = object_session(req)
+    if sess is not None:
+        queue_unread_deltas(sess, {req.user_id: 1})  # Core insert: no flush hook
+
+
+# =============== PLAYER STATS: same-transaction maintenance ===============
+DEPOSIT_DONE = "LOADED"
+WITHDRAW_DONE = "PAID"
+
+
+def _status_change(obj):
+    """(was_done, is_done) for the status attribute, or None if untouched."""
+    hist = sa_inspect(obj).attrs.status.history
+    if not hist.has_changes():
+        return None
+    old = hist.deleted[0] if hist.deleted else None
+    return old, obj.status
+
+
+def _done_before_after(obj, done: str, is_new: bool) -> tuple[bool, bool]:
+    ch = _status_change(obj)
+    if ch is None:
+        is_done = not is_new and obj.status == done
+        return is_done, is_done
+    return ch[0] == done, ch[1] == done
+
+
+def _amounts_changed(obj, attrs) -> bool:
+    state = sa_inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
 
-        q = (
-            sess.query(ReadyAccount)
-            .filter(ReadyAccount.game_id == req.game_id)
-            .order_by(ReadyAccount.created_at.asc())
+def _add_deposit(d: dict, get, sign: int):
+    bonus = float(get("bonus_amount") or 0)
+    d["deposit_count"] += sign
+    d["deposit_sum"] += sign * float(get("amount") or 0)
+    d["bonus_count"] += sign * (1 if bonus > 0 else 0)
+    d["bonus_sum"] += sign * bonus
+
+
+def _stats_deltas(session) -> dict:
+    """
+    Per-user deltas for this flush. A row that was done (LOADED / PAID) before
+    the flush is taken out with its old amounts, a row that is done after it
+    goes in with the new ones – so transitions, reversals and amount or bonus
+    edits on a LOADED deposit all net out correctly.
+    """
+    deltas: dict[int, dict] = {}
+    now = datetime.utcnow()
+
+    def _d(uid):
+        return deltas.setdefault(uid, {
+            "deposit_count": 0, "deposit_sum": 0.0, "bonus_count": 0, "bonus_sum": 0.0,
+            "withdraw_count": 0, "withdraw_sum": 0.0,
+            "deposit_at": None, "withdraw_at": None, "reversed": False,
+        })
+
+    new = set(session.new)
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, DepositRequest) and obj.user_id:
+            was, is_ = _done_before_after(obj, DEPOSIT_DONE, obj in new)
+            if not (was or is_) or (was and is_ and not _amounts_changed(obj, ("amount", "bonus_amount"))):
+                continue
+            d = _d(obj.user_id)
+            if was:
+                _add_deposit(d, _committed_getter(obj), -1)
+            if is_:
+                _add_deposit(d, lambda n: getattr(obj, n), 1)
+            if is_ and not was:
+                d["deposit_at"] = obj.loaded_at or now
+            d["reversed"] |= was and not is_
+        elif isinstance(obj, WithdrawRequest) and obj.user_id:
+            was, is_ = _done_before_after(obj, WITHDRAW_DONE, obj in new)
+            if not (was or is_) or (was and is_ and not _amounts_changed(obj, ("amount",))):
+                continue
+            d = _d(obj.user_id)
+            if was:
+                d["withdraw_count"] -= 1
+                d["withdraw_sum"] -= float(_committed_getter(obj)("amount") or 0)
+            if is_:
+                d["withdraw_count"] += 1
+                d["withdraw_sum"] += float(obj.amount or 0)
+            if is_ and not was:
+                d["withdraw_at"] = obj.acted_at or now
+            d["reversed"] |= was and not is_
+    return deltas
+
+
+def bump_player_stats(connection, user_id: int, d: dict):
+    """Atomic upsert: counters are added (col = col + delta), never read-modify-written."""
+    t = PlayerStats.__table__
+    now = datetime.utcnow()
+    values = {
+        "user_id": user_id,
+        "deposit_count": d["deposit_count"], "deposit_sum": d["deposit_sum"],
+        "bonus_count": d["bonus_count"], "bonus_sum": d["bonus_sum"],
+        "withdraw_count": d["withdraw_count"], "withdraw_sum": d["withdraw_sum"],
+        "first_deposit_at": d["deposit_at"], "last_deposit_at": d["deposit_at"],
+        "last_withdraw_at": d["withdraw_at"],
+        "updated_at": now,
+    }
+    counters = ("deposit_count", "deposit_sum", "bonus_count", "bonus_sum", "withdraw_count", "withdraw_sum")
+    set_ = {c: t.c[c] + values[c] for c in counters}
+    set_["first_deposit_at"] = sa_func.coalesce(t.c.first_deposit_at, values["first_deposit_at"])
+    set_["last_deposit_at"] = sa_func.coalesce(values["last_deposit_at"], t.c.last_deposit_at)
+    set_["last_withdraw_at"] = sa_func.coalesce(values["last_withdraw_at"], t.c.last_withdraw_at)
+    set_["updated_at"] = now
+
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "postgres", "sqlite"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as _insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as _insert
+        stmt = _insert(t).values(**values).on_conflict_do_update(index_elements=[t.c.user_id], set_=set_)
+        connection.execute(stmt)
+        return
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as _insert
+        connection.execute(_insert(t).values(**values).on_duplicate_key_update(**set_))
+        return
+    res = connection.execute(t.update().where(t.c.user_id == user_id).values(**set_))
+    if not res.rowcount:
+        connection.execute(t.insert().values(**values))
+
+
+# A reversal may take away the first or last done row, which the additive
+# upsert can't know: re-derive the timestamps from history for that player,
+# the same way player_stats.BACKFILL_SQL does.
+_DONE_DEPOSIT_TIMES = """
+    SELECT COALESCE(loaded_at, created_at) AS at FROM deposit_requests
+    WHERE user_id = :uid AND status = 'LOADED'
+    UNION ALL
+    SELECT COALESCE(settled_at, created_at) FROM request_archive
+    WHERE kind = 'deposit' AND user_id = :uid AND status = 'LOADED'
+"""
+_PLAYER_STATS_TIMES_SQL = f"""
+UPDATE player_stats SET
+    first_deposit_at = (SELECT MIN(at) FROM ({_DONE_DEPOSIT_TIMES}) dep),
+    last_deposit_at = (SELECT MAX(at) FROM ({_DONE_DEPOSIT_TIMES}) dep),
+    last_withdraw_at = (SELECT MAX(at) FROM (
+        SELECT COALESCE(acted_at, updated_at, created_at) AS at FROM withdraw_requests
+        WHERE user_id = :uid AND status = 'PAID'
+        UNION ALL
+        SELECT COALESCE(settled_at, created_at) FROM request_archive
+        WHERE kind = 'withdraw' AND user_id = :uid AND status = 'PAID'
+    ) wd)
+WHERE user_id = :uid
+"""
+
+
+def recompute_player_stat_times(connection, user_id: int):
+    connection.execute(db.text(_PLAYER_STATS_TIMES_SQL), {"uid": user_id})
+
+
+# active_history: load the old status on assignment even when the row was
+# expired (after commit), so LOADED -> REJECTED is seen as a reversal.
+@event.listens_for(DepositRequest.status, "set", active_history=True)
+@event.listens_for(WithdrawRequest.status, "set", active_history=True)
+def _status_active_history(target, value, oldvalue, initiator):
+    return value
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_player_stats(session, flush_context):
+    deltas = _stats_deltas(session)
+    if not deltas:
+        return
+    conn = session.connection()
+    for user_id, d in deltas.items():
+        bump_player_stats(conn, user_id, d)
+        if d["reversed"]:
+            recompute_player_stat_times(conn, user_id)
+
+
+# =============== DAILY STATS: same-transaction maintenance ===============
+EPOCH_DAY = date(1970, 1, 1)  # bucket for rows without created_at (same in daily_stats.FACTS_SQL)
+
+
+def _deposit_fact(get):
+    bonus = float(get("bonus_amount") or 0)
+    return ("deposit", get("game_id") or 0, get("method") or "", get("status") or "",
+            get("loaded_by") or 0, float(get("amount") or 0), 1 if bonus > 0 else 0, bonus)
+
+
+def _withdraw_fact(get):
+    return ("withdraw", get("game_id") or 0, get("method") or "", get("status") or "",
+            get("acted_by") or 0, float(get("amount") or 0), 0, 0.0)
+
+
+def _id_request_fact(get):
+    return ("id_request", get("game_id") or 0, "", get("status") or "",
+            get("handled_by") or get("approved_by_id") or 0, 0.0, 0, 0.0)
+
+
+def _user_fact(get):
+    claimed = bool(get("signup_bonus_claimed"))
+    return ("user", 0, "", get("role") or "", 0, 0.0,
+            1 if claimed else 0, float(get("signup_bonus_amount") or 0) if claimed else 0.0)
+
+
+# (model, attributes the fact reads, fact)
+_DAILY_FACTS = (
+    (DepositRequest, ("created_at", "game_id", "method", "status", "loaded_by", "amount", "bonus_amount"),
+     _deposit_fact),
+    (WithdrawRequest, ("created_at", "game_id", "method", "status", "acted_by", "amount"), _withdraw_fact),
+    (GameAccountRequest, ("created_at", "game_id", "status", "handled_by", "approved_by_id"), _id_request_fact),
+    (User, ("created_at", "role", "signup_bonus_claimed", "signup_bonus_amount"), _user_fact),
+)
+
+
+def _daily_spec(obj):
+    for spec in _DAILY_FACTS:
+        if isinstance(obj, spec[0]):
+            return spec
+    return None
+
+
+def _committed_getter(obj):
+    """Attribute values as they were before this flush."""
+    state = sa_inspect(obj)
+
+    def get(name):
+        hist = state.attrs[name].history
+        if not hist.has_changes():
+            return getattr(obj, name)
+        return hist.deleted[0] if hist.deleted else None
+    return get
+
+
+def _add_fact(deltas: dict, fact_fn, get, sign: int):
+    kind, game_id, method, status, actor_id, amount, bonus_cnt, bonus_amount = fact_fn(get)
+    created = get("created_at")
+    key = (created.date() if created else EPOCH_DAY, kind, game_id, method, status, actor_id)
+    d = deltas.setdefault(key, [0, 0.0, 0, 0.0])
+    d[0] += sign
+    d[1] += sign * amount
+    d[2] += sign * bonus_cnt
+    d[3] += sign * bonus_amount
+
+
+def _daily_deltas(session) -> dict:
+    deltas: dict[tuple, list] = {}
+    for obj in session.new:
+        spec = _daily_spec(obj)
+        if spec:
+            _add_fact(deltas, spec[2], lambda n, o=obj: getattr(o, n), 1)
+    for obj in session.dirty:
+        spec = _daily_spec(obj)
+        if not spec:
+            continue
+        state = sa_inspect(obj)
+        if not any(state.attrs[a].history.has_changes() for a in spec[1]):
+            continue
+        _add_fact(deltas, spec[2], _committed_getter(obj), -1)
+        _add_fact(deltas, spec[2], lambda n, o=obj: getattr(o, n), 1)
+    for obj in session.deleted:
+        spec = _daily_spec(obj)
+        # the row is gone: only values still in memory can be read
+        if spec and not (sa_inspect(obj).unloaded & set(spec[1])):
+            _add_fact(deltas, spec[2], _committed_getter(obj), -1)
+    return {k: v for k, v in deltas.items() if any(v)}
+
+
+def bump_daily_stats(connection, deltas: dict):
+    """Atomic upsert of {(day, kind, game_id, method, status, actor_id): [cnt, amount, bonus_cnt, bonus_amount]}."""
+    if not deltas:
+        return
+    t = DailyStat.__table__
+    now = datetime.utcnow()
+    rows = [
+        {"day": day, "kind": kind, "game_id": game_id, "method": method, "status": status, "actor_id": actor_id,
+         "cnt": d[0], "amount": d[1], "bonus_cnt": d[2], "bonus_amount": d[3], "updated_at": now}
+        for (day, kind, game_id, method, status, actor_id), d in deltas.items()
+    ]
+    counters = ("cnt", "amount", "bonus_cnt", "bonus_amount")
+    keys = ("day", "kind", "game_id", "method", "status", "actor_id")
+
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "postgres", "sqlite"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as _insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as _insert
+        stmt = _insert(t)
+        set_ = {c: t.c[c] + stmt.excluded[c] for c in counters}
+        set_["updated_at"] = stmt.excluded.updated_at
+        connection.execute(stmt.on_conflict_do_update(index_elements=[t.c[k] for k in keys], set_=set_), rows)
+        return
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as _insert
+        stmt = _insert(t)
+        set_ = {c: t.c[c] + stmt.inserted[c] for c in counters}
+        set_["updated_at"] = stmt.inserted.updated_at
+        connection.execute(stmt.on_duplicate_key_update(**set_), rows)
+        return
+    for row in rows:
+        match = [t.c[k] == row[k] for k in keys]
+        res = connection.execute(
+            t.update().where(*match).values(
+                **{c: t.c[c] + row[c] for c in counters}, updated_at=now)
         )
-        if hasattr(ReadyAccount, "is_claimed"):
-            q = q.filter(ReadyAccount.is_claimed == False)  # noqa: E712
+        if not res.rowcount:
+            connection.execute(t.insert().values(**row))
+
 
-        ra = q.first()
-        if not ra:
+def shift_daily_stat(connection, obj, old: dict, new: dict):
+    """
+    Move `obj` between buckets for a change made with a bulk UPDATE, which
+    the after_flush hook never sees (e.g. id_requests' atomic claim).
+    """
+    spec = _daily_spec(obj)
+    if not spec:
+        return
+    deltas: dict[tuple, list] = {}
+    _add_fact(deltas, spec[2], lambda n: old[n] if n in old else getattr(obj, n), -1)
+    _add_fact(deltas, spec[2], lambda n: new[n] if n in new else getattr(obj, n), 1)
+    bump_daily_stats(connection, {k: v for k, v in deltas.items() if any(v)})
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Same reason as _status_active_history: the "before" bucket needs the old
+# values even when the row was expired by a commit.
+for _model, _attrs, _fn in _DAILY_FACTS:
+    for _attr in _attrs:
+        event.listen(getattr(_model, _attr), "set", _keep_old_value, active_history=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_daily_stats(session, flush_context):
+    deltas = _daily_deltas(session)
+    if deltas:
+        bump_daily_stats(session.connection(), deltas)
+
+
+# =============== PLAYER SEARCH: same-transaction reindex ===============
+# columns that end up in player_search's document, per model
+_SEARCH_FIELDS = (
+    (User, ("name", "email", "mobile", "telegram_username")),
+    (ReferralCode, ("code", "user_id")),
+    (GameAccount, ("account_username", "user_id")),
+)
+
+
+def _search_user_ids(session) -> set:
+    ids = set()
+    groups = (("new", session.new), ("dirty", session.dirty), ("deleted", session.deleted))
+    for group, objs in groups:
+        for obj in objs:
+            spec = next((f for m, f in _SEARCH_FIELDS if isinstance(obj, m)), None)
+            if spec is None:
+                continue
+            is_user = isinstance(obj, User)
+            state = sa_inspect(obj)
+            if group == "deleted":  # the row is gone: no lazy loads
+                uid = state.identity[0] if is_user else state.dict.get("user_id")
+            else:
+                uid = obj.id if is_user else obj.user_id
+            if group == "dirty":
+                if not any(state.attrs[f].history.has_changes() for f in spec):
+                    continue
+                if not is_user:  # moved to another user: both documents change
+                    ids.update(u for u in state.attrs.user_id.history.deleted if u)
+            if uid:
+                ids.add(uid)
+    return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_player_search(session, flush_context):
+    ids = _search_user_ids(session)
+    if ids:
+        import player_search  # no import cycle at load time
+        player_search.reindex(session.connection(), ids)
+
+
+# =============== DEAD LETTERS: a LOADED deposit closes its credit job ===============
+DEAD_LETTER_OPEN = ("DEAD", "VERIFY", "REPLAYING")
+
+
+@event.listens_for(Session, "after_flush")
+def _resolve_credit_dead_letters(session, flush_context):
+    ids = [o.id for o in session.dirty
+           if isinstance(o, DepositRequest) and _done_before_after(o, DEPOSIT_DONE, False) == (False, True)]
+    if ids:
+        session.connection().execute(
+            DeadLetterJob.__table__.update()
+            .where(DeadLetterJob.kind == "credit", DeadLetterJob.ref_id.in_(ids),
+                   DeadLetterJob.status.in_(DEAD_LETTER_OPEN))
+            .values(status="RESOLVED")
+        )
+
+
+# =============== SETTINGS SNAPSHOTS: bump the version after commit ===============
+@event.listens_for(Session, "after_flush")
+def _note_settings_change(session, flush_context):
+    for objs in (session.new, session.dirty, session.deleted):
+        if any(isinstance(o, (PaymentSettings, BonusSettings)) for o in objs):
+            session.info["settings_changed"] = True
             return
 
-        acc = (
-            sess.query(GameAccount)
-            .filter(GameAccount.user_id == req.user_id, GameAccount.game_id == req.game_id)
-            .first()
+
+@event.listens_for(Session, "after_commit")
+def _bump_settings_version(session):
+    if session.info.pop("settings_changed", False):
+        import settings_cache  # no import cycle at load time
+        settings_cache.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_settings_change(session):
+    session.info.pop("settings_changed", None)
+
+
+# =============== UNREAD BADGE COUNTERS: applied after commit ===============
+def queue_unread_deltas(session, deltas: dict):
+    """Adjust unread_counts by {user_id: delta} once `session` commits (dropped on rollback)."""
+    pending = session.info.setdefault("unread_deltas", {})
+    for uid, d in deltas.items():
+        if uid and d:
+            pending[uid] = pending.get(uid, 0) + d
+
+
+def _unread_deltas(session) -> dict:
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] = deltas.get(obj.user_id, 0) + 1
+    for obj in session.dirty:
+        if not isinstance(obj, Notification):
+            continue
+        hist = sa_inspect(obj).attrs.is_read.history
+        if hist.added and hist.deleted and bool(hist.added[0]) != bool(hist.deleted[0]):
+            deltas[obj.user_id] = deltas.get(obj.user_id, 0) + (-1 if hist.added[0] else 1)
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            state = sa_inspect(obj)  # the row is gone: no lazy loads
+            if "is_read" not in state.unloaded and not state.dict.get("is_read"):
+                uid = state.dict.get("user_id")
+                deltas[uid] = deltas.get(uid, 0) - 1
+    return deltas
+
+
+# Same reason as _status_active_history: a read flip needs the old value.
+event.listen(Notification.is_read, "set", _keep_old_value, active_history=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_unread_changes(session, flush_context):
+    deltas = _unread_deltas(session)
+    if deltas:
+        queue_unread_deltas(session, deltas)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_unread_deltas(session):
+    deltas = session.info.pop("unread_deltas", None)
+    if deltas:
+        import unread_counts  # no import cycle at load time
+        unread_counts.apply(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_unread_deltas(session):
+    session.info.pop("unread_deltas", None)
+
+
+# ---------------- dm_threads denormalized last message / unread ----------------
+
+def _dm_thread_updates(session) -> list:
+    """One row of bind values per thread that got new messages in this flush."""
+    by_thread: dict[int, list] = {}
+    for obj in session.new:
+        if isinstance(obj, DMMessage) and obj.thread_id:
+            by_thread.setdefault(obj.thread_id, []).append(obj)
+
+    rows = []
+    for thread_id, msgs in by_thread.items():
+        msgs.sort(key=lambda m: m.id or 0)
+        # A reply means the sender's side has read the thread: their own
+        # counter restarts, the other side's counter grows.
+        staff_keep, staff_n, player_keep, player_n = 1, 0, 1, 0
+        for m in msgs:
+            if (m.sender_role or "").upper() in DM_STAFF_ROLES:
+                staff_keep, staff_n = 0, 0
+                player_n += 1
+            else:
+                player_keep, player_n = 0, 0
+                staff_n += 1
+        last = msgs[-1]
+        rows.append({
+            "tid": thread_id,
+            "snippet": (last.body or "")[:DM_SNIPPET_LEN],
+            "role": (last.sender_role or "").upper() or None,
+            "at": last.created_at or datetime.utcnow(),
+            "staff_keep": staff_keep, "staff_n": staff_n,
+            "player_keep": player_keep, "player_n": player_n,
+        })
+    return rows
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_dm_threads(session, flush_context):
+    rows = _dm_thread_updates(session)
+    if not rows:
+        return
+    t = DMThread.__table__
+    stmt = (
+        t.update()
+        .where(t.c.id == bindparam("tid"))
+        .values(
+            last_msg_snippet=bindparam("snippet"),
+            last_sender_role=bindparam("role"),
+            last_msg_at=bindparam("at"),
+            unread_for_staff=t.c.unread_for_staff * bindparam("staff_keep") + bindparam("staff_n"),
+            unread_for_player=t.c.unread_for_player * bindparam("player_keep") + bindparam("player_n"),
         )
-        if not acc:
-            acc = GameAccount(
-                user_id=req.user_id,
-                game_id=req.game_id,
-                created_at=datetime.utcnow(),
-            )
-            sess.add(acc)
-
-        acc.account_username = getattr(ra, "username", "")
-        acc.account_password = getattr(ra, "password", "")
-        acc.extra = (getattr(ra, "note", "") or "")
-
-        if hasattr(acc, "request_id"):
-            acc.request_id = req.id
-        if hasattr(acc, "issued_at"):
-            acc.issued_at = datetime.utcnow()
-
-        req.status = "APPROVED"
-        if hasattr(req, "approved_at"):
-            req.approved_at = datetime.utcnow()
-
-        if hasattr(ra, "is_claimed"):
-            ra.is_claimed = True
-            if hasattr(ra, "claimed_by"):
-                ra.claimed_by = req.user_id
-            if hasattr(ra, "claimed_at"):
-                ra.claimed_at = datetime.utcnow()
-        else:
-            sess.delete(ra)
-
-        game = sess.get(Game, req.game_id)
-        game_name = game.name if game else f"Game #{req.game_id}"
-        sess.add(Notification(
-            user_id=req.user_id,
-            message=f"✅ Your login for {game_name} is ready. Check My Logins.",
-            is_read=False,
-            created_at=datetime.utcnow(),
-        ))
-    except Exception:
-        # never block the original insert
-        pass
+    )
+    # executemany: a broadcast to N threads is one round-trip, not N.
+    session.connection().execute(stmt, rows)
+
+
+def mark_dm_thread_read(thread: DMThread, staff: bool) -> bool:
+    """Zero the reader's unread counter; True when something changed (caller commits)."""
+    if staff and thread.unread_for_staff:
+        thread.unread_for_staff = 0
+        return True
+    if not staff and thread.unread_for_player:
+        thread.unread_for_player = 0
+        return True
+    return False
 
 
 # ========================= NEW: Bonus Helper Functions =========================
@@ -0,0 +1,266 @@
+# notification_retention.py
+"""
+Retention for the notifications table.
+
+Read notifications older than NOTIFY_RETENTION_DAYS are moved out of the
+hot table in batches of NOTIFY_ARCHIVE_BATCH, one short transaction each:
+
+  NOTIFY_ARCHIVE_MODE=table   INSERT into notifications_archive, DELETE
+  NOTIFY_ARCHIVE_MODE=jsonl   append to NOTIFY_ARCHIVE_DIR/notifications-YYYYMMDD.jsonl.gz,
+                              then DELETE (a crash between the two can leave
+                              a duplicate line, never a lost row)
+
+Unread notifications are never moved, however old.
+
+On Postgres the live table is range-partitioned by month on created_at
+(migration 0009). Each run also creates the partitions for the next
+NOTIFY_PARTITION_MONTHS_AHEAD months and drops monthly partitions that
+are past retention and already empty, so old months go away as files
+instead of as dead tuples waiting for VACUUM.
+
+Scheduled by Celery beat ("archive-notifications"). The report (rows
+moved, batches, seconds) is logged and returned.
+
+CLI:
+  python notification_retention.py run [--days 30] [--mode jsonl] [--dry-run]
+  python notification_retention.py partitions
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+from celery_app import celery, get_flask_app
+
+log = logging.getLogger("notification_retention")
+
+RETENTION_DAYS = int(os.getenv("NOTIFY_RETENTION_DAYS", "30"))
+BATCH = int(os.getenv("NOTIFY_ARCHIVE_BATCH", "5000"))
+ARCHIVE_MODE = os.getenv("NOTIFY_ARCHIVE_MODE", "table").strip().lower()
+ARCHIVE_DIR = os.getenv("NOTIFY_ARCHIVE_DIR", os.path.join(".data", "notifications_archive"))
+MONTHS_AHEAD = int(os.getenv("NOTIFY_PARTITION_MONTHS_AHEAD", "2"))
+
+_COLS = ("id", "user_id", "message", "is_read", "created_at")
+
+
+# ---------------------------------------------------------------------------
+# Archive
+# ---------------------------------------------------------------------------
+
+def _write_jsonl(rows, now: datetime) -> str:
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"notifications-{now:%Y%m%d}.jsonl.gz")
+    # gzip files may hold several members; appending keeps each batch atomic-ish
+    with gzip.open(path, "at", encoding="utf-8") as fh:
+        for r in rows:
+            fh.write(json.dumps({
+                "id": r.id, "user_id": r.user_id, "message": r.message, "is_read": bool(r.is_read),
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+                "archived_at": now.isoformat(),
+            }) + "\n")
+    return path
+
+
+def archive_read(days: int | None = None, batch: int | None = None, mode: str | None = None,
+                 max_batches: int | None = None, dry_run: bool = False) -> dict:
+    from models import db, NotificationArchive
+
+    days = RETENTION_DAYS if days is None else days
+    batch = batch or BATCH
+    mode = (mode or ARCHIVE_MODE).lower()
+    if mode not in ("table", "jsonl"):
+        raise ValueError(f"unknown archive mode {mode!r} (table | jsonl)")
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    select_sql = text(
+        "SELECT id, user_id, message, is_read, created_at FROM notifications "
+        "WHERE is_read = :t AND created_at < :cutoff "
+        "ORDER BY created_at LIMIT :n"
+    )
+    report = {"mode": mode, "cutoff": cutoff.isoformat(timespec="seconds"),
+              "rows": 0, "batches": 0, "files": [], "seconds": 0.0}
+    t0 = time.perf_counter()
+
+    if dry_run:
+        report["rows"] = db.session.execute(
+            text("SELECT COUNT(*) FROM notifications WHERE is_read = :t AND created_at < :cutoff"),
+            {"t": True, "cutoff": cutoff},
+        ).scalar() or 0
+        report["seconds"] = round(time.perf_counter() - t0, 2)
+        return report
+
+    while max_batches is None or report["batches"] < max_batches:
+        rows = db.session.execute(select_sql, {"t": True, "cutoff": cutoff, "n": batch}).all()
+        if not rows:
+            break
+        now = datetime.utcnow()
+        ids = [r.id for r in rows]
+        try:
+            if mode == "table":
+                db.session.execute(NotificationArchive.__table__.insert(), [
+                    {**{c: getattr(r, c) for c in _COLS}, "archived_at": now} for r in rows
+                ])
+            else:
+                path = _write_jsonl(rows, now)
+                if path not in report["files"]:
+                    report["files"].append(path)
+            db.session.execute(
+                text("DELETE FROM notifications WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report["rows"] += len(rows)
+        report["batches"] += 1
+        if len(rows) < batch:
+            break
+
+    report["seconds"] = round(time.perf_counter() - t0, 2)
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Postgres partitions
+# ---------------------------------------------------------------------------
+
+def _month_start(d: datetime) -> datetime:
+    return datetime(d.year, d.month, 1)
+
+
+def _next_month(d: datetime) -> datetime:
+    return datetime(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"notifications_p{month:%Y%m}"
+
+
+def is_partitioned(session) -> bool:
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications')"
+    )).scalar())
+
+
+def ensure_partitions(session, months_ahead: int | None = None) -> list[str]:
+    """Create the monthly partitions from this month to months_ahead ahead."""
+    if not is_partitioned(session):
+        return []
+    months_ahead = MONTHS_AHEAD if months_ahead is None else months_ahead
+    created = []
+    month = _month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        if not session.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar():
+            session.execute(text(
+                f"CREATE TABLE {name} PARTITION OF notifications "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = _next_month(month)
+    session.commit()
+    return created
+
+
+def drop_empty_partitions(session, days: int | None = None) -> list[str]:
+    """Drop monthly partitions that end before the retention cutoff and hold no rows."""
+    if not is_partitioned(session):
+        return []
+    days = RETENTION_DAYS if days is None else days
+    cutoff_month = _month_start(datetime.utcnow() - timedelta(days=days))
+    names = [n for (n,) in session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('notifications') AND c.relname LIKE 'notifications_p%'"
+    ))]
+    dropped = []
+    for name in sorted(names):
+        try:
+            month = datetime.strptime(name[len("notifications_p"):], "%Y%m")
+        except ValueError:
+            continue
+        if _next_month(month) > cutoff_month:
+            continue
+        if session.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).scalar():
+            continue  # still holds unread rows
+        session.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    session.commit()
+    return dropped
+
+
+# ---------------------------------------------------------------------------
+# Scheduled job
+# ---------------------------------------------------------------------------
+
+def run_retention(days: int | None = None, mode: str | None = None) -> dict:
+    from models import db
+    report = {"partitions_created": ensure_partitions(db.session)}
+    report.update(archive_read(days=days, mode=mode))
+    report["partitions_dropped"] = drop_empty_partitions(db.session, days=days)
+    log.info(
+        "notification retention: %d rows moved (%s) in %d batches, %.2fs; partitions +%d -%d",
+        report["rows"], report["mode"], report["batches"], report["seconds"],
+        len(report["partitions_created"]), len(report["partitions_dropped"]),
+    )
+    return report
+
+
+@celery.task(name="archive_notifications", queue="maintenance")
+def archive_notifications() -> dict:
+    app = get_flask_app()
+    with app.app_context():
+        return run_retention()
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="notifications retention / archival")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("run")
+    rp.add_argument("--days", type=int, default=None)
+    rp.add_argument("--mode", choices=("table", "jsonl"), default=None)
+    rp.add_argument("--dry-run", action="store_true")
+    sub.add_parser("partitions")
+    args = ap.parse_args(argv)
+
+    from app import app
+    from models import db
+    with app.app_context():
+        if args.cmd == "partitions":
+            if not is_partitioned(db.session):
+                print("notifications is not partitioned (Postgres only)")
+                return 0
+            print("created:", ensure_partitions(db.session) or "-")
+            for (name,) in db.session.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass('notifications') ORDER BY 1"
+            )):
+                print(" ", name)
+            return 0
+        if args.dry_run:
+            r = archive_read(days=args.days, mode=args.mode, dry_run=True)
+            print(f"would move {r['rows']} read notifications older than {r['cutoff']}")
+            return 0
+        r = run_retention(days=args.days, mode=args.mode)
+        print(f"✅ moved {r['rows']} rows ({r['mode']}) in {r['batches']} batches, {r['seconds']}s")
+        for f in r["files"]:
+            print(f"   {f}")
+        if r["partitions_created"] or r["partitions_dropped"]:
+            print(f"   partitions +{r['partitions_created']} -{r['partitions_dropped']}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
@@ -1,7 +1,7 @@
 # notifications.py
 from flask import Blueprint, render_template, redirect, url_for, abort
 from flask_login import login_required, current_user
-from models import db, Notification
+from models import db, Notification, queue_unread_deltas
 
 notify_bp = Blueprint("notifybp", __name__, url_prefix="/notifications")
 
@@ -39,8 +39,9 @@ def mark_read(note_id: int):
 @notify_bp.post("/read-all")
 @login_required
 def mark_all_read():
-    (Notification.query
-     .filter_by(user_id=current_user.id, is_read=False)
-     .update({"is_read": True}))
+    n = (Notification.query
+         .filter_by(user_id=current_user.id, is_read=False)
+         .update({"is_read": True}))
+    queue_unread_deltas(db.session, {current_user.id: -n})  # bulk UPDATE: no flush hook
     db.session.commit()
     return redirect(url_for("notifybp.list_notifications"))
\ No newline at end of file
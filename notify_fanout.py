@@ -0,0 +1,62 @@
+# notify_fanout.py
+"""
+One message to many users, without a query + commit per recipient.
+
+  notify_staff(msg)          every EMPLOYEE/ADMIN: one id SELECT + notify_many
+  fan_out(user_ids, msg)     inline up to FANOUT_INLINE_MAX recipients;
+                             larger lists go to the `fan_out_notifications`
+                             Celery task so the request that triggered it
+                             (e.g. a staff broadcast) returns immediately
+
+models.notify_many does the work: one dedup SELECT and batched INSERTs per
+NOTIFY_CHUNK recipients. If the broker is unreachable, fan_out falls back to
+running inline – a slow request beats a lost notification.
+
+Benchmark: python bench_notify.py
+"""
+
+import logging
+import os
+
+from celery_app import celery, get_flask_app
+from models import db, User, notify_many
+
+log = logging.getLogger("notify_fanout")
+
+FANOUT_INLINE_MAX = int(os.getenv("FANOUT_INLINE_MAX", "500"))
+FANOUT_PRIORITY = 8  # behind staff/first-deposit/vip/normal provisioning lanes
+
+STAFF_ROLES = ("EMPLOYEE", "ADMIN")
+
+
+def staff_ids() -> list[int]:
+    return [uid for (uid,) in db.session.query(User.id).filter(User.role.in_(STAFF_ROLES))]
+
+
+def notify_staff(message: str, commit: bool = True) -> int:
+    return notify_many(staff_ids(), message, commit=commit)
+
+
+def fan_out(user_ids, message: str) -> dict:
+    """Notify `user_ids`; returns {"mode": "inline"|"queued", "recipients": n[, "inserted": n]}."""
+    ids = list(dict.fromkeys(int(u) for u in user_ids if u))
+    if len(ids) > FANOUT_INLINE_MAX:
+        try:
+            fan_out_notifications.apply_async(args=[ids, message], priority=FANOUT_PRIORITY)
+            return {"mode": "queued", "recipients": len(ids)}
+        except Exception as e:
+            log.warning("fan-out enqueue failed (%s) – sending %d notifications inline", e, len(ids))
+    return {"mode": "inline", "recipients": len(ids), "inserted": notify_many(ids, message)}
+
+
+@celery.task(name="fan_out_notifications", queue="id_requests")
+def fan_out_notifications(user_ids: list, message: str) -> int:
+    app = get_flask_app()
+    with app.app_context():
+        try:
+            n = notify_many(user_ids, message)
+        except Exception:
+            db.session.rollback()
+            raise
+    log.info("fan-out: %d/%d notifications inserted", n, len(user_ids))
+    return n
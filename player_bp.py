@@ -7,8 +7,6 @@
 # -----------------------------------------------------------------------------
 
 from datetime import datetime, timedelta
-import re
-import random
 import os
 import time
 import logging
@@ -20,7 +18,9 @@ from flask import (
     redirect, url_for, flash, abort, current_app, jsonify
 )
 from flask_login import login_required, current_user
-from sqlalchemy import text
+from load_shed import low_priority
+import kv  # cached kv_store (promo / trending fallbacks)
+import settings_cache  # versioned PaymentSettings / BonusSettings snapshots
 
 from models import (
     db,
@@ -34,12 +34,12 @@ from models import (
     PaymentSettings,
     Notification,
     ReferralCode,
-    BonusSettings,  # NEW: Import BonusSetting model
     BonusRecord,   # NEW: Import BonusRecord model
     apply_bonus_to_deposit,  # NEW: Import bonus helper functions
     get_player_next_bonus
 )
 from models import notify
+from models import get_or_create_referral_for_user, next_referral_code  # id-derived referral codes
 from models import DepositRequest as Deposit  # back-compat alias
 
 # NOWPayments Crypto invoices
@@ -320,40 +320,6 @@ short_bp  = Blueprint("short_bp", __name__, url_prefix="")
 #                    SHARED UTILITIES / HELPERS
 # =============================================================================
 
-# ---- tiny KV fallback (for promo/trending text) ------------------------------
-def _ensure_kv():
-    try:
-        bind = db.session.get_bind()
-        dialect = bind.dialect.name
-        if dialect in ("postgresql", "postgres"):
-            db.session.execute(text("CREATE TABLE IF NOT EXISTS kv_store (key TEXT PRIMARY KEY, value TEXT)"))
-        elif dialect in ("mysql", "mariadb"):
-            db.session.execute(text(
-                "CREATE TABLE IF NOT EXISTS kv_store (`key` VARCHAR(191) PRIMARY KEY, `value` TEXT) "
-                "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
-            ))
-        else:
-            db.session.execute(text("CREATE TABLE IF NOT EXISTS kv_store (key TEXT PRIMARY KEY, value TEXT)"))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-def _kv_get(k: str) -> Optional[str]:
-    _ensure_kv()
-    try:
-        row = db.session.execute(text("SELECT value FROM kv_store WHERE key=:k"), {"k": k}).fetchone()
-        return row[0] if row else None
-    except Exception:
-        db.session.rollback()
-        return None
-
-def _kv_first(*keys, default: Optional[str] = None) -> Optional[str]:
-    for k in keys:
-        v = _kv_get(k)
-        if v not in (None, ""):
-            return v
-    return default
-
 # ---- uploads ----------------------------------------------------------------
 _ALLOWED_PROOF_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
 
@@ -396,11 +362,11 @@ def _player_like() -> bool:
     return current_user.is_authenticated and current_user.role in ("PLAYER", "ADMIN")
 
 def _get_settings():
-    s = db.session.get(PaymentSettings, 1)
+    s = settings_cache.payment()  # read-only snapshot
     if not s:
-        s = PaymentSettings(id=1, min_redeem=0, max_redeem=0)
-        db.session.add(s)
+        db.session.add(PaymentSettings(id=1, min_redeem=0, max_redeem=0))
         db.session.commit()
+        s = settings_cache.payment()
     return s
 
 def _first_attr(obj, *names, default=None):
@@ -486,14 +452,8 @@ def _approve_request(req: GameAccountRequest):
 # ==================== NEW BONUS HELPER FUNCTIONS ====================
 
 def _get_current_bonus_settings():
-    """Get current bonus settings from database"""
-    bonus_settings = BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()
-    if not bonus_settings:
-        # Create default settings if none exist
-        bonus_settings = BonusSettings()
-        db.session.add(bonus_settings)
-        db.session.commit()
-    return bonus_settings
+    """Current bonus settings (cached read-only snapshot)"""
+    return settings_cache.bonus()
 
 def _get_player_bonus_info(player_id: int):
     """Get comprehensive bonus info for a player"""
@@ -1190,14 +1150,14 @@ def player_dashboard():
         Notification.created_at.desc()
     ).limit(10).all()
 
-    promo_line1 = _first_attr(settings, *PROMO1_ALIASES, default=None) or _kv_first(*PROMO1_ALIASES, default="")
-    promo_line2 = _first_attr(settings, *PROMO2_ALIASES, default=None) or _kv_first(*PROMO2_ALIASES, default="")
+    promo_line1 = _first_attr(settings, *PROMO1_ALIASES, default=None) or kv.first(*PROMO1_ALIASES, default="")
+    promo_line2 = _first_attr(settings, *PROMO2_ALIASES, default=None) or kv.first(*PROMO2_ALIASES, default="")
     
     # 🔹 NEW: Get bonus settings and player bonus info
     bonus_settings = _get_current_bonus_settings()
     player_bonus_info = _get_player_bonus_info(current_user.id)
 
-    raw_csv = _first_attr(settings, *TREND_ALIASES, default=None) or (_kv_first(*TREND_ALIASES, default="") or "")
+    raw_csv = _first_attr(settings, *TREND_ALIASES, default=None) or (kv.first(*TREND_ALIASES, default="") or "")
     trending_ids: list[int] = []
     for token in str(raw_csv).split(","):
         t = token.strip()
@@ -1962,8 +1922,8 @@ def deposit_submit():
         f"{amount} via {method}{extra}{suffix}"
     )
 
-    for staff in User.query.filter(User.role.in_(("EMPLOYEE", "ADMIN"))).all():
-        notify(staff.id, staff_msg)
+    from notify_fanout import notify_staff  # lazy: pulls in celery
+    notify_staff(staff_msg)  # one dedup SELECT + one batched INSERT for all staff
 
     # Optional: Cash App invoice handoff (unchanged)
     if method == "CASHAPP" and create_cashapp_invoice:
@@ -2018,6 +1978,7 @@ def deposit_submit():
 
 @player_bp.get("/request/<int:req_id>/status.json", endpoint="request_status_json")
 @login_required
+@low_priority
 def request_status_json(req_id: int):
     req = db.session.get(GameAccountRequest, req_id)
     if not req or req.user_id != current_user.id:
@@ -2038,6 +1999,7 @@ def deposit_processing(dep_id: int):
 
 @player_bp.get("/deposit/<int:dep_id>/status.json", endpoint="deposit_status_json")
 @login_required
+@low_priority
 def deposit_status_json(dep_id: int):
     dep = db.session.get(DepositRequest, dep_id)
     if not dep or dep.user_id != current_user.id:
@@ -2138,8 +2100,8 @@ def withdraw_post():
         parts.append(acc_note)
     staff_msg = " | ".join(parts)
 
-    for staff in User.query.filter(User.role.in_(("EMPLOYEE", "ADMIN"))).all():
-        notify(staff.id, staff_msg)
+    from notify_fanout import notify_staff  # lazy: pulls in celery
+    notify_staff(staff_msg)  # one dedup SELECT + one batched INSERT for all staff
 
     # player in-site notification
     notify(current_user.id, f"Withdrawal request #{wr.id} submitted. You'll be notified once processed.")
@@ -2166,6 +2128,7 @@ def withdraw_post():
     
 @player_bp.get("/withdraw/status/<int:wr_id>")
 @login_required
+@low_priority
 def withdraw_status(wr_id: int):
     wr = db.session.get(WithdrawRequest, wr_id)
     if not wr or wr.user_id != current_user.id:
@@ -2256,26 +2219,12 @@ def withdraw_get():
 #                               REFERRALS
 # =============================================================================
 
-def _generate_ref_code_for(user: User) -> str:
-    base = "".join(re.findall(r"[A-Za-z]", (user.name or "").strip()))[:2].upper()
-    if len(base) < 2:
-        base = (base + "XX")[:2]
-    for _ in range(50):
-        num = random.randint(0, 9999)
-        code = f"{base}{num:04d}"
-        if not ReferralCode.query.filter_by(code=code).first():
-            return code
-    return f"RX{random.randint(0, 9999):04d}"
+def _generate_ref_code_for(user: User, current: str | None = None) -> str:
+    # derived from the user id (models.referral_code_for): unique without probing the table
+    return next_referral_code(user.id, user.name, current)
 
 def _ensure_referral_for(user_id: int) -> ReferralCode:
-    rc = ReferralCode.query.filter_by(user_id=user_id).first()
-    if rc:
-        return rc
-    user = db.session.get(User, user_id)
-    code = _generate_ref_code_for(user)
-    rc = ReferralCode(user_id=user_id, code=code, created_at=datetime.utcnow())
-    db.session.add(rc); db.session.commit()
-    return rc
+    return get_or_create_referral_for_user(user_id)
 
 @player_bp.get("/referral")
 @login_required
@@ -2301,7 +2250,7 @@ def referral_home():
           <div class="h3" style="letter-spacing:2px">{{ code }}</div>
           <p style="margin-top:10px">Share this link with your friends:</p>
           <input class="input" style="width:100%" value="{{ link }}" readonly onclick="this.select()">
-          <p class="muted" style="margin-top:10px">Format is first 2 letters of your name + 4 digits.</p>
+          <p class="muted" style="margin-top:10px">Format is first 2 letters of your name + 6 letters/digits.</p>
         </div>
       </div>
     {% endblock %}
@@ -2324,7 +2273,7 @@ def referral_new_code():
         rc = _ensure_referral_for(current_user.id)
         flash("Referral code created.", "success")
         return redirect(url_for("playerbp.referral_home"))
-    rc.code = _generate_ref_code_for(current_user); rc.created_at = datetime.utcnow()
+    rc.code = _generate_ref_code_for(current_user, rc.code); rc.created_at = datetime.utcnow()
     db.session.commit()
     flash("Referral code updated.", "success")
     return redirect(url_for("playerbp.referral_home"))
@@ -2332,12 +2281,13 @@ def referral_new_code():
 @player_bp.get("/ref/<string:code>")
 def referral_landing(code: str):
     code = (code or "").strip().upper()
-    rc = ReferralCode.query.filter_by(code=code).first()
-    if not rc:
+    rc_id = db.session.query(ReferralCode.id).filter_by(code=code).scalar()
+    if not rc_id:
         flash("Referral code not found.", "error")
         return redirect(url_for("auth.register_get"))
-    if hasattr(rc, "uses"):
-        rc.uses = (rc.uses or 0) + 1; db.session.commit()
+    # counted in Redis, deduped per visitor, flushed to referral_codes.clicks in batches
+    import referral_clicks  # lazy: pulls in celery
+    referral_clicks.record(rc_id, referral_clicks.visitor_key(request.remote_addr, request.user_agent.string))
     return redirect(url_for("auth.register_get") + f"?ref={code}")
 
 
@@ -0,0 +1,283 @@
+# player_search.py
+"""
+Indexed player search: name, email, mobile, telegram_username, referral
+code and game login usernames, as one lowercase document per user.
+
+  Postgres  player_search(user_id, doc) with a pg_trgm GIN index on doc:
+            `doc LIKE '%term%'` is an index scan, ranked by
+            word_similarity(term, doc)
+  SQLite    FTS5 table player_search_fts(doc) with the trigram tokenizer,
+            rowid = user id: MATCH on the quoted term, ranked by bm25
+  other     (or before migration 0012) the old LIKE over users
+
+A numeric term also matches that user id exactly, ranked first. Terms
+shorter than three characters can't use a trigram index; they fall back to
+a LIKE scan of the document table.
+
+The documents are kept current by models._maintain_player_search, which
+calls reindex() for every user whose name/email/mobile/telegram,
+referral code or game logins changed in the flush. Rebuild everything
+with `python player_search.py rebuild`.
+
+Two ways in:
+  search_user_ids  ranked, capped id list – "Find player" style lookups
+                   (Telegram bot)
+  user_filter      `column IN (every matching user)` – unranked and
+                   uncapped, for filtering another table (chat inbox,
+                   employee deposits ?q=, admin deposit search, cold
+                   storage search) so paging over it never loses rows
+
+CLI:
+  python player_search.py rebuild
+  python player_search.py query "jo@gma"
+Benchmark: python bench_search.py --users 500000
+"""
+
+import argparse
+import os
+import time
+from collections import defaultdict
+
+from sqlalchemy import column, false, inspect as sa_inspect, or_, select, table, text
+
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "2000"))  # rows ranked per query on Postgres
+REBUILD_BATCH = 5000
+
+_backends: dict = {}
+
+_pg_docs = table("player_search", column("user_id"), column("doc"))
+_fts_docs = table("player_search_fts", column("rowid"), column("doc"))
+
+
+def backend(connection) -> str:
+    """"pg_trgm" | "fts5" | "like" for this connection's database (cached per URL)."""
+    engine = connection.engine
+    key = str(engine.url)
+    if key not in _backends:
+        name = connection.dialect.name
+        tables = set(sa_inspect(connection).get_table_names())
+        if name == "postgresql" and "player_search" in tables:
+            _backends[key] = "pg_trgm"
+        elif name == "sqlite" and "player_search_fts" in tables:
+            _backends[key] = "fts5"
+        else:
+            _backends[key] = "like"
+    return _backends[key]
+
+
+# ---------------------------------------------------------------------------
+# Documents
+# ---------------------------------------------------------------------------
+
+def _doc(name, email, mobile, telegram_username, code, logins) -> str:
+    parts = [name, email, mobile, telegram_username, code, *logins]
+    return " ".join(p.strip() for p in parts if p and p.strip()).lower()
+
+
+def reindex(connection, user_ids) -> int:
+    """Recompute the documents of `user_ids` (deleted users are dropped). Caller's transaction."""
+    ids = sorted({int(u) for u in user_ids if u})
+    if not ids:
+        return 0
+    kind = backend(connection)
+    if kind == "like":
+        return 0
+
+    from models import GameAccount, ReferralCode, User
+    u, rc, ga = User.__table__, ReferralCode.__table__, GameAccount.__table__
+    users = connection.execute(
+        select(u.c.id, u.c.name, u.c.email, u.c.mobile, u.c.telegram_username).where(u.c.id.in_(ids))
+    ).all()
+    codes = dict(connection.execute(select(rc.c.user_id, rc.c.code).where(rc.c.user_id.in_(ids))).all())
+    logins = defaultdict(list)
+    for uid, login in connection.execute(
+        select(ga.c.user_id, ga.c.account_username).where(ga.c.user_id.in_(ids)).order_by(ga.c.id)
+    ):
+        logins[uid].append(login)
+
+    rows = [{"uid": r.id, "doc": _doc(r.name, r.email, r.mobile, r.telegram_username,
+                                      codes.get(r.id), logins.get(r.id, ()))} for r in users]
+    if kind == "pg_trgm":
+        gone = sorted(set(ids) - {r["uid"] for r in rows})
+        if gone:
+            connection.execute(text("DELETE FROM player_search WHERE user_id = ANY(:ids)"), {"ids": gone})
+        if rows:
+            connection.execute(text(
+                "INSERT INTO player_search (user_id, doc) VALUES (:uid, :doc) "
+                "ON CONFLICT (user_id) DO UPDATE SET doc = excluded.doc"
+            ), rows)
+    else:
+        # FTS5 has no upsert; rowid deletes are index lookups
+        connection.execute(text(f"DELETE FROM player_search_fts WHERE rowid IN ({','.join(map(str, ids))})"))
+        if rows:
+            connection.execute(text("INSERT INTO player_search_fts (rowid, doc) VALUES (:uid, :doc)"), rows)
+    return len(rows)
+
+
+def rebuild() -> int:
+    """Recompute every document, REBUILD_BATCH users per transaction."""
+    from models import db, User
+    last, total = 0, 0
+    while True:
+        ids = [uid for (uid,) in db.session.query(User.id).filter(User.id > last)
+               .order_by(User.id).limit(REBUILD_BATCH)]
+        if not ids:
+            break
+        total += reindex(db.session.connection(), ids)
+        db.session.commit()
+        last = ids[-1]
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def user_filter(col, term: str, role: str | None = "PLAYER"):
+    """
+    `col IN (SELECT id of every user matching term)`, for filtering deposits,
+    threads, ... by player. Unlike search_user_ids there is no cap and no
+    ranking, so keyset paging over the filtered table sees every match.
+    """
+    from models import db, User
+
+    term = (term or "").strip().lower()
+    if not term:
+        return false()
+    like = _like(term)
+    kind = backend(db.session.connection())
+    if kind == "pg_trgm":
+        cond = User.id.in_(select(_pg_docs.c.user_id).where(_pg_docs.c.doc.like(like)))
+    elif kind == "fts5":
+        doc = _fts_docs.c.doc
+        match = doc.op("MATCH")(_fts_phrase(term)) if len(term) >= 3 else doc.like(like, escape="\\")
+        cond = User.id.in_(select(_fts_docs.c.rowid).where(match))
+    else:
+        cond = or_(
+            User.name.ilike(like, escape="\\"),
+            User.email.ilike(like, escape="\\"),
+            User.mobile.ilike(like, escape="\\"),
+            User.telegram_username.ilike(like, escape="\\"),
+        )
+    if term.lstrip("#").isdigit():
+        cond = or_(cond, User.id == int(term.lstrip("#")))
+    users = select(User.id).where(cond)
+    if role:
+        users = users.where(User.role == role)
+    return col.in_(users)
+
+
+def search_user_ids(term: str, limit: int = 50, role: str | None = "PLAYER") -> list[int]:
+    """User ids matching `term`, best first. role=None searches staff too."""
+    from models import db, User
+
+    term = (term or "").strip().lower()
+    if not term:
+        return []
+    exact_id = int(term.lstrip("#")) if term.lstrip("#").isdigit() else None
+    like = _like(term)
+    params = {"term": term, "like": like, "limit": limit, "cap": max(SEARCH_CANDIDATES, limit),
+              "role": role, "id": exact_id or 0}
+    role_sql = "AND u.role = :role" if role else ""
+
+    conn = db.session.connection()
+    kind = backend(conn)
+    if kind == "pg_trgm":
+        ids = [r[0] for r in conn.execute(text(f"""
+            SELECT c.user_id
+            FROM (
+                SELECT s.user_id, s.doc
+                FROM player_search s
+                WHERE s.doc LIKE :like OR s.user_id = :id
+                LIMIT :cap
+            ) c
+            JOIN users u ON u.id = c.user_id
+            WHERE true {role_sql}
+            ORDER BY (c.user_id = :id) DESC, word_similarity(:term, c.doc) DESC, c.user_id DESC
+            LIMIT :limit
+        """), params)]
+    elif kind == "fts5":
+        if len(term) >= 3:
+            params["match"] = _fts_phrase(term)
+            where, order = "f.doc MATCH :match", "f.rank"
+        else:  # below the trigram length: scan
+            where, order = "f.doc LIKE :like ESCAPE '\\'", "f.rowid DESC"
+        ids = [r[0] for r in conn.execute(text(f"""
+            SELECT f.rowid
+            FROM player_search_fts f
+            JOIN users u ON u.id = f.rowid
+            WHERE {where} {role_sql}
+            ORDER BY {order}
+            LIMIT :limit
+        """), params)]
+    else:
+        q = db.session.query(User.id).filter(or_(
+            User.name.ilike(like, escape="\\"),
+            User.email.ilike(like, escape="\\"),
+            User.mobile.ilike(like, escape="\\"),
+            User.telegram_username.ilike(like, escape="\\"),
+        ))
+        if role:
+            q = q.filter(User.role == role)
+        ids = [uid for (uid,) in q.order_by(User.id.desc()).limit(limit)]
+
+    if exact_id is not None and exact_id not in ids:
+        q = db.session.query(User.id).filter(User.id == exact_id)
+        if role:
+            q = q.filter(User.role == role)
+        if q.first():
+            ids = [exact_id] + ids[: limit - 1]
+    elif exact_id is not None:
+        ids = [exact_id] + [i for i in ids if i != exact_id]
+    return ids
+
+
+def search_users(term: str, limit: int = 50, role: str | None = "PLAYER") -> list:
+    """User rows in rank order."""
+    from models import User
+    ids = search_user_ids(term, limit=limit, role=role)
+    if not ids:
+        return []
+    by_id = {u.id: u for u in User.query.filter(User.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="player search index: rebuild / query")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild")
+    qp = sub.add_parser("query")
+    qp.add_argument("term")
+    qp.add_argument("--limit", type=int, default=20)
+    qp.add_argument("--all-roles", action="store_true")
+    args = ap.parse_args(argv)
+
+    from app import app
+    from models import db
+    with app.app_context():
+        if args.cmd == "rebuild":
+            print(f"✅ player search rebuilt ({backend(db.session.connection())}): {rebuild()} users")
+            return 0
+        t0 = time.perf_counter()
+        users = search_users(args.term, limit=args.limit, role=None if args.all_roles else "PLAYER")
+        ms = (time.perf_counter() - t0) * 1000
+        for u in users:
+            print(f"{u.id:>8}  {u.name or '':<24} {u.email or ''}")
+        print(f"{len(users)} results in {ms:.1f} ms ({backend(db.session.connection())})")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
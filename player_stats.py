@@ -0,0 +1,136 @@
+# player_stats.py
+"""
+Read side + backfill for the player_stats table (models.PlayerStats).
+
+The table is kept current by models._maintain_player_stats, which upserts
+deltas in the same transaction that moves a DepositRequest to LOADED or a
+WithdrawRequest to PAID (or back), or edits the amount / bonus of one that
+already is. After a reversal the first/last timestamps are re-derived
+from history. Views read one row per player instead of COUNT/SUM over
+deposit history.
+
+CLI:
+  python player_stats.py backfill        # rebuild every row from history
+  python player_stats.py show 42
+"""
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import text
+
+# Same aggregate as migration 0005_player_stats – keep them in step – plus the
+# rows cold_storage.py has moved to request_archive. The timestamps match
+# models._PLAYER_STATS_TIMES_SQL.
+BACKFILL_SQL = """
+INSERT INTO player_stats (
+    user_id, deposit_count, deposit_sum, first_deposit_at, last_deposit_at,
+    bonus_count, bonus_sum, withdraw_count, withdraw_sum, last_withdraw_at, updated_at
+)
+SELECT u.id,
+       COALESCE(d.cnt, 0), COALESCE(d.total, 0), d.first_at, d.last_at,
+       COALESCE(d.bonus_cnt, 0), COALESCE(d.bonus_total, 0),
+       COALESCE(w.cnt, 0), COALESCE(w.total, 0), w.last_at,
+       :now
+FROM users u
+LEFT JOIN (
+    SELECT user_id,
+           COUNT(*) AS cnt,
+           SUM(amount) AS total,
+           MIN(COALESCE(loaded_at, created_at)) AS first_at,
+           MAX(COALESCE(loaded_at, created_at)) AS last_at,
+           SUM(CASE WHEN COALESCE(bonus_amount, 0) > 0 THEN 1 ELSE 0 END) AS bonus_cnt,
+           SUM(COALESCE(bonus_amount, 0)) AS bonus_total
+    FROM (
+        SELECT user_id, amount, loaded_at, created_at, bonus_amount
+        FROM deposit_requests WHERE status = 'LOADED'
+        UNION ALL
+        SELECT user_id, amount, settled_at, created_at, bonus_amount
+        FROM request_archive WHERE kind = 'deposit' AND status = 'LOADED'
+    ) dep
+    GROUP BY user_id
+) d ON d.user_id = u.id
+LEFT JOIN (
+    SELECT user_id,
+           COUNT(*) AS cnt,
+           SUM(amount) AS total,
+           MAX(COALESCE(acted_at, updated_at, created_at)) AS last_at
+    FROM (
+        SELECT user_id, amount, acted_at, updated_at, created_at
+        FROM withdraw_requests WHERE status = 'PAID'
+        UNION ALL
+        SELECT user_id, amount, settled_at, settled_at, created_at
+        FROM request_archive WHERE kind = 'withdraw' AND status = 'PAID'
+    ) wd
+    GROUP BY user_id
+) w ON w.user_id = u.id
+WHERE d.user_id IS NOT NULL OR w.user_id IS NOT NULL
+"""
+
+
+def stats_for(user_id: int):
+    """PlayerStats row or None (None means: no loaded deposits / paid withdrawals yet)."""
+    from models import db, PlayerStats
+    return db.session.get(PlayerStats, user_id) if user_id else None
+
+
+def stats_map(user_ids) -> dict:
+    """{user_id: PlayerStats} for a page of rows – one query."""
+    from models import PlayerStats
+    ids = list({int(u) for u in user_ids if u})
+    if not ids:
+        return {}
+    return {s.user_id: s for s in PlayerStats.query.filter(PlayerStats.user_id.in_(ids)).all()}
+
+
+def loaded_count(user_id: int, stats: dict | None = None) -> int:
+    s = stats.get(user_id) if stats is not None else stats_for(user_id)
+    return int(s.deposit_count or 0) if s else 0
+
+
+def loaded_sum(user_id: int) -> float:
+    s = stats_for(user_id)
+    return float(s.deposit_sum or 0) if s else 0.0
+
+
+def backfill() -> int:
+    """Rebuild player_stats from deposit/withdraw history (live + archived) in one transaction."""
+    from models import db, PlayerStats
+    try:
+        db.session.execute(text("DELETE FROM player_stats"))
+        db.session.execute(text(BACKFILL_SQL), {"now": datetime.utcnow()})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return PlayerStats.query.count()
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="player_stats: backfill / show")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("backfill")
+    sp = sub.add_parser("show")
+    sp.add_argument("user_id", type=int)
+    args = ap.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "backfill":
+            print(f"✅ player_stats rebuilt: {backfill()} players")
+            return 0
+        s = stats_for(args.user_id)
+        if not s:
+            print(f"no stats for user {args.user_id}")
+            return 1
+        for col in s.__table__.columns.keys():
+            print(f"{col:<18} {getattr(s, col)}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
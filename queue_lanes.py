@@ -0,0 +1,213 @@
+# queue_lanes.py
+"""
+Priority lanes for the ID-provisioning and credit-replay Celery tasks.
+
+Lanes (lower Celery/Redis priority number = served first):
+  staff          0  staff pressed "Replay" on one job – a human is waiting
+  first_deposit  2  player still on their first deposit (get_player_next_bonus)
+  vip            4  lifetime LOADED deposits >= VIP_LIFETIME_DEPOSIT
+  normal         6  everyone else
+
+The Redis transport keeps one list per priority step (id_requests,
+id_requests:1, ...) and always drains the lower step first, so a flood of
+normal requests can't delay a first-time depositor.
+
+Anti-starvation: `age_waiting_requests` (Celery beat, every AGING_TICK_SECONDS)
+re-publishes PENDING requests one lane higher for every AGING_SECONDS they
+have waited, up to AGED_FLOOR. The original message still sits in its old
+list; process_id_request claims rows atomically, so whichever copy arrives
+second is a no-op.
+
+Per-lane wait/run/outcomes are recorded by queue_metrics (lane dimension).
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from celery_app import celery, get_flask_app
+from request_progress import redis_client
+
+log = logging.getLogger("queue_lanes")
+
+LANES = {
+    "staff": 0,
+    "first_deposit": 2,
+    "vip": 4,
+    "normal": 6,
+}
+DEFAULT_LANE = "normal"
+PRIORITY_STEPS = list(range(10))
+
+VIP_LIFETIME_DEPOSIT = float(os.getenv("VIP_LIFETIME_DEPOSIT", "500"))
+
+AGING_SECONDS = int(os.getenv("LANE_AGING_SECONDS", "120"))
+AGING_TICK_SECONDS = int(os.getenv("LANE_AGING_TICK_SECONDS", "30"))
+AGING_STEP = 2
+AGED_FLOOR = 1  # aged jobs never jump ahead of the staff lane
+AGING_BATCH = 200
+
+_PRI_TTL = 24 * 3600
+
+
+def _pri_key(req_id: int) -> str:
+    return f"lanes:req:{req_id}"
+
+
+def priority(lane: str | None) -> int:
+    return LANES.get(lane or DEFAULT_LANE, LANES[DEFAULT_LANE])
+
+
+# ---------------------------------------------------------------------------
+# Lane selection
+# ---------------------------------------------------------------------------
+
+def lifetime_deposits(user_id: int) -> float:
+    from player_stats import loaded_sum
+    return loaded_sum(user_id)
+
+
+def lane_for_user(user, *, staff: bool = False) -> str:
+    from models import get_player_next_bonus
+
+    if staff:
+        return "staff"
+    if not user:
+        return DEFAULT_LANE
+    try:
+        # still on (or finishing) the first deposit
+        if get_player_next_bonus(user) == "signup" or (user.deposit_count or 0) <= 1:
+            return "first_deposit"
+        if lifetime_deposits(user.id) >= VIP_LIFETIME_DEPOSIT:
+            return "vip"
+    except Exception:
+        log.exception("lane lookup failed for user %s", getattr(user, "id", None))
+    return DEFAULT_LANE
+
+
+def lane_for_request(req_id: int, *, staff: bool = False) -> str:
+    from models import db, GameAccountRequest, User
+
+    if staff:
+        return "staff"
+    req = db.session.get(GameAccountRequest, req_id)
+    user = db.session.get(User, req.user_id) if req else None
+    return lane_for_user(user)
+
+
+def lane_for_deposit(dep_id: int, *, staff: bool = False) -> str:
+    from models import db, DepositRequest, User
+
+    if staff:
+        return "staff"
+    dep = db.session.get(DepositRequest, dep_id)
+    user = db.session.get(User, dep.user_id) if dep else None
+    return lane_for_user(user)
+
+
+# ---------------------------------------------------------------------------
+# Bookkeeping (what priority a waiting request was last published at)
+# ---------------------------------------------------------------------------
+
+def remember(req_id: int, lane: str, pri: int, eta: float | None = None):
+    try:
+        key = _pri_key(req_id)
+        redis_client.hset(key, mapping={"lane": lane, "pri": pri, "ts": eta or time.time()})
+        redis_client.expire(key, _PRI_TTL)
+    except Exception as e:
+        log.warning("lane bookkeeping failed for req %s: %s", req_id, e)
+
+
+def bump(req_id: int, pri: int):
+    """Record an aging re-publish; keeps the original lane and start time."""
+    try:
+        redis_client.hset(_pri_key(req_id), "pri", pri)
+    except Exception as e:
+        log.warning("lane bump failed for req %s: %s", req_id, e)
+
+
+def current(req_id: int) -> dict:
+    try:
+        raw = redis_client.hgetall(_pri_key(req_id)) or {}
+    except Exception:
+        return {}
+    return {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in raw.items()}
+
+
+def aged_priority(base: int, waited_seconds: float) -> int:
+    steps = int(max(0.0, waited_seconds) // AGING_SECONDS)
+    return max(min(base, AGED_FLOOR), base - steps * AGING_STEP)
+
+
+def effective_priority(req) -> int:
+    """Priority after aging; used by the legacy polling worker to pick rows."""
+    info = current(req.id)
+    base = LANES.get(info.get("lane"), LANES[DEFAULT_LANE])
+    if info.get("ts"):
+        waited = time.time() - float(info["ts"])
+    else:
+        waited = (datetime.utcnow() - req.created_at).total_seconds() if req.created_at else 0
+    return aged_priority(base, waited)
+
+
+# ---------------------------------------------------------------------------
+# Aging (Celery beat)
+# ---------------------------------------------------------------------------
+
+@celery.task(name="age_waiting_requests", queue="id_requests")
+def age_waiting_requests():
+    """Bump long-waiting PENDING requests to a higher lane."""
+    from models import GameAccountRequest
+    from id_requests import republish_aged_request
+
+    app = get_flask_app()
+    bumped = 0
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(seconds=AGING_SECONDS)
+        rows = (
+            GameAccountRequest.query
+            .filter(GameAccountRequest.status == "PENDING")
+            .filter(GameAccountRequest.created_at <= cutoff)
+            .order_by(GameAccountRequest.created_at.asc())
+            .limit(AGING_BATCH)
+            .all()
+        )
+        now = time.time()
+        for req in rows:
+            info = current(req.id)
+            if not info:
+                continue  # never went through Celery (legacy worker / ready pool)
+            pri = int(info.get("pri", LANES[DEFAULT_LANE]))
+            # waiting starts when the job was due (replays are delayed)
+            since = float(info.get("ts") or now)
+            if since > now:
+                continue
+            base = LANES.get(info.get("lane"), pri)
+            target = aged_priority(base, now - since)
+            if target < pri:
+                republish_aged_request(req.id, info.get("lane") or DEFAULT_LANE, target, since)
+                bumped += 1
+    if bumped:
+        log.info("age_waiting_requests: bumped %s request(s)", bumped)
+    return {"bumped": bumped}
+
+
+# ---------------------------------------------------------------------------
+# Broker depth per lane
+# ---------------------------------------------------------------------------
+
+def lane_depth(queue: str = "id_requests") -> dict:
+    """{lane or "p<N>": messages waiting} straight from the Redis priority lists."""
+    names = {pri: lane for lane, pri in LANES.items()}
+    out = {}
+    for pri in PRIORITY_STEPS:
+        key = queue if pri == 0 else f"{queue}:{pri}"
+        try:
+            n = int(redis_client.llen(key))
+        except Exception:
+            return {}
+        if n or pri in names:
+            out[names.get(pri, f"p{pri}")] = n
+    return out
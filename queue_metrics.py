@@ -0,0 +1,355 @@
+# queue_metrics.py
+"""
+Per-vendor queue observability for ID requests.
+
+Records into Redis, in hourly buckets (kept QM_RETENTION_HOURS):
+  - wait     : seconds between enqueue and a worker picking the job up
+  - run      : seconds the worker spent on the job
+  - attempts : provider attempts used by the job
+  - outcome  : counters (approved / failed / skipped / error / err:<Exception>)
+
+The same series are also kept per priority lane (queue_lanes.py) under the
+pseudo-vendor "@<lane>" so the admin page can show lane wait percentiles.
+
+Histograms are fixed-bucket hashes (qm:h:<metric>:<vendor>:<YYYYMMDDHH>)
+so writes are O(1) HINCRBYs and p50/p95/p99 are computed on read by
+merging the buckets of the requested window.
+
+Sources:
+  - Celery: task_prerun / task_postrun / task_failure signals below
+  - legacy id_request_worker.py: calls record_job() directly
+"""
+
+import logging
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from celery.signals import task_prerun, task_postrun, task_failure
+
+from request_progress import redis_client
+
+log = logging.getLogger("queue_metrics")
+
+RETENTION_HOURS = int(os.getenv("QM_RETENTION_HOURS", str(24 * 8)))
+
+# Histogram upper bounds per metric (anything above the last one → "inf")
+BUCKETS = {
+    "wait": (0.5, 1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600, 1200, 1800, 3600),
+    "run": (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 360, 600),
+    "attempts": (1, 2, 3, 4, 5, 6, 7, 8, 9, 10),
+}
+QUANTILES = (0.50, 0.95, 0.99)
+
+TRACKED_TASKS = {"process_id_request", "replay_credit"}
+VENDORS_KEY = "qm:vendors"
+LANES_KEY = "qm:lanes"
+
+# task_id -> (perf_counter at prerun, vendor, lane, queue wait); worker-process local
+_running: dict[str, tuple[float, str, str | None, float | None]] = {}
+
+
+# ---------------------------------------------------------------------------
+# Keys / labels
+# ---------------------------------------------------------------------------
+
+def _label(name: str | None) -> str:
+    return "".join((name or "").strip().lower().split()) or "unknown"
+
+
+def vendor_label(game) -> str:
+    """Stable metric label for a Game row ("Ultra Panda" -> "ultrapanda")."""
+    return _label(getattr(game, "name", None))
+
+
+def _lane_series(lane: str) -> str:
+    return f"@{lane}"
+
+
+def _hour(ts: float | None = None) -> str:
+    return datetime.utcfromtimestamp(ts or time.time()).strftime("%Y%m%d%H")
+
+
+def _hours_back(hours: int) -> list[str]:
+    now = datetime.utcnow()
+    return [(now - timedelta(hours=h)).strftime("%Y%m%d%H") for h in range(hours)]
+
+
+def _hist_key(metric: str, vendor: str, hour: str) -> str:
+    return f"qm:h:{metric}:{vendor}:{hour}"
+
+
+def _outcome_key(vendor: str, hour: str) -> str:
+    return f"qm:o:{vendor}:{hour}"
+
+
+def _enqueued_key(task_id: str) -> str:
+    return f"qm:enq:{task_id}"
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+def _bucket_field(metric: str, value: float) -> str:
+    bounds = BUCKETS[metric]
+    idx = bisect_left(bounds, value)
+    return str(bounds[idx]) if idx < len(bounds) else "inf"
+
+
+def _observe(pipe, metric: str, vendor: str, value: float, hour: str):
+    key = _hist_key(metric, vendor, hour)
+    pipe.hincrby(key, _bucket_field(metric, value), 1)
+    pipe.hincrby(key, "count", 1)
+    pipe.hincrbyfloat(key, "sum", float(value))
+    pipe.expire(key, RETENTION_HOURS * 3600)
+
+
+def record_job(vendor: str, *, wait: float | None = None, run: float | None = None,
+               attempts: int | None = None, outcome: str | None = None,
+               lane: str | None = None):
+    """Record one finished (or picked-up) job. Never raises."""
+    vendor = vendor or "unknown"
+    hour = _hour()
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sadd(VENDORS_KEY, vendor)
+        series = [vendor]
+        if lane:
+            pipe.sadd(LANES_KEY, lane)
+            series.append(_lane_series(lane))
+        for s in series:
+            if wait is not None and wait >= 0:
+                _observe(pipe, "wait", s, wait, hour)
+            if run is not None and run >= 0:
+                _observe(pipe, "run", s, run, hour)
+            if attempts:
+                _observe(pipe, "attempts", s, attempts, hour)
+            if outcome:
+                okey = _outcome_key(s, hour)
+                pipe.hincrby(okey, outcome.lower(), 1)
+                pipe.expire(okey, RETENTION_HOURS * 3600)
+        pipe.execute()
+    except Exception as e:
+        log.warning("queue metrics write failed (%s): %s", vendor, e)
+
+
+def mark_enqueued(task_id: str, vendor: str, req_id: int | None = None, countdown: float = 0,
+                  lane: str | None = None):
+    """Remember when/what was enqueued so task_prerun can compute queue wait."""
+    try:
+        key = _enqueued_key(task_id)
+        redis_client.hset(key, mapping={
+            # delayed jobs (countdown) only start "waiting" once they are due
+            "ts": time.time() + (countdown or 0),
+            "vendor": vendor or "unknown",
+            "req_id": req_id or "",
+            "lane": lane or "",
+        })
+        redis_client.expire(key, 24 * 3600)
+    except Exception as e:
+        log.warning("queue metrics enqueue mark failed: %s", e)
+
+
+# ---------------------------------------------------------------------------
+# Celery signals (only fire inside the worker)
+# ---------------------------------------------------------------------------
+
+@task_prerun.connect
+def _on_task_prerun(sender=None, task_id=None, task=None, **_):
+    if getattr(task, "name", None) not in TRACKED_TASKS:
+        return
+    vendor, lane, wait = "unknown", None, None
+    try:
+        raw = redis_client.hgetall(_enqueued_key(task_id)) or {}
+        if raw:
+            vendor = (raw.get(b"vendor") or b"unknown").decode()
+            lane = (raw.get(b"lane") or b"").decode() or None
+            wait = time.time() - float(raw.get(b"ts") or time.time())
+            redis_client.delete(_enqueued_key(task_id))
+    except Exception as e:
+        log.warning("queue metrics prerun lookup failed: %s", e)
+
+    # wait is recorded in postrun, so duplicate (skipped) copies don't count
+    _running[task_id] = (time.perf_counter(), vendor, lane, wait)
+
+
+@task_postrun.connect
+def _on_task_postrun(sender=None, task_id=None, task=None, retval=None, state=None, **_):
+    if getattr(task, "name", None) not in TRACKED_TASKS:
+        return
+    started, vendor, lane, wait = _running.pop(task_id, (None, "unknown", None, None))
+    run = (time.perf_counter() - started) if started is not None else None
+
+    attempts, outcome = None, None
+    if isinstance(retval, dict):
+        vendor = retval.get("vendor") or vendor
+        attempts = retval.get("attempts")
+        outcome = retval.get("outcome")
+    if not outcome:
+        outcome = "error" if state == "FAILURE" else (state or "unknown").lower()
+
+    if outcome == "skipped":
+        record_job(vendor, outcome=outcome, lane=lane)
+        return
+    record_job(vendor, wait=wait, run=run, attempts=attempts, outcome=outcome, lane=lane)
+
+
+@task_failure.connect
+def _on_task_failure(sender=None, task_id=None, exception=None, **_):
+    if getattr(sender, "name", None) not in TRACKED_TASKS:
+        return
+    # postrun records the outcome/run time; here we only keep the error class
+    _, vendor, lane, _ = _running.get(task_id, (None, "unknown", None, None))
+    record_job(vendor, outcome=f"err:{type(exception).__name__}", lane=lane)
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def _merge_hist(metric: str, vendor: str, hours: int) -> dict:
+    pipe = redis_client.pipeline(transaction=False)
+    for h in _hours_back(hours):
+        pipe.hgetall(_hist_key(metric, vendor, h))
+    merged: dict[str, float] = {}
+    for part in pipe.execute():
+        for k, v in (part or {}).items():
+            k = k.decode() if isinstance(k, bytes) else k
+            merged[k] = merged.get(k, 0.0) + float(v)
+    return merged
+
+
+def _quantile(metric: str, merged: dict, q: float):
+    total = merged.get("count", 0)
+    if not total:
+        return None
+    target = q * total
+    seen, lower = 0.0, 0.0
+    for upper in BUCKETS[metric]:
+        n = merged.get(str(upper), 0.0)
+        if n and seen + n >= target:
+            # linear interpolation inside the bucket
+            return round(lower + (upper - lower) * ((target - seen) / n), 2)
+        seen += n
+        lower = upper
+    return float(BUCKETS[metric][-1])
+
+
+def _hist_summary(metric: str, vendor: str, hours: int) -> dict:
+    merged = _merge_hist(metric, vendor, hours)
+    count = int(merged.get("count", 0))
+    out = {
+        "count": count,
+        "avg": round(merged.get("sum", 0.0) / count, 2) if count else None,
+    }
+    for q in QUANTILES:
+        out[f"p{int(q * 100)}"] = _quantile(metric, merged, q)
+    return out
+
+
+def _outcomes(vendor: str, hours: int) -> dict:
+    pipe = redis_client.pipeline(transaction=False)
+    for h in _hours_back(hours):
+        pipe.hgetall(_outcome_key(vendor, h))
+    totals: dict[str, int] = {}
+    for part in pipe.execute():
+        for k, v in (part or {}).items():
+            k = k.decode() if isinstance(k, bytes) else k
+            totals[k] = totals.get(k, 0) + int(v)
+    return totals
+
+
+def backlog_by_vendor() -> dict:
+    """Live backlog from the DB: {vendor: {"PENDING": n, "IN_PROGRESS": n}}."""
+    from sqlalchemy import func
+    from models import db, Game, GameAccountRequest
+
+    rows = (
+        db.session.query(Game.name, GameAccountRequest.status, func.count(GameAccountRequest.id))
+        .join(Game, Game.id == GameAccountRequest.game_id)
+        .filter(GameAccountRequest.status.in_(("PENDING", "PROCESSING", "IN_PROGRESS")))
+        .group_by(Game.name, GameAccountRequest.status)
+        .all()
+    )
+    out: dict[str, dict] = {}
+    for name, status, n in rows:
+        vendor = _label(name)
+        # PROCESSING (Celery) and IN_PROGRESS (legacy worker) mean the same thing
+        status = "IN_PROGRESS" if status == "PROCESSING" else status
+        bucket = out.setdefault(vendor, {"PENDING": 0, "IN_PROGRESS": 0})
+        bucket[status] = bucket.get(status, 0) + int(n)
+    return out
+
+
+def broker_depth(queues=("id_requests",)) -> dict:
+    """Messages waiting in the Redis broker lists (all priority steps summed)."""
+    out = {}
+    for q in queues:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.llen(q)
+            for pri in range(1, 10):
+                pipe.llen(f"{q}:{pri}")
+            out[q] = sum(int(n or 0) for n in pipe.execute())
+        except Exception:
+            out[q] = None
+    return out
+
+
+def snapshot(hours: int = 24) -> dict:
+    """Everything the admin page / JSON endpoint shows."""
+    hours = max(1, min(int(hours or 24), RETENTION_HOURS))
+    try:
+        vendors = sorted(v.decode() if isinstance(v, bytes) else v
+                         for v in (redis_client.smembers(VENDORS_KEY) or ()))
+        redis_ok = True
+    except Exception:
+        vendors, redis_ok = [], False
+
+    backlog = backlog_by_vendor()
+    for v in backlog:
+        if v not in vendors:
+            vendors.append(v)
+
+    per_vendor = {}
+    for v in sorted(vendors):
+        row = {"backlog": backlog.get(v, {"PENDING": 0, "IN_PROGRESS": 0})}
+        if redis_ok:
+            try:
+                row["wait"] = _hist_summary("wait", v, hours)
+                row["run"] = _hist_summary("run", v, hours)
+                row["attempts"] = _hist_summary("attempts", v, hours)
+                row["outcomes"] = _outcomes(v, hours)
+            except Exception as e:
+                log.warning("queue metrics read failed (%s): %s", v, e)
+        per_vendor[v] = row
+
+    per_lane = {}
+    if redis_ok:
+        try:
+            from queue_lanes import LANES, lane_depth
+            depth = lane_depth()
+            seen = set(LANES) | {v.decode() if isinstance(v, bytes) else v
+                                 for v in (redis_client.smembers(LANES_KEY) or ())}
+            for lane in sorted(seen, key=lambda x: LANES.get(x, 99)):
+                series = _lane_series(lane)
+                per_lane[lane] = {
+                    "priority": LANES.get(lane),
+                    "queued": depth.get(lane),
+                    "wait": _hist_summary("wait", series, hours),
+                    "run": _hist_summary("run", series, hours),
+                    "outcomes": _outcomes(series, hours),
+                }
+        except Exception as e:
+            log.warning("queue metrics lane read failed: %s", e)
+
+    return {
+        "hours": hours,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "redis_ok": redis_ok,
+        "broker": broker_depth() if redis_ok else {},
+        "vendors": per_vendor,
+        "lanes": per_lane,
+    }
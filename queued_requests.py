@@ -1,21 +1,41 @@
 # queued_requests.py
 
-from flask import Blueprint, jsonify
-from models import db, GameAccountRequest
+import json
 import os
-import redis
+import time
 
-# Local Redis client just for progress lookups (no circular import)
-REDIS_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
-redis_client = redis.from_url(REDIS_URL)
+from flask import Blueprint, jsonify, Response
+from flask_login import login_required, current_user
+from load_shed import low_priority
+from models import db, GameAccountRequest
 
+import request_progress
+from request_progress import DEFAULT_MESSAGE, TERMINAL_STAGES
 
-def _progress_key(req_id: int) -> str:
-    return f"req_progress:{req_id}"
+# One SSE connection per waiting player; keep it short-lived so proxies and
+# workers recycle it (EventSource reconnects by itself).
+SSE_MAX_SECONDS = int(os.getenv("REQ_SSE_MAX_SECONDS", "240"))
+SSE_HEARTBEAT_SECONDS = 15
 
 queue_bp = Blueprint("queue_bp", __name__)
 
+
+def _event_for_db_status(req_id: int, status: str):
+    """Synthesize a terminal event when the DB already knows the outcome."""
+    status = (status or "").upper()
+    if status == "APPROVED":
+        return {"req_id": req_id, "stage": "done", "message": request_progress.STAGES["done"]}
+    if status == "FAILED":
+        return {"req_id": req_id, "stage": "failed", "message": request_progress.STAGES["failed"]}
+    return None
+
+
+def _sse(event: dict) -> str:
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+
 @queue_bp.get("/player/request/<int:req_id>/status.json")
+@low_priority
 def player_request_status_json(req_id):
     req = db.session.get(GameAccountRequest, req_id)
     if not req:
@@ -24,12 +44,84 @@ def player_request_status_json(req_id):
     # status from DB
     status = getattr(req, "status", "UNKNOWN")
 
-    # progress text from Redis
-    raw = redis_client.get(_progress_key(req_id))
-    progress = raw.decode("utf-8") if raw else "Your ID request is in the queue…"
+    # progress event from Redis
+    event = request_progress.latest(req_id) or {}
 
     return jsonify({
         "ok": True,
         "status": status,
-        "progress": progress,
-    })
\ No newline at end of file
+        "stage": event.get("stage") or "queued",
+        "progress": event.get("message") or DEFAULT_MESSAGE,
+        "position": event.get("position"),
+    })
+
+
+@queue_bp.get("/player/request/<int:req_id>/events")
+@login_required
+@low_priority
+def player_request_events(req_id):
+    """
+    Server-Sent Events stream of progress for one request.
+
+    Subscribes first, then replays the latest stored event, so nothing
+    published in between is lost. Stops on done/failed or after
+    SSE_MAX_SECONDS.
+    """
+    req = db.session.get(GameAccountRequest, req_id)
+    if not req or req.user_id != current_user.id:
+        return jsonify({"ok": False, "error": "Request not found"}), 404
+
+    db_event = _event_for_db_status(req_id, req.status)
+    # Don't hold a pooled DB connection for the lifetime of the stream
+    db.session.close()
+
+    def _stream():
+        if db_event:
+            yield _sse(db_event)
+            return
+
+        pubsub = None
+        try:
+            pubsub = request_progress.subscribe(req_id)
+            first = request_progress.latest(req_id) or {
+                "req_id": req_id, "stage": "queued", "message": DEFAULT_MESSAGE,
+            }
+            yield "retry: 3000\n\n"
+            yield _sse(first)
+            if first.get("stage") in TERMINAL_STAGES:
+                return
+
+            deadline = time.time() + SSE_MAX_SECONDS
+            while time.time() < deadline:
+                msg = pubsub.get_message(timeout=SSE_HEARTBEAT_SECONDS)
+                if not msg:
+                    yield ": ping\n\n"
+                    continue
+                data = msg.get("data")
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                try:
+                    event = json.loads(data)
+                except (TypeError, ValueError):
+                    continue
+                yield _sse(event)
+                if event.get("stage") in TERMINAL_STAGES:
+                    return
+        except Exception:
+            # Redis unavailable: tell the client to fall back to polling
+            yield "event: unavailable\ndata: {}\n\n"
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    return Response(
+        _stream(),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
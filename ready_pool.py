@@ -0,0 +1,216 @@
+# ready_pool.py
+"""
+Keeps the ReadyAccount pool stocked so ID requests are fulfilled instantly
+by models._autofulfill_game_request_on_insert instead of waiting minutes
+for a browser bot.
+
+Per active game with an auto_create-capable vendor:
+  rate   = GameAccountRequests/day over the last POOL_RATE_DAYS
+  target = ceil(rate * POOL_COVER_HOURS / 24 * POOL_HEADROOM), clamped to
+           [POOL_MIN, POOL_MAX]
+  stock  = unclaimed ReadyAccount rows
+and the deficit is created with provider_auto_create_batch() – one vendor
+login per batch of up to POOL_BATCH accounts.
+
+Runs from Celery beat (`fill_ready_pool`, every POOL_TICK_SECONDS) but only
+does work inside the quiet window POOL_QUIET_HOURS (UTC, e.g. "6-13"), so the
+vendor panels aren't busy with stocking while players are online.
+
+CLI:
+  python ready_pool.py status
+  python ready_pool.py fill [--force] [--game 3]
+"""
+
+import argparse
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+
+from celery_app import celery, get_flask_app
+from request_progress import redis_client
+
+log = logging.getLogger("ready_pool")
+
+POOL_QUIET_HOURS = os.getenv("POOL_QUIET_HOURS", "6-13")   # UTC, start-end (end exclusive)
+POOL_RATE_DAYS = int(os.getenv("POOL_RATE_DAYS", "7"))
+POOL_COVER_HOURS = float(os.getenv("POOL_COVER_HOURS", "24"))  # stock until the next quiet window
+POOL_HEADROOM = float(os.getenv("POOL_HEADROOM", "1.25"))
+POOL_MIN = int(os.getenv("POOL_MIN", "2"))
+POOL_MAX = int(os.getenv("POOL_MAX", "50"))
+POOL_BATCH = int(os.getenv("POOL_BATCH", "10"))
+POOL_TICK_SECONDS = int(os.getenv("POOL_TICK_SECONDS", "900"))
+
+_LOCK_KEY = "ready_pool:lock"
+_LOCK_TTL = 2 * 3600
+
+
+def in_quiet_window(now: datetime | None = None, spec: str | None = None) -> bool:
+    """True when the UTC hour is inside POOL_QUIET_HOURS ("22-5" wraps midnight)."""
+    spec = (spec or POOL_QUIET_HOURS or "").strip()
+    if not spec or "-" not in spec:
+        return False
+    start, end = (int(x) % 24 for x in spec.split("-", 1))
+    hour = (now or datetime.utcnow()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def target_for(requests_per_day: float) -> int:
+    want = math.ceil(requests_per_day * POOL_COVER_HOURS / 24.0 * POOL_HEADROOM)
+    return max(POOL_MIN, min(POOL_MAX, want))
+
+
+def _vendor_supports_auto_create(vendor: str | None) -> bool:
+    from automation.providers import by_key
+    p = by_key.get(vendor or "")
+    return bool(p and p.auto_create)
+
+
+def plan(game_id: int | None = None) -> list[dict]:
+    """One row per game: vendor, request rate, stock, target, deficit."""
+    from sqlalchemy import func
+    from automation.providers import detect_vendor
+    from models import db, Game, GameAccountRequest, ReadyAccount
+
+    since = datetime.utcnow() - timedelta(days=POOL_RATE_DAYS)
+    rate_rows = dict(
+        db.session.query(GameAccountRequest.game_id, func.count(GameAccountRequest.id))
+        .filter(GameAccountRequest.created_at >= since)
+        .group_by(GameAccountRequest.game_id)
+        .all()
+    )
+    stock_rows = dict(
+        db.session.query(ReadyAccount.game_id, func.count(ReadyAccount.id))
+        .filter((ReadyAccount.is_claimed == False) | ReadyAccount.is_claimed.is_(None))  # noqa: E712
+        .group_by(ReadyAccount.game_id)
+        .all()
+    )
+
+    q = Game.query.filter(Game.is_active == True)  # noqa: E712
+    if game_id:
+        q = q.filter(Game.id == game_id)
+
+    out = []
+    for game in q.order_by(Game.id.asc()).all():
+        vendor = detect_vendor(game)
+        per_day = rate_rows.get(game.id, 0) / float(POOL_RATE_DAYS)
+        stock = int(stock_rows.get(game.id, 0))
+        supported = _vendor_supports_auto_create(vendor)
+        target = target_for(per_day) if supported else 0
+        out.append({
+            "game_id": game.id,
+            "game": game.name,
+            "vendor": vendor,
+            "auto_create": supported,
+            "requests_per_day": round(per_day, 2),
+            "stock": stock,
+            "target": target,
+            "deficit": max(0, target - stock),
+        })
+    return out
+
+
+def _store_created(game_id: int, vendor: str, results: list) -> tuple[int, str | None]:
+    from automation.providers import result_ok, result_error_text
+    from models import db, ReadyAccount
+
+    added, error = 0, None
+    for res in results:
+        if not result_ok(vendor, res):
+            error = result_error_text(res) or "auto_create failed"
+            continue
+        username = (res.get("account") or res.get("username") or "").strip()
+        if not username:
+            continue
+        password = (res.get("password") or username).strip()
+        exists = ReadyAccount.query.filter_by(game_id=game_id, username=username).first()
+        if exists:
+            continue
+        db.session.add(ReadyAccount(
+            game_id=game_id,
+            username=username,
+            password=password,
+            note=f"Auto-stocked via {vendor} ({datetime.utcnow():%Y-%m-%d})",
+        ))
+        added += 1
+    db.session.commit()
+    return added, error
+
+
+def fill(game_id: int | None = None, force: bool = False) -> dict:
+    """Top every game up to its target (one batch per game per run)."""
+    from automation.providers import provider_auto_create_batch
+
+    if not force and not in_quiet_window():
+        return {"skipped": "outside quiet window", "window": POOL_QUIET_HOURS}
+
+    # One filler at a time – a batch holds a vendor session for minutes
+    try:
+        if not redis_client.set(_LOCK_KEY, "1", nx=True, ex=_LOCK_TTL):
+            return {"skipped": "another fill is running"}
+    except Exception:
+        log.warning("ready pool lock unavailable; continuing without it")
+
+    summary = {"games": []}
+    try:
+        for row in plan(game_id):
+            if not row["auto_create"] or row["deficit"] <= 0:
+                continue
+            batch = min(row["deficit"], POOL_BATCH)
+            log.info("ready pool: creating %s for %s (%s) stock=%s target=%s",
+                     batch, row["game"], row["vendor"], row["stock"], row["target"])
+            try:
+                results = provider_auto_create_batch(row["vendor"], batch)
+                added, error = _store_created(row["game_id"], row["vendor"], results)
+            except Exception as e:
+                from models import db
+                db.session.rollback()
+                log.exception("ready pool fill failed for %s", row["game"])
+                added, error = 0, f"{type(e).__name__}: {e}"
+            summary["games"].append({**row, "requested": batch, "added": added, "error": error})
+    finally:
+        try:
+            redis_client.delete(_LOCK_KEY)
+        except Exception:
+            pass
+    return summary
+
+
+@celery.task(name="fill_ready_pool", queue="maintenance", soft_time_limit=3000, time_limit=3300)
+def fill_ready_pool(force: bool = False):
+    app = get_flask_app()
+    with app.app_context():
+        return fill(force=force)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="ReadyAccount pool: status / fill")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status")
+    fp = sub.add_parser("fill")
+    fp.add_argument("--force", action="store_true", help="ignore the quiet window")
+    fp.add_argument("--game", type=int, help="only this game id")
+    args = ap.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "status":
+            print(f"quiet window (UTC): {POOL_QUIET_HOURS}  now in window: {in_quiet_window()}")
+            for r in plan():
+                flag = "" if r["auto_create"] else "  (no auto_create)"
+                print(f"#{r['game_id']:<4} {r['game']:<20} {str(r['vendor']):<11} "
+                      f"{r['requests_per_day']:>6}/day  stock {r['stock']:>3} / target {r['target']:>3}{flag}")
+            return 0
+        print(fill(game_id=args.game, force=args.force))
+        return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(_cli())
@@ -0,0 +1,197 @@
+# referral_clicks.py
+"""
+Buffered referral link clicks.
+
+/ref/<code> used to write referral_codes on every hit, which turns one row
+into a hot spot when a promo link goes viral. A landing now costs a Redis
+round-trip or two:
+
+  SET ref_click_seen:<code_id>:<visitor> NX EX REFERRAL_CLICK_DEDUP_SECONDS
+  HINCRBY ref_clicks <code_id> 1            (only when the SET was new)
+
+where <visitor> hashes the client address and user agent, so refreshes and
+back-button hits within the window count once. Celery beat
+("flush-referral-clicks") folds the pending hash into
+referral_codes.clicks with one executemany UPDATE.
+
+If Redis is down, clicks go to a per-process buffer (deduped the same way)
+that the web process flushes itself every REFERRAL_CLICK_FLUSH_SECONDS.
+
+Flushing is at-least-once: a crash between the DB commit and dropping the
+drained hash re-adds that batch on the next run. Clicks are a marketing
+number; that is an acceptable trade for never touching the row per hit.
+
+CLI:
+  python referral_clicks.py flush
+  python referral_clicks.py pending
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+import redis
+from sqlalchemy import bindparam
+
+from celery_app import celery, get_flask_app
+from request_progress import redis_client  # same Redis as the Celery broker
+
+log = logging.getLogger("referral_clicks")
+
+DEDUP_SECONDS = int(os.getenv("REFERRAL_CLICK_DEDUP_SECONDS", "86400"))
+FLUSH_SECONDS = int(os.getenv("REFERRAL_CLICK_FLUSH_SECONDS", "60"))
+LOCAL_SEEN_MAX = 100_000  # per-process dedup entries kept while Redis is down
+
+PENDING_KEY = "ref_clicks"
+DRAINING_KEY = "ref_clicks:draining"
+LOCK_KEY = "ref_clicks:lock"
+
+_lock = threading.Lock()
+_local = {"counts": Counter(), "seen": {}, "since": time.monotonic()}
+
+
+def visitor_key(remote_addr: str | None, user_agent: str | None) -> str:
+    raw = f"{remote_addr or ''}|{user_agent or ''}".encode()
+    return hashlib.sha1(raw).hexdigest()[:20]
+
+
+def _seen_key(code_id: int, visitor: str) -> str:
+    return f"ref_click_seen:{code_id}:{visitor}"
+
+
+# ---------------------------------------------------------------------------
+# Counting
+# ---------------------------------------------------------------------------
+
+def record(code_id: int, visitor: str) -> bool:
+    """Count one landing on `code_id` unless `visitor` was seen recently. True if counted."""
+    try:
+        counted = bool(redis_client.set(_seen_key(code_id, visitor), "1", nx=True, ex=DEDUP_SECONDS))
+        if counted:
+            redis_client.hincrby(PENDING_KEY, str(code_id), 1)
+    except redis.RedisError as e:
+        log.debug("referral_clicks: redis unavailable (%s) – buffering locally", e)
+        counted = _record_local(code_id, visitor)
+    _maybe_flush_local()
+    return counted
+
+
+def _record_local(code_id: int, visitor: str) -> bool:
+    now = time.monotonic()
+    key = _seen_key(code_id, visitor)
+    with _lock:
+        seen = _local["seen"]
+        if seen.get(key, 0) > now:
+            return False
+        if len(seen) >= LOCAL_SEEN_MAX:
+            for k in [k for k, exp in seen.items() if exp <= now] or list(seen)[: LOCAL_SEEN_MAX // 2]:
+                del seen[k]
+        seen[key] = now + DEDUP_SECONDS
+        _local["counts"][code_id] += 1
+    return True
+
+
+def _maybe_flush_local():
+    if not _local["counts"] or time.monotonic() - _local["since"] < FLUSH_SECONDS:
+        return
+    with _lock:
+        counts, _local["counts"] = _local["counts"], Counter()
+        _local["since"] = time.monotonic()
+    try:
+        apply_counts(counts)
+    except Exception:
+        log.exception("referral_clicks: local flush failed – keeping %s clicks", sum(counts.values()))
+        with _lock:
+            _local["counts"].update(counts)
+
+
+# ---------------------------------------------------------------------------
+# Flushing
+# ---------------------------------------------------------------------------
+
+def apply_counts(counts) -> int:
+    """Add {code_id: n} to referral_codes.clicks in one statement. Own transaction."""
+    from models import db, ReferralCode
+    rows = [{"rid": int(k), "n": int(v)} for k, v in sorted(counts.items(), key=lambda kv: int(kv[0])) if int(v)]
+    if not rows:
+        return 0
+    t = ReferralCode.__table__
+    stmt = (t.update().where(t.c.id == bindparam("rid"))
+            .values(clicks=db.func.coalesce(t.c.clicks, 0) + bindparam("n")))
+    with db.engine.begin() as conn:  # sorted ids: concurrent flushes lock rows in the same order
+        conn.execute(stmt, rows)
+    return sum(r["n"] for r in rows)
+
+
+def pending() -> dict:
+    """{code_id: clicks} not yet in the database (Redis plus this process's buffer)."""
+    out = Counter()
+    try:
+        for raw in (redis_client.hgetall(DRAINING_KEY) or {}, redis_client.hgetall(PENDING_KEY) or {}):
+            out.update({int(k): int(v) for k, v in raw.items()})
+    except redis.RedisError:
+        pass
+    with _lock:
+        out.update(_local["counts"])
+    return dict(out)
+
+
+def flush() -> int:
+    """Move pending clicks into the database. Returns the number of clicks written."""
+    written = 0
+    if redis_client.set(LOCK_KEY, "1", nx=True, ex=300):
+        try:
+            # a leftover draining hash (crashed run) goes first; otherwise take the live one
+            if not redis_client.exists(DRAINING_KEY):
+                try:
+                    redis_client.rename(PENDING_KEY, DRAINING_KEY)
+                except redis.ResponseError:  # no pending clicks
+                    pass
+            counts = redis_client.hgetall(DRAINING_KEY) or {}
+            if counts:
+                written += apply_counts(counts)
+            redis_client.delete(DRAINING_KEY)
+        finally:
+            redis_client.delete(LOCK_KEY)
+    _local["since"] = 0.0
+    _maybe_flush_local()
+    return written
+
+
+@celery.task(name="flush_referral_clicks", queue="maintenance")
+def flush_referral_clicks() -> int:
+    app = get_flask_app()
+    with app.app_context():
+        n = flush()
+        if n:
+            log.info("referral_clicks: flushed %s clicks", n)
+        return n
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="referral click buffer: flush / pending")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("flush")
+    sub.add_parser("pending")
+    args = ap.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "flush":
+            print(f"✅ flushed {flush()} referral clicks")
+            return 0
+        for code_id, n in sorted(pending().items()):
+            print(f"{code_id:>8}  {n}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
@@ -0,0 +1,134 @@
+# request_progress.py
+"""
+Structured progress events for GameAccountRequest rows.
+
+Workers and automation bots publish small JSON events such as
+  {"req_id": 12, "stage": "solving_captcha", "message": "...", "ts": ...}
+
+Each event is:
+  - stored in Redis under req_progress:<id> (latest event, with TTL) so
+    status.json and late SSE subscribers can catch up
+  - published on the Redis pub/sub channel req_progress:<id> so the SSE
+    endpoint in queued_requests.py can stream it to the lobby card
+
+Bots don't know which request they are serving, so the worker binds the
+request id with `bind(req_id)` and bots call `report(stage)`; outside a
+bound worker `report()` is a no-op (CLI runs, staff recharges, etc.).
+
+Redis problems never break the caller – progress is best effort.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import redis
+
+log = logging.getLogger("request_progress")
+
+# Same Redis the Celery broker uses (no extra config needed)
+REDIS_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+redis_client = redis.from_url(REDIS_URL)
+
+# Latest event lives a little longer than the lobby card waits (3 min)
+PROGRESS_TTL_SECONDS = int(os.getenv("REQ_PROGRESS_TTL", "3600"))
+
+# Stage -> default player-facing text
+STAGES = {
+    "queued":          "Your ID request is in the queue…",
+    "started":         "A worker picked up your request…",
+    "logging_in":      "Logging in to the game server…",
+    "solving_captcha": "Solving the security check…",
+    "creating_account": "Creating your game account…",
+    "retrying":        "Game server is slow, trying again…",
+    "done":            "Your login is ready!",
+    "failed":          "We couldn't create your ID automatically.",
+}
+TERMINAL_STAGES = {"done", "failed"}
+
+DEFAULT_MESSAGE = STAGES["queued"]
+
+_current_req_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "req_progress_current", default=None
+)
+
+
+def progress_key(req_id: int) -> str:
+    return f"req_progress:{req_id}"
+
+
+# Channel and key share a name; they live in different Redis namespaces.
+channel_for = progress_key
+
+
+def publish(req_id: int, stage: str, message: Optional[str] = None, **extra) -> dict:
+    """Store + broadcast one progress event. Returns the event dict."""
+    event = {
+        "req_id": int(req_id),
+        "stage": stage,
+        "message": message or STAGES.get(stage) or stage,
+        "ts": time.time(),
+    }
+    if extra:
+        event.update(extra)
+
+    payload = json.dumps(event)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(progress_key(req_id), payload, ex=PROGRESS_TTL_SECONDS)
+        pipe.publish(channel_for(req_id), payload)
+        pipe.execute()
+    except Exception as e:
+        log.warning("progress publish failed for req_id=%s stage=%s: %s", req_id, stage, e)
+    return event
+
+
+@contextmanager
+def bind(req_id: int):
+    """Route report() calls made inside this block to `req_id`."""
+    token = _current_req_id.set(int(req_id))
+    try:
+        yield
+    finally:
+        _current_req_id.reset(token)
+
+
+def current_request_id() -> Optional[int]:
+    return _current_req_id.get()
+
+
+def report(stage: str, message: Optional[str] = None, **extra) -> None:
+    """Publish for the request bound by the worker; no-op when unbound."""
+    req_id = _current_req_id.get()
+    if req_id is None:
+        return
+    publish(req_id, stage, message, **extra)
+
+
+def latest(req_id: int) -> Optional[dict]:
+    """Last stored event (also understands the old plain-text values)."""
+    try:
+        raw = redis_client.get(progress_key(req_id))
+    except Exception:
+        return None
+    if not raw:
+        return None
+    text = raw.decode("utf-8") if isinstance(raw, bytes) else str(raw)
+    try:
+        event = json.loads(text)
+        if isinstance(event, dict):
+            return event
+    except ValueError:
+        pass
+    return {"req_id": int(req_id), "stage": "queued", "message": text}
+
+
+def subscribe(req_id: int):
+    """Return a PubSub already subscribed to this request's channel."""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel_for(req_id))
+    return pubsub
@@ -13,6 +13,13 @@ import re
 import requests
 from typing import Optional
 
+# Progress events for the lobby card (no-op outside the ID worker)
+try:
+    from request_progress import report as _progress
+except Exception:  # pragma: no cover
+    def _progress(*a, **k):
+        return None
+
 CAPTCHA_KEY = os.getenv("TWO_CAPTCHA_APIKEY") or os.getenv("TWO_CAPTCHA_API_KEY") or ""
 
 class CaptchaError(RuntimeError):
@@ -52,6 +59,7 @@ def solve_image_captcha(api_key: Optional[str], png_bytes: bytes) -> str:
     Uploads PNG bytes to 2Captcha and returns ONLY the digits (3–5 chars typical).
     Raises CaptchaError on failure.
     """
+    _progress("solving_captcha")
     key = (api_key or CAPTCHA_KEY).strip()
     if not key:
         raise CaptchaError("TWO_CAPTCHA_APIKEY / TWO_CAPTCHA_API_KEY not set")
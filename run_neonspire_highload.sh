@@ -13,6 +13,9 @@ source venv/bin/activate
 export FLASK_ENV=production
 export NEONSPIRE_HIGHLOAD=1
 
+# Apply pending migrations once, before the workers boot
+python schema_check.py upgrade
+
 # Run Gunicorn with threaded workers on PORT 5100 (NOT 5000!)
 gunicorn \
   -w 4 \
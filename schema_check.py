@@ -0,0 +1,200 @@
+# schema_check.py
+"""
+Fast startup schema check.
+
+The schema is owned by the Alembic migrations in migrations/versions
+(`flask --app app db upgrade`). At boot create_app() only compares the
+database's alembic_version row with the head revision of the scripts on
+disk – one SELECT instead of create_all() plus ~50 inspector/ALTER
+round-trips.
+
+SCHEMA_CHECK (env):
+  version  (default) check only; SQLite dev databases are upgraded
+           automatically, anything else logs a loud warning
+  upgrade  run pending migrations at boot (single-process deploys)
+  off      skip the check entirely (e.g. while running `flask db upgrade`)
+
+A database stamped with a revision that is not on disk is only re-adopted
+(un-stamped and replayed from 0001) when that revision is one of
+LEGACY_REVISIONS, the old autogenerate ids that predate migrations/versions
+(extend with SCHEMA_LEGACY_REVISIONS=id1,id2). Any other unknown stamp, e.g.
+a database already migrated by a newer release during a rollback, is
+never touched: the check reports "behind" (SCHEMA_CHECK=upgrade refuses
+to boot) and the upgrade CLI exits 1.
+
+CLI (deploy step, before workers start):
+  python schema_check.py status
+  python schema_check.py upgrade
+"""
+
+import argparse
+import logging
+import os
+import re
+
+from sqlalchemy import text
+
+log = logging.getLogger("schema_check")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_VERSIONS_DIR = os.path.join(MIGRATIONS_DIR, "versions")
+
+_REV_RE = re.compile(r"^revision\s*=\s*['\"]([^'\"]+)['\"]", re.M)
+_DOWN_RE = re.compile(r"^down_revision\s*=\s*(.+)$", re.M)
+
+# alembic_version stamps of the pre-migrations/versions autogenerate era
+LEGACY_REVISIONS = frozenset(
+    {"4ed94f0ac81a"}
+    | {r.strip() for r in os.getenv("SCHEMA_LEGACY_REVISIONS", "").split(",") if r.strip()}
+)
+
+_scan_cache: tuple[set, set] | None = None
+
+
+def _scan() -> tuple[set, set]:
+    """(all revision ids, head revision ids) of the scripts on disk, without importing Alembic."""
+    global _scan_cache
+    if _scan_cache is not None:
+        return _scan_cache
+
+    revs, parents = set(), set()
+    try:
+        names = os.listdir(_VERSIONS_DIR)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(_VERSIONS_DIR, name), encoding="utf-8") as fh:
+            src = fh.read()
+        m = _REV_RE.search(src)
+        if not m:
+            continue
+        revs.add(m.group(1))
+        d = _DOWN_RE.search(src)
+        if d:
+            parents.update(re.findall(r"['\"]([^'\"]+)['\"]", d.group(1)))
+
+    _scan_cache = (revs, revs - parents)
+    return _scan_cache
+
+
+def head_revisions() -> set:
+    return _scan()[1]
+
+
+def foreign_revisions(current: set | None) -> set:
+    """Stamped revisions that are neither on disk nor a known legacy id."""
+    return (current or set()) - _scan()[0] - LEGACY_REVISIONS
+
+
+def current_revisions(session) -> set | None:
+    """Revisions stamped in the database; None when alembic_version is missing."""
+    try:
+        rows = session.execute(text("SELECT version_num FROM alembic_version")).fetchall()
+    except Exception:
+        session.rollback()
+        return None
+    return {r[0] for r in rows}
+
+
+def upgrade(db, current: set | None = None):
+    """
+    Run pending migrations. A database stamped by a LEGACY_REVISIONS id is
+    un-stamped first: 0001/0002 only create what is missing, so replaying them
+    adopts the existing schema. Any other unknown stamp raises RuntimeError.
+    """
+    from flask_migrate import upgrade as _upgrade
+
+    foreign = foreign_revisions(current)
+    if foreign:
+        raise RuntimeError(f"alembic_version has revision(s) {sorted(foreign)} not in migrations/ "
+                           "(migrated by a newer release?); refusing to re-stamp")
+    unknown = (current or set()) - _scan()[0]
+    if unknown:
+        log.warning("alembic_version has legacy revision(s) %s; re-adopting from baseline", sorted(unknown))
+        db.session.execute(text("DELETE FROM alembic_version"))
+        db.session.commit()
+        db.session.remove()
+    _upgrade(directory=MIGRATIONS_DIR)
+
+
+def check_schema(db, mode: str | None = None) -> str:
+    """
+    Called inside an app context by create_app(). Returns one of
+    "ok", "upgraded", "behind", "skipped".
+    """
+    mode = (mode or os.getenv("SCHEMA_CHECK", "version")).strip().lower()
+    if mode == "off":
+        return "skipped"
+
+    heads = head_revisions()
+    current = current_revisions(db.session)
+    db.session.remove()  # give the connection back before the first request
+    if current is not None and current == heads:
+        return "ok"
+
+    foreign = foreign_revisions(current)
+    if foreign:
+        msg = (f"⚠️ DATABASE IS STAMPED {sorted(foreign)}, which this code does not know "
+               f"(code={sorted(heads)}) – probably migrated by a newer release. Not migrating.")
+        log.warning(msg)
+        print(msg)
+        if mode in ("upgrade", "auto"):
+            raise SystemExit(msg)  # upgrading was asked for and is not possible: don't start
+        return "behind"
+
+    explicit = mode in ("upgrade", "auto")
+    if explicit or db.engine.dialect.name == "sqlite":
+        log.info("schema %s -> %s: running migrations", sorted(current or []) or "empty", sorted(heads))
+        print(f"🛠️ Applying database migrations ({', '.join(sorted(heads))})")
+        try:
+            upgrade(db, current)
+            return "upgraded"
+        except SystemExit:
+            # flask_migrate exits on failure; only fatal when upgrading was asked for
+            if explicit:
+                raise
+
+    msg = (
+        f"⚠️ DATABASE SCHEMA IS NOT AT HEAD: db={sorted(current) if current is not None else 'unversioned'} "
+        f"code={sorted(heads)}. Run `python schema_check.py upgrade` "
+        "(first run on an existing database adopts it; nothing is dropped)."
+    )
+    log.warning(msg)
+    print(msg)
+    return "behind"
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="Schema version: status / upgrade")
+    ap.add_argument("cmd", choices=["status", "upgrade"])
+    args = ap.parse_args(argv)
+
+    os.environ["SCHEMA_CHECK"] = "off"  # importing app must not race us
+    from app import app
+    from models import db
+
+    with app.app_context():
+        current = current_revisions(db.session)
+        print(f"db   : {sorted(current) if current is not None else 'unversioned'}")
+        print(f"head : {sorted(head_revisions())}")
+        foreign = foreign_revisions(current)
+        if args.cmd == "upgrade" and foreign:
+            print(f"refusing to upgrade: {sorted(foreign)} not in migrations/ (newer release?)")
+            return 1
+        if args.cmd == "upgrade" and current != head_revisions():
+            upgrade(db, current)
+            print(f"now  : {sorted(current_revisions(db.session) or [])}")
+            from app import seed_admin
+            seed_admin()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(_cli())
@@ -0,0 +1,185 @@
+# settings_cache.py
+"""
+Versioned, read-only snapshots of PaymentSettings (row 1) and the current
+BonusSettings (latest updated_at).
+
+Every template render used to load PaymentSettings in inject_globals and
+again in the view, and several views fetched BonusSettings on their own.
+Now each process keeps one pair of immutable Snapshot objects:
+
+  payment()   Snapshot | None
+  bonus()     Snapshot (the default row is created on first use, as before)
+
+A Snapshot reads like the model (settings.crypto_qr_url,
+getattr(bonus, "signup_percentage")) but has no session and refuses
+writes – views that edit settings keep loading the ORM rows.
+
+Versioning: any commit that touched a settings row calls bump() (see
+models._bump_settings_version, so the admin and employee update endpoints
+need nothing extra). bump() increments the Redis counter
+"settings:version" and publishes the new value; every process runs one
+daemon thread subscribed to that channel and drops its snapshot when the
+version moves. Without Redis, snapshots expire after
+SETTINGS_CACHE_TTL_SECONDS.
+
+Inside a request the pair is pinned on flask.g, so one render never mixes
+two versions.
+"""
+
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from flask import g, has_request_context
+from sqlalchemy import inspect as sa_inspect
+
+from db_routing import use_primary
+
+log = logging.getLogger("settings_cache")
+
+CACHE_TTL_SECONDS = float(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "300"))
+VERSION_KEY = "settings:version"
+CHANNEL = "settings:version"
+
+_lock = threading.Lock()
+# gen moves on every local drop, so a load that raced a bump is not stored
+_state = {"snap": None, "loaded_at": 0.0, "gen": 0, "version": None, "listener_pid": None}
+
+
+class Snapshot:
+    """Immutable copy of one settings row's columns."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: dict):
+        object.__setattr__(self, "_values", MappingProxyType(dict(values)))
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"settings snapshot is read-only (tried to set {name!r})")
+
+    def __repr__(self):
+        return f"<Snapshot {dict(self._values)!r}>"
+
+
+def _redis():
+    from request_progress import redis_client  # same Redis as the Celery broker
+    return redis_client
+
+
+def _snapshot(obj):
+    if obj is None:
+        return None
+    return Snapshot({a.key: getattr(obj, a.key) for a in sa_inspect(obj).mapper.column_attrs})
+
+
+def _load() -> dict:
+    # Always the primary: this is cached process-wide, so a lagging replica
+    # read inside a @read_only view would pin the pre-bump row for the TTL.
+    from models import db, BonusSettings, PaymentSettings
+    with use_primary():
+        return {
+            "payment": _snapshot(db.session.get(PaymentSettings, 1)),
+            "bonus": _snapshot(BonusSettings.query.order_by(BonusSettings.updated_at.desc()).first()),
+        }
+
+
+def _drop():
+    with _lock:
+        _state["snap"] = None
+        _state["gen"] += 1
+    if has_request_context():
+        g.pop("_settings_snapshot", None)
+
+
+def current() -> dict:
+    """{"payment": Snapshot | None, "bonus": Snapshot | None} – zero queries on a warm cache."""
+    if has_request_context() and "_settings_snapshot" in g:
+        return g._settings_snapshot
+    _ensure_listener()
+    with _lock:
+        snap, gen = _state["snap"], _state["gen"]
+        fresh = snap is not None and time.monotonic() - _state["loaded_at"] < CACHE_TTL_SECONDS
+    if not fresh:
+        snap = _load()
+        with _lock:
+            if _state["gen"] == gen:
+                _state["snap"], _state["loaded_at"] = snap, time.monotonic()
+    if has_request_context():
+        g._settings_snapshot = snap
+    return snap
+
+
+def payment():
+    return current()["payment"]
+
+
+def bonus():
+    snap = current()["bonus"]
+    if snap is None:  # first use: create the default row like the old call sites did
+        from models import db, BonusSettings
+        db.session.add(BonusSettings())
+        db.session.commit()  # bumps the version → _drop()
+        _drop()
+        snap = current()["bonus"]
+    return snap
+
+
+def bump():
+    """Invalidate every process's snapshot. Called after a commit that changed settings."""
+    _drop()
+    try:
+        r = _redis()
+        version = int(r.incr(VERSION_KEY))
+        r.publish(CHANNEL, version)
+        _state["version"] = version
+    except Exception as e:
+        log.debug("settings_cache: version not broadcast (%s) – peers expire in %ss", e, CACHE_TTL_SECONDS)
+
+
+# ---------------------------------------------------------------------------
+# Cross-process invalidation
+# ---------------------------------------------------------------------------
+
+def _ensure_listener():
+    # per pid: a forked worker does not inherit the parent's thread
+    if _state["listener_pid"] == os.getpid():
+        return
+    with _lock:
+        if _state["listener_pid"] == os.getpid():
+            return
+        _state["listener_pid"] = os.getpid()
+    threading.Thread(target=_listen, name="settings-version", daemon=True).start()
+
+
+def _on_version(version):
+    if version != _state["version"]:
+        _state["version"] = version
+        with _lock:
+            _state["snap"] = None
+            _state["gen"] += 1
+
+
+def _listen():
+    backoff = 1.0
+    while True:
+        try:
+            r = _redis()
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            _on_version(int(r.get(VERSION_KEY) or 0))  # catch up on bumps missed while disconnected
+            backoff = 1.0
+            for msg in pubsub.listen():
+                if msg.get("type") == "message":
+                    _on_version(int(msg["data"]))
+        except Exception as e:
+            log.debug("settings_cache: version listener down (%s), retrying in %.0fs", e, backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
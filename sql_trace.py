@@ -0,0 +1,237 @@
+# sql_trace.py
+"""
+Per-request SQL instrumentation.
+
+Engine events count and time every statement issued while a Flask request
+is active. At the end of the request:
+  • Server-Timing header:  db;dur=12.4;desc="17 queries", app;dur=48.0
+  • N+1 warning when the same statement runs >= SQL_N_PLUS_ONE times in
+    one request (SQLAlchemy binds parameters, so a per-row query repeats
+    the exact same SQL text)
+  • slow-query log for statements >= SQL_SLOW_MS, with the *shape* of the
+    bound parameters (types only – no player data in the logs)
+  • dev-only panel appended to HTML pages (app.debug or SQL_DEBUG_PANEL=1)
+
+Env:
+  SQL_TRACE=1            on/off switch for the whole thing (default on)
+  SQL_SLOW_MS=200
+  SQL_N_PLUS_ONE=5
+  SQL_SERVER_TIMING=1
+  SQL_DEBUG_PANEL=0
+
+Query budgets (for tests):
+  with query_budget(8):
+      client.get("/employee/deposits")
+or, with pytest, through the `query_budget` fixture in conftest.py:
+  def test_deposits(client, query_budget):
+      with query_budget(8):
+          client.get("/employee/deposits")
+"""
+
+import html
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+log = logging.getLogger("sql_trace")
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+SQL_TRACE = _env_bool("SQL_TRACE", "1")
+SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+N_PLUS_ONE = int(os.getenv("SQL_N_PLUS_ONE", "5"))
+SERVER_TIMING = _env_bool("SQL_SERVER_TIMING", "1")
+DEBUG_PANEL = _env_bool("SQL_DEBUG_PANEL", "0")
+
+_listeners_installed = False
+_budgets = threading.local()
+
+
+# ---------------------------------------------------------------------------
+# Engine hooks
+# ---------------------------------------------------------------------------
+
+def param_shape(params):
+    """(int, str) / {"user_id": "int"} – the shape of the binds, never the values."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        if params and isinstance(params[0], (list, tuple, dict)):  # executemany
+            return f"{len(params)} x {param_shape(params[0])}"
+        return tuple(type(v).__name__ for v in params)
+    return type(params).__name__
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_sqltrace_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("_sqltrace_t0")
+    if not stack:
+        return
+    ms = (time.perf_counter() - stack.pop()) * 1000.0
+
+    budgets = getattr(_budgets, "stack", None)
+    if budgets:
+        for b in budgets:
+            b["count"] += 1
+            b["statements"].append(statement)
+
+    if not has_request_context():
+        return
+    stats = g.get("_sql_stats")
+    if stats is None:
+        return
+    stats["count"] += 1
+    stats["ms"] += ms
+    stats["repeats"][statement] += 1
+    if ms >= SLOW_MS:
+        stats["slow"].append((ms, statement, param_shape(parameters)))
+
+
+def _on_error(context):
+    # after_cursor_execute never runs for a statement that raised
+    conn = context.connection
+    stack = conn.info.get("_sqltrace_t0") if conn is not None else None
+    if stack:
+        stack.pop()
+
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _before)
+    event.listen(Engine, "after_cursor_execute", _after)
+    event.listen(Engine, "handle_error", _on_error)
+    _listeners_installed = True
+
+
+# ---------------------------------------------------------------------------
+# Flask wiring
+# ---------------------------------------------------------------------------
+
+def _shape(statement: str) -> str:
+    from index_advisor import normalize
+    return normalize(statement)
+
+
+def request_summary(stats: dict) -> dict:
+    repeats = [
+        {"count": n, "statement": _shape(stmt)}
+        for stmt, n in stats["repeats"].most_common()
+        if n >= N_PLUS_ONE
+    ]
+    return {
+        "queries": stats["count"],
+        "db_ms": round(stats["ms"], 1),
+        "app_ms": round((time.perf_counter() - stats["t0"]) * 1000.0, 1),
+        "n_plus_one": repeats,
+        "slow": [
+            {"ms": round(ms, 1), "statement": _shape(stmt), "params": shape}
+            for ms, stmt, shape in stats["slow"]
+        ],
+    }
+
+
+def _panel_html(summary: dict) -> str:
+    rows = []
+    for r in summary["n_plus_one"]:
+        rows.append(f"<div>🔁 {r['count']}× <code>{html.escape(r['statement'][:220])}</code></div>")
+    for r in summary["slow"]:
+        rows.append(f"<div>🐢 {r['ms']} ms <code>{html.escape(r['statement'][:220])}</code> "
+                    f"<span style='opacity:.7'>{html.escape(str(r['params']))}</span></div>")
+    color = "#f87171" if summary["n_plus_one"] or summary["slow"] else "#34d399"
+    return (
+        "<div id='sql-trace-panel' style='position:fixed;right:10px;bottom:10px;z-index:99999;"
+        "max-width:720px;max-height:40vh;overflow:auto;background:rgba(15,23,42,.95);color:#e2e8f0;"
+        f"font:12px/1.4 monospace;border:1px solid {color};border-radius:10px;padding:8px 10px'>"
+        f"<b style='color:{color}'>SQL</b> {summary['queries']} queries • {summary['db_ms']} ms db • "
+        f"{summary['app_ms']} ms total"
+        + "".join(rows)
+        + "</div>"
+    )
+
+
+def init_sql_trace(app):
+    """Register the request hooks on the app (no-op when SQL_TRACE=0)."""
+    if not SQL_TRACE:
+        return
+    _install_listeners()
+    panel = DEBUG_PANEL or app.debug
+
+    @app.before_request
+    def _sql_trace_start():
+        g._sql_stats = {"t0": time.perf_counter(), "count": 0, "ms": 0.0,
+                        "repeats": Counter(), "slow": []}
+
+    @app.after_request
+    def _sql_trace_finish(response):
+        stats = g.pop("_sql_stats", None)
+        if stats is None:
+            return response
+        summary = request_summary(stats)
+        endpoint = request.endpoint or request.path
+
+        for r in summary["n_plus_one"]:
+            log.warning("N+1 in %s: %sx %s", endpoint, r["count"], r["statement"][:300])
+        for r in summary["slow"]:
+            log.warning("slow query in %s: %.1f ms %s params=%s",
+                        endpoint, r["ms"], r["statement"][:300], r["params"])
+
+        if SERVER_TIMING:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries", app;dur={summary["app_ms"]}',
+            )
+
+        if panel and response.mimetype == "text/html" and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            idx = body.lower().rfind("</body>")
+            if idx != -1:
+                response.set_data(body[:idx] + _panel_html(summary) + body[idx:])
+        return response
+
+
+# ---------------------------------------------------------------------------
+# Query budgets
+# ---------------------------------------------------------------------------
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = ""):
+    """Fail (AssertionError) when the block issues more than max_queries statements."""
+    _install_listeners()
+    stack = getattr(_budgets, "stack", None)
+    if stack is None:
+        stack = _budgets.stack = []
+    budget = {"count": 0, "statements": []}
+    stack.append(budget)
+    try:
+        yield budget
+    finally:
+        stack.remove(budget)
+    if budget["count"] > max_queries:
+        top = Counter(_shape(s) for s in budget["statements"]).most_common(5)
+        detail = "\n".join(f"  {n}× {shape[:200]}" for shape, n in top)
+        raise QueryBudgetExceeded(
+            f"{label or 'block'} ran {budget['count']} queries (budget {max_queries}):\n{detail}"
+        )
+
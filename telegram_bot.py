@@ -52,11 +52,17 @@ from models import (
     GameAccountRequest,
     DepositRequest,
     WithdrawRequest,
-    PaymentSettings,
     DMThread,
     DMMessage,
     notify,
+    mark_dm_thread_read,
 )
+from player_stats import stats_for
+from keyset import seek, cached_count
+from player_search import search_users
+import settings_cache  # cached PaymentSettings snapshot
+from db_routing import use_replica  # listings may read from DATABASE_REPLICA_URL
+from wallet import credit as wallet_credit, debit as wallet_debit, key_for as wallet_key
 
 # 👇 we need this to read from kv_store like employee dashboard
 from sqlalchemy import text
@@ -391,10 +397,17 @@ def _vendor_for_game(game: Game | None) -> str | None:
         return None
     return detect_vendor(game)
 
-def _add_wallet_balance(user_id: int, amount: int):
-    wallet = PlayerBalance.query.filter_by(user_id=user_id).first()
-    if wallet:
-        wallet.balance = (wallet.balance or 0) + amount
+def _add_wallet_balance(user_id: int, amount: int, key: str):
+    """Atomic, ledgered credit – a repeated `key` (e.g. double-tapped button) is a no-op."""
+    wallet_credit(user_id, amount, key=key)
+
+def _dead_letter_credit(dep_id: int, vendor: str, error: str, payload: dict, verify: bool = False):
+    """Park a failed vendor credit in the dead-letter queue (admin → Dead letters)."""
+    try:
+        import dead_letters
+        dead_letters.record("credit", dep_id, vendor, error, payload, verify=verify)
+    except Exception:
+        pass
 
 # ================== STAFF BOTTOM MENU ==================
 
@@ -439,10 +452,7 @@ def staff_menu_router(update, context):
         context.user_data["expect_player_search"] = False
 
         with flask_app.app_context():
-            rows = User.query.filter(
-                (User.email.ilike(f"%{query}%")) |
-                (User.name.ilike(f"%{query}%"))
-            ).limit(5).all()
+            rows = search_users(query, limit=5, role=None)
 
         if not rows:
             update.message.reply_text("No matching players found.")
@@ -490,33 +500,32 @@ def staff_menu_router(update, context):
 
 def _send_active_chats(update, telegram_user_id: int):
     """Show active chats assigned to this employee."""
-    with flask_app.app_context():
+    with flask_app.app_context(), use_replica():
         # Find employee by telegram_id
         employee = User.query.filter_by(telegram_id=telegram_user_id).first()
         if not employee:
             update.message.reply_text("❌ Employee record not found.")
             return
         
-        # Get active threads
-        threads = DMThread.query.filter_by(
-            employee_id=employee.id,
-            status="OPEN"
-        ).order_by(DMThread.last_msg_at.desc()).limit(10).all()
+        # Get active threads – player joined in, last message denormalized on the thread
+        rows = (db.session.query(DMThread, User)
+                .outerjoin(User, User.id == DMThread.player_id)
+                .filter(DMThread.employee_id == employee.id, DMThread.status == "OPEN")
+                .order_by(DMThread.last_msg_at.desc())
+                .limit(10)
+                .all())
         
-        if not threads:
+        if not rows:
             update.message.reply_text("💬 No active chats.")
             return
         
         msg = ["💬 *Your Active Chats:*\n"]
-        for thread in threads:
-            player = db.session.get(User, thread.player_id)
-            last_msg = DMMessage.query.filter_by(
-                thread_id=thread.id
-            ).order_by(DMMessage.id.desc()).first()
-            
-            last_text = last_msg.body[:50] + "..." if last_msg and len(last_msg.body) > 50 else (last_msg.body if last_msg else "No messages")
+        for thread, player in rows:
+            snippet = thread.last_msg_snippet
+            last_text = snippet[:50] + "..." if snippet and len(snippet) > 50 else (snippet or "No messages")
+            unread = f" 🔴 {thread.unread_for_staff} new" if thread.unread_for_staff else ""
             msg.append(
-                f"• *{_display_name(player)}* (ID: {thread.id})\n"
+                f"• *{_display_name(player)}* (ID: {thread.id}){unread}\n"
                 f"  Last: {last_text}\n"
                 f"  [💬 Chat](callback:open_chat:{thread.id}) | "
                 f" [📋 Info](callback:player_info:{thread.player_id})\n"
@@ -524,8 +533,7 @@ def _send_active_chats(update, telegram_user_id: int):
         
         # Create inline keyboard with chat buttons
         keyboard = []
-        for thread in threads:
-            player = db.session.get(User, thread.player_id)
+        for thread, player in rows:
             keyboard.append([
                 InlineKeyboardButton(
                     f"💬 {_display_name(player)[:20]}...",
@@ -578,7 +586,7 @@ def start_cmd(update: Update, context: CallbackContext):
 def panel_cmd(update: Update, context: CallbackContext):
     if not staff_only(update):
         return
-    with flask_app.app_context():
+    with flask_app.app_context(), use_replica():
         pending_deposits = DepositRequest.query.filter_by(status="PENDING").count()
         pending_requests = GameAccountRequest.query.filter(
             GameAccountRequest.status.in_(["PENDING", "IN_PROGRESS"])
@@ -709,14 +717,29 @@ def whoami_cmd(update: Update, context: CallbackContext):
 
 # ================== LIST SENDERS ==================
 
-def _send_deposits_list(target, page: int):
-    with flask_app.app_context():
-        q = (
-            DepositRequest.query.filter(DepositRequest.status.in_(["PENDING", "RECEIVED"]))
-            .order_by(DepositRequest.created_at.asc())
-        )
-        total = q.count()
-        rows = q.offset(page * PAGE_SIZE).limit(PAGE_SIZE).all()
+def _parse_list_callback(data: str) -> tuple[int, str | None]:
+    """'list_x:<page>[:<cursor>]' -> (page, cursor). page is for display only."""
+    parts = data.split(":", 2)
+    try:
+        page = max(0, int(parts[1]))
+    except (IndexError, ValueError):
+        page = 0
+    cursor = parts[2] if len(parts) > 2 and parts[2] else None
+    return page, cursor
+
+def _list_nav(prefix: str, page: int, pg) -> list:
+    nav = []
+    if pg.prev_cursor:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{prefix}:{max(page-1, 0)}:{pg.prev_cursor}"))
+    if pg.next_cursor:
+        nav.append(InlineKeyboardButton("➡️ Next", callback_data=f"{prefix}:{page+1}:{pg.next_cursor}"))
+    return nav
+
+def _send_deposits_list(target, page: int, cursor: str | None = None):
+    with flask_app.app_context(), use_replica():
+        q = DepositRequest.query.filter(DepositRequest.status.in_(["PENDING", "RECEIVED"]))
+        pg = seek(q, DepositRequest, cursor=cursor, limit=PAGE_SIZE, desc=False)
+        rows = pg.rows
 
     if not rows:
         if hasattr(target, "message"):
@@ -730,11 +753,7 @@ def _send_deposits_list(target, page: int):
         text_lines.append(f"- #{d.id} • user {d.user_id} • {d.amount} via {d.method}")
     text = "\n".join(text_lines)
 
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"list_deposits:{page-1}"))
-    if (page + 1) * PAGE_SIZE < total:
-        nav.append(InlineKeyboardButton("➡️ Next", callback_data=f"list_deposits:{page+1}"))
+    nav = _list_nav("list_deposits", page, pg)
 
     if hasattr(target, "message"):
         target.message.reply_text(text, parse_mode=ParseMode.MARKDOWN,
@@ -746,14 +765,11 @@ def _send_deposits_list(target, page: int):
     for d in rows:
         _send_deposit_card(target, d)
 
-def _send_withdrawals_list(target, page: int):
-    with flask_app.app_context():
-        q = (
-            WithdrawRequest.query.filter_by(status="PENDING")
-            .order_by(WithdrawRequest.created_at.asc())
-        )
-        total = q.count()
-        rows = q.offset(page * PAGE_SIZE).limit(PAGE_SIZE).all()
+def _send_withdrawals_list(target, page: int, cursor: str | None = None):
+    with flask_app.app_context(), use_replica():
+        q = WithdrawRequest.query.filter_by(status="PENDING")
+        pg = seek(q, WithdrawRequest, cursor=cursor, limit=PAGE_SIZE, desc=False)
+        rows = pg.rows
 
     if not rows:
         if hasattr(target, "message"):
@@ -767,11 +783,7 @@ def _send_withdrawals_list(target, page: int):
         text_lines.append(f"- #{w.id} • user {w.user_id} • {w.amount} via {w.method}")
     text = "\n".join(text_lines)
 
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"list_withdrawals:{page-1}"))
-    if (page + 1) * PAGE_SIZE < total:
-        nav.append(InlineKeyboardButton("➡️ Next", callback_data=f"list_withdrawals:{page+1}"))
+    nav = _list_nav("list_withdrawals", page, pg)
 
     if hasattr(target, "message"):
         target.message.reply_text(text, parse_mode=ParseMode.MARKDOWN,
@@ -783,16 +795,13 @@ def _send_withdrawals_list(target, page: int):
     for w in rows:
         _send_withdraw_card(target, w)
 
-def _send_requests_list(target, page: int):
-    with flask_app.app_context():
-        q = (
-            GameAccountRequest.query.filter(
-                GameAccountRequest.status.in_(["PENDING", "IN_PROGRESS"])
-            )
-            .order_by(GameAccountRequest.created_at.asc())
+def _send_requests_list(target, page: int, cursor: str | None = None):
+    with flask_app.app_context(), use_replica():
+        q = GameAccountRequest.query.filter(
+            GameAccountRequest.status.in_(["PENDING", "IN_PROGRESS"])
         )
-        total = q.count()
-        rows = q.offset(page * PAGE_SIZE).limit(PAGE_SIZE).all()
+        pg = seek(q, GameAccountRequest, cursor=cursor, limit=PAGE_SIZE, desc=False)
+        rows = pg.rows
 
     if not rows:
         if hasattr(target, "message"):
@@ -806,11 +815,7 @@ def _send_requests_list(target, page: int):
         text_lines.append(f"- #{r.id} • user {r.user_id} • game {r.game_id} • {r.status}")
     text = "\n".join(text_lines)
 
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"list_requests:{page-1}"))
-    if (page + 1) * PAGE_SIZE < total:
-        nav.append(InlineKeyboardButton("➡️ Next", callback_data=f"list_requests:{page+1}"))
+    nav = _list_nav("list_requests", page, pg)
 
     if hasattr(target, "message"):
         target.message.reply_text(text, parse_mode=ParseMode.MARKDOWN,
@@ -822,7 +827,7 @@ def _send_requests_list(target, page: int):
     for r in rows:
         _send_request_card(target, r)
 
-def _send_players_list(target, page: int):
+def _send_players_list(target, page: int, cursor: str | None = None):
     """
     Rich players list:
     - ID + name
@@ -831,10 +836,11 @@ def _send_players_list(target, page: int):
     - games count + names
     - registration time
     """
-    with flask_app.app_context():
-        q = User.query.filter_by(role="PLAYER").order_by(User.created_at.desc())
-        total = q.count()
-        rows = q.offset(page * PAGE_SIZE).limit(PAGE_SIZE).all()
+    with flask_app.app_context(), use_replica():
+        q = User.query.filter_by(role="PLAYER")
+        pg = seek(q, User, cursor=cursor, limit=PAGE_SIZE)
+        rows = pg.rows
+        total = cached_count("tg:players", q)
 
         if not rows:
             msg = "No players."
@@ -899,11 +905,7 @@ def _send_players_list(target, page: int):
         text = "\n".join(lines)
 
     # pagination
-    nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"list_players:{page-1}"))
-    if (page + 1) * PAGE_SIZE < total:
-        nav.append(InlineKeyboardButton("➡️ Next", callback_data=f"list_players:{page+1}"))
+    nav = _list_nav("list_players", page, pg)
 
     kb = InlineKeyboardMarkup([nav]) if nav else None
 
@@ -924,7 +926,8 @@ def _send_deposit_card(target, dep: DepositRequest):
     with flask_app.app_context():
         user = db.session.get(User, dep.user_id) if dep.user_id else None
         game = db.session.get(Game, dep.game_id) if dep.game_id else None
-        settings = db.session.get(PaymentSettings, 1)
+        settings = settings_cache.payment()
+        stats = stats_for(dep.user_id)
 
         meta = {}
         try:
@@ -946,6 +949,10 @@ def _send_deposit_card(target, dep: DepositRequest):
         f"Game: {gname}",
         f"Status: {dep.status}",
     ]
+    if stats and stats.deposit_count:
+        lines.append(f"History: {stats.deposit_count} loaded (${stats.deposit_sum:,.2f})")
+    else:
+        lines.append("History: ⭐ first deposit")
 
     if dep.created_at:
         lines.append(f"Created: `{dep.created_at:%Y-%m-%d %H:%M}`")
@@ -1188,6 +1195,8 @@ def callback_handler(update: Update, context: CallbackContext):
                 thread_id=thread_id
             ).order_by(DMMessage.id.desc()).limit(10).all()
             messages.reverse()
+            if mark_dm_thread_read(thread, staff=True):
+                db.session.commit()
             
             msg_lines = [f"💬 *Chat with {_display_name(player)}*\n"]
             for msg in messages:
@@ -1245,20 +1254,20 @@ def callback_handler(update: Update, context: CallbackContext):
     
     # lists
     if data.startswith("list_deposits:"):
-        page = int(data.split(":", 1)[1])
-        _send_deposits_list(q, page)
+        page, cursor = _parse_list_callback(data)
+        _send_deposits_list(q, page, cursor)
         return
     if data.startswith("list_withdrawals:"):
-        page = int(data.split(":", 1)[1])
-        _send_withdrawals_list(q, page)
+        page, cursor = _parse_list_callback(data)
+        _send_withdrawals_list(q, page, cursor)
         return
     if data.startswith("list_requests:"):
-        page = int(data.split(":", 1)[1])
-        _send_requests_list(q, page)
+        page, cursor = _parse_list_callback(data)
+        _send_requests_list(q, page, cursor)
         return
     if data.startswith("list_players:"):
-        page = int(data.split(":", 1)[1])
-        _send_players_list(q, page)
+        page, cursor = _parse_list_callback(data)
+        _send_players_list(q, page, cursor)
         return
     if data.startswith("list_chats:"):
         page = int(data.split(":", 1)[1])
@@ -1284,7 +1293,7 @@ def callback_handler(update: Update, context: CallbackContext):
                 return
             dep.status = "LOADED"
             dep.loaded_at = datetime.utcnow()
-            _add_wallet_balance(dep.user_id, int(dep.amount or 0))
+            _add_wallet_balance(dep.user_id, int(dep.amount or 0), key=wallet_key("deposit", dep))
             db.session.commit()
             notify(dep.user_id, f"✅ Your deposit #{dep.id} of {dep.amount} has been loaded.")
         context.bot.edit_message_text(chat_id=chat_id, message_id=progress_mid,
@@ -1347,26 +1356,28 @@ def callback_handler(update: Update, context: CallbackContext):
                 return
 
             note = f"Deposit#{dep.id} via Telegram"
+            credit_payload = {"deposit_id": dep.id, "vendor": vendor, "account": acc_username,
+                              "amount": amount, "note": note}
             try:
                 res = provider_credit(vendor, acc_username, amount, note)
             except Exception as e:
                 msg = str(e)
+                # the call may have landed before it raised: staff verify, no blind replay
+                _dead_letter_credit(dep.id, vendor, f"{type(e).__name__}: {msg}", credit_payload, verify=True)
                 if "Locator.click" in msg or "Timeout 60000ms" in msg or "recharge" in msg.lower():
-                    context.bot.edit_message_text(
-                        chat_id=chat_id,
-                        message_id=progress_mid,
-                        text="⚠️ JUWA recharge failed.\nPlease try again or load it manually in the JUWA panel.",
-                    )
-                else:
-                    context.bot.edit_message_text(
-                        chat_id=chat_id,
-                        message_id=progress_mid,
-                        text=f"{vendor.upper()} credit failed: {msg}",
-                    )
+                    msg = "the panel timed out"
+                context.bot.edit_message_text(
+                    chat_id=chat_id,
+                    message_id=progress_mid,
+                    text=(f"⚠️ {vendor.upper()} recharge did not confirm ({msg}).\n"
+                          f"It may still have gone through – check the {vendor.upper()} panel before "
+                          f"retrying. If it is there, mark the deposit LOADED."),
+                )
                 return
 
             if not _prov_ok(vendor, res):
                 err_txt = _prov_err(res) or "unknown error"
+                _dead_letter_credit(dep.id, vendor, err_txt, credit_payload)
                 context.bot.edit_message_text(
                     chat_id=chat_id,
                     message_id=progress_mid,
@@ -1376,7 +1387,7 @@ def callback_handler(update: Update, context: CallbackContext):
 
             dep.status = "LOADED"
             dep.loaded_at = datetime.utcnow()
-            _add_wallet_balance(dep.user_id, amount)
+            _add_wallet_balance(dep.user_id, amount, key=wallet_key("deposit", dep))
             db.session.commit()
             notify(dep.user_id, f"✅ Your deposit #{dep.id} of {amount} has been credited to {vendor.upper()}.")
         context.bot.edit_message_text(
@@ -1472,9 +1483,7 @@ def callback_handler(update: Update, context: CallbackContext):
                 return
             wd.status = "PAID"
             wd.paid_at = datetime.utcnow()
-            wallet = PlayerBalance.query.filter_by(user_id=wd.user_id).first()
-            if wallet:
-                wallet.balance = max(0, (wallet.balance or 0) - (wd.amount or 0))
+            wallet_debit(wd.user_id, wd.amount or 0, key=wallet_key("withdraw", wd))
             db.session.commit()
             notify(wd.user_id, f"💸 Your withdrawal #{wd.id} for {wd.amount} has been paid.")
         context.bot.edit_message_text(
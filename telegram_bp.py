@@ -10,7 +10,7 @@ import urllib.parse
 from flask import Blueprint, request, jsonify, url_for, render_template, redirect, session
 from flask_login import login_user
 
-from models import db, User
+from models import db, User, PlayerBalance
 
 telegram_bp = Blueprint("telegram_bp", __name__)
 
@@ -140,6 +140,8 @@ def tg_autologin():
             # random password that user never needs
             user.set_password(token_hex(16))
             db.session.add(user)
+            db.session.flush()
+            db.session.add(PlayerBalance(user_id=user.id, balance=0))  # wallet opens with the account
             db.session.commit()
 
         # 3) log them in
@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip("flask")
+
+
+def _player_and_game(db, name: str, pool: int = 0):
+    from models import Game, ReadyAccount, User
+
+    user = User(email=f"{name}@example.com", name=name, role="PLAYER", password_hash="x")
+    game = Game(name=f"{name} game", download_url="", is_active=True)
+    db.session.add_all([user, game])
+    db.session.flush()
+    db.session.add_all([ReadyAccount(game_id=game.id, username=f"{name}{i}", password=f"pw{i}")
+                        for i in range(pool)])
+    db.session.commit()
+    return user.id, game.id
+
+
+def _request(db, user_id: int, game_id: int):
+    from models import GameAccountRequest
+
+    req = GameAccountRequest(user_id=user_id, game_id=game_id, status="PENDING")
+    db.session.add(req)
+    db.session.flush()
+    return req
+
+
+def test_pool_account_is_claimed_and_request_approved(db):
+    from models import GameAccount, GameAccountRequest, Notification, ReadyAccount
+
+    uid, gid = _player_and_game(db, "autofill", pool=1)
+    req = _request(db, uid, gid)
+    assert req.status == "APPROVED"
+    assert req not in db.session.dirty  # in step with the row, nothing left to flush
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(GameAccountRequest, req.id).status == "APPROVED"
+    ra = ReadyAccount.query.filter_by(game_id=gid).one()
+    assert ra.is_claimed and ra.claimed_by == uid and ra.claimed_at is not None
+    acc = GameAccount.query.filter_by(user_id=uid, game_id=gid).one()
+    assert (acc.account_username, acc.account_password, acc.request_id) == ("autofill0", "pw0", req.id)
+    assert Notification.query.filter_by(user_id=uid).count() == 1
+
+
+def test_one_pool_account_serves_one_request(db):
+    from models import GameAccount, GameAccountRequest, ReadyAccount, User
+
+    uid, gid = _player_and_game(db, "onlyone", pool=1)
+    other = User(email="onlyone-2@example.com", name="onlyone-2", role="PLAYER", password_hash="x")
+    db.session.add(other)
+    db.session.flush()
+
+    first = _request(db, uid, gid)
+    second = _request(db, other.id, gid)
+    db.session.commit()
+
+    assert db.session.get(GameAccountRequest, first.id).status == "APPROVED"
+    assert db.session.get(GameAccountRequest, second.id).status == "PENDING"
+    assert ReadyAccount.query.filter_by(game_id=gid, is_claimed=True).count() == 1
+    assert GameAccount.query.filter_by(game_id=gid).count() == 1
+
+
+def test_empty_pool_leaves_request_pending(db):
+    from models import GameAccount, GameAccountRequest
+
+    uid, gid = _player_and_game(db, "emptypool")
+    req = _request(db, uid, gid)
+    db.session.commit()
+
+    assert db.session.get(GameAccountRequest, req.id).status == "PENDING"
+    assert GameAccount.query.filter_by(user_id=uid, game_id=gid).count() == 0
+
+
+def test_fulfilled_request_is_not_enqueued(db, monkeypatch):
+    pytest.importorskip("celery")
+    import id_requests
+
+    uid, gid = _player_and_game(db, "noenqueue", pool=1)
+    req = _request(db, uid, gid)
+    db.session.commit()
+
+    sent, published = [], []
+    monkeypatch.setattr(id_requests.process_id_request, "apply_async", lambda *a, **kw: sent.append(a))
+    monkeypatch.setattr(id_requests.request_progress, "publish", lambda *a, **kw: published.append(a))
+    id_requests.enqueue_game_account_request(req.id)
+
+    assert sent == []
+    assert published == [(req.id, "done")]
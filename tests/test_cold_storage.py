@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("flask")
+
+
+def _player(db, name: str) -> int:
+    from models import User
+
+    u = User(email=f"{name}@example.com", name=name, role="PLAYER", password_hash="x")
+    db.session.add(u)
+    db.session.commit()
+    return u.id
+
+
+def test_archived_and_deleted_ids_are_never_reused(db):
+    import cold_storage
+    from models import DepositRequest, RequestArchive
+
+    uid = _player(db, "cold-reuse")
+    old = datetime.utcnow() - timedelta(days=400)
+    deps = [DepositRequest(user_id=uid, amount=10, method="CRYPTO", status="LOADED",
+                           created_at=old, updated_at=old) for _ in range(3)]
+    db.session.add_all(deps)
+    db.session.commit()
+    ids = [d.id for d in deps]
+
+    cold_storage.archive_settled("deposit", days=90)
+    db.session.expire_all()
+    assert all(db.session.get(DepositRequest, i) is None for i in ids)  # the newest one too
+    archived = RequestArchive.query.filter(RequestArchive.kind == "deposit", RequestArchive.ref_id.in_(ids))
+    assert sorted(a.ref_id for a in archived) == ids
+
+    gone = DepositRequest(user_id=uid, amount=10, method="CRYPTO", status="PENDING")
+    db.session.add(gone)
+    db.session.commit()
+    assert gone.id > ids[-1]
+    gone_id = gone.id
+    db.session.delete(gone)
+    db.session.commit()
+
+    fresh = DepositRequest(user_id=uid, amount=10, method="CRYPTO", status="LOADED", created_at=old, updated_at=old)
+    db.session.add(fresh)
+    db.session.commit()
+    assert fresh.id > gone_id
+    assert cold_storage.archive_settled("deposit", days=90)["rows"] == 1
+
+
+def test_wallet_key_does_not_follow_the_id(db):
+    import wallet
+    from models import DepositRequest
+
+    uid = _player(db, "cold-key")
+    dep = DepositRequest(user_id=uid, amount=10, method="CRYPTO", status="PENDING")
+    db.session.add(dep)
+    db.session.commit()
+
+    assert dep.ledger_key and dep.ledger_key != str(dep.id)
+    assert wallet.key_for("deposit", dep) == f"deposit:{dep.ledger_key}"
+    dep.ledger_key = None  # a row written behind the ORM's back
+    assert wallet.key_for("deposit", dep) == f"deposit:{dep.id}"
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("flask")
+
+
+def _bucket(db, game_id: int, status: str) -> int:
+    from models import DailyStat
+
+    return int(db.session.query(db.func.coalesce(db.func.sum(DailyStat.cnt), 0))
+               .filter(DailyStat.kind == "deposit", DailyStat.game_id == game_id, DailyStat.status == status)
+               .scalar())
+
+
+def test_refresh_repairs_old_days_with_open_requests(db):
+    import daily_stats
+    from models import DailyStat, DepositRequest, Game, User
+
+    player = User(email="daily-open@example.com", name="daily open", role="PLAYER", password_hash="x")
+    game = Game(name="daily open game", download_url="", is_active=True)
+    db.session.add_all([player, game])
+    db.session.flush()
+    old = datetime.utcnow() - timedelta(days=10)
+    db.session.add_all([DepositRequest(user_id=player.id, game_id=game.id, amount=25, method="CRYPTO",
+                                       status="PENDING", created_at=old) for _ in range(2)])
+    db.session.commit()
+    assert _bucket(db, game.id, "PENDING") == 2
+
+    # drift the rollup behind the hooks' back
+    DailyStat.query.filter_by(kind="deposit", game_id=game.id, status="PENDING").update({"cnt": 7})
+    db.session.commit()
+
+    r = daily_stats.refresh(days=2)
+    assert r["since"] <= old.date().isoformat()
+    assert _bucket(db, game.id, "PENDING") == 2
+
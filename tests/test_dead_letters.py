@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("celery")
+
+
+def _deposit(db, name: str) -> int:
+    from models import DepositRequest, User
+
+    u = User(email=f"{name}@example.com", name=name, role="PLAYER", password_hash="x")
+    db.session.add(u)
+    db.session.flush()
+    dep = DepositRequest(user_id=u.id, amount=25, method="CRYPTO", status="RECEIVED")
+    db.session.add(dep)
+    db.session.commit()
+    return dep.id
+
+
+def _payload(dep_id: int) -> dict:
+    return {"deposit_id": dep_id, "vendor": "juwa", "account": "acc", "amount": 25, "note": "t"}
+
+
+def test_unknown_outcome_is_not_bulk_replayed(db):
+    import dead_letters
+
+    dep_id = _deposit(db, "dlq-verify")
+    job = dead_letters.record("credit", dep_id, "juwa", "TimeoutError: Timeout 60000ms exceeded",
+                              _payload(dep_id), verify=True)
+    assert job.status == "VERIFY"
+
+    summary = dead_letters.replay(kind="credit", ids=[job.id], force=True, dry_run=True)
+    assert summary["matched"] == 0
+
+    # a later definite failure must not make it replayable again
+    assert dead_letters.record("credit", dep_id, "juwa", "credit failed", _payload(dep_id)).status == "VERIFY"
+
+    assert dead_letters.release(job.id)
+    assert db.session.get(dead_letters.DeadLetterJob, job.id).status == "DEAD"
+
+
+def test_loading_the_deposit_resolves_its_credit_job(db):
+    import dead_letters
+    from models import DepositRequest
+
+    dep_id = _deposit(db, "dlq-loaded")
+    job = dead_letters.record("credit", dep_id, "juwa", "TimeoutError", _payload(dep_id), verify=True)
+
+    db.session.get(DepositRequest, dep_id).status = "LOADED"
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(dead_letters.DeadLetterJob, job.id).status == "RESOLVED"
@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("flask")
+
+
+def _thread(db, name: str):
+    from models import DMThread, User
+
+    player = User(email=f"{name}@example.com", name=name, role="PLAYER", password_hash="x")
+    staff = User(email=f"{name}-staff@example.com", name=f"{name} staff", role="EMPLOYEE", password_hash="x")
+    db.session.add_all([player, staff])
+    db.session.flush()
+    thread = DMThread(player_id=player.id, employee_id=staff.id, status="OPEN")
+    db.session.add(thread)
+    db.session.commit()
+    return thread, player, staff
+
+
+def _say(db, thread, user, body: str, commit: bool = True):
+    from models import DMMessage
+
+    db.session.add(DMMessage(thread_id=thread.id, sender_id=user.id, sender_role=user.role, body=body))
+    if commit:
+        db.session.commit()
+
+
+def test_counters_and_last_message(db):
+    thread, player, staff = _thread(db, "dm-counters")
+
+    _say(db, thread, player, "hi")
+    _say(db, thread, player, "anyone there?")
+    db.session.refresh(thread)
+    assert (thread.unread_for_staff, thread.unread_for_player) == (2, 0)
+    assert (thread.last_msg_snippet, thread.last_sender_role) == ("anyone there?", "PLAYER")
+
+    _say(db, thread, staff, "hello!")  # a reply: staff has read the thread
+    db.session.refresh(thread)
+    assert (thread.unread_for_staff, thread.unread_for_player) == (0, 1)
+    assert thread.last_sender_role == "EMPLOYEE"
+
+
+def test_several_messages_in_one_flush(db):
+    thread, player, staff = _thread(db, "dm-batch")
+
+    _say(db, thread, player, "one", commit=False)
+    _say(db, thread, staff, "two", commit=False)
+    _say(db, thread, player, "three", commit=False)
+    db.session.commit()
+    db.session.refresh(thread)
+    assert (thread.unread_for_staff, thread.unread_for_player) == (1, 0)
+    assert thread.last_msg_snippet == "three"
+
+
+def test_mark_read_zeroes_only_the_reader(db):
+    from models import mark_dm_thread_read
+
+    thread, player, staff = _thread(db, "dm-read")
+    _say(db, thread, player, "ping")
+    _say(db, thread, staff, "pong")
+    db.session.refresh(thread)
+    assert (thread.unread_for_staff, thread.unread_for_player) == (0, 1)
+
+    assert not mark_dm_thread_read(thread, staff=True)
+    assert mark_dm_thread_read(thread, staff=False)
+    db.session.commit()
+    db.session.refresh(thread)
+    assert (thread.unread_for_staff, thread.unread_for_player) == (0, 0)
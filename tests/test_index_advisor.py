@@ -0,0 +1,65 @@
+import index_advisor
+from index_advisor import candidate, normalize, suggest
+
+PENDING_DEPOSITS = (
+    "SELECT deposit_requests.id, deposit_requests.amount FROM deposit_requests "
+    "WHERE deposit_requests.status = ? ORDER BY deposit_requests.created_at DESC LIMIT ? OFFSET ?"
+)
+PLAYER_WITHDRAWS = (
+    "SELECT withdraw_requests.id FROM withdraw_requests "
+    "WHERE withdraw_requests.user_id = ? AND withdraw_requests.status = ? "
+    "ORDER BY withdraw_requests.created_at DESC"
+)
+
+
+class _Inspector:
+    """Just the three reflection calls table_indexes() makes."""
+
+    def __init__(self, indexes: dict):
+        self._indexes = indexes
+
+    def get_pk_constraint(self, table):
+        return {"constrained_columns": ["id"]}
+
+    def get_indexes(self, table):
+        return [{"name": "_".join(cols), "column_names": cols} for cols in self._indexes.get(table, [])]
+
+    def get_unique_constraints(self, table):
+        return []
+
+
+def test_normalize_folds_literals_and_bind_styles():
+    a = normalize("SELECT * FROM users WHERE users.id = 42 AND users.email = 'x@example.com'")
+    b = normalize("SELECT *\n  FROM users WHERE users.id = %(id_1)s AND users.email = :email")
+    assert a == b == "SELECT * FROM users WHERE users.id = ? AND users.email = ?"
+    assert normalize("SELECT 1 FROM t WHERE t.id IN (?, ?, ?)") == normalize("SELECT 1 FROM t WHERE t.id IN (?)")
+
+
+def test_candidate_is_equality_then_sort():
+    assert candidate(PENDING_DEPOSITS) == ("deposit_requests", ["status", "created_at"])
+    assert candidate(PLAYER_WITHDRAWS) == ("withdraw_requests", ["user_id", "status", "created_at"])
+
+
+def test_candidate_skips_primary_key_lookups():
+    assert candidate("SELECT users.name FROM users WHERE users.id = ?") is None
+
+
+def test_candidate_uses_the_range_column_without_a_sort():
+    shape = "SELECT notifications.id FROM notifications WHERE notifications.created_at < ?"
+    assert candidate(shape) == ("notifications", ["created_at"])
+
+
+def test_suggest_reports_only_uncovered_shapes():
+    shapes = {
+        PENDING_DEPOSITS: {"calls": 10, "total_ms": 120.0, "max_ms": 30.0},
+        PLAYER_WITHDRAWS: {"calls": 4, "total_ms": 80.0, "max_ms": 25.0},
+    }
+    inspector = _Inspector({"deposit_requests": [["status", "created_at"]], "withdraw_requests": [["user_id"]]})
+    out = suggest(shapes, inspector)
+    assert [(s["table"], s["columns"]) for s in out] == [("withdraw_requests", ["user_id", "status", "created_at"])]
+    assert out[0]["ddl"].startswith("CREATE INDEX ix_withdraw_requests_user_id_status_created_at")
+
+
+def test_covered_ignores_equality_column_order():
+    assert index_advisor._covered(["status", "user_id", "created_at"], 2, [["user_id", "status", "created_at"]])
+    assert not index_advisor._covered(["status", "created_at"], 1, [["created_at", "status"]])
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("flask")
+
+
+def _players(db, tag: str, n: int) -> list[int]:
+    from models import DepositRequest, User
+
+    users = [User(email=f"{tag}{i}@gmail.example", name=f"{tag} {i}", role="PLAYER", password_hash="x")
+             for i in range(n)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all([DepositRequest(user_id=u.id, amount=10, method="CRYPTO", status="PENDING")
+                        for u in users])
+    db.session.commit()
+    return [u.id for u in users]
+
+
+def test_filter_is_not_capped(db, monkeypatch):
+    import player_search
+    from models import DepositRequest
+
+    ids = _players(db, "broadterm", 12)
+    monkeypatch.setattr(player_search, "SEARCH_CANDIDATES", 5)
+
+    ranked = player_search.search_user_ids("broadterm", limit=5)
+    assert len(ranked) == 5
+
+    found = DepositRequest.query.filter(player_search.user_filter(DepositRequest.user_id, "broadterm"))
+    assert sorted(d.user_id for d in found) == ids
+
+
+def test_filter_matches_exact_id_and_role(db):
+    import player_search
+    from models import User
+
+    uid = _players(db, "exactid", 1)[0]
+    staff = User(email="exactid-staff@gmail.example", name="exactid staff", role="EMPLOYEE", password_hash="x")
+    db.session.add(staff)
+    db.session.commit()
+
+    by_id = User.query.filter(player_search.user_filter(User.id, f"#{uid}")).all()
+    assert [u.id for u in by_id] == [uid]
+
+    players = User.query.filter(player_search.user_filter(User.id, "exactid")).all()
+    assert [u.id for u in players] == [uid]
+    everyone = User.query.filter(player_search.user_filter(User.id, "exactid", role=None)).all()
+    assert sorted(u.id for u in everyone) == sorted([uid, staff.id])
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("flask")
+
+T1 = datetime(2026, 3, 1, 12, 0)
+T2 = datetime(2026, 3, 5, 12, 0)
+
+
+def _player(db, name: str) -> int:
+    from models import User
+
+    u = User(email=f"{name}@example.com", name=name, role="PLAYER", password_hash="x")
+    db.session.add(u)
+    db.session.commit()
+    return u.id
+
+
+def _stats(db, uid: int):
+    from models import PlayerStats
+
+    db.session.expire_all()
+    return db.session.get(PlayerStats, uid)
+
+
+def _deposit(db, uid: int, amount: float, loaded_at: datetime, bonus: float = 0.0):
+    from models import DepositRequest
+
+    dep = DepositRequest(user_id=uid, amount=amount, method="CRYPTO", status="PENDING", bonus_amount=bonus)
+    db.session.add(dep)
+    db.session.commit()
+    dep.status, dep.loaded_at = "LOADED", loaded_at
+    db.session.commit()
+    return dep
+
+
+def test_load_and_reverse_deposits(db):
+    uid = _player(db, "stats-reverse")
+    first = _deposit(db, uid, 20, T1)
+    second = _deposit(db, uid, 50, T2, bonus=10)
+
+    s = _stats(db, uid)
+    assert (s.deposit_count, s.deposit_sum, s.bonus_count, s.bonus_sum) == (2, 70, 1, 10)
+    assert (s.first_deposit_at, s.last_deposit_at) == (T1, T2)
+
+    second.status = "REJECTED"
+    db.session.commit()
+    s = _stats(db, uid)
+    assert (s.deposit_count, s.deposit_sum, s.bonus_count, s.bonus_sum) == (1, 20, 0, 0)
+    assert (s.first_deposit_at, s.last_deposit_at) == (T1, T1)
+
+    first.status = "REJECTED"
+    db.session.commit()
+    s = _stats(db, uid)
+    assert (s.deposit_count, s.deposit_sum) == (0, 0)
+    assert (s.first_deposit_at, s.last_deposit_at) == (None, None)
+
+
+def test_amount_and_bonus_edits_while_loaded(db):
+    uid = _player(db, "stats-edit")
+    dep = _deposit(db, uid, 30, T1)
+
+    dep.amount = 45
+    dep.bonus_amount = 5
+    db.session.commit()
+    s = _stats(db, uid)
+    assert (s.deposit_count, s.deposit_sum, s.bonus_count, s.bonus_sum) == (1, 45, 1, 5)
+
+    dep.note = "checked"  # unrelated edit: nothing moves
+    db.session.commit()
+    s = _stats(db, uid)
+    assert (s.deposit_count, s.deposit_sum, s.bonus_count, s.bonus_sum) == (1, 45, 1, 5)
+
+    dep.amount, dep.status = 60, "REJECTED"  # reversal takes out what was counted
+    db.session.commit()
+    s = _stats(db, uid)
+    assert (s.deposit_count, s.deposit_sum, s.bonus_count, s.bonus_sum) == (0, 0, 0, 0)
+
+
+def test_withdraw_amount_edit_while_paid(db):
+    from models import WithdrawRequest
+
+    uid = _player(db, "stats-withdraw")
+    wd = WithdrawRequest(user_id=uid, amount=40, method="CASHAPP", status="PAID", acted_at=T1)
+    db.session.add(wd)
+    db.session.commit()
+
+    wd.amount = 35
+    db.session.commit()
+    s = _stats(db, uid)
+    assert (s.withdraw_count, s.withdraw_sum, s.last_withdraw_at) == (1, 35, T1)
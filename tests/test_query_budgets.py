@@ -0,0 +1,84 @@
+"""Statement budgets for hot views: the count must not grow with the rows on the page.
+
+Rows are written in their own app context so each request gets a fresh session,
+and only the shapes on the page's own tables are compared – a kv / settings
+refetch landing in one of the two runs does not count.
+"""
+
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("flask")
+
+DEPOSITS_BUDGET = 25
+DEPOSIT_TABLES = ("deposit_requests", "users", "games")
+
+
+def _login(client, user_id: int):
+    with client.session_transaction() as s:
+        s["_user_id"] = str(user_id)
+        s["_fresh"] = True
+
+
+def _shapes(budget, tables) -> Counter:
+    from sql_trace import _shape
+    return Counter(_shape(s) for s in budget["statements"] if any(t in s for t in tables))
+
+
+def _add_deposits(app, n: int, tag: str):
+    from models import DepositRequest, Game, User, db
+
+    with app.app_context():
+        game = Game(name=f"budget {tag}", download_url="", is_active=True)
+        players = [User(email=f"budget-{tag}-{i}@example.com", name=f"Budget {tag} {i}", role="PLAYER",
+                        password_hash="x") for i in range(n)]
+        db.session.add(game)
+        db.session.add_all(players)
+        db.session.flush()
+        db.session.add_all([DepositRequest(user_id=p.id, game_id=game.id, amount=20 + i, method="CRYPTO",
+                                           status="PENDING") for i, p in enumerate(players)])
+        db.session.commit()
+
+
+def _measure(client, query_budget, url: str, budget: int, label: str):
+    client.get(url)  # warm settings / kv caches
+    with query_budget(budget, label) as b:
+        assert client.get(url).status_code == 200
+    return b
+
+
+def test_employee_deposits_list(app, client, query_budget):
+    from models import User, db
+
+    with app.app_context():
+        staff = User(email="budget-staff@example.com", name="Budget Staff", role="EMPLOYEE", password_hash="x")
+        db.session.add(staff)
+        db.session.commit()
+        staff_id = staff.id
+    _login(client, staff_id)
+
+    url = "/employee/deposits?status=PENDING"
+    _add_deposits(app, 3, "small")
+    small = _measure(client, query_budget, url, DEPOSITS_BUDGET, "deposits list, 3 rows")
+    _add_deposits(app, 40, "large")
+    large = _measure(client, query_budget, url, DEPOSITS_BUDGET, "deposits list, 43 rows")
+
+    assert _shapes(large, DEPOSIT_TABLES) == _shapes(small, DEPOSIT_TABLES), \
+        "statements on the deposit tables grow with the number of deposits"
+
+
+LOBBY_BUDGET = 10
+
+
+def test_anonymous_lobby(app, client, query_budget):
+    from models import Game, db
+
+    few = _measure(client, query_budget, "/", LOBBY_BUDGET, "lobby")
+
+    with app.app_context():
+        db.session.add_all([Game(name=f"lobby {i}", download_url="", is_active=True) for i in range(30)])
+        db.session.commit()
+    many = _measure(client, query_budget, "/", LOBBY_BUDGET, "lobby, 30 more games")
+
+    assert _shapes(many, ("games",)) == _shapes(few, ("games",)), "statements grow with the number of games"
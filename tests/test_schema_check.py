@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("flask")
+
+
+def test_migrations_have_a_single_head():
+    import schema_check
+
+    assert len(schema_check.head_revisions()) == 1
+
+
+def test_booted_database_is_at_head(db):
+    import schema_check
+
+    assert schema_check.current_revisions(db.session) == schema_check.head_revisions()
+    assert schema_check.check_schema(db, "version") == "ok"
+
+
+def test_boot_issues_two_statements(app):
+    """create_app() only checks alembic_version and looks up the seed admin."""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import create_app
+
+    seen = []
+
+    def count(*_a, **_k):
+        seen.append(1)
+
+    event.listen(Engine, "before_cursor_execute", count)
+    try:
+        create_app()
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+    assert len(seen) <= 2
+
+
+def _restamp(db, rev: str):
+    from sqlalchemy import text
+
+    db.session.execute(text("UPDATE alembic_version SET version_num = :v"), {"v": rev})
+    db.session.commit()
+
+
+def test_unknown_stamp_is_left_alone(db):
+    import schema_check
+
+    (head,) = schema_check.head_revisions()
+    _restamp(db, "ffffffffffff")
+    try:
+        assert schema_check.check_schema(db, "version") == "behind"
+        with pytest.raises(SystemExit):
+            schema_check.check_schema(db, "upgrade")
+        with pytest.raises(RuntimeError):
+            schema_check.upgrade(db, {"ffffffffffff"})
+        assert schema_check.current_revisions(db.session) == {"ffffffffffff"}
+    finally:
+        _restamp(db, head)
+
+
+def test_legacy_stamp_is_readopted():
+    import schema_check
+
+    assert schema_check.foreign_revisions({"4ed94f0ac81a"}) == set()
+    assert schema_check.foreign_revisions({"ffffffffffff"}) == {"ffffffffffff"}
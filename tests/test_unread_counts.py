@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("redis")
+
+
+@pytest.fixture
+def counts():
+    import unread_counts
+
+    try:
+        unread_counts._redis().ping()
+    except Exception:
+        pytest.skip("no Redis at REDIS_URL")
+    uid = 987_654_321
+    unread_counts._redis().delete(unread_counts.key_for(uid), unread_counts.gen_key_for(uid))
+    yield unread_counts, uid
+    unread_counts._redis().delete(unread_counts.key_for(uid), unread_counts.gen_key_for(uid))
+
+
+def test_miss_seeds_the_count(counts, monkeypatch):
+    unread_counts, uid = counts
+    monkeypatch.setattr(unread_counts, "_count", lambda user_id: 3)
+
+    assert unread_counts.get(uid) == 3
+    unread_counts.apply({uid: 2})
+    assert int(unread_counts._redis().get(unread_counts.key_for(uid))) == 5
+
+
+def test_notification_committed_during_the_count_is_not_lost(counts, monkeypatch):
+    unread_counts, uid = counts
+    rows = [3]
+
+    def count_racing_a_commit(user_id):
+        n = rows[0]         # the COUNT's snapshot
+        rows[0] += 1        # another request commits a notification ...
+        unread_counts.apply({uid: 1})  # ... and its delta finds no key
+        return n
+
+    monkeypatch.setattr(unread_counts, "_count", count_racing_a_commit)
+    assert unread_counts.get(uid) == 3
+    assert unread_counts._redis().get(unread_counts.key_for(uid)) is None  # not seeded with the stale 3
+
+    monkeypatch.setattr(unread_counts, "_count", lambda user_id: rows[0])
+    assert unread_counts.get(uid) == 4
@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip("flask")
+
+
+def test_hammer_loses_no_credits():
+    import wallet
+
+    threads, credits, amount = 8, 25, 5
+    r = wallet.hammer(threads=threads, credits=credits, amount=amount)
+
+    assert r["expected"] == threads * credits * amount
+    assert r["ledger"]["errors"] == 0
+    assert r["ledger"]["balance"] == r["expected"]
+    assert r["ledger"]["ledger_sum"] == r["ledger"]["balance"]
+    assert r["ledger"]["ledger_mismatch"] == []
+    assert r["ok"]
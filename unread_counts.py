@@ -0,0 +1,114 @@
+# unread_counts.py
+"""
+Unread-notification badge counts kept in Redis, so inject_globals (which
+runs for every rendered template) no longer COUNTs notifications.
+
+  unread:<user_id>      integer, expires after UNREAD_COUNT_TTL_SECONDS
+  unread:gen:<user_id>  bumped by every apply() / forget() for that user
+
+  get(user_id)       GET; on a miss COUNT(*) the user's unread rows
+                     (ix_notifications_user_unread) and seed the key
+  apply(deltas)      {user_id: +n / -n} after a commit – models queues
+                     these from notify_many, ORM inserts, is_read flips
+                     and deletes, and applies them in after_commit
+  forget(user_id)    drop the key (bulk deletes; next read re-counts)
+
+Counters are only adjusted while they exist: an INCRBY that lands on a
+missing key (result == delta) or drives one negative deletes it again, so
+the next read re-counts instead of trusting a partial number. A miss reads
+the generation before it COUNTs and only seeds the key if no apply() ran
+in between – otherwise a notification committed during the COUNT would be
+lost (its delta found no key) and the stale count kept for the whole TTL.
+Anything the hooks can't see (raw SQL, a Redis outage during apply) is
+healed by the TTL. Without Redis, get() is the old COUNT.
+"""
+
+import logging
+import os
+
+log = logging.getLogger("unread_counts")
+
+TTL_SECONDS = int(os.getenv("UNREAD_COUNT_TTL_SECONDS", "3600"))
+
+# SET NX the count only while the generation is still the one read before COUNT
+_SEED_LUA = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'NX', 'EX', ARGV[3])
+return 1
+"""
+_seed_script = None
+
+
+def _redis():
+    from request_progress import redis_client  # same Redis as the Celery broker
+    return redis_client
+
+
+def key_for(user_id: int) -> str:
+    return f"unread:{int(user_id)}"
+
+
+def gen_key_for(user_id: int) -> str:
+    return f"unread:gen:{int(user_id)}"
+
+
+def _seed(user_id: int, gen: str, n: int):
+    global _seed_script
+    if _seed_script is None:
+        _seed_script = _redis().register_script(_SEED_LUA)
+    _seed_script(keys=[key_for(user_id), gen_key_for(user_id)], args=[gen, n, TTL_SECONDS])
+
+
+def _count(user_id: int) -> int:
+    from models import db, Notification
+    return (db.session.query(db.func.count(Notification.id))
+            .filter(Notification.user_id == user_id, Notification.is_read == False)  # noqa: E712
+            .scalar() or 0)
+
+
+def get(user_id: int) -> int:
+    try:
+        raw, gen = _redis().mget(key_for(user_id), gen_key_for(user_id))
+    except Exception as e:
+        log.debug("unread_counts: redis unavailable (%s) – counting", e)
+        return _count(user_id)
+    if raw is not None:
+        return max(int(raw), 0)
+    n = _count(user_id)
+    try:
+        _seed(user_id, str(int(gen)) if gen is not None else "", n)
+    except Exception:
+        pass
+    return n
+
+
+def apply(deltas: dict):
+    """Adjust existing counters by {user_id: delta}; best effort."""
+    items = [(int(uid), int(d)) for uid, d in deltas.items() if uid and d]
+    if not items:
+        return
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for uid, d in items:
+            pipe.incr(gen_key_for(uid))
+            pipe.expire(gen_key_for(uid), TTL_SECONDS)
+            pipe.incrby(key_for(uid), d)
+        results = pipe.execute()[2::3]
+        stale = [key_for(uid) for (uid, d), n in zip(items, results) if n < 0 or n == d]
+        if stale:
+            _redis().delete(*stale)
+    except Exception as e:
+        log.debug("unread_counts: %s counters not adjusted (%s) – TTL will re-count", len(items), e)
+
+
+def forget(user_id: int):
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        pipe.delete(key_for(user_id))
+        pipe.incr(gen_key_for(user_id))  # a COUNT already running must not seed
+        pipe.expire(gen_key_for(user_id), TTL_SECONDS)
+        pipe.execute()
+    except Exception:
+        pass
@@ -0,0 +1,289 @@
+# wallet.py
+"""
+Concurrency-safe wallet updates backed by the append-only wallet_ledger.
+
+Every balance change goes through apply()/credit()/debit(), inside the
+caller's transaction (db.session.connection()):
+
+  1. INSERT the ledger row keyed by an idempotency key (key_for("deposit",
+     dep) – "deposit:<ledger_key>").
+     A key that already exists means the change was applied before –
+     nothing else happens and None is returned.
+  2. UPDATE player_balances SET balance = balance + :delta (an upsert when
+     the wallet row doesn't exist yet). The database does the addition, so
+     two staff approving deposits for the same player at the same moment
+     can't overwrite each other the way `wallet.balance = wallet.balance + x`
+     in Python did.
+
+Debits that must not go below zero (withdrawals, as before) lock the wallet
+row (FOR UPDATE on Postgres; SQLite already holds the write lock after
+step 1) and record the amount actually taken.
+
+The caller commits; a rollback drops both the ledger row and the balance
+change.
+
+CLI:
+  python wallet.py verify            # balances that disagree with SUM(delta)
+  python wallet.py history 42
+  python wallet.py hammer --threads 16 --credits 50
+      # concurrent credits against a temp SQLite db: old read-modify-write
+      # vs apply(), checks the final balance
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+
+def _tables():
+    from models import PlayerBalance, WalletLedger
+    return PlayerBalance.__table__, WalletLedger.__table__
+
+
+def _insert_ledger(conn, row: dict) -> bool:
+    """True if the row was inserted, False if the idempotency key already exists."""
+    _, t = _tables()
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "postgres", "sqlite"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as _insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as _insert
+        res = conn.execute(_insert(t).values(**row).on_conflict_do_nothing(index_elements=[t.c.idempotency_key]))
+        return bool(res.rowcount)
+    if dialect in ("mysql", "mariadb"):
+        res = conn.execute(t.insert().prefix_with("IGNORE").values(**row))
+        return bool(res.rowcount)
+    try:
+        with conn.begin_nested():
+            conn.execute(t.insert().values(**row))
+        return True
+    except IntegrityError:
+        return False
+
+
+def _add_to_balance(conn, user_id: int, delta: int, now: datetime):
+    """balance = balance + delta, creating the wallet row if needed."""
+    t, _ = _tables()
+    values = {"user_id": user_id, "balance": delta, "updated_at": now}
+    set_ = {"balance": func.coalesce(t.c.balance, 0) + delta, "updated_at": now}
+
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "postgres", "sqlite"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as _insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as _insert
+        conn.execute(_insert(t).values(**values).on_conflict_do_update(index_elements=[t.c.user_id], set_=set_))
+        return
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as _insert
+        conn.execute(_insert(t).values(**values).on_duplicate_key_update(**set_))
+        return
+    res = conn.execute(t.update().where(t.c.user_id == user_id).values(**set_))
+    if not res.rowcount:
+        conn.execute(t.insert().values(**values))
+
+
+def key_for(kind: str, obj) -> str:
+    """
+    Idempotency key for a deposit / withdrawal: "deposit:<ledger_key>".
+
+    ledger_key is random per row, so an id handed out again after archiving
+    never lands on an old ledger entry. Rows from before migration 0014 carry
+    their id there – the key they were already credited under.
+    """
+    return f"{kind}:{obj.ledger_key or obj.id}"
+
+
+def apply(user_id: int, delta, key: str, reason: str = "adjust",
+          actor_id: int | None = None, floor_zero: bool = False, session=None) -> int | None:
+    """
+    Change a player's wallet by `delta` exactly once per `key`.
+
+    Returns the delta actually applied (differs from `delta` only for a
+    floor_zero debit larger than the balance), or None when `key` was
+    already applied.
+    """
+    from models import db
+    session = session or db.session
+    conn = session.connection()
+    wallets, ledger = _tables()
+
+    delta = int(round(float(delta or 0)))
+    now = datetime.utcnow()
+    if not _insert_ledger(conn, {
+        "user_id": user_id, "delta": delta, "reason": reason,
+        "idempotency_key": key, "actor_id": actor_id, "created_at": now,
+    }):
+        return None
+
+    if floor_zero and delta < 0:
+        q = select(wallets.c.balance).where(wallets.c.user_id == user_id)
+        if conn.dialect.name != "sqlite":
+            q = q.with_for_update()
+        current = int(conn.execute(q).scalar() or 0)
+        applied = -min(max(current, 0), -delta)
+        if applied != delta:
+            conn.execute(ledger.update().where(ledger.c.idempotency_key == key).values(delta=applied))
+        delta = applied
+
+    _add_to_balance(conn, user_id, delta, now)
+    return delta
+
+
+def credit(user_id: int, amount, key: str, reason: str = "deposit", **kw) -> int | None:
+    return apply(user_id, abs(float(amount or 0)), key, reason=reason, **kw)
+
+
+def debit(user_id: int, amount, key: str, reason: str = "withdraw", floor_zero: bool = True, **kw) -> int | None:
+    return apply(user_id, -abs(float(amount or 0)), key, reason=reason, floor_zero=floor_zero, **kw)
+
+
+# ---------------------------------------------------------------------------
+# Read side
+# ---------------------------------------------------------------------------
+
+def mismatches(limit: int = 100) -> list[dict]:
+    """Wallets whose balance differs from their ledger sum."""
+    from models import db
+    wallets, ledger = _tables()
+    sums = (select(ledger.c.user_id, func.sum(ledger.c.delta).label("total"))
+            .group_by(ledger.c.user_id).subquery())
+    rows = db.session.execute(
+        select(wallets.c.user_id, wallets.c.balance, sums.c.total)
+        .select_from(wallets.outerjoin(sums, sums.c.user_id == wallets.c.user_id))
+        .where(func.coalesce(wallets.c.balance, 0) != func.coalesce(sums.c.total, 0))
+        .limit(limit)
+    ).all()
+    return [{"user_id": r[0], "balance": r[1], "ledger": r[2]} for r in rows]
+
+
+def history(user_id: int, limit: int = 50):
+    from models import WalletLedger
+    return (WalletLedger.query.filter_by(user_id=user_id)
+            .order_by(WalletLedger.id.desc()).limit(limit).all())
+
+
+# ---------------------------------------------------------------------------
+# Concurrency check
+# ---------------------------------------------------------------------------
+
+def hammer(threads: int = 16, credits: int = 50, amount: int = 5) -> dict:
+    """
+    `threads` workers each credit one wallet `credits` times, first with the
+    old read-modify-write, then with apply(). Runs on a throwaway SQLite file.
+    """
+    from flask import Flask
+    from models import db, User, PlayerBalance
+
+    path = os.path.join(tempfile.mkdtemp(prefix="wallet_hammer_"), "wallet.db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 60, "check_same_thread": False}}
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        for uid in (1, 2):
+            db.session.add(User(id=uid, name=f"hammer{uid}", email=f"h{uid}@example.invalid",
+                                password_hash="x", role="PLAYER"))
+            db.session.add(PlayerBalance(user_id=uid, balance=0))
+        db.session.commit()
+
+    def legacy(tid, i):
+        w = PlayerBalance.query.filter_by(user_id=1).first()
+        w.balance = (w.balance or 0) + amount
+        db.session.commit()
+
+    def ledgered(tid, i):
+        apply(2, amount, key=f"hammer:{tid}:{i}", reason="adjust")
+        db.session.commit()
+
+    def run(fn):
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def worker(tid):
+            with app.app_context():
+                barrier.wait()
+                for i in range(credits):
+                    try:
+                        fn(tid, i)
+                    except Exception as e:
+                        db.session.rollback()
+                        errors.append(repr(e))
+        t0 = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return time.perf_counter() - t0, errors
+
+    expected = threads * credits * amount
+    legacy_s, legacy_err = run(legacy)
+    ledger_s, ledger_err = run(ledgered)
+
+    with app.app_context():
+        got_legacy = PlayerBalance.query.filter_by(user_id=1).first().balance
+        got_ledger = PlayerBalance.query.filter_by(user_id=2).first().balance
+        _, ledger = _tables()
+        ledger_sum = db.session.execute(select(func.sum(ledger.c.delta)).where(ledger.c.user_id == 2)).scalar()
+        bad = [m for m in mismatches() if m["user_id"] == 2]
+
+    return {
+        "expected": expected,
+        "legacy": {"balance": got_legacy, "seconds": round(legacy_s, 2), "errors": len(legacy_err)},
+        "ledger": {"balance": got_ledger, "seconds": round(ledger_s, 2), "errors": len(ledger_err),
+                   "ledger_sum": ledger_sum, "ledger_mismatch": bad},
+        "ok": got_ledger == expected == ledger_sum and not ledger_err and not bad,
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _cli(argv=None):
+    ap = argparse.ArgumentParser(description="wallet ledger: verify / history / hammer")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("verify")
+    sp = sub.add_parser("history")
+    sp.add_argument("user_id", type=int)
+    hp = sub.add_parser("hammer")
+    hp.add_argument("--threads", type=int, default=16)
+    hp.add_argument("--credits", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "hammer":
+        r = hammer(args.threads, args.credits)
+        print(f"expected balance        {r['expected']}")
+        print(f"read-modify-write       {r['legacy']['balance']}  ({r['legacy']['seconds']}s, "
+              f"{r['legacy']['errors']} errors)")
+        print(f"wallet.apply            {r['ledger']['balance']}  ({r['ledger']['seconds']}s, "
+              f"{r['ledger']['errors']} errors)")
+        print("✅ no lost updates" if r["ok"] else f"❌ ledger run wrong: {r['ledger']}")
+        return 0 if r["ok"] else 1
+
+    from app import app
+    with app.app_context():
+        if args.cmd == "verify":
+            bad = mismatches()
+            for m in bad:
+                print(f"user {m['user_id']:<8} balance={m['balance']} ledger={m['ledger']}")
+            print("✅ every balance matches its ledger" if not bad else f"❌ {len(bad)} mismatched wallet(s)")
+            return 1 if bad else 0
+        for row in history(args.user_id):
+            print(f"{row.created_at:%Y-%m-%d %H:%M:%S}  {row.delta:>+8}  {row.reason:<10} {row.idempotency_key}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())